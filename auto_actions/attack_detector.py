@@ -8,7 +8,8 @@ This is designed to detect combat damage numbers in RuneScape.
 Features:
 - Detects orange damage numbers using color filtering
 - Uses OCR to read the exact damage values
-- Logs all detected damage with timestamps
+- Streams detected damage to data/damage_log.jsonl (rotated, bounded memory)
+  with running totals: hits, max hit, session and rolling DPS
 - Real-time monitoring with hotkey controls
 
 Hotkeys:
@@ -17,11 +18,12 @@ Hotkeys:
 - d: toggle debug mode
 - c: set custom detection region around mouse
 - x: clear custom region
+- k: start / stop the sampling profiler (writes data/profiles/*.folded)
 
 Requirements:
 - Uses HSV color detection to isolate orange damage text
 - Uses pytesseract for OCR of damage numbers
-- Saves detected damage to log file
+- Appends detected damage to a JSON-lines log (see event_log.py)
 
 Run:
   python auto_actions/attack_detector.py
@@ -32,7 +34,7 @@ from __future__ import annotations
 import os
 import sys
 import time
-import json
+from collections import deque
 from typing import Optional, Tuple, List
 from datetime import datetime
 
@@ -57,6 +59,11 @@ except Exception:
 try:
     from pynput import keyboard
     from funcs import AutoActionFunctions
+    from event_channel import get_publisher
+    import hotlog
+    from profiler import get_profiler
+    from event_log import EVENTS_DIR, get_event_log
+    from telemetry import get_telemetry
 except Exception as e:
     print(f"❌ Import error: {e}")
     sys.exit(1)
@@ -87,11 +94,76 @@ PAUSED = True
 STOP = False
 DEBUG = True
 CUSTOM_ROI = None  # (x1, y1, x2, y2) if user sets a manual region
-DAMAGE_LOG = []  # Store detected damage numbers with timestamps
-LOG_FILE = os.path.join(CURRENT_DIR, "data", "damage_log.json")
-
-# Ensure data directory exists
-os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+# Detected damage is streamed to disk; only the last entries stay in memory.
+# The log (file + writer thread) is created on the first hit, not at import.
+DAMAGE_LOG = None
+LOG_FILE = os.path.join(EVENTS_DIR, "damage_log.jsonl")
+# Per-frame diagnostics go through the async logger (rate limited per message)
+LOG = hotlog.get_logger("attack_detector", level=hotlog.DEBUG if DEBUG else hotlog.INFO)
+FRAME_LOG_EVERY_S = 0.5  # rate limit for once-per-frame debug lines (per-contour lines are not limited)
+
+
+def get_damage_log():
+    """Get or create the streaming damage log"""
+    global DAMAGE_LOG
+    if DAMAGE_LOG is None:
+        DAMAGE_LOG = get_event_log("damage_log", window=200)
+    return DAMAGE_LOG
+
+
+class DamageStats:
+    """Running damage aggregates in O(1) memory, plus DPS over the last `window_s`."""
+
+    def __init__(self, window_s: float = 10.0):
+        self.window_s = window_s
+        self.count = 0
+        self.total = 0
+        self.max_hit = 0
+        self.zero_hits = 0
+        self.first_t: Optional[float] = None
+        self.last_t: Optional[float] = None
+        self._recent = deque()  # (t, damage) inside the rolling window
+        self._recent_total = 0
+
+    def add(self, damage: int, t: float):
+        self.count += 1
+        self.total += damage
+        self.max_hit = max(self.max_hit, damage)
+        self.zero_hits += damage == 0
+        if self.first_t is None:
+            self.first_t = t
+        self.last_t = t
+        self._recent.append((t, damage))
+        self._recent_total += damage
+        self._prune(t)
+
+    def _prune(self, now: float):
+        while self._recent and now - self._recent[0][0] > self.window_s:
+            self._recent_total -= self._recent.popleft()[1]
+
+    def dps(self) -> float:
+        """Session DPS from the first to the last hit."""
+        if self.first_t is None or self.last_t <= self.first_t:
+            return 0.0
+        return self.total / (self.last_t - self.first_t)
+
+    def recent_dps(self, now: Optional[float] = None) -> float:
+        self._prune(time.time() if now is None else now)
+        return self._recent_total / self.window_s
+
+    def summary(self) -> dict:
+        return {
+            "hits": self.count,
+            "total": self.total,
+            "max_hit": self.max_hit,
+            "zero_hits": self.zero_hits,
+            "avg_hit": self.total / self.count if self.count else 0.0,
+            "dps": self.dps(),
+            "recent_dps": self.recent_dps(),
+        }
+
+
+DAMAGE_STATS = DamageStats()
 
 
 def on_key_press(key):
@@ -107,6 +179,7 @@ def on_key_press(key):
             return False
         elif key.char == 'd':
             DEBUG = not DEBUG
+            LOG.set_level(hotlog.DEBUG if DEBUG else hotlog.INFO)
             print(f"🐛 Debug mode: {'ON' if DEBUG else 'OFF'}")
         elif key.char == 'c':
             # Set ROI - user should position mouse near where damage numbers appear
@@ -117,38 +190,44 @@ def on_key_press(key):
         elif key.char == 'x':
             CUSTOM_ROI = None
             print("🗑️ Cleared ROI - will scan full screen")
+        elif key.char == 'k':
+            get_profiler("attack_detector").toggle()
     except AttributeError:
         pass
 
 
 def save_damage_log():
-    """Save the damage log to file"""
-    try:
-        with open(LOG_FILE, 'w') as f:
-            json.dump(DAMAGE_LOG, f, indent=2)
-        print(f"💾 Saved {len(DAMAGE_LOG)} damage entries to {LOG_FILE}")
-    except Exception as e:
-        print(f"⚠️ Failed to save damage log: {e}")
+    """Flush the streaming damage log to disk and print the session totals"""
+    s = DAMAGE_STATS.summary()
+    if DAMAGE_LOG is None:
+        print("💾 No damage entries this session")
+    else:
+        DAMAGE_LOG.flush()
+        print(f"💾 {DAMAGE_LOG.written} damage entries in {LOG_FILE}"
+              f"{f' ({DAMAGE_LOG.dropped} dropped)' if DAMAGE_LOG.dropped else ''}")
+    print(f"📊 Hits: {s['hits']}  total: {s['total']}  max hit: {s['max_hit']}  "
+          f"avg: {s['avg_hit']:.1f}  DPS: {s['dps']:.2f}")
 
 
 def log_damage(damage_value: int, position: Tuple[int, int], confidence: float = 1.0):
     """Log a detected damage number"""
-    timestamp = datetime.now().isoformat()
+    now = datetime.now()
     entry = {
-        "timestamp": timestamp,
+        "timestamp": now.isoformat(),
         "damage": damage_value,
         "position": position,
         "confidence": confidence
     }
-    DAMAGE_LOG.append(entry)
+    get_damage_log().append(entry)
+    DAMAGE_STATS.add(damage_value, now.timestamp())
+    get_publisher("attack_detector").detection("damage", True, position, value=damage_value)
+    get_telemetry("attack_detector").detection("damage", True, position, confidence=confidence,
+                                               value=damage_value, t=now.timestamp(), every_s=0)
     
     # Display the damage
-    time_str = datetime.now().strftime("%H:%M:%S")
-    print(f"[{time_str}] 💥 Damage: {damage_value} at {position} (conf: {confidence:.2f})")
-    
-    # Auto-save every 10 entries
-    if len(DAMAGE_LOG) % 10 == 0:
-        save_damage_log()
+    LOG.info("[{}] 💥 Damage: {} at {} (conf: {:.2f}) max: {} DPS(10s): {:.2f}", now.strftime("%H:%M:%S"),
+             damage_value, position, confidence, DAMAGE_STATS.max_hit, DAMAGE_STATS.recent_dps(now.timestamp()),
+             every_s=0)
 
 
 def detect_orange_damage_numbers(frame) -> List[Tuple[int, Tuple[int, int], float]]:
@@ -165,29 +244,26 @@ def detect_orange_damage_numbers(frame) -> List[Tuple[int, Tuple[int, int], floa
             x1, y1, x2, y2 = max(0, x1), max(0, y1), min(frame.shape[1], x2), min(frame.shape[0], y2)
             roi = frame[y1:y2, x1:x2]
             roi_offset = (x1, y1)
-            if DEBUG:
-                print(f"🔍 Using custom ROI: {CUSTOM_ROI}")
+            LOG.debug("🔍 Using custom ROI: {}", CUSTOM_ROI, every_s=FRAME_LOG_EVERY_S)
         else:
             # Use full screen for damage detection
             roi = frame
             roi_offset = (0, 0)
-            if DEBUG:
-                print("🔍 Scanning full screen for damage numbers")
+            LOG.debug("🔍 Scanning full screen for damage numbers", every_s=FRAME_LOG_EVERY_S)
         
         if roi.size == 0:
-            if DEBUG:
-                print("⚠️ ROI is empty")
+            LOG.debug("⚠️ ROI is empty", every_s=FRAME_LOG_EVERY_S)
             return []
             
         # Convert to HSV for orange detection
         hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
         
-        # Debug: Show HSV range in ROI
-        if DEBUG:
-            h_min, h_max = hsv[:,:,0].min(), hsv[:,:,0].max()
-            s_min, s_max = hsv[:,:,1].min(), hsv[:,:,1].max() 
-            v_min, v_max = hsv[:,:,2].min(), hsv[:,:,2].max()
-            print(f"🎨 HSV ranges in ROI - H:[{h_min}-{h_max}] S:[{s_min}-{s_max}] V:[{v_min}-{v_max}]")
+        # Debug: Show HSV range in ROI (six full-array reductions - only when
+        # debug logging is on; cv2.minMaxLoc is much cheaper than numpy min/max)
+        if LOG.debug_enabled:
+            ranges = [cv2.minMaxLoc(hsv[:, :, c])[:2] for c in range(3)]
+            LOG.debug("🎨 HSV ranges in ROI - H:[{:.0f}-{:.0f}] S:[{:.0f}-{:.0f}] V:[{:.0f}-{:.0f}]",
+                      *ranges[0], *ranges[1], *ranges[2], every_s=FRAME_LOG_EVERY_S)
         
         # Create mask for orange damage colors
         orange_mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
@@ -198,8 +274,7 @@ def detect_orange_damage_numbers(frame) -> List[Tuple[int, Tuple[int, int], floa
         
         # Count orange pixels for debugging
         orange_pixels = cv2.countNonZero(orange_mask)
-        if DEBUG:
-            print(f"🟠 Found {orange_pixels} orange pixels")
+        LOG.debug("🟠 Found {} orange pixels", orange_pixels, every_s=FRAME_LOG_EVERY_S)
         
         if orange_pixels < 10:  # Not enough orange detected
             return []
@@ -207,23 +282,20 @@ def detect_orange_damage_numbers(frame) -> List[Tuple[int, Tuple[int, int], floa
         # Find contours for number-like shapes
         contours, _ = cv2.findContours(orange_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
-        if DEBUG:
-            print(f"🔍 Found {len(contours)} contours")
+        LOG.debug("🔍 Found {} contours", len(contours), every_s=FRAME_LOG_EVERY_S)
         
         detected_numbers = []
         
         for i, contour in enumerate(contours):
             area = cv2.contourArea(contour)
-            if DEBUG:
-                print(f"  Contour {i}: area={area}")
+            LOG.debug("  Contour {}: area={}", i, area)
             
             # Filter by size - damage numbers are typically small to medium sized
             if 20 < area < 5000:
                 x, y, w, h = cv2.boundingRect(contour)
                 aspect_ratio = h / w if w > 0 else 0
                 
-                if DEBUG:
-                    print(f"  Contour {i}: bbox=({x},{y},{w},{h}), aspect={aspect_ratio:.2f}")
+                LOG.debug("  Contour {}: bbox=({},{},{},{}), aspect={:.2f}", i, x, y, w, h, aspect_ratio)
                 
                 # Filter by aspect ratio - numbers are typically taller than they are wide
                 if 0.3 < aspect_ratio < 5.0:
@@ -241,8 +313,7 @@ def detect_orange_damage_numbers(frame) -> List[Tuple[int, Tuple[int, int], floa
                         config = '--psm 8 -c tessedit_char_whitelist=0123456789'
                         try:
                             text = pytesseract.image_to_string(number_roi, config=config).strip()
-                            if DEBUG:
-                                print(f"  OCR result: '{text}'")
+                            LOG.debug("  OCR result: '{}'", text)
                             
                             # Validate that we got a valid damage number
                             if text.isdigit() and len(text) >= 1:
@@ -258,22 +329,18 @@ def detect_orange_damage_numbers(frame) -> List[Tuple[int, Tuple[int, int], floa
                                     
                                     detected_numbers.append((damage_value, position, confidence))
                                     
-                                    if DEBUG:
-                                        print(f"  ✅ Valid damage number: {damage_value} at {position}")
+                                    LOG.debug("  ✅ Valid damage number: {} at {}", damage_value, position)
                         except Exception as ocr_err:
-                            if DEBUG:
-                                print(f"  OCR error: {ocr_err}")
+                            LOG.error("  OCR error: {}", ocr_err)
                     else:
                         # Fallback without OCR - just detect that there's an orange number-like shape
-                        if DEBUG:
-                            print("  No OCR available, detected orange number-like shape")
+                        LOG.debug("  No OCR available, detected orange number-like shape")
                         # We could implement template matching here for common damage numbers
                         
         return detected_numbers
         
     except Exception as e:
-        if DEBUG:
-            print(f"⚠️ Detection error: {e}")
+        LOG.error("⚠️ Detection error: {}", e)
         return []
 
 
@@ -287,6 +354,7 @@ def main():
     print("  d = toggle debug output")
     print("  c = set detection region around mouse cursor")
     print("  x = clear custom detection region")
+    print("  k = start/stop sampling profiler")
     print("=" * 50)
     print("⏸️  PAUSED - Press 'p' to start detection")
 
@@ -308,14 +376,12 @@ def main():
 
             now = time.time()
 
-            if DEBUG:
-                print("📸 Capturing screen for damage detection...")
-            
+            LOG.debug("📸 Capturing screen for damage detection...", every_s=FRAME_LOG_EVERY_S)
+
             # Capture screen
             frame = funcs.capture_screen()
             if frame is not None:
-                if DEBUG:
-                    print(f"📸 Screen captured: {frame.shape}")
+                LOG.debug("📸 Screen captured: {}", frame.shape, every_s=FRAME_LOG_EVERY_S)
                 
                 # Detect damage numbers
                 detected_numbers = detect_orange_damage_numbers(frame)
@@ -329,8 +395,10 @@ def main():
                     if detection_key not in detection_cooldown or (now - detection_cooldown[detection_key]) > 2.0:
                         log_damage(damage_value, position, confidence)
                         detection_cooldown[detection_key] = now
-                    elif DEBUG:
-                        print(f"  🔄 Skipped duplicate: {damage_value} (cooldown)")
+                        if len(detection_cooldown) > 256:  # keep the key map bounded too
+                            detection_cooldown = {k: t for k, t in detection_cooldown.items() if now - t <= 2.0}
+                    else:
+                        LOG.debug("  🔄 Skipped duplicate: {} (cooldown)", damage_value)
             
             # Light frame pacing to avoid heavy CPU usage
             time.sleep(0.1)  # Check every 100ms
@@ -339,9 +407,11 @@ def main():
         print("\n🛑 Interrupted by user")
     finally:
         listener.stop()
+        LOG.flush()
         save_damage_log()
+        if DAMAGE_LOG is not None:
+            DAMAGE_LOG.close()
         print("👋 Exiting attack damage detector")
-        print(f"📊 Total damage entries logged: {len(DAMAGE_LOG)}")
 
 
 if __name__ == "__main__":
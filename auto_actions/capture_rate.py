@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Adaptive Capture Rate
+
+Replaces the fixed sleeps between captures (FLICK_LOOP_SLEEP, 0.5 s polls)
+with a rate chosen by urgency, so a loop captures fast only when something
+is about to change and idles otherwise:
+
+- Each loop state has a base rate (`rates`, Hz): e.g. 10 Hz while active,
+  2 Hz when paused, 0.5 Hz during a break, 1/3 Hz while chopping.
+- expect(t, window_s) marks a predicted transition (a tick boundary, the
+  spellbook coming back, a tree falling). Inside t ± window the loop runs at
+  `fast_hz`; before it, the wait is cut short so the window is not missed.
+  Passing period_s makes the expectation repeat (tick boundaries), and a
+  `key` lets a newer prediction replace an older one. With hold=True nothing
+  is captured until the window opens (e.g. a minimum dwell that no capture
+  can shorten).
+- urgent(duration_s) runs fast for a while, e.g. right after a click while
+  the UI reacts.
+- frame() counts captures; achieved fps is reported per state (and for
+  'urgent' when the fast rate was in force), alongside the target rate.
+
+All times are perf_counter seconds.
+
+Usage:
+    rate = CaptureRate("flick", rates={"active": 10.0}, fast_hz=50.0)
+    while running:
+        t0 = time.perf_counter()
+        frame = capture(); rate.frame()
+        if tick_changed:
+            rate.expect(t0 + 0.6, window_s=0.08, period_s=0.6, key="tick")
+        rate.wait(started=t0)
+    rate.print_stats()
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+DEFAULT_RATES = {
+    "active": 10.0,
+    "idle": 2.0,
+    "paused": 2.0,
+    "break": 0.5,
+}
+DEFAULT_FAST_HZ = 50.0
+URGENT = "urgent"
+
+
+def _clock() -> float:
+    # Looked up per call so a patched clock (simulator.SimClock) is honoured
+    return time.perf_counter()
+
+
+class CaptureRate:
+    def __init__(self, name: str, rates: Optional[Dict[str, float]] = None, fast_hz: float = DEFAULT_FAST_HZ,
+                 state: str = "active", clock: Callable[[], float] = _clock,
+                 timer: Optional[Callable[[str, float], None]] = None):
+        """
+        Args:
+            name: Used in stats output.
+            rates: state -> base capture rate in Hz (merged over DEFAULT_RATES).
+            fast_hz: Rate inside expectation windows and urgent periods.
+            state: Initial state.
+            timer: Optional fn(stage, ms) fed 'frame_gap:<state>' per frame.
+        """
+        self.name = name
+        self.rates = {**DEFAULT_RATES, **(rates or {})}
+        self.fast_hz = fast_hz
+        self.clock = clock
+        self.timer = timer
+        self.state = state
+        self._urgent_until = 0.0
+        self._expect: Dict[str, Tuple[float, float, Optional[float], bool]] = {}  # key -> (t, window, period, hold)
+        self._mark = clock()
+        self._last_frame: Optional[float] = None
+        self._frames: Dict[str, int] = {}
+        self._seconds: Dict[str, float] = {}
+
+    # --- Hints ---
+    def set_state(self, state: str):
+        if state != self.state:
+            self._account(self.clock())
+            self.state = state
+
+    def urgent(self, duration_s: float):
+        self._urgent_until = max(self._urgent_until, self.clock() + duration_s)
+
+    def expect(self, t: float, window_s: float = 0.1, period_s: Optional[float] = None, key: str = "default",
+               hold: bool = False):
+        """Capture fast within `window_s` of time `t` (and every `period_s` after it).
+
+        hold=True also suppresses capture until the window opens.
+        """
+        self._expect[key] = (t, window_s, period_s, hold)
+
+    def expect_in(self, delay_s: float, window_s: float = 0.1, period_s: Optional[float] = None,
+                  key: str = "default", hold: bool = False):
+        self.expect(self.clock() + delay_s, window_s, period_s, key, hold)
+
+    def expected(self, key: str, near: float) -> Optional[float]:
+        """Centre of `key`'s expectation window closest to time `near` (None if not set)."""
+        entry = self._expect.get(key)
+        if entry is None:
+            return None
+        t, _, period, _ = entry
+        if period:
+            t += round((near - t) / period) * period
+        return t
+
+    def clear(self, key: Optional[str] = None):
+        """Drop one expectation (None = all, plus any urgent period)."""
+        if key is None:
+            self._expect.clear()
+            self._urgent_until = 0.0
+        else:
+            self._expect.pop(key, None)
+
+    # --- Rate ---
+    def _next_window(self, now: float) -> Optional[Tuple[float, float]]:
+        """(start, end) of the nearest expectation window that has not ended yet."""
+        best = None
+        for key, (t, window, period, hold) in list(self._expect.items()):
+            if period:
+                if now > t + window:
+                    t += ((now - t - window) // period + 1) * period
+                    self._expect[key] = (t, window, period, hold)
+            elif now > t + window:
+                del self._expect[key]
+                continue
+            if best is None or t - window < best[0]:
+                best = (t - window, t + window)
+        return best
+
+    def _held_until(self, now: float) -> Optional[float]:
+        """Start of the nearest hold=True window that has not opened yet."""
+        self._next_window(now)  # rolls periodic windows forward, drops ended ones
+        starts = [t - window for t, window, _, hold in self._expect.values() if hold and now < t - window]
+        return min(starts) if starts else None
+
+    def is_urgent(self, now: Optional[float] = None) -> bool:
+        now = self.clock() if now is None else now
+        if now < self._urgent_until:
+            return True
+        window = self._next_window(now)
+        return window is not None and window[0] <= now
+
+    def period(self, now: Optional[float] = None) -> float:
+        """Seconds between captures right now, cut short ahead of the next expected transition
+        (or stretched to the opening of a held window)."""
+        now = self.clock() if now is None else now
+        held = self._held_until(now)
+        if held is not None:
+            return held - now
+        if self.is_urgent(now):
+            return 1.0 / self.fast_hz
+        hz = self.rates.get(self.state, self.rates["active"])
+        period = 1.0 / hz if hz > 0 else float("inf")
+        window = self._next_window(now)
+        if window is not None:
+            period = min(period, window[0] - now)
+        if self._urgent_until > now:
+            period = min(period, self._urgent_until - now)
+        return max(0.0, period)
+
+    def wait(self, started: Optional[float] = None, stop: Optional[threading.Event] = None) -> float:
+        """Sleep out the current period, counted from `started` (default: now); returns seconds slept."""
+        now = self.clock()
+        remaining = self.period(now) - (now - started if started is not None else 0.0)
+        if remaining <= 0:
+            return 0.0
+        if stop is not None:
+            stop.wait(remaining)
+        else:
+            time.sleep(remaining)
+        return remaining
+
+    # --- Accounting ---
+    def _key(self, now: float) -> str:
+        return URGENT if self._held_until(now) is None and self.is_urgent(now) else self.state
+
+    def _account(self, now: float):
+        key = self._key(now)
+        self._seconds[key] = self._seconds.get(key, 0.0) + (now - self._mark)
+        self._mark = now
+
+    def frame(self):
+        """Count one capture (call right after capturing)."""
+        now = self.clock()
+        key = self._key(now)
+        self._account(now)
+        self._frames[key] = self._frames.get(key, 0) + 1
+        if self.timer is not None and self._last_frame is not None:
+            self.timer(f"frame_gap:{key}", (now - self._last_frame) * 1000.0)
+        self._last_frame = now
+
+    def stats(self) -> Dict[str, dict]:
+        self._account(self.clock())
+        out = {}
+        for key in sorted(set(self._seconds) | set(self._frames)):
+            seconds = self._seconds.get(key, 0.0)
+            frames = self._frames.get(key, 0)
+            target = self.fast_hz if key == URGENT else self.rates.get(key, self.rates["active"])
+            out[key] = {"frames": frames, "seconds": seconds,
+                        "fps": frames / seconds if seconds > 0 else 0.0, "target_hz": target}
+        return out
+
+    def print_stats(self):
+        stats = self.stats()
+        if not stats:
+            return
+        print(f"🎞️ [{self.name}] Capture rate per state:")
+        for key, s in stats.items():
+            print(f"   - {key}: {s['fps']:.1f} fps (target {s['target_hz']:.1f}) "
+                  f"over {s['seconds']:.0f}s, {s['frames']} frames")
@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+"""
+Detector Dataset and Scoring
+
+A labeled frame dataset plus a scorer that runs each detector over it and
+reports accuracy and latency side by side, so a speed-up (downscaling, an
+ROI, a lookup table) can be shown not to cost detections.
+
+Dataset layout (data/datasets/<name>/):
+    frames/000001.png
+    labels.jsonl        one JSON object per frame:
+        {"id": "000001", "frame": "frames/000001.png", "source": "...",
+         "labels": {"crab": [[x, y, w, h]], "tunnel": [], "darts": [[...]],
+                    "alch_spell": [], "digit": 3, "prayer": false},
+         "suggested": {...}}
+
+A box label is a list of ground-truth boxes ([] = annotated as absent); a
+value label is the digit (null = no digit) or the prayer state. "digit_box"
+(the orange tick digit) and "damage" (hitsplat numbers) are boxes that only
+feed the HSV optimizer. Keys that
+are missing are not annotated and that detector is skipped for the frame.
+"suggested" holds unconfirmed pre-labels (e.g. what the bot detected when
+the frame was recorded); the labeler starts from them.
+
+Scoring: a box detector's hit counts when its reported position lies in a
+ground-truth box (plus `tolerance` px). A hit outside every box is a false
+positive and, if boxes exist, also a miss. Value detectors count a true
+positive when the predicted value equals a present label. Latency is
+recorded per detector per frame.
+
+Usage:
+    python detector_eval.py import-recording data/recordings/alch_crab-... alch --every 5
+    python detector_eval.py add-images alch dbg_*.jpg
+    python detector_eval.py label alch
+    python detector_eval.py score alch --json before.json
+    python detector_eval.py score alch --baseline before.json     # exit 1 on accuracy regression
+    python detector_eval.py synth sim_alch --frames 100           # simulator frames with exact labels
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from metrics import LatencyHistogram
+
+DATASETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "datasets")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LABEL_KINDS = {
+    "crab": "box",
+    "tunnel": "box",
+    "darts": "box",
+    "alch_spell": "box",
+    "digit": "value",
+    "prayer": "value",
+    # Pixel-level boxes for colour work (auto_tree/hsv_optimizer.py), no detector scores them
+    "digit_box": "box",
+    "damage": "box",
+}
+DEFAULT_TOLERANCE_PX = 5
+
+
+# --- Dataset ---
+class FrameDataset:
+    def __init__(self, path: str):
+        """Open (or create) a dataset directory; a bare name resolves under data/datasets/."""
+        if not os.path.isabs(path) and os.sep not in path:
+            path = os.path.join(DATASETS_DIR, path)
+        self.path = path
+        self.labels_path = os.path.join(path, "labels.jsonl")
+        self.items: List[dict] = []
+        if os.path.exists(self.labels_path):
+            with open(self.labels_path, encoding="utf-8") as f:
+                self.items = [json.loads(line) for line in f if line.strip()]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def load_frame(self, item: dict) -> Optional[np.ndarray]:
+        return cv2.imread(os.path.join(self.path, item["frame"]))
+
+    def __iter__(self) -> Iterator[Tuple[dict, np.ndarray]]:
+        for item in self.items:
+            frame = self.load_frame(item)
+            if frame is not None:
+                yield item, frame
+
+    def add(self, frame: np.ndarray, labels: Optional[dict] = None, suggested: Optional[dict] = None,
+            source: str = "") -> dict:
+        os.makedirs(os.path.join(self.path, "frames"), exist_ok=True)
+        next_id = max((int(i["id"]) for i in self.items), default=0) + 1
+        item = {"id": f"{next_id:06d}", "frame": f"frames/{next_id:06d}.png", "source": source,
+                "labels": labels or {}, "suggested": suggested or {}}
+        cv2.imwrite(os.path.join(self.path, item["frame"]), frame)
+        with open(self.labels_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(item) + "\n")
+        self.items.append(item)
+        return item
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self.labels_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for item in self.items:
+                f.write(json.dumps(item) + "\n")
+        os.replace(tmp, self.labels_path)
+
+    def label_counts(self) -> Dict[str, int]:
+        counts = {name: 0 for name in LABEL_KINDS}
+        for item in self.items:
+            for name in item.get("labels", {}):
+                counts[name] = counts.get(name, 0) + 1
+        return counts
+
+
+# --- Detectors under test ---
+class DetectorSpec:
+    def __init__(self, name: str, label: str, factory: Callable[[], Callable[[np.ndarray], object]]):
+        """
+        Args:
+            name: Detector name in reports (several detectors may score one label).
+            label: Label key it is scored against (see LABEL_KINDS).
+            factory: Builds fn(frame) -> result. Box detectors return a
+                (position, confidence) tuple, a position or None; value
+                detectors return the value or a (value, score) tuple.
+        """
+        self.name = name
+        self.label = label
+        self.kind = LABEL_KINDS[label]
+        self.factory = factory
+        self._fn = None
+
+    @property
+    def fn(self):
+        if self._fn is None:
+            self._fn = self.factory()
+        return self._fn
+
+
+_shared: Dict[str, object] = {}
+
+
+def _alch_crab_bot():
+    if "alch_crab" not in _shared:
+        if REPO_ROOT not in sys.path:
+            sys.path.append(REPO_ROOT)
+        from auto_alch_crab_bot import AutoAlchCrabBot
+        bot = AutoAlchCrabBot()
+        if bot.ticks is not None:
+            bot.ticks.stop()
+            bot.ticks = None
+        bot.debug = False
+        bot.log.set_level("INFO")
+        if not bot.load_templates():
+            raise RuntimeError("AutoAlchCrabBot templates missing")
+        _shared["alch_crab"] = bot
+    return _shared["alch_crab"]
+
+
+def _digit_classifier():
+    ticks_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ticks")
+    if ticks_dir not in sys.path:
+        sys.path.append(ticks_dir)
+    from tm_detect import classify_digit_from_frame, load_all_templates
+    templates = load_all_templates(os.path.join(ticks_dir, "templates"))
+    return lambda frame: classify_digit_from_frame(frame, templates)
+
+
+def _quick_prayer_state():
+    from funcs import AutoActionFunctions
+    funcs = AutoActionFunctions()
+    return lambda frame: funcs.is_quick_prayer_on(frame)
+
+
+DETECTORS: Dict[str, DetectorSpec] = {}
+
+
+def register_detector(spec: DetectorSpec) -> DetectorSpec:
+    DETECTORS[spec.name] = spec
+    return spec
+
+
+register_detector(DetectorSpec("crab", "crab", lambda: _alch_crab_bot().find_crab))
+register_detector(DetectorSpec("tunnel", "tunnel", lambda: _alch_crab_bot().find_tunnel))
+register_detector(DetectorSpec("alch_spell", "alch_spell", lambda: _alch_crab_bot().find_alch_spell))
+register_detector(DetectorSpec("darts", "darts", lambda: _alch_crab_bot().find_darts))
+register_detector(DetectorSpec("digit", "digit", _digit_classifier))
+register_detector(DetectorSpec("prayer", "prayer", _quick_prayer_state))
+
+
+# --- Scoring ---
+def _position(result) -> Optional[Tuple[float, float]]:
+    if result is None:
+        return None
+    if isinstance(result, dict):
+        result = result.get("position")
+    elif isinstance(result, (list, tuple)) and len(result) == 2 and not np.isscalar(result[0]):
+        result = result[0]  # (position, confidence)
+    if result is None:
+        return None
+    return float(result[0]), float(result[1])
+
+
+def _value(result):
+    if isinstance(result, (list, tuple)) and len(result) == 2:
+        return result[0]  # (value, score)
+    return result
+
+
+def _present(value) -> bool:
+    return value is not None and value is not False
+
+
+def _in_box(pos, box, tol) -> bool:
+    x, y, w, h = box
+    return x - tol <= pos[0] <= x + w + tol and y - tol <= pos[1] <= y + h + tol
+
+
+class Score:
+    def __init__(self, name: str):
+        self.name = name
+        self.tp = self.fp = self.fn = self.tn = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+        self.misses: List[dict] = []  # frame id, what went wrong
+
+    def add_box(self, item_id: str, result, boxes: List[List[float]], tol: float):
+        pos = _position(result)
+        hit = pos is not None and any(_in_box(pos, box, tol) for box in boxes)
+        if hit:
+            self.tp += 1
+            return
+        if pos is not None:
+            self.fp += 1
+            self.misses.append({"id": item_id, "error": "false_positive", "at": pos})
+        if boxes:
+            self.fn += 1
+            if pos is None:
+                self.misses.append({"id": item_id, "error": "missed"})
+        elif pos is None:
+            self.tn += 1
+
+    def add_value(self, item_id: str, result, expected):
+        got = _value(result)
+        if isinstance(got, np.generic):
+            got = got.item()
+        if _present(expected):
+            if got == expected:
+                self.tp += 1
+                return
+            self.fn += 1
+            if _present(got):
+                self.fp += 1
+            self.misses.append({"id": item_id, "error": "wrong", "expected": expected, "got": got})
+        elif _present(got):
+            self.fp += 1
+            self.misses.append({"id": item_id, "error": "false_positive", "got": got})
+        else:
+            self.tn += 1
+
+    def summary(self) -> dict:
+        predicted = self.tp + self.fp
+        actual = self.tp + self.fn
+        frames = self.latency.count
+        lat = self.latency.summary()
+        return {
+            "frames": frames,
+            "tp": self.tp, "fp": self.fp, "fn": self.fn, "tn": self.tn, "errors": self.errors,
+            "precision": self.tp / predicted if predicted else 1.0,
+            "recall": self.tp / actual if actual else 1.0,
+            "accuracy": (self.tp + self.tn) / frames if frames else 1.0,
+            "p50_ms": lat["p50_ms"], "p99_ms": lat["p99_ms"], "mean_ms": lat["mean_ms"],
+        }
+
+
+def score_dataset(dataset: FrameDataset, names: Optional[List[str]] = None,
+                  tolerance: float = DEFAULT_TOLERANCE_PX, repeat: int = 1) -> Dict[str, Score]:
+    """Run each detector over every frame annotated for its label.
+
+    repeat > 1 runs each detector several times per frame and keeps the fastest
+    timing (less scheduler noise when comparing small speed-ups).
+    """
+    counts = dataset.label_counts()
+    specs = [DETECTORS[n] for n in (names or list(DETECTORS))]
+    specs = [spec for spec in specs if counts.get(spec.label)]
+    scores = {spec.name: Score(spec.name) for spec in specs}
+    for spec in list(specs):
+        try:
+            spec.fn
+        except Exception as e:
+            print(f"⚠️ Skipping detector '{spec.name}': {e}")
+            specs.remove(spec)
+            scores.pop(spec.name)
+    for item, frame in dataset:
+        labels = item.get("labels", {})
+        for spec in specs:
+            if spec.label not in labels:
+                continue
+            score = scores[spec.name]
+            best = None
+            result = None
+            for _ in range(max(1, repeat)):
+                t0 = time.perf_counter()
+                try:
+                    result = spec.fn(frame)
+                except Exception as e:
+                    score.errors += 1
+                    score.misses.append({"id": item["id"], "error": f"exception: {e}"})
+                    result = None
+                elapsed = time.perf_counter() - t0
+                best = elapsed if best is None else min(best, elapsed)
+            score.latency.record_us(best * 1e6)
+            if spec.kind == "box":
+                score.add_box(item["id"], result, labels[spec.label], tolerance)
+            else:
+                score.add_value(item["id"], result, labels[spec.label])
+    return scores
+
+
+def compare(report: Dict[str, dict], baseline: Dict[str, dict], max_drop: float) -> List[str]:
+    """Regressions of precision/recall beyond max_drop against a baseline report."""
+    problems = []
+    for name, cur in report.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ("precision", "recall"):
+            if cur[key] < base[key] - max_drop:
+                problems.append(f"{name} {key} {base[key]:.3f} → {cur[key]:.3f}")
+    return problems
+
+
+def print_report(report: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None):
+    print(f"{'detector':<12} {'frames':>6} {'prec':>6} {'recall':>6} {'acc':>6} "
+          f"{'p50 ms':>8} {'p99 ms':>8}   tp/fp/fn/tn")
+    for name, s in report.items():
+        line = (f"{name:<12} {s['frames']:>6} {s['precision']:>6.3f} {s['recall']:>6.3f} {s['accuracy']:>6.3f} "
+                f"{s['p50_ms']:>8.2f} {s['p99_ms']:>8.2f}   {s['tp']}/{s['fp']}/{s['fn']}/{s['tn']}")
+        base = (baseline or {}).get(name)
+        if base:
+            speed = base["p50_ms"] / s["p50_ms"] if s["p50_ms"] else 0.0
+            line += (f"   Δprec {s['precision'] - base['precision']:+.3f} Δrecall {s['recall'] - base['recall']:+.3f}"
+                     f" p50 {base['p50_ms']:.2f}→{s['p50_ms']:.2f} ms ({speed:.2f}x)")
+        print(line)
+
+
+# --- Building datasets ---
+def import_recording(dataset: FrameDataset, archive_path: str, every: int = 1) -> int:
+    """Add frames of a session recording; the bot's detections become suggestions."""
+    from session_recorder import SessionArchive
+    archive = SessionArchive(archive_path)
+    pending = None  # (t, frame, merged detections) of a kept frame
+    added = 0
+    n = 0
+
+    def flush():
+        nonlocal added
+        if pending is not None:
+            t, frame, results = pending
+            suggested = {k: _suggest_box(v) if LABEL_KINDS[k] == "box" else _value(v)
+                         for k, v in results.items() if k in LABEL_KINDS}
+            dataset.add(frame, suggested=suggested, source=f"{os.path.basename(archive_path)}@{t:.3f}")
+            added += 1
+
+    for kind, t, item in archive.records():
+        if kind == "frame":
+            flush()
+            pending = None
+            n += 1
+            if (n - 1) % max(1, every) == 0:
+                pending = (t, item.copy(), {})
+        elif item.get("type") == "detections" and pending is not None and item.get("frame_t") == pending[0]:
+            pending[2].update(item.get("results") or {})
+    flush()
+    return added
+
+
+def _suggest_box(result, half: int = 15):
+    pos = _position(result)
+    if pos is None:
+        return []
+    return [[int(pos[0]) - half, int(pos[1]) - half, 2 * half, 2 * half]]
+
+
+def add_images(dataset: FrameDataset, paths: List[str]) -> int:
+    added = 0
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            print(f"⚠️ Could not read {path}")
+            continue
+        dataset.add(frame, source=os.path.basename(path))
+        added += 1
+    return added
+
+
+def synthesize(dataset: FrameDataset, frames: int = 100, seed: int = 0) -> int:
+    """Simulator frames with exact labels (a smoke set; real screenshots are the real test)."""
+    import random
+    from simulator import TICK_S, AlchCrabScene
+    rng = random.Random(seed)
+    scene = AlchCrabScene(seed=seed)
+    for i in range(frames):
+        scene.tab = rng.choice(("spellbook", "inventory", "equipment"))
+        now = rng.uniform(0, 600)
+        frame = scene.render(now).copy()
+        digit = 4 - int(now / TICK_S) % 4
+        digit_box = scene.digit_rect(digit)
+        (cx, cy), (ax, ay) = scene.crab_center, scene.crab_axes
+        (tx, ty), (bx, by) = scene.tunnel_center, scene.tunnel_axes
+        labels = {
+            "crab": [[cx - ax, cy - ay, 2 * ax, 2 * ay]],
+            "tunnel": [[tx - bx, ty - by, 2 * bx, 2 * by]],
+            "alch_spell": [list(scene.alch_rect)] if scene.tab == "spellbook" else [],
+            "darts": [list(scene.darts_rect)] if scene.tab == "inventory" else [],
+            "digit": digit,
+            "digit_box": [list(digit_box)],
+        }
+        dataset.add(frame, labels=labels, source=f"simulator seed={seed} tab={scene.tab}")
+    return frames
+
+
+# --- Labeling ---
+def label_interactive(dataset: FrameDataset, only_unlabeled: bool = True):
+    """Step through frames with OpenCV windows.
+
+    Box labels: drag boxes (cv2.selectROIs), Enter/Space to accept each, Esc
+    when done; Esc without a box = absent. 'digit': press 1-4, 0 for none.
+    'prayer': y/n. Press 's' on a value prompt to skip, 'q' to save and quit.
+    """
+    window = "label"
+    for item in dataset.items:
+        labels = item.setdefault("labels", {})
+        if only_unlabeled and all(k in labels for k in LABEL_KINDS):
+            continue
+        frame = dataset.load_frame(item)
+        if frame is None:
+            continue
+        for name, kind in LABEL_KINDS.items():
+            if name in labels:
+                continue
+            view = frame.copy()
+            for box in item.get("suggested", {}).get(name, []) if kind == "box" else []:
+                x, y, w, h = (int(v) for v in box)
+                cv2.rectangle(view, (x, y), (x + w, y + h), (0, 255, 255), 1)
+            cv2.putText(view, f"{item['id']}: {name}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 255), 2)
+            if kind == "box":
+                rois = cv2.selectROIs(window, view, showCrosshair=False)
+                labels[name] = [[int(v) for v in r] for r in rois] if len(rois) else []
+                continue
+            hint = "1-4 / 0=none" if name == "digit" else "y / n"
+            cv2.putText(view, f"{name}? {hint}  (s=skip, q=quit)", (10, 65),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+            cv2.imshow(window, view)
+            key = chr(cv2.waitKey(0) & 0xFF)
+            if key == "q":
+                dataset.save()
+                cv2.destroyAllWindows()
+                return
+            if key == "s":
+                continue
+            if name == "digit" and key in "01234":
+                labels[name] = int(key) or None
+            elif name == "prayer" and key in "yn":
+                labels[name] = key == "y"
+        dataset.save()
+    cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Labeled frame datasets and detector scoring")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("import-recording", help="Add frames from a session recording")
+    p.add_argument("archive")
+    p.add_argument("dataset")
+    p.add_argument("--every", type=int, default=5, help="Keep every Nth frame")
+    p = sub.add_parser("add-images", help="Add screenshots (e.g. dbg_*.jpg)")
+    p.add_argument("dataset")
+    p.add_argument("images", nargs="+")
+    p = sub.add_parser("synth", help="Add simulator frames with exact labels")
+    p.add_argument("dataset")
+    p.add_argument("--frames", type=int, default=100)
+    p.add_argument("--seed", type=int, default=0)
+    p = sub.add_parser("label", help="Annotate frames interactively")
+    p.add_argument("dataset")
+    p.add_argument("--all", action="store_true", help="Revisit frames that are already labeled")
+    p = sub.add_parser("score", help="Score detectors: precision/recall and latency")
+    p.add_argument("dataset")
+    p.add_argument("--detectors", help=f"Comma-separated subset of: {', '.join(DETECTORS)}")
+    p.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE_PX, help="Box slack in px")
+    p.add_argument("--repeat", type=int, default=1, help="Runs per frame (fastest is kept)")
+    p.add_argument("--json", metavar="PATH", help="Write the report as JSON")
+    p.add_argument("--baseline", metavar="PATH", help="Compare with an earlier --json report")
+    p.add_argument("--max-drop", type=float, default=0.0, help="Allowed precision/recall drop vs baseline")
+    args = parser.parse_args()
+
+    dataset = FrameDataset(args.dataset)
+    if args.command == "import-recording":
+        print(f"📥 Added {import_recording(dataset, args.archive, every=args.every)} frames to {dataset.path}")
+    elif args.command == "add-images":
+        print(f"📥 Added {add_images(dataset, args.images)} frames to {dataset.path}")
+    elif args.command == "synth":
+        print(f"📥 Added {synthesize(dataset, frames=args.frames, seed=args.seed)} simulator frames to {dataset.path}")
+    elif args.command == "label":
+        label_interactive(dataset, only_unlabeled=not args.all)
+        print(f"🏷️ Labels: {dataset.label_counts()}")
+    elif args.command == "score":
+        if not len(dataset):
+            print(f"❌ Empty dataset: {dataset.path}")
+            return 2
+        names = args.detectors.split(",") if args.detectors else None
+        scores = score_dataset(dataset, names, tolerance=args.tolerance, repeat=args.repeat)
+        report = {name: s.summary() for name, s in scores.items()}
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)["detectors"]
+        print(f"🎯 {dataset.path}: {len(dataset)} frames")
+        print_report(report, baseline)
+        for name, s in scores.items():
+            for miss in s.misses[:3]:
+                detail = {k: v for k, v in miss.items() if k not in ("id", "error")}
+                print(f"   ⚠️ {name} frame {miss['id']}: {miss['error']} {detail or ''}")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"dataset": dataset.path, "detectors": report}, f, indent=2)
+        if baseline:
+            problems = compare(report, baseline, args.max_drop)
+            for problem in problems:
+                print(f"   ❌ Regression: {problem}")
+            if problems:
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Detector Registry
+
+Lets a bot declare its detectors once and run the active set over each frame
+in a single pass, instead of hard-coding find_*() calls that each convert and
+scan the same screenshot again.
+
+Each detector declares:
+- roi: (x, y, w, h) in frame coordinates, a callable(frame_shape) -> roi, or
+  None for the full frame
+- views: which shared intermediate images it needs: 'bgr', 'gray', 'hsv' or
+  'mask:<name>' for an HSV mask registered with register_mask()
+- interval_ms: minimum time between runs (0 = every frame); between runs the
+  previous result is re-published with its age
+
+Per frame, every view is computed once, only over the bounding box of the
+ROIs that need it, and every detector receives a RoiViews object that crops
+the shared views to its own ROI. The results of all detectors are published
+as one snapshot dict:
+    - seq (int): frame number
+    - t (float): perf_counter() when the frame was processed
+    - results (dict): detector name -> result
+    - age_ms (dict): detector name -> ms since that result was computed
+    - ran (list): detectors that actually ran on this frame
+
+Usage:
+    registry = DetectorRegistry()
+    registry.register_mask('crab', (lower_hsv, upper_hsv))
+    registry.register('crab', lambda v: find_crab(v.bgr, hsv=v.hsv), views=('hsv', 'mask:crab'))
+    registry.register('alch', lambda v: find_alch(v.bgr, gray=v.gray), views=('gray',), interval_ms=100)
+    snapshot = registry.run(frame)
+    crab = snapshot['results']['crab']
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Roi = Tuple[int, int, int, int]
+
+
+def _clip_roi(roi: Optional[Roi], shape) -> Roi:
+    h_img, w_img = shape[:2]
+    if roi is None:
+        return (0, 0, w_img, h_img)
+    x, y, w, h = (int(v) for v in roi)
+    x1, y1 = max(0, x), max(0, y)
+    x2, y2 = min(w_img, x + w), min(h_img, y + h)
+    return (x1, y1, max(0, x2 - x1), max(0, y2 - y1))
+
+
+def _union(rois: Iterable[Roi]) -> Optional[Roi]:
+    rois = list(rois)
+    if not rois:
+        return None
+    x1 = min(r[0] for r in rois)
+    y1 = min(r[1] for r in rois)
+    x2 = max(r[0] + r[2] for r in rois)
+    y2 = max(r[1] + r[3] for r in rois)
+    return (x1, y1, x2 - x1, y2 - y1)
+
+
+class FrameViews:
+    """Per-frame cache of derived images, each computed once over a given region."""
+
+    def __init__(self, frame, masks: Dict[str, dict], regions: Optional[Dict[str, Roi]] = None):
+        self.frame = frame
+        self.masks = masks
+        self.regions = regions or {}
+        self._cache: Dict[str, Tuple[Roi, np.ndarray]] = {}
+
+    def _compute(self, view: str, region: Roi) -> np.ndarray:
+        x, y, w, h = region
+        if view == 'bgr':
+            return self.frame[y:y + h, x:x + w]
+        if view == 'gray':
+            return cv2.cvtColor(self.frame[y:y + h, x:x + w], cv2.COLOR_BGR2GRAY)
+        if view == 'hsv':
+            return cv2.cvtColor(self.frame[y:y + h, x:x + w], cv2.COLOR_BGR2HSV)
+        if view.startswith('mask:'):
+            spec = self.masks[view[5:]]
+            hsv = self.get('hsv', region)
+            mask = cv2.inRange(hsv, spec['lower'], spec['upper'])
+            kernel = np.ones((3, 3), np.uint8)
+            if spec['open']:
+                mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=spec['open'])
+            if spec['dilate']:
+                mask = cv2.morphologyEx(mask, cv2.MORPH_DILATE, kernel, iterations=spec['dilate'])
+            return mask
+        raise KeyError(f"Unknown view '{view}'")
+
+    def get(self, view: str, roi: Optional[Roi] = None) -> np.ndarray:
+        """Return `view` cropped to `roi` (frame coordinates; None = full frame)."""
+        want = _clip_roi(roi, self.frame.shape)
+        cached = self._cache.get(view)
+        if cached is not None:
+            (cx, cy, cw, ch), img = cached
+            x, y, w, h = want
+            if x >= cx and y >= cy and x + w <= cx + cw and y + h <= cy + ch:
+                return img[y - cy:y - cy + h, x - cx:x - cx + w]
+        # Not cached (or cached over a smaller area): compute over the planned
+        # region if it covers the request, otherwise over the full frame
+        region = self.regions.get(view)
+        if region is None or not (want[0] >= region[0] and want[1] >= region[1]
+                                  and want[0] + want[2] <= region[0] + region[2]
+                                  and want[1] + want[3] <= region[1] + region[3]):
+            region = _clip_roi(None, self.frame.shape)
+        img = self._compute(view, region)
+        self._cache[view] = (region, img)
+        return self.get(view, roi)
+
+
+class RoiViews:
+    """What a detector sees: shared views cropped to its ROI."""
+
+    def __init__(self, views: FrameViews, roi: Roi):
+        self._views = views
+        self.roi = roi
+        self.offset = (roi[0], roi[1])
+
+    @property
+    def bgr(self):
+        return self._views.get('bgr', self.roi)
+
+    @property
+    def gray(self):
+        return self._views.get('gray', self.roi)
+
+    @property
+    def hsv(self):
+        return self._views.get('hsv', self.roi)
+
+    def mask(self, name: str):
+        return self._views.get(f'mask:{name}', self.roi)
+
+    def to_frame(self, point):
+        """Translate an ROI-relative (x, y) point to frame coordinates."""
+        if point is None:
+            return None
+        return (int(point[0]) + self.offset[0], int(point[1]) + self.offset[1])
+
+
+class Detector:
+    def __init__(self, name: str, fn: Callable[[RoiViews], object], roi=None,
+                 views: Tuple[str, ...] = ('bgr',), interval_ms: float = 0.0, enabled: bool = True):
+        self.name = name
+        self.fn = fn
+        self.roi = roi
+        self.views = tuple(views)
+        self.interval_ms = float(interval_ms)
+        self.enabled = enabled
+        self.last_run = 0.0
+        self.last_result = None
+        self.runs = 0
+        self.total_ms = 0.0
+
+    def resolve_roi(self, shape) -> Roi:
+        roi = self.roi(shape) if callable(self.roi) else self.roi
+        return _clip_roi(roi, shape)
+
+    def due(self, now: float) -> bool:
+        return self.runs == 0 or (now - self.last_run) * 1000.0 >= self.interval_ms
+
+
+class DetectorRegistry:
+    def __init__(self, debug: bool = False, timer: Optional[Callable[[str, float], None]] = None):
+        """
+        Args:
+            debug: Print which detectors ran per frame.
+            timer: Optional fn(stage, ms) fed 'view:<name>' and 'detect:<name>'
+                timings (e.g. a metrics.Metrics object).
+        """
+        self.debug = debug
+        self.timer = timer
+        self.detectors: Dict[str, Detector] = {}
+        self.masks: Dict[str, dict] = {}
+        self.seq = 0
+        self.snapshot: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    # --- Registration ---
+    def register(self, name: str, fn: Callable[[RoiViews], object], roi=None,
+                 views: Tuple[str, ...] = ('bgr',), interval_ms: float = 0.0, enabled: bool = True) -> Detector:
+        for view in views:
+            if view.startswith('mask:') and view[5:] not in self.masks:
+                raise ValueError(f"Detector '{name}' needs unregistered mask '{view[5:]}'")
+        det = Detector(name, fn, roi=roi, views=views, interval_ms=interval_ms, enabled=enabled)
+        self.detectors[name] = det
+        return det
+
+    def detector(self, name: str, **kwargs):
+        """Decorator form of register()."""
+        def wrap(fn):
+            self.register(name, fn, **kwargs)
+            return fn
+        return wrap
+
+    def register_mask(self, name: str, hsv_range, open_iterations: int = 1, dilate_iterations: int = 1):
+        """Register a shared HSV mask view ('mask:<name>'), morphology included."""
+        lower, upper = hsv_range
+        self.masks[name] = {
+            'lower': np.array(lower, dtype=np.uint8),
+            'upper': np.array(upper, dtype=np.uint8),
+            'open': int(open_iterations),
+            'dilate': int(dilate_iterations),
+        }
+
+    def set_enabled(self, name: str, enabled: bool = True):
+        self.detectors[name].enabled = enabled
+
+    def set_active(self, names: Iterable[str]):
+        """Enable exactly the given detectors."""
+        names = set(names)
+        for name, det in self.detectors.items():
+            det.enabled = name in names
+
+    # --- Running ---
+    def _plan_regions(self, due: List[Detector], shape) -> Dict[str, Roi]:
+        needs: Dict[str, List[Roi]] = {}
+        for det in due:
+            roi = det.resolve_roi(shape)
+            for view in det.views:
+                needs.setdefault(view, []).append(roi)
+                if view.startswith('mask:'):
+                    needs.setdefault('hsv', []).append(roi)
+        return {view: _union(rois) for view, rois in needs.items()}
+
+    def run(self, frame, active: Optional[Iterable[str]] = None) -> dict:
+        """Run the due detectors over `frame` once and publish the combined snapshot.
+
+        Args:
+            frame: BGR screenshot.
+            active: Optional detector names for this frame (overrides `enabled`).
+        """
+        now = time.perf_counter()
+        names = set(active) if active is not None else None
+        candidates = [d for d in self.detectors.values()
+                      if (d.name in names if names is not None else d.enabled)]
+        due = [d for d in candidates if d.due(now)]
+
+        views = FrameViews(frame, self.masks, self._plan_regions(due, frame.shape))
+        # Compute the declared shared views up front, once each (masks last,
+        # so the HSV conversion they share is timed as its own view)
+        for view in sorted(views.regions, key=lambda v: v.startswith('mask:')):
+            t0 = time.perf_counter()
+            views.get(view, views.regions[view])
+            if self.timer is not None:
+                self.timer(f"view:{view}", (time.perf_counter() - t0) * 1000.0)
+
+        ran = []
+        for det in due:
+            t0 = time.perf_counter()
+            try:
+                det.last_result = det.fn(RoiViews(views, det.resolve_roi(frame.shape)))
+            except Exception as e:
+                print(f"   ❌ Detector '{det.name}' failed: {e}")
+                det.last_result = None
+            t1 = time.perf_counter()
+            det.last_run = t1
+            det.runs += 1
+            det.total_ms += (t1 - t0) * 1000.0
+            if self.timer is not None:
+                self.timer(f"detect:{det.name}", (t1 - t0) * 1000.0)
+            ran.append(det.name)
+
+        done = time.perf_counter()
+        snapshot = {
+            'seq': self.seq + 1,
+            't': done,
+            'results': {d.name: d.last_result for d in candidates},
+            'age_ms': {d.name: (done - d.last_run) * 1000.0 for d in candidates},
+            'ran': ran,
+        }
+        with self._lock:
+            self.seq += 1
+            self.snapshot = snapshot
+        if self.debug:
+            print(f"   🧩 Detectors ran {ran} in {(done - now) * 1000.0:.1f} ms")
+        return snapshot
+
+    def latest(self) -> Optional[dict]:
+        """Most recent snapshot (safe to read from other threads)."""
+        with self._lock:
+            return self.snapshot
+
+    def result(self, name: str, default=None):
+        snapshot = self.latest()
+        if snapshot is None:
+            return default
+        return snapshot['results'].get(name, default)
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            name: {
+                'runs': d.runs,
+                'mean_ms': d.total_ms / d.runs if d.runs else 0.0,
+                'interval_ms': d.interval_ms,
+                'enabled': d.enabled,
+            }
+            for name, d in self.detectors.items()
+        }
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Local Tick / Event Channel
+
+Lightweight pub/sub between cooperating scripts on the same machine, so the
+tick phase seen by attack_flicker.py, the crab presence seen by the pray-flick
+crab script and the damage numbers seen by attack_detector.py are no longer
+trapped in each script's globals.
+
+Transport: every subscriber binds its own datagram socket (a Unix domain
+socket, or a 127.0.0.1 UDP port where AF_UNIX is unavailable, i.e. Windows)
+and advertises it as a file in the channel directory. Publishers send each
+message to every advertised endpoint with a non-blocking sendto; a full or
+dead subscriber drops the message instead of stalling the publisher's hot
+loop. Subscribers block in recv (or a background thread does) - nobody polls.
+
+Messages are compact fixed-size binary records:
+    header:     kind (u8), version (u8), source (u16), seq (u32), t (f64 perf_counter)
+    tick:       digit (u8), period_ms (f32), tick index (u32)
+    detection:  tag (8s), found (u8), x (i16), y (i16), value (f32)
+    ack:        tag (8s), ok (u8), ref seq (u32), busy_ms (u16)
+
+Before acting, a script claims the input with claim(tag, busy_ms) (an ack
+with busy_ms > 0); when it is done it acks with ref=<claim seq>, which
+releases the claim early. TickFollower turns claims into a "busy" window
+other bots wait out before clicking, e.g. the alch bot during a prayer flick.
+
+Usage:
+    pub = get_publisher("attack_flicker")
+    pub.tick(digit=2, period_ms=600.0, index=n)
+    claim = pub.claim("flick", busy_ms=250)
+    ok = flick()
+    pub.ack("flick", ok=ok, ref=claim)
+
+    sub = EventSubscriber(kinds=(KIND_TICK,))
+    event = sub.recv(timeout=1.0)          # dict or None
+
+    ticks = TickFollower().start()
+    ticks.wait_until_idle(max_wait_s=0.4)  # before clicking
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional
+
+DEFAULT_CHANNEL = "osrs"
+VERSION = 1
+
+KIND_TICK = 1
+KIND_DETECTION = 2
+KIND_ACK = 3
+
+_HEADER = struct.Struct("<BBHId")
+_PAYLOAD = {
+    KIND_TICK: struct.Struct("<BfI"),
+    KIND_DETECTION: struct.Struct("<8sBhhf"),
+    KIND_ACK: struct.Struct("<8sBIH"),
+}
+_MAX_SIZE = _HEADER.size + max(s.size for s in _PAYLOAD.values())
+
+HAS_UNIX = hasattr(socket, "AF_UNIX") and os.name == "posix"
+
+
+def channel_dir(channel: str = DEFAULT_CHANNEL) -> str:
+    path = os.path.join(tempfile.gettempdir(), f"{channel}_events")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _tag(text: str) -> bytes:
+    return text.encode("ascii", "ignore")[:8]
+
+
+def _source_id(name: str) -> int:
+    return zlib.crc32(name.encode("utf-8")) & 0xFFFF
+
+
+def decode(data: bytes) -> Optional[dict]:
+    """Decode one datagram into an event dict (None if malformed)."""
+    if len(data) < _HEADER.size:
+        return None
+    kind, version, source, seq, t = _HEADER.unpack_from(data, 0)
+    payload = _PAYLOAD.get(kind)
+    if version != VERSION or payload is None or len(data) < _HEADER.size + payload.size:
+        return None
+    event = {"kind": kind, "source": source, "seq": seq, "t": t}
+    fields = payload.unpack_from(data, _HEADER.size)
+    if kind == KIND_TICK:
+        event.update(digit=fields[0], period_ms=fields[1], index=fields[2])
+    elif kind == KIND_DETECTION:
+        tag, found, x, y, value = fields
+        event.update(tag=tag.rstrip(b"\0").decode("ascii"), found=bool(found),
+                     pos=(x, y) if found else None, value=value)
+    else:
+        tag, ok, ref, busy_ms = fields
+        event.update(tag=tag.rstrip(b"\0").decode("ascii"), ok=bool(ok), ref=ref, busy_ms=busy_ms)
+    return event
+
+
+class EventPublisher:
+    def __init__(self, source: str, channel: str = DEFAULT_CHANNEL):
+        self.source = source
+        self.source_id = _source_id(source)
+        self.dir = channel_dir(channel)
+        self.seq = 0
+        self.sent = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._endpoints: list = []
+        self._dir_mtime = None
+        self.sock = socket.socket(socket.AF_UNIX if HAS_UNIX else socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def _refresh_endpoints(self):
+        # One stat() per message; the directory is only re-scanned when a
+        # subscriber joined or left
+        try:
+            mtime = os.stat(self.dir).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._dir_mtime:
+            return
+        self._dir_mtime = mtime
+        endpoints = []
+        for entry in os.scandir(self.dir):
+            if HAS_UNIX and entry.name.endswith(".sock"):
+                endpoints.append((entry.path, entry.path))
+            elif not HAS_UNIX and entry.name.endswith(".port"):
+                try:
+                    port = int(entry.name.split("-")[-1][:-5])
+                except ValueError:
+                    continue
+                endpoints.append((("127.0.0.1", port), entry.path))
+        self._endpoints = endpoints
+
+    def _send(self, kind: int, *fields) -> int:
+        with self._lock:
+            self.seq = (self.seq + 1) & 0xFFFFFFFF
+            seq = self.seq
+            data = _HEADER.pack(kind, VERSION, self.source_id, seq, time.perf_counter()) + _PAYLOAD[kind].pack(*fields)
+            self._refresh_endpoints()
+            dead = []
+            for address, path in self._endpoints:
+                try:
+                    self.sock.sendto(data, address)
+                    self.sent += 1
+                except (BlockingIOError, InterruptedError):
+                    self.dropped += 1  # subscriber is behind; never block the sender
+                except (ConnectionRefusedError, FileNotFoundError):
+                    dead.append(path)  # subscriber exited without cleaning up
+                except OSError:
+                    self.dropped += 1
+            for path in dead:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if dead:
+                self._dir_mtime = None
+            return seq
+
+    def tick(self, digit: int = 0, period_ms: float = 0.0, index: int = 0) -> int:
+        """Announce a tick boundary (digit = attack-timer digit shown, 0 if unknown)."""
+        return self._send(KIND_TICK, int(digit) & 0xFF, float(period_ms), int(index) & 0xFFFFFFFF)
+
+    def detection(self, tag: str, found: bool, pos=None, value: float = 0.0) -> int:
+        x, y = (int(pos[0]), int(pos[1])) if pos is not None else (0, 0)
+        x = max(-32768, min(32767, x))
+        y = max(-32768, min(32767, y))
+        return self._send(KIND_DETECTION, _tag(tag), 1 if found else 0, x, y, float(value))
+
+    def ack(self, tag: str, ok: bool = True, ref: int = 0, busy_ms: int = 0) -> int:
+        """Acknowledge an action; ref = seq of the claim it completes."""
+        return self._send(KIND_ACK, _tag(tag), 1 if ok else 0, int(ref) & 0xFFFFFFFF,
+                          max(0, min(0xFFFF, int(busy_ms))))
+
+    def claim(self, tag: str, busy_ms: float) -> int:
+        """Announce that this script owns the input for up to busy_ms; returns the claim seq."""
+        return self.ack(tag, ok=True, busy_ms=max(1, int(busy_ms)))
+
+    def close(self):
+        self.sock.close()
+
+
+class EventSubscriber:
+    _ids = itertools.count()
+
+    def __init__(self, channel: str = DEFAULT_CHANNEL, kinds: Optional[Iterable[int]] = None,
+                 rcvbuf: int = 1 << 16):
+        self.kinds = set(kinds) if kinds is not None else None
+        self.dir = channel_dir(channel)
+        self.received = 0
+        self._thread = None
+        self._stop = threading.Event()
+        name = f"{os.getpid()}-{next(self._ids)}"
+        if HAS_UNIX:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.path = os.path.join(self.dir, f"{name}.sock")
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.sock.bind(self.path)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.bind(("127.0.0.1", 0))
+            self.path = os.path.join(self.dir, f"{name}-{self.sock.getsockname()[1]}.port")
+            open(self.path, "w").close()
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        except OSError:
+            pass
+
+    def recv(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Block until a matching event arrives (None on timeout or close)."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                self.sock.settimeout(remaining)
+                data = self.sock.recv(_MAX_SIZE)
+            except socket.timeout:
+                return None
+            except OSError:
+                return None  # socket closed (or Windows ICMP noise after close)
+            event = decode(data)
+            if event is None or (self.kinds is not None and event["kind"] not in self.kinds):
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return None
+                continue
+            self.received += 1
+            return event
+
+    def start(self, handler: Callable[[dict], None]) -> "EventSubscriber":
+        """Deliver events to handler(event) from a background thread."""
+        def _loop():
+            while not self._stop.is_set():
+                event = self.recv(timeout=0.5)
+                if event is not None:
+                    try:
+                        handler(event)
+                    except Exception as e:
+                        print(f"   ❌ Event handler failed: {e}")
+
+        self._thread = threading.Thread(target=_loop, name="event-subscriber", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        try:
+            self.sock.close()
+        finally:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+
+class TickFollower:
+    """Tracks tick boundaries and busy windows published by other scripts."""
+
+    def __init__(self, channel: str = DEFAULT_CHANNEL, stale_s: float = 3.0):
+        self.channel = channel
+        self.stale_s = stale_s
+        self.last_tick_t = 0.0
+        self.period_ms = 600.0
+        self.index = 0
+        self.digit = 0
+        self.busy_until = 0.0
+        self._claim = None  # (source, seq) of the claim that set busy_until
+        self.detections: Dict[str, dict] = {}
+        self.waits_ms: deque = deque(maxlen=512)
+        self._sub: Optional[EventSubscriber] = None
+        self._cond = threading.Condition()
+
+    def start(self) -> "TickFollower":
+        self._sub = EventSubscriber(self.channel).start(self._on_event)
+        return self
+
+    def _on_event(self, event: dict):
+        with self._cond:
+            kind = event["kind"]
+            if kind == KIND_TICK:
+                self.last_tick_t = event["t"]
+                self.index = event["index"]
+                self.digit = event["digit"]
+                if 300.0 <= event["period_ms"] <= 900.0:
+                    self.period_ms = event["period_ms"]
+            elif kind == KIND_ACK and event["busy_ms"]:
+                until = event["t"] + event["busy_ms"] / 1000.0
+                if until > self.busy_until:
+                    self.busy_until = until
+                    self._claim = (event["source"], event["seq"])
+            elif kind == KIND_ACK and self._claim == (event["source"], event["ref"]):
+                self.busy_until = event["t"]  # claim completed early
+                self._claim = None
+            elif kind == KIND_DETECTION:
+                self.detections[event["tag"]] = event
+            self._cond.notify_all()
+
+    @property
+    def synced(self) -> bool:
+        return self.last_tick_t > 0 and time.perf_counter() - self.last_tick_t < self.stale_s
+
+    def next_tick_in_s(self) -> Optional[float]:
+        """Predicted time until the next tick boundary (None if no recent ticks)."""
+        if not self.synced:
+            return None
+        period = self.period_ms / 1000.0
+        elapsed = (time.perf_counter() - self.last_tick_t) % period
+        return period - elapsed
+
+    def busy(self) -> bool:
+        return time.perf_counter() < self.busy_until
+
+    def wait_until_idle(self, max_wait_s: float = 0.5) -> float:
+        """Block while another script holds the input; returns seconds waited."""
+        start = time.perf_counter()
+        end = start + max_wait_s
+        with self._cond:
+            while True:
+                now = time.perf_counter()
+                if now >= self.busy_until or now >= end:
+                    break
+                self._cond.wait(min(self.busy_until, end) - now)
+        waited = time.perf_counter() - start
+        if waited > 0.001:
+            self.waits_ms.append(waited * 1000.0)
+        return waited
+
+    def stop(self):
+        if self._sub is not None:
+            self._sub.close()
+            self._sub = None
+
+
+_publishers: Dict[tuple, EventPublisher] = {}
+
+
+def get_publisher(source: str, channel: str = DEFAULT_CHANNEL) -> EventPublisher:
+    key = (source, channel)
+    if key not in _publishers:
+        _publishers[key] = EventPublisher(source, channel)
+    return _publishers[key]
+
+
+def main():
+    """Print every event on the channel (debugging aid)."""
+    names = {KIND_TICK: "tick", KIND_DETECTION: "detection", KIND_ACK: "ack"}
+    sub = EventSubscriber()
+    print(f"📡 Listening on {sub.dir} (Ctrl+C to stop)")
+    try:
+        while True:
+            event = sub.recv()
+            if event is None:
+                continue
+            age_ms = (time.perf_counter() - event["t"]) * 1000.0
+            rest = {k: v for k, v in event.items() if k not in ("kind", "t")}
+            print(f"📨 {names[event['kind']]:<9} +{age_ms:.2f} ms {rest}")
+    except KeyboardInterrupt:
+        print("\n👋 Stopped listening")
+    finally:
+        sub.close()
+
+
+if __name__ == "__main__":
+    main()
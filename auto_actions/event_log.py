@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Streaming Event Log
+
+Append-only JSON-lines log for long sessions. Rewriting a whole JSON array
+on every save is O(n) per save and keeps every record in memory; this keeps
+neither:
+
+- append() only enqueues the record (never blocks, never touches disk) and
+  keeps it in a fixed-size in-memory window for recent() lookups
+- a background writer batches queued records into one write() per wake-up,
+  flushes every `flush_s` and fsyncs every `fsync_s`, so at most a few
+  seconds of records are lost on a power cut (none on a normal exit)
+- when the file reaches `max_bytes` (checked per record) it is rotated like
+  logging's RotatingFileHandler: log.jsonl -> log.jsonl.1 -> ... -> log.jsonl.<backups>
+
+The queue is bounded; if the disk cannot keep up, records are dropped and
+counted (`dropped`) rather than stalling the detection loop.
+
+Usage:
+    events = get_event_log("damage", window=200)
+    events.append({"damage": 12, "position": [640, 360]})
+    events.recent(10)
+    for record in read_events(events.path):   # oldest first, rotated files included
+        ...
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+EVENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+QUEUE_SIZE = 8192
+BATCH_RECORDS = 512
+
+
+class EventLog:
+    def __init__(self, path: str, window: int = 500, flush_s: float = 0.5, fsync_s: float = 5.0,
+                 max_bytes: int = DEFAULT_MAX_BYTES, backups: int = 5, queue_size: int = QUEUE_SIZE):
+        """
+        Args:
+            path: The .jsonl file; rotated files get .1, .2, ... appended.
+            window: Records kept in memory for recent().
+            flush_s: Longest time a record stays in the writer's buffer.
+            fsync_s: Time between fsyncs (0 = fsync on every flush).
+            max_bytes: Rotate when the file grows past this (0 = never).
+            backups: Rotated files to keep.
+        """
+        self.path = path
+        self.flush_s = flush_s
+        self.fsync_s = fsync_s
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.window: deque = deque(maxlen=window)
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"event-log-{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    # --- Producer side ---
+    def append(self, record: dict):
+        self.window.append(record)
+        self.appended += 1
+        try:
+            self._q.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def recent(self, n: Optional[int] = None) -> List[dict]:
+        items = list(self.window)
+        return items if n is None else items[-n:]
+
+    def flush(self, timeout: float = 2.0):
+        """Wait (bounded) until everything appended so far is on disk and fsynced."""
+        done = threading.Event()
+        try:
+            self._q.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def close(self, timeout: float = 2.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._q.put(None)
+        self._thread.join(timeout=timeout)
+
+    # --- Writer thread ---
+    def _open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        return open(self.path, "a", encoding="utf-8")
+
+    def _rotate(self, f):
+        f.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+        return self._open()
+
+    def _run(self):
+        f = self._open()
+        size = f.tell()
+        last_sync = time.perf_counter()
+        dirty = False
+        while True:
+            try:
+                item = self._q.get(timeout=self.flush_s)
+            except queue.Empty:
+                item = False  # timeout: flush what is buffered
+            batch = [item] if item is not False else []
+            while len(batch) < BATCH_RECORDS:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            waiters = []
+            stop = False
+            lines = []
+            for rec in batch:
+                if rec is None:
+                    stop = True
+                elif isinstance(rec, threading.Event):
+                    waiters.append(rec)
+                else:
+                    try:
+                        lines.append(json.dumps(rec, default=str))
+                    except Exception as e:
+                        lines.append(json.dumps({"error": f"unserializable record: {e}"}))
+            try:
+                # Size is checked per record, so a batch never overshoots
+                # max_bytes by more than one line
+                chunk = []
+                for line in lines:
+                    line += "\n"
+                    chunk.append(line)
+                    size += len(line.encode("utf-8"))
+                    if self.max_bytes and size >= self.max_bytes:
+                        f.write("".join(chunk))
+                        self.written += len(chunk)
+                        chunk = []
+                        f.flush()
+                        os.fsync(f.fileno())
+                        f = self._rotate(f)
+                        size = 0
+                        dirty = False
+                if chunk:
+                    f.write("".join(chunk))
+                    self.written += len(chunk)
+                    dirty = True
+                now = time.perf_counter()
+                if dirty and (not lines or waiters or stop or len(batch) < BATCH_RECORDS):
+                    f.flush()
+                    if waiters or stop or now - last_sync >= self.fsync_s:
+                        os.fsync(f.fileno())
+                        last_sync = now
+                        dirty = False
+            except Exception as e:
+                print(f"⚠️ Event log write failed ({self.path}): {e}")
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                f.close()
+                return
+
+
+def read_events(path: str, include_rotated: bool = True) -> Iterator[dict]:
+    """Yield records oldest first; a torn last line (crash mid-write) is skipped."""
+    paths = []
+    if include_rotated:
+        i = 1
+        while os.path.exists(f"{path}.{i}"):
+            paths.append(f"{path}.{i}")
+            i += 1
+        paths.reverse()
+    if os.path.exists(path):
+        paths.append(path)
+    for p in paths:
+        with open(p, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+_logs: Dict[str, EventLog] = {}
+
+
+def get_event_log(name: str, **kwargs) -> EventLog:
+    """Shared log at data/<name>.jsonl, closed (flushed and fsynced) at exit."""
+    if name not in _logs:
+        log = EventLog(os.path.join(EVENTS_DIR, f"{name}.jsonl"), **kwargs)
+        atexit.register(log.close)
+        _logs[name] = log
+    return _logs[name]
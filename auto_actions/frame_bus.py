@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Shared-Memory Frame Bus
+
+One capture producer writes screen frames into a multiprocessing.shared_memory
+ring; any number of local scripts (one_tick_pray.py, attack_flicker.py, a crab
+or alch bot, ...) read the newest frame from it instead of each capturing the
+screen themselves and racing for the same frames.
+
+Layout of the segment:
+    header:  magic, version, width, height, channels, slots, latest_seq
+    slots:   per slot (seq, timestamp) followed by the frame bytes
+
+Writing a slot first invalidates its seq, then copies the frame, then stores
+the new seq and finally bumps latest_seq. A reader maps the latest slot as a
+read-only NumPy view (zero-copy) and checks the slot seq; the view stays
+valid until the producer wraps around the ring (slots - 1 further frames).
+Use copy=True if a frame must be kept longer; read_bus_frame() and
+bus_capture() always do.
+
+Timestamps are time.perf_counter() values, which share one monotonic clock
+across processes on the same machine.
+
+Usage:
+    python frame_bus.py --fps 60                   # run the producer
+    AUTO_FRAME_BUS=1 python one_tick_pray.py       # consumers read from the bus
+
+    reader = FrameBusReader()
+    seq, ts, frame = reader.latest()
+    seq, ts, frame = reader.wait_next(seq, timeout=0.1)
+
+Exported:
+- FrameBusWriter(shape, name=..., slots=6)
+- FrameBusReader(name=...)
+- bus_capture(fallback) -> capture function that prefers the bus when AUTO_FRAME_BUS is set
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_BUS_NAME = "osrs_frame_bus"
+DEFAULT_SLOTS = 6
+MAGIC = b"FBUS"
+VERSION = 1
+MAX_FRAME_AGE_S = 0.5  # older than this, consumers treat the producer as gone
+REATTACH_S = 1.0       # how often read_bus_frame() re-opens the bus while frames are stale
+
+_HEADER = struct.Struct("<4sIIIIIQ")  # magic, version, width, height, channels, slots, latest_seq
+_SLOT = struct.Struct("<Qd")  # seq, timestamp
+_ALIGN = 64
+
+_created_here = set()  # bus names created by this process (or the parent it was forked from)
+
+
+def _align(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _layout(width: int, height: int, channels: int, slots: int) -> Tuple[int, int, int]:
+    """Return (slot table offset, first frame offset, frame stride)."""
+    table = _align(_HEADER.size)
+    first = _align(table + slots * _SLOT.size)
+    stride = _align(width * height * channels)
+    return table, first, stride
+
+
+class FrameBusWriter:
+    def __init__(self, shape, name: str = DEFAULT_BUS_NAME, slots: int = DEFAULT_SLOTS):
+        """Create (or replace) the bus for frames of `shape` (h, w, c)."""
+        height, width = int(shape[0]), int(shape[1])
+        channels = int(shape[2]) if len(shape) > 2 else 1
+        self.shape = (height, width, channels)
+        self.name = name
+        self.slots = int(slots)
+        self.table, self.first, self.stride = _layout(width, height, channels, self.slots)
+        size = self.first + self.stride * self.slots
+
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()  # left over from a producer that crashed
+        except FileNotFoundError:
+            pass
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _created_here.add(name)
+        _HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, width, height, channels, self.slots, 0)
+        self.seq = 0
+        self._frames = [
+            np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=self.first + i * self.stride)
+            for i in range(self.slots)
+        ]
+
+    def publish(self, frame: np.ndarray, timestamp: Optional[float] = None) -> int:
+        """Copy `frame` into the next slot and make it the latest. Returns its seq."""
+        if frame.shape[:2] != self.shape[:2]:
+            raise ValueError(f"Frame shape {frame.shape} does not match bus shape {self.shape}")
+        seq = self.seq + 1
+        slot = seq % self.slots
+        off = self.table + slot * _SLOT.size
+        _SLOT.pack_into(self.shm.buf, off, 0, 0.0)  # invalidate while writing
+        dst = self._frames[slot]
+        if frame.ndim == 2:
+            dst[:, :, 0] = frame
+        else:
+            np.copyto(dst, frame[:, :, :self.shape[2]])
+        _SLOT.pack_into(self.shm.buf, off, seq, time.perf_counter() if timestamp is None else timestamp)
+        struct.pack_into("<Q", self.shm.buf, _HEADER.size - 8, seq)
+        self.seq = seq
+        return seq
+
+    def close(self, unlink: bool = True):
+        self._frames = []
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name=name)
+    # Readers must not unlink the producer's segment when they exit (POSIX
+    # resource tracker behaviour before Python 3.13). A reader sharing the
+    # writer's tracker leaves the writer's registration alone.
+    if os.name == "posix" and name not in _created_here:
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+
+class FrameBusReader:
+    def __init__(self, name: str = DEFAULT_BUS_NAME):
+        """Attach to a running bus; raises FileNotFoundError if no producer exists."""
+        self.name = name
+        self.shm = _attach(name)
+        magic, version, width, height, channels, slots, _ = _HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.shm.close()
+            raise ValueError(f"'{name}' is not a frame bus (v{VERSION})")
+        self.shape = (height, width, channels)
+        self.slots = slots
+        self.table, self.first, self.stride = _layout(width, height, channels, slots)
+        self._frames = []
+        for i in range(slots):
+            view = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=self.first + i * self.stride)
+            view.flags.writeable = False
+            self._frames.append(view)
+        self.frames_read = 0
+        self.torn_reads = 0
+
+    def latest_seq(self) -> int:
+        return struct.unpack_from("<Q", self.shm.buf, _HEADER.size - 8)[0]
+
+    def _slot_info(self, slot: int) -> Tuple[int, float]:
+        return _SLOT.unpack_from(self.shm.buf, self.table + slot * _SLOT.size)
+
+    def is_valid(self, seq: int) -> bool:
+        """Whether the frame with `seq` has not been overwritten yet."""
+        return seq > 0 and self._slot_info(seq % self.slots)[0] == seq
+
+    def latest(self, copy: bool = False) -> Tuple[int, float, Optional[np.ndarray]]:
+        """Return (seq, timestamp, frame) for the newest frame; frame is None if none yet."""
+        for _ in range(3):
+            seq = self.latest_seq()
+            if seq == 0:
+                return 0, 0.0, None
+            slot = seq % self.slots
+            slot_seq, ts = self._slot_info(slot)
+            if slot_seq != seq:
+                continue  # producer is rewriting this slot; re-read latest
+            frame = self._frames[slot]
+            if copy:
+                frame = frame.copy()
+                if not self.is_valid(seq):
+                    self.torn_reads += 1
+                    continue
+            self.frames_read += 1
+            return seq, ts, frame
+        self.torn_reads += 1
+        return 0, 0.0, None
+
+    def wait_next(self, last_seq: int, timeout: float = 0.1, copy: bool = False):
+        """Wait for a frame newer than `last_seq` (short sleeps, no busy spin)."""
+        end = time.perf_counter() + timeout
+        while True:
+            if self.latest_seq() > last_seq:
+                seq, ts, frame = self.latest(copy=copy)
+                if frame is not None:
+                    return seq, ts, frame
+            if time.perf_counter() >= end:
+                return 0, 0.0, None
+            time.sleep(0.001)
+
+    def close(self):
+        self._frames = []
+        self.shm.close()
+
+
+# --- Consumer helper ---
+_reader: Optional[FrameBusReader] = None
+_attached_at = 0.0
+
+
+def bus_enabled() -> bool:
+    return os.environ.get("AUTO_FRAME_BUS", "").strip().lower() not in ("", "0", "false", "no")
+
+
+def read_bus_frame(max_age_s: float = MAX_FRAME_AGE_S):
+    """Latest bus frame (a private copy), or None if the bus is off, missing or stale.
+
+    Capture helpers hand frames to detectors and queues that keep them longer
+    than the ring takes to wrap, so this copies (and re-checks the slot seq
+    against torn reads) instead of returning a view of the shared slot.
+
+    While frames are stale the bus is re-opened (at most every REATTACH_S):
+    a restarted producer creates a new segment, and the old mapping would
+    keep returning its last frame forever.
+    """
+    if not bus_enabled():
+        return None
+    if _reader is None and not _reattach():
+        return None
+    seq, ts, frame = _reader.latest(copy=True)
+    if frame is None or time.perf_counter() - ts > max_age_s:
+        if time.perf_counter() - _attached_at < REATTACH_S or not _reattach():
+            return None
+        seq, ts, frame = _reader.latest(copy=True)
+        if frame is None or time.perf_counter() - ts > max_age_s:
+            return None
+    return frame
+
+
+def _reattach() -> bool:
+    """(Re)open the consumer-side reader; False if no bus is running."""
+    global _reader, _attached_at
+    _attached_at = time.perf_counter()
+    if _reader is not None:
+        try:
+            _reader.close()
+        except Exception:
+            pass
+        _reader = None
+    try:
+        _reader = FrameBusReader(os.environ.get("AUTO_FRAME_BUS_NAME", DEFAULT_BUS_NAME))
+    except (FileNotFoundError, ValueError):
+        return False
+    return True
+
+
+def bus_capture(fallback: Callable[[], object]) -> Callable[[], object]:
+    """Wrap a capture function so it reads from the frame bus when AUTO_FRAME_BUS is set."""
+    def _capture():
+        frame = read_bus_frame()
+        return frame if frame is not None else fallback()
+    return _capture
+
+
+# --- Producer ---
+def _make_grabber():
+    try:
+        from mss import mss  # type: ignore
+        grab = mss()
+        mon = grab.monitors[1]
+        return lambda: np.asarray(grab.grab(mon))[:, :, :3]
+    except Exception:
+        import cv2
+        import pyautogui
+        return lambda: cv2.cvtColor(np.array(pyautogui.screenshot()), cv2.COLOR_RGB2BGR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture the screen once and share frames with other scripts")
+    parser.add_argument("--fps", type=float, default=60.0, help="Target capture rate")
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS, help="Ring size")
+    parser.add_argument("--name", default=DEFAULT_BUS_NAME, help="Shared memory name")
+    args = parser.parse_args()
+
+    grab = _make_grabber()
+    first = grab()
+    writer = FrameBusWriter(first.shape, name=args.name, slots=args.slots)
+    mb = writer.shm.size / (1024 * 1024)
+    print(f"🚌 Frame bus '{args.name}' {first.shape[1]}x{first.shape[0]} x{args.slots} slots ({mb:.1f} MB)")
+    print("   Start consumers with AUTO_FRAME_BUS=1. Ctrl+C to stop.")
+    interval = 1.0 / max(1.0, args.fps)
+    next_t = time.perf_counter()
+    last_report = next_t
+    published = 0
+    try:
+        while True:
+            t0 = time.perf_counter()
+            frame = grab()
+            writer.publish(np.ascontiguousarray(frame), timestamp=time.perf_counter())
+            published += 1
+            if t0 - last_report >= 5.0:
+                print(f"🚌 {published / (t0 - last_report):.1f} fps (seq {writer.seq})")
+                published = 0
+                last_report = t0
+            next_t += interval
+            delay = next_t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_t = time.perf_counter()
+    except KeyboardInterrupt:
+        print("\n👋 Frame bus stopped")
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,6 +12,11 @@ import random
 import os
 from datetime import datetime
 
+from input_backend import get_input_backend
+from input_scheduler import get_input_scheduler, now, precise_sleep
+from mouse_paths import get_mouse_path_model
+from frame_bus import read_bus_frame
+
 # Configure pyautogui for safety
 pyautogui.FAILSAFE = True  # Move mouse to corner to stop
 pyautogui.PAUSE = 0.1  # Small pause between actions
@@ -30,6 +35,14 @@ class AutoActionFunctions:
         self.qp_last_point = None  # last in-orb click point for micro-movement continuity
         self.qp_anchor_point = None  # slowly drifting "norm" point within orb
         self.qp_inner_margin = 20  # pixels to stay inside orb edge when clicking
+        self.last_press_time = None  # perf_counter when human_click_hold last pressed (achieved input time)
+        self.qp_release_at = 0.0  # perf_counter deadline of the last scheduled flick's final button release
+        self.input = get_input_backend()  # mouse/keyboard output (see input_backend.py)
+        try:
+            self.mouse_paths = get_mouse_path_model()  # trajectories fitted from data/mouse_profile_*.jsonl
+        except Exception as e:
+            print(f"⚠️ Mouse path model unavailable, using simple glides: {e}")
+            self.mouse_paths = None
         
         # Load templates on initialization
         self.load_templates()
@@ -121,23 +134,14 @@ class AutoActionFunctions:
     # --- Rapid input helpers for precise timing actions (e.g., prayer flick) ---
     def rapid_press(self, key: str, hold_seconds: float = 0.0):
         """Press a key with minimal global delay, optionally holding briefly.
-        Respects a local timing without the module-wide pyautogui.PAUSE.
+        Goes through the input backend, so no module-wide pyautogui.PAUSE applies.
         """
-        try:
-            original_pause = pyautogui.PAUSE
-            pyautogui.PAUSE = 0  # ensure immediate
-            if hold_seconds and hold_seconds > 0:
-                pyautogui.keyDown(key)
-                time.sleep(hold_seconds)
-                pyautogui.keyUp(key)
-            else:
-                pyautogui.press(key)
-        finally:
-            # restore global pause setting
-            try:
-                pyautogui.PAUSE = original_pause
-            except Exception:
-                pass
+        if hold_seconds and hold_seconds > 0:
+            self.input.key_down(key)
+            precise_sleep(hold_seconds)
+            self.input.key_up(key)
+        else:
+            self.input.press(key)
 
     # --- Quick-prayer calibration storage ---
     def _load_config(self):
@@ -254,6 +258,10 @@ class AutoActionFunctions:
 
     def next_micro_point(self, prev_point=None, center=None, radius=None, inner_margin_px: int | None = None):
         """Choose the next in-orb point using human profile: ~90% 1–3 px, ~10% 4–6 px steps."""
+        if self.mouse_paths is not None:
+            # Step size drawn from the recorded micro-step distribution
+            step = self.mouse_paths.sample_micro_step()
+            return self.step_point_in_orb(prev_point=prev_point, center=center, radius=radius, min_step=step, max_step=step, inner_margin_px=inner_margin_px)
         # Primary small steps
         if random.random() < 0.9:
             return self.step_point_in_orb(prev_point=prev_point, center=center, radius=radius, min_step=1, max_step=3, inner_margin_px=inner_margin_px)
@@ -263,7 +271,12 @@ class AutoActionFunctions:
     # --- Humanized quick movement for near-instant but realistic motion ---
     def human_quick_move(self, target_x: int, target_y: int):
         try:
-            start_x, start_y = pyautogui.position()
+            start_x, start_y = self.input.position()
+            if self.mouse_paths is not None:
+                self.input.check_failsafe()
+                points, dts = self.mouse_paths.path((start_x, start_y), (target_x, target_y))
+                self.input.play_path(points, dts)
+                return
             dx = target_x - start_x
             dy = target_y - start_y
             distance = (dx * dx + dy * dy) ** 0.5
@@ -280,30 +293,36 @@ class AutoActionFunctions:
             wp_x = start_x + dx * wp_frac + random.randint(-3, 3)
             wp_y = start_y + dy * wp_frac + random.randint(-3, 3)
 
-            pyautogui.moveTo(wp_x, wp_y, duration=total_dur * 0.55)
-            pyautogui.moveTo(target_x, target_y, duration=total_dur * 0.45)
+            self.input.glide_to(wp_x, wp_y, duration=total_dur * 0.55)
+            self.input.glide_to(target_x, target_y, duration=total_dur * 0.45)
         except Exception as e:
             print(f"⚠️ human_quick_move failed: {e}")
 
     def human_micro_move(self, target_x: int, target_y: int):
         """Very small motion for within-orb adjustments; fast but not teleporting."""
         try:
-            start_x, start_y = pyautogui.position()
+            start_x, start_y = self.input.position()
             dx = target_x - start_x
             dy = target_y - start_y
             distance = (dx * dx + dy * dy) ** 0.5
             if distance < 1:
                 return
+            if self.mouse_paths is not None:
+                self.input.check_failsafe()
+                points, dts = self.mouse_paths.path((start_x, start_y), (target_x, target_y))
+                self.input.play_path(points, dts)
+                return
             duration = random.uniform(0.015, 0.05)
-            pyautogui.moveTo(target_x, target_y, duration=duration)
+            self.input.glide_to(target_x, target_y, duration=duration)
         except Exception as e:
             print(f"⚠️ human_micro_move failed: {e}")
 
     def human_click_hold(self, x: int, y: int, hold_ms: int = 35):
         try:
-            pyautogui.mouseDown(x=x, y=y, button='left')
-            time.sleep(max(0.02, hold_ms / 1000.0))
-            pyautogui.mouseUp(x=x, y=y, button='left')
+            self.input.mouse_down('left', x=x, y=y)
+            self.last_press_time = time.perf_counter()
+            precise_sleep(max(0.02, hold_ms / 1000.0))
+            self.input.mouse_up('left', x=x, y=y)
         except Exception as e:
             print(f"⚠️ human_click_hold failed: {e}")
 
@@ -373,20 +392,18 @@ class AutoActionFunctions:
                 if pos is None:
                     print("⚠️ Quick-prayer icon not located")
                     return False
-                original_pause = pyautogui.PAUSE
-                pyautogui.PAUSE = 0
                 # Quick but realistic movement; micro if close
-                cur_x, cur_y = pyautogui.position()
+                cur_x, cur_y = self.input.position()
                 if ((pos[0]-cur_x)**2 + (pos[1]-cur_y)**2) ** 0.5 <= 12:
                     self.human_micro_move(pos[0], pos[1])
                 else:
                     self.human_quick_move(pos[0], pos[1])
                 # Brief settle before click for reliability
-                time.sleep(settle)
+                precise_sleep(settle)
                 # Click ON with a short hold
                 self.human_click_hold(pos[0], pos[1], hold_ms=hold_on)
                 # Gap between toggles
-                time.sleep(gap)
+                precise_sleep(gap)
                 # Slightly different nearby point within the orb for OFF (micro step)
                 if pos_center is not None:
                     pos2 = self.next_micro_point(prev_point=pos, center=pos_center, radius=pos_radius, inner_margin_px=inner_margin_px)
@@ -396,7 +413,6 @@ class AutoActionFunctions:
                 self.human_micro_move(pos2[0], pos2[1])
                 # Click OFF with a short hold
                 self.human_click_hold(pos2[0], pos2[1], hold_ms=hold_off)
-                pyautogui.PAUSE = original_pause
                 # Remember last point for next invocation to avoid big jumps
                 self.qp_last_point = pos2
                 # Occasionally drift anchor slightly to a new local "norm" point
@@ -405,7 +421,7 @@ class AutoActionFunctions:
             else:
                 # Keyboard fallback
                 self.rapid_press(quick_prayer_key)
-                time.sleep(gap)
+                precise_sleep(gap)
                 self.rapid_press(quick_prayer_key)
             timestamp = datetime.now().strftime("%H:%M:%S")
             print(f"[{timestamp}] ✝️ Prayer flick (gap {int(gap*1000)} ms)")
@@ -413,9 +429,96 @@ class AutoActionFunctions:
         except Exception as e:
             print(f"❌ pray_tick failed: {e}")
             return False
+
+    def pray_tick_at(
+        self,
+        on_deadline: float,
+        min_gap_ms: int = 40,
+        max_gap_ms: int = 90,
+        inner_margin_px: int = 20,
+        hold_on_ms_min: int = 60,
+        hold_on_ms_max: int = 100,
+        hold_off_ms_min: int = 60,
+        hold_off_ms_max: int = 100,
+        scheduler=None,
+    ):
+        """Schedule a quick-prayer flick whose ON press lands exactly at `on_deadline`.
+
+        `on_deadline` is on the input_scheduler clock (time.perf_counter seconds).
+        The cursor is pre-positioned inside the orb by the scheduler as soon as the
+        previous scheduled flick has released the button, so call this at least
+        ~350 ms ahead of the deadline; the move and the four button edges are
+        fired by the scheduler thread at absolute deadlines instead of chained sleeps.
+
+        Requires quick-prayer calibration (qp_calibrate.py).
+
+        Returns:
+            dict with the scheduled deadlines ('on_down', 'on_up', 'off_down',
+            'off_up') and ticket ids, or None if the orb is not calibrated.
+        """
+        try:
+            pos_center = self.qp_center
+            pos_radius = self.qp_radius
+            if pos_center is None:
+                print("⚠️ pray_tick_at needs quick-prayer calibration (run qp_calibrate.py)")
+                return None
+            sched = scheduler if scheduler is not None else get_input_scheduler()
+
+            base = self.qp_last_point or self.qp_anchor_point
+            if base is None:
+                self.qp_anchor_point = self.random_point_in_orb(center=pos_center, radius=pos_radius, inner_margin_px=inner_margin_px)
+                base = self.qp_anchor_point
+            pos = self.next_micro_point(prev_point=base, center=pos_center, radius=pos_radius, inner_margin_px=inner_margin_px)
+            pos2 = self.next_micro_point(prev_point=pos, center=pos_center, radius=pos_radius, inner_margin_px=inner_margin_px)
+
+            gap = random.uniform(min_gap_ms / 1000.0, max_gap_ms / 1000.0)
+            hold_on = random.randint(max(1, hold_on_ms_min), max(hold_on_ms_min, hold_on_ms_max)) / 1000.0
+            hold_off = random.randint(max(1, hold_off_ms_min), max(hold_off_ms_min, hold_off_ms_max)) / 1000.0
+
+            def _preposition():
+                cur_x, cur_y = self.input.position()
+                if ((pos[0]-cur_x)**2 + (pos[1]-cur_y)**2) ** 0.5 <= 12:
+                    self.human_micro_move(pos[0], pos[1])
+                else:
+                    self.human_quick_move(pos[0], pos[1])
+
+            t_on_down = on_deadline
+            t_on_up = t_on_down + hold_on
+            t_off_down = t_on_up + gap
+            t_off_up = t_off_down + hold_off
+            inp = self.input
+            tickets = [
+                # Not before the previous flick's off_up: moving while its button is
+                # held would drag, and its off_up would move the cursor back
+                sched.submit(max(now(), self.qp_release_at), _preposition, label="flick_preposition"),
+                sched.submit(t_on_down, lambda: inp.mouse_down('left', x=pos[0], y=pos[1]), label="flick_on_down"),
+                sched.submit(t_on_up, lambda: inp.mouse_up('left', x=pos[0], y=pos[1]), label="flick_on_up"),
+                # Micro adjustment inside the orb halfway through the gap
+                sched.submit(t_on_up + gap * 0.5, lambda: inp.move_to(pos2[0], pos2[1]), label="flick_adjust"),
+                sched.submit(t_off_down, lambda: inp.mouse_down('left', x=pos2[0], y=pos2[1]), label="flick_off_down"),
+                sched.submit(t_off_up, lambda: inp.mouse_up('left', x=pos2[0], y=pos2[1]), label="flick_off_up"),
+            ]
+
+            self.qp_last_point = pos2
+            self.qp_release_at = t_off_up
+            if random.random() < 0.03:
+                self.qp_anchor_point = self.next_micro_point(prev_point=self.qp_anchor_point or pos2, center=pos_center, radius=pos_radius)
+            return {
+                "on_down": t_on_down,
+                "on_up": t_on_up,
+                "off_down": t_off_down,
+                "off_up": t_off_up,
+                "tickets": tickets,
+            }
+        except Exception as e:
+            print(f"❌ pray_tick_at failed: {e}")
+            return None
     
     def capture_screen(self):
-        """Capture current screen"""
+        """Capture current screen (latest frame-bus frame when AUTO_FRAME_BUS is set)"""
+        frame = read_bus_frame()
+        if frame is not None:
+            return frame
         try:
             screenshot = pyautogui.screenshot()
             frame = np.array(screenshot)
@@ -857,16 +960,13 @@ class AutoActionFunctions:
                 if pos is None:
                     print("⚠️ Quick-prayer icon not located")
                     return False
-                original_pause = pyautogui.PAUSE
-                pyautogui.PAUSE = 0
-                cur_x, cur_y = pyautogui.position()
+                cur_x, cur_y = self.input.position()
                 if ((pos[0]-cur_x)**2 + (pos[1]-cur_y)**2) ** 0.5 <= 12:
                     self.human_micro_move(pos[0], pos[1])
                 else:
                     self.human_quick_move(pos[0], pos[1])
-                time.sleep(settle)
+                precise_sleep(settle)
                 self.human_click_hold(pos[0], pos[1], hold_ms=hold_ms)
-                pyautogui.PAUSE = original_pause
                 self.qp_last_point = pos
             else:
                 # Keyboard fallback (assumes bound hotkey)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Hot-Loop Logger
+
+Drop-in replacement for print() inside detection / action loops. Console I/O
+on a slow terminal (Windows conhost in particular) can cost milliseconds per
+line, which is a hidden bottleneck when a detector prints once per contour.
+
+- Level filtering: a disabled call returns after one integer comparison, and
+  `if log.debug_enabled:` guards expensive debug-only computations (array
+  reductions, pixel counts) so they are skipped entirely.
+- Lazy formatting: the call only enqueues (template, args); str.format runs on
+  the background writer thread. Pass values, not views of buffers that will
+  be overwritten (e.g. frame-bus frames).
+- Background writer: lines are batched into one write() per wake-up. The
+  queue is bounded; when the terminal cannot keep up, lines are dropped and
+  counted rather than blocking the hot loop.
+- Rate limiting: each message template is emitted at most once per
+  `repeat_s` (per-call `every_s` overrides); the next emitted line reports
+  how many repeats were suppressed. ERROR lines are never rate limited.
+
+Usage:
+    log = get_logger("alch_crab", level=DEBUG)
+    log.debug("   🎨 Contour {}: area={:.0f}", i, area)
+    log.info("⚡ Toggle ON ({})", digit, every_s=0.5)
+    if log.debug_enabled:
+        log.debug("🎨 H:[{}-{}]", int(hsv[..., 0].min()), int(hsv[..., 0].max()))
+
+AUTO_LOG_LEVEL (DEBUG/INFO/WARNING/ERROR) overrides the default level of
+every logger created through get_logger().
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+_LEVEL_NAMES = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "WARN": WARNING, "ERROR": ERROR}
+
+QUEUE_SIZE = 8192
+BATCH_LINES = 256
+
+
+class _Writer:
+    """Single background thread that owns the console for all loggers."""
+
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, name="hotlog-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, record) -> None:
+        try:
+            self.q.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    @staticmethod
+    def _format(record) -> str:
+        template, args, fields, suppressed = record
+        try:
+            line = template.format(*args) if args else template
+        except Exception as e:
+            line = f"{template} {args!r} (format error: {e})"
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if suppressed:
+            line += f" (+{suppressed} repeats suppressed)"
+        return line
+
+    def _run(self):
+        while True:
+            record = self.q.get()
+            batch = [record]
+            while len(batch) < BATCH_LINES:
+                try:
+                    batch.append(self.q.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            for rec in batch:
+                if rec is None:
+                    continue  # flush marker
+                lines.append(self._format(rec))
+            if self.dropped:
+                lines.append(f"⚠️ hotlog: {self.dropped} lines dropped (console too slow)")
+                self.dropped = 0
+            if lines:
+                try:
+                    out = sys.stdout  # looked up late: scripts may re-wrap stdout for emoji
+                    out.write("\n".join(lines) + "\n")
+                    out.flush()
+                except Exception:
+                    pass
+                self.written += len(lines)
+            for _ in batch:
+                self.q.task_done()
+
+    def flush(self, timeout: float = 1.0):
+        """Wait (bounded) until everything queued so far is written."""
+        end = time.perf_counter() + timeout
+        while self.q.unfinished_tasks and time.perf_counter() < end:
+            time.sleep(0.005)
+
+
+_writer: Optional[_Writer] = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _Writer:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = _Writer()
+                atexit.register(_writer.flush)
+    return _writer
+
+
+def _parse_level(level) -> int:
+    if isinstance(level, str):
+        return _LEVEL_NAMES.get(level.strip().upper(), INFO)
+    return int(level)
+
+
+class HotLogger:
+    def __init__(self, name: str, level=INFO, repeat_s: float = 0.0):
+        """
+        Args:
+            name: Logger name (kept for get_logger() lookups and stats).
+            level: Minimum level emitted.
+            repeat_s: Default per-template rate limit (0 = no limit).
+        """
+        self.name = name
+        self.level = _parse_level(level)
+        self.repeat_s = float(repeat_s)
+        self._last: Dict[tuple, float] = {}
+        self._suppressed: Dict[tuple, int] = {}
+
+    def set_level(self, level):
+        self.level = _parse_level(level)
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    @property
+    def debug_enabled(self) -> bool:
+        return DEBUG >= self.level
+
+    def log(self, level: int, template: str, *args, every_s: Optional[float] = None, **fields):
+        if level < self.level:
+            return
+        limit = self.repeat_s if every_s is None else every_s
+        suppressed = 0
+        if limit > 0 and level < ERROR:
+            key = (level, template)
+            now = time.perf_counter()
+            last = self._last.get(key)
+            if last is not None and now - last < limit:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+            self._last[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+        _get_writer().put((template, args, fields, suppressed))
+
+    def debug(self, template: str, *args, **kwargs):
+        if DEBUG >= self.level:
+            self.log(DEBUG, template, *args, **kwargs)
+
+    def info(self, template: str, *args, **kwargs):
+        if INFO >= self.level:
+            self.log(INFO, template, *args, **kwargs)
+
+    def warning(self, template: str, *args, **kwargs):
+        self.log(WARNING, template, *args, **kwargs)
+
+    def error(self, template: str, *args, **kwargs):
+        self.log(ERROR, template, *args, **kwargs)
+
+    def flush(self, timeout: float = 1.0):
+        if _writer is not None:
+            _writer.flush(timeout)
+
+
+_loggers: Dict[str, HotLogger] = {}
+
+
+def get_logger(name: str, level=INFO, repeat_s: float = 0.0) -> HotLogger:
+    """Shared logger per name; AUTO_LOG_LEVEL overrides `level` at creation."""
+    if name not in _loggers:
+        env = os.environ.get("AUTO_LOG_LEVEL")
+        _loggers[name] = HotLogger(name, level=env if env else level, repeat_s=repeat_s)
+    return _loggers[name]
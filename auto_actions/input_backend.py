@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Input Backends
+
+One small interface for mouse/keyboard output with several implementations:
+
+- PyAutoGuiBackend: the original behaviour (pyautogui with tweened moves),
+  but without the per-call PAUSE.
+- XTestBackend: Linux/X11 fast path. Keeps one persistent Xlib display
+  connection and injects events through the XTest extension - no fail-safe
+  position query, no pause, no tween thread per call.
+- Win32Backend: Windows fast path via SetCursorPos / SendInput through ctypes.
+- RecordingBackend: touches no real device; keeps a virtual cursor and
+  records every event with its timestamp (tests, simulators, dry runs).
+
+Every backend moves along paths itself in glide_to()/play_path(), stepping
+at up to 240 Hz on precise deadlines, so the mouse paths recorded by
+record_mouse_profile.py can be replayed at the rate they were captured.
+
+Pick one with get_input_backend(name) or the AUTO_INPUT_BACKEND environment
+variable: "auto" (default), "pyautogui", "xtest", "win32", "recording".
+"auto" prefers the native fast path for the current OS and falls back to
+pyautogui.
+
+Exported:
+- InputBackend, PyAutoGuiBackend, XTestBackend, Win32Backend, RecordingBackend
+- FailSafeError
+- get_input_backend(name=None) -> InputBackend
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from input_scheduler import precise_sleep_until
+
+DEFAULT_STEP_HZ = 240.0
+FAILSAFE_MARGIN = 2  # px from a screen corner that aborts, like pyautogui.FAILSAFE
+
+
+class FailSafeError(Exception):
+    """Raised when the cursor sits in a screen corner (emergency stop)."""
+
+
+class InputBackend:
+    name = "base"
+
+    def __init__(self, failsafe: bool = True):
+        self.failsafe = failsafe
+
+    # --- Primitive operations (implemented by subclasses) ---
+    def position(self) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def size(self) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def move_to(self, x: int, y: int):
+        raise NotImplementedError
+
+    def mouse_down(self, button: str = "left", x: Optional[int] = None, y: Optional[int] = None):
+        raise NotImplementedError
+
+    def mouse_up(self, button: str = "left", x: Optional[int] = None, y: Optional[int] = None):
+        raise NotImplementedError
+
+    def key_down(self, key: str):
+        raise NotImplementedError
+
+    def key_up(self, key: str):
+        raise NotImplementedError
+
+    # --- Composite operations ---
+    def check_failsafe(self):
+        """One position query per composite action instead of one per event."""
+        if not self.failsafe:
+            return
+        x, y = self.position()
+        w, h = self.size()
+        near_x = x <= FAILSAFE_MARGIN or x >= w - 1 - FAILSAFE_MARGIN
+        near_y = y <= FAILSAFE_MARGIN or y >= h - 1 - FAILSAFE_MARGIN
+        if near_x and near_y:
+            raise FailSafeError(f"Fail-safe triggered: cursor in screen corner at ({x}, {y})")
+
+    def move_rel(self, dx: int, dy: int):
+        x, y = self.position()
+        self.move_to(x + int(dx), y + int(dy))
+
+    def click(self, x: Optional[int] = None, y: Optional[int] = None, button: str = "left"):
+        self.check_failsafe()
+        if x is not None and y is not None:
+            self.move_to(x, y)
+        self.mouse_down(button)
+        self.mouse_up(button)
+
+    def press(self, key: str):
+        self.key_down(key)
+        self.key_up(key)
+
+    def play_path(self, points: Sequence[Tuple[float, float]], dts: Sequence[float]):
+        """Move through `points`, waiting dts[i] seconds before point i (deadline-paced)."""
+        t = time.perf_counter()
+        for (px, py), dt in zip(points, dts):
+            t += max(0.0, float(dt))
+            precise_sleep_until(t)
+            self.move_to(int(round(px)), int(round(py)))
+
+    def glide_to(self, x: int, y: int, duration: float = 0.0, step_hz: float = DEFAULT_STEP_HZ):
+        """Move to (x, y) over `duration` seconds with smoothstep easing."""
+        self.check_failsafe()
+        if duration <= 0:
+            self.move_to(x, y)
+            return
+        sx, sy = self.position()
+        n = max(1, int(duration * step_hz))
+        dt = duration / n
+        points = []
+        for i in range(1, n + 1):
+            f = i / n
+            f = f * f * (3.0 - 2.0 * f)  # ease in/out
+            points.append((sx + (x - sx) * f, sy + (y - sy) * f))
+        self.play_path(points, [dt] * n)
+
+    def glide_rel(self, dx: int, dy: int, duration: float = 0.0, step_hz: float = DEFAULT_STEP_HZ):
+        x, y = self.position()
+        self.glide_to(x + int(dx), y + int(dy), duration=duration, step_hz=step_hz)
+
+    def close(self):
+        pass
+
+
+class PyAutoGuiBackend(InputBackend):
+    """Original pyautogui behaviour minus the global PAUSE on every call."""
+
+    name = "pyautogui"
+
+    def __init__(self, failsafe: bool = True):
+        super().__init__(failsafe=failsafe)
+        import pyautogui
+        self.pg = pyautogui
+
+    def position(self):
+        x, y = self.pg.position()
+        return int(x), int(y)
+
+    def size(self):
+        w, h = self.pg.size()
+        return int(w), int(h)
+
+    def move_to(self, x, y):
+        self.pg.moveTo(x, y, _pause=False)
+
+    def mouse_down(self, button="left", x=None, y=None):
+        self.pg.mouseDown(x=x, y=y, button=button, _pause=False)
+
+    def mouse_up(self, button="left", x=None, y=None):
+        self.pg.mouseUp(x=x, y=y, button=button, _pause=False)
+
+    def key_down(self, key):
+        self.pg.keyDown(key, _pause=False)
+
+    def key_up(self, key):
+        self.pg.keyUp(key, _pause=False)
+
+    def glide_to(self, x, y, duration=0.0, step_hz=DEFAULT_STEP_HZ):
+        # Keep pyautogui's own tween so existing timings feel the same
+        self.pg.moveTo(x, y, duration=duration, _pause=False)
+
+
+class XTestBackend(InputBackend):
+    """X11 XTest injection over one persistent display connection (python-xlib)."""
+
+    name = "xtest"
+    BUTTONS = {"left": 1, "middle": 2, "right": 3}
+    KEY_ALIASES = {
+        "enter": "Return", "return": "Return", "esc": "Escape", "escape": "Escape",
+        "space": "space", "tab": "Tab", "backspace": "BackSpace", "shift": "Shift_L",
+        "ctrl": "Control_L", "alt": "Alt_L", "up": "Up", "down": "Down",
+        "left": "Left", "right": "Right",
+    }
+
+    def __init__(self, failsafe: bool = True):
+        super().__init__(failsafe=failsafe)
+        from Xlib import X, XK, display
+        from Xlib.ext import xtest
+        self.X = X
+        self.XK = XK
+        self.xtest = xtest
+        self.display = display.Display()
+        if not self.display.has_extension("XTEST"):
+            raise RuntimeError("X server has no XTEST extension")
+        self.root = self.display.screen().root
+        self._keycodes = {}
+
+    def position(self):
+        p = self.root.query_pointer()
+        return int(p.root_x), int(p.root_y)
+
+    def size(self):
+        s = self.display.screen()
+        return int(s.width_in_pixels), int(s.height_in_pixels)
+
+    def move_to(self, x, y):
+        self.xtest.fake_input(self.display, self.X.MotionNotify, x=int(x), y=int(y))
+        self.display.sync()
+
+    def _button(self, kind, button, x, y):
+        if x is not None and y is not None:
+            self.xtest.fake_input(self.display, self.X.MotionNotify, x=int(x), y=int(y))
+        self.xtest.fake_input(self.display, kind, self.BUTTONS.get(button, 1))
+        self.display.sync()
+
+    def mouse_down(self, button="left", x=None, y=None):
+        self._button(self.X.ButtonPress, button, x, y)
+
+    def mouse_up(self, button="left", x=None, y=None):
+        self._button(self.X.ButtonRelease, button, x, y)
+
+    def _keycode(self, key):
+        code = self._keycodes.get(key)
+        if code is None:
+            name = self.KEY_ALIASES.get(key.lower(), key)
+            if len(name) > 1 and name[0] in "fF" and name[1:].isdigit():
+                name = name.upper()
+            keysym = self.XK.string_to_keysym(name)
+            code = self.display.keysym_to_keycode(keysym)
+            if not code:
+                raise ValueError(f"Unknown key: {key}")
+            self._keycodes[key] = code
+        return code
+
+    def key_down(self, key):
+        self.xtest.fake_input(self.display, self.X.KeyPress, self._keycode(key))
+        self.display.sync()
+
+    def key_up(self, key):
+        self.xtest.fake_input(self.display, self.X.KeyRelease, self._keycode(key))
+        self.display.sync()
+
+    def close(self):
+        try:
+            self.display.close()
+        except Exception:
+            pass
+
+
+class Win32Backend(InputBackend):
+    """Windows fast path: SetCursorPos + SendInput via ctypes (no extra packages)."""
+
+    name = "win32"
+    MOUSEEVENTF = {
+        ("left", True): 0x0002, ("left", False): 0x0004,
+        ("right", True): 0x0008, ("right", False): 0x0010,
+        ("middle", True): 0x0020, ("middle", False): 0x0040,
+    }
+    KEYEVENTF_KEYUP = 0x0002
+    VK_NAMES = {
+        "enter": 0x0D, "return": 0x0D, "esc": 0x1B, "escape": 0x1B, "space": 0x20,
+        "tab": 0x09, "backspace": 0x08, "shift": 0x10, "ctrl": 0x11, "alt": 0x12,
+        "left": 0x25, "up": 0x26, "right": 0x27, "down": 0x28,
+    }
+
+    def __init__(self, failsafe: bool = True):
+        super().__init__(failsafe=failsafe)
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.user32 = ctypes.windll.user32
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                        ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD),
+                        ("dwExtraInfo", ctypes.POINTER(wintypes.ULONG))]
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                        ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.POINTER(wintypes.ULONG))]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+        self.MOUSEINPUT, self.KEYBDINPUT, self.INPUT = MOUSEINPUT, KEYBDINPUT, INPUT
+        self._point = wintypes.POINT()
+
+    def position(self):
+        self.user32.GetCursorPos(self.ctypes.byref(self._point))
+        return int(self._point.x), int(self._point.y)
+
+    def size(self):
+        return int(self.user32.GetSystemMetrics(0)), int(self.user32.GetSystemMetrics(1))
+
+    def move_to(self, x, y):
+        self.user32.SetCursorPos(int(x), int(y))
+
+    def _send(self, inp):
+        self.user32.SendInput(1, self.ctypes.byref(inp), self.ctypes.sizeof(inp))
+
+    def _mouse(self, button, down, x, y):
+        if x is not None and y is not None:
+            self.move_to(x, y)
+        inp = self.INPUT(type=0)
+        inp.u.mi = self.MOUSEINPUT(0, 0, 0, self.MOUSEEVENTF[(button, down)], 0, None)
+        self._send(inp)
+
+    def mouse_down(self, button="left", x=None, y=None):
+        self._mouse(button, True, x, y)
+
+    def mouse_up(self, button="left", x=None, y=None):
+        self._mouse(button, False, x, y)
+
+    def _vk(self, key):
+        k = key.lower()
+        if k in self.VK_NAMES:
+            return self.VK_NAMES[k]
+        if k.startswith("f") and k[1:].isdigit():
+            return 0x70 + int(k[1:]) - 1  # VK_F1..VK_F24
+        if len(key) == 1:
+            return self.user32.VkKeyScanW(ord(key)) & 0xFF
+        raise ValueError(f"Unknown key: {key}")
+
+    def _key(self, key, up):
+        inp = self.INPUT(type=1)
+        inp.u.ki = self.KEYBDINPUT(self._vk(key), 0, self.KEYEVENTF_KEYUP if up else 0, 0, None)
+        self._send(inp)
+
+    def key_down(self, key):
+        self._key(key, False)
+
+    def key_up(self, key):
+        self._key(key, True)
+
+
+class RecordingBackend(InputBackend):
+    """Null backend: virtual cursor plus an in-memory event log."""
+
+    name = "recording"
+
+    def __init__(self, screen_size: Tuple[int, int] = (1920, 1080), start: Tuple[int, int] = (960, 540),
+                 failsafe: bool = False, on_event=None):
+        super().__init__(failsafe=failsafe)
+        self.screen_size = (int(screen_size[0]), int(screen_size[1]))
+        self.cursor = (int(start[0]), int(start[1]))
+        self.buttons_down = set()
+        self.keys_down = set()
+        self.events: List[dict] = []
+        self.on_event = on_event  # optional callback(event) e.g. a simulator
+
+    def _record(self, kind, **fields):
+        event = {"t": time.perf_counter(), "type": kind, "x": self.cursor[0], "y": self.cursor[1]}
+        event.update(fields)
+        self.events.append(event)
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def position(self):
+        return self.cursor
+
+    def size(self):
+        return self.screen_size
+
+    def move_to(self, x, y):
+        self.cursor = (int(x), int(y))
+        self._record("move")
+
+    def mouse_down(self, button="left", x=None, y=None):
+        if x is not None and y is not None:
+            self.cursor = (int(x), int(y))
+        self.buttons_down.add(button)
+        self._record("mouse_down", button=button)
+
+    def mouse_up(self, button="left", x=None, y=None):
+        if x is not None and y is not None:
+            self.cursor = (int(x), int(y))
+        self.buttons_down.discard(button)
+        self._record("mouse_up", button=button)
+
+    def key_down(self, key):
+        self.keys_down.add(key)
+        self._record("key_down", key=key)
+
+    def key_up(self, key):
+        self.keys_down.discard(key)
+        self._record("key_up", key=key)
+
+    def clicks(self) -> List[dict]:
+        return [e for e in self.events if e["type"] == "mouse_down"]
+
+    def clear(self):
+        self.events.clear()
+
+
+def _make(name: str) -> InputBackend:
+    if name == "pyautogui":
+        return PyAutoGuiBackend()
+    if name == "xtest":
+        return XTestBackend()
+    if name == "win32":
+        return Win32Backend()
+    if name == "recording":
+        return RecordingBackend()
+    raise ValueError(f"Unknown input backend: {name}")
+
+
+def get_input_backend(name: Optional[str] = None) -> InputBackend:
+    """Create an input backend by name, env AUTO_INPUT_BACKEND, or 'auto'."""
+    name = (name or os.environ.get("AUTO_INPUT_BACKEND") or "auto").lower()
+    if name != "auto":
+        return _make(name)
+    candidates = []
+    if sys.platform.startswith("win"):
+        candidates.append("win32")
+    elif sys.platform.startswith("linux") and os.environ.get("DISPLAY"):
+        candidates.append("xtest")
+    candidates.append("pyautogui")
+    last_error = None
+    for candidate in candidates:
+        try:
+            return _make(candidate)
+        except Exception as e:
+            last_error = e
+    raise RuntimeError(f"No input backend available: {last_error}")
+
+
+if __name__ == "__main__":
+    # Per-event latency check: move the cursor back and forth in place
+    backend = get_input_backend()
+    print(f"🖱️ Input backend: {backend.name}")
+    x, y = backend.position()
+    n = 500
+    start = time.perf_counter()
+    for i in range(n):
+        backend.move_to(x + (i % 2), y)
+    elapsed = time.perf_counter() - start
+    backend.move_to(x, y)
+    print(f"⏱️ {n} moves in {elapsed * 1000:.1f} ms ({elapsed / n * 1e6:.0f} µs per event)")
+    backend.close()
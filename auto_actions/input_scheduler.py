@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+High-Resolution Input Scheduler
+
+Runs input actions at absolute deadlines on the monotonic clock
+(time.perf_counter) instead of chaining time.sleep() calls.
+
+A single background thread keeps a heap of pending actions. It sleeps
+until ~1 ms before the next deadline (OS sleep granularity is several ms
+on Windows) and then spins for the remainder, so actions fire within a
+fraction of a millisecond of their target even while the main loop is
+busy capturing and matching frames. For every action the achieved-minus-
+target error is recorded, so timing accuracy is visible per label.
+
+Exported:
+- now() -> float                                   monotonic seconds
+- precise_sleep_until(deadline, spin_s=0.001)      hybrid sleep/spin wait
+- precise_sleep(seconds, spin_s=0.001)
+- InputScheduler                                   deadline-driven action thread
+- get_input_scheduler() -> InputScheduler          shared, started instance (per process)
+
+Usage:
+    sched = get_input_scheduler()
+    t0 = now() + 0.050
+    sched.submit(t0, lambda: pyautogui.mouseDown(_pause=False), label="on_down")
+    sched.submit(t0 + 0.070, lambda: pyautogui.mouseUp(_pause=False), label="on_up")
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_SPIN_S = 0.001  # spin for the final millisecond
+
+
+def now() -> float:
+    """Monotonic high-resolution clock used for all deadlines (seconds)."""
+    return time.perf_counter()
+
+
+def precise_sleep_until(deadline: float, spin_s: float = DEFAULT_SPIN_S) -> float:
+    """Block until `deadline` (perf_counter seconds); return the achieved time.
+
+    Sleeps coarsely while more than `spin_s` remains, then busy-waits.
+    """
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= spin_s:
+            break
+        time.sleep(remaining - spin_s)
+    while True:
+        t = time.perf_counter()
+        if t >= deadline:
+            return t
+
+
+def precise_sleep(seconds: float, spin_s: float = DEFAULT_SPIN_S) -> float:
+    """Relative version of precise_sleep_until()."""
+    return precise_sleep_until(time.perf_counter() + max(0.0, seconds), spin_s=spin_s)
+
+
+class InputScheduler:
+    def __init__(self, spin_s: float = DEFAULT_SPIN_S, history: int = 1024, late_ms: float = 2.0):
+        """
+        Args:
+            spin_s: How long before a deadline to switch from sleeping to spinning.
+            history: How many per-action timing records to keep.
+            late_ms: Error above which an action is counted as late.
+        """
+        self.spin_s = spin_s
+        self.late_ms = late_ms
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._busy = False
+        self.records: deque = deque(maxlen=history)
+
+    # --- Lifecycle ---
+    def start(self) -> "InputScheduler":
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="input-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, drain: bool = False):
+        """Stop the thread. Pending actions are dropped unless drain=True."""
+        if drain:
+            self.wait_idle()
+        with self._cond:
+            self._running = False
+            self._heap.clear()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    # --- Submission ---
+    def submit(self, deadline: float, action: Callable[[], object], label: str = "action") -> int:
+        """Run `action` at `deadline` (perf_counter seconds). Returns a ticket id."""
+        ticket = next(self._seq)
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, ticket, action, label))
+            self._cond.notify_all()
+        return ticket
+
+    def submit_in(self, delay_s: float, action: Callable[[], object], label: str = "action") -> int:
+        return self.submit(now() + max(0.0, delay_s), action, label=label)
+
+    def cancel(self, ticket: int) -> bool:
+        with self._cond:
+            for i, item in enumerate(self._heap):
+                if item[1] == ticket:
+                    self._heap.pop(i)
+                    heapq.heapify(self._heap)
+                    self._cond.notify_all()
+                    return True
+        return False
+
+    def cancel_all(self):
+        with self._cond:
+            self._heap.clear()
+            self._cond.notify_all()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def next_deadline(self) -> Optional[float]:
+        with self._cond:
+            return self._heap[0][0] if self._heap else None
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every submitted action has run."""
+        end = None if timeout is None else now() + timeout
+        while True:
+            with self._cond:
+                if not self._heap and not self._busy:
+                    return True
+            if end is not None and now() >= end:
+                return False
+            time.sleep(0.001)
+
+    # --- Worker ---
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                deadline = self._heap[0][0]
+                remaining = deadline - now()
+                if remaining > self.spin_s:
+                    # Coarse sleep; an earlier submission will wake us up
+                    self._cond.wait(remaining - self.spin_s)
+                    continue
+                _, ticket, action, label = heapq.heappop(self._heap)
+                self._busy = True
+
+            try:
+                achieved = precise_sleep_until(deadline, spin_s=self.spin_s)
+                try:
+                    action()
+                    ok = True
+                except Exception as e:
+                    ok = False
+                    print(f"⚠️ Scheduled action '{label}' failed: {e}")
+                done = now()
+                error_ms = (achieved - deadline) * 1000.0
+                self.records.append({
+                    "label": label,
+                    "target": deadline,
+                    "achieved": achieved,
+                    "error_ms": error_ms,
+                    "duration_ms": (done - achieved) * 1000.0,
+                    "late": error_ms > self.late_ms,
+                    "ok": ok,
+                })
+            finally:
+                self._busy = False
+
+    # --- Reporting ---
+    def last_record(self, label: Optional[str] = None) -> Optional[dict]:
+        for rec in reversed(self.records):
+            if label is None or rec["label"] == label:
+                return rec
+        return None
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-label timing error summary (ms)."""
+        by_label: Dict[str, List[dict]] = {}
+        for rec in list(self.records):
+            by_label.setdefault(rec["label"], []).append(rec)
+        out: Dict[str, dict] = {}
+        for label, recs in by_label.items():
+            errs = sorted(r["error_ms"] for r in recs)
+            n = len(errs)
+            out[label] = {
+                "count": n,
+                "mean_error_ms": sum(errs) / n,
+                "p50_error_ms": errs[n // 2],
+                "p99_error_ms": errs[min(n - 1, int(n * 0.99))],
+                "max_error_ms": errs[-1],
+                "late": sum(1 for r in recs if r["late"]),
+                "mean_duration_ms": sum(r["duration_ms"] for r in recs) / n,
+            }
+        return out
+
+    def print_stats(self):
+        stats = self.stats()
+        if not stats:
+            print("⏱️ No scheduled actions recorded")
+            return
+        for label, s in sorted(stats.items()):
+            print(
+                f"⏱️ {label}: n={s['count']} err p50={s['p50_error_ms']:.3f} ms "
+                f"p99={s['p99_error_ms']:.3f} ms max={s['max_error_ms']:.3f} ms "
+                f"late={s['late']} dur={s['mean_duration_ms']:.2f} ms"
+            )
+
+
+# Shared instance so every caller serializes through one input thread
+_scheduler: Optional[InputScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_input_scheduler() -> InputScheduler:
+    """Get (and start on first use) the shared InputScheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = InputScheduler().start()
+        return _scheduler
+
+
+def _reset_after_fork():
+    # Only the forking thread survives in the child, so the inherited instance
+    # says it is running but has no thread; the child starts its own on first use
+    global _scheduler, _scheduler_lock
+    _scheduler = None
+    _scheduler_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+if __name__ == "__main__":
+    # Self-check: schedule no-op actions and report the achieved timing error
+    print("🧪 InputScheduler timing check (200 actions, 5 ms apart)")
+    sched = InputScheduler().start()
+    t0 = now() + 0.05
+    for i in range(200):
+        sched.submit(t0 + i * 0.005, lambda: None, label="noop")
+    sched.wait_idle()
+    sched.print_stats()
+    sched.stop()
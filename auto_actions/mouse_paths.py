@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Mouse Path Engine
+
+Generates human-like mouse trajectories whose statistics come from the
+profiles recorded by record_mouse_profile.py (data/mouse_profile_*.jsonl)
+instead of hand-written random steps.
+
+Fitting (once, at start-up):
+- The raw move events are split into strokes (runs of consecutive moves).
+- Per distance bucket we keep the empirical stroke durations, the lateral
+  deviation from the straight chord (curvature) and the mean progress curve
+  (how far along the chord the cursor is at each fraction of the stroke).
+- Globally we keep the sampling interval (dt) of moving samples and the
+  distribution of single micro steps (for in-orb adjustments).
+
+Generation:
+- Paths are produced whole, as NumPy arrays, in a unit frame (progress along
+  the chord, lateral offset as a fraction of the distance).
+- A small pool of unit paths is pre-generated per distance bucket; at click
+  time a path is popped and mapped onto (start, end) with a few vector ops.
+
+Without any recorded profile the engine falls back to a minimum-jerk
+velocity profile with the timings the old hand-written moves used.
+
+Exported:
+- MousePathModel.from_profiles(data_dir) / MousePathModel.default()
+- model.path(start, end) -> (points[N, 2] float, dts[N] seconds)
+- model.sample_micro_step() -> int pixels
+- get_mouse_path_model() -> shared, pre-warmed model
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(CURRENT_DIR, "data")
+
+# Stroke distance bucket edges in pixels: [0,12) [12,40) [40,120) [120,360) [360,inf)
+BUCKET_EDGES = (12.0, 40.0, 120.0, 360.0)
+PROGRESS_POINTS = 17  # resolution of the fitted mean progress curve
+POOL_SIZE = 32  # pre-generated unit paths per bucket
+MIN_STROKES_PER_BUCKET = 5
+
+# Fallbacks matching the previous hand-written movement timings (seconds)
+DEFAULT_DURATIONS = {
+    0: (0.015, 0.05),
+    1: (0.06, 0.12),
+    2: (0.10, 0.16),
+    3: (0.16, 0.26),
+    4: (0.22, 0.34),
+}
+DEFAULT_DT = 1.0 / 240.0
+DEFAULT_LATERAL = 0.04  # max lateral offset as a fraction of distance
+
+
+def bucket_for(distance: float) -> int:
+    return int(np.searchsorted(BUCKET_EDGES, distance, side="right"))
+
+
+def min_jerk(tau: np.ndarray) -> np.ndarray:
+    """Minimum-jerk position profile s(tau) for tau in [0, 1]."""
+    return tau ** 3 * (10.0 - 15.0 * tau + 6.0 * tau ** 2)
+
+
+def load_move_events(paths: Sequence[str]) -> List[np.ndarray]:
+    """Load move events of each profile file as an array of (t, x, y) rows."""
+    runs = []
+    for path in paths:
+        rows = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    ev = json.loads(line)
+                except Exception:
+                    continue
+                if ev.get("type") == "move":
+                    rows.append((float(ev["t"]), float(ev["x"]), float(ev["y"])))
+        if len(rows) > 2:
+            arr = np.array(rows, dtype=np.float64)
+            runs.append(arr[np.argsort(arr[:, 0])])
+    return runs
+
+
+class MousePathModel:
+    def __init__(self, rng: Optional[np.random.Generator] = None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        n_buckets = len(BUCKET_EDGES) + 1
+        self.durations: Dict[int, np.ndarray] = {}
+        self.laterals: Dict[int, np.ndarray] = {}
+        self.progress_curves: Dict[int, np.ndarray] = {}
+        self.dts = np.array([DEFAULT_DT])
+        self.micro_steps = np.array([1, 1, 2, 2, 2, 3, 3, 3, 4, 5])
+        self.n_strokes = 0
+        self.source_files: List[str] = []
+        self._pools = {b: deque() for b in range(n_buckets)}
+        self._lock = threading.Lock()
+        self._refilling = set()  # buckets with a refill thread in flight
+
+    # --- Construction ---
+    @classmethod
+    def default(cls, rng=None) -> "MousePathModel":
+        return cls(rng=rng)
+
+    @classmethod
+    def from_profiles(cls, data_dir: str = DATA_DIR, rng=None) -> "MousePathModel":
+        model = cls(rng=rng)
+        files = sorted(
+            p for p in glob.glob(os.path.join(data_dir, "mouse_profile_*.jsonl"))
+        )
+        if files:
+            model.fit(load_move_events(files))
+            model.source_files = files
+        return model
+
+    def fit(self, runs: Sequence[np.ndarray]):
+        """Fit distributions from arrays of (t, x, y) move samples."""
+        strokes_by_bucket: Dict[int, List[Tuple[float, float, np.ndarray]]] = {}
+        moving_dts = []
+        micro = []
+        for arr in runs:
+            t, x, y = arr[:, 0], arr[:, 1], arr[:, 2]
+            dt = np.diff(t)
+            step = np.hypot(np.diff(x), np.diff(y))
+            moving = step > 0
+            moving_dts.append(dt[moving])
+            micro.append(step[moving])
+
+            # Runs of consecutive moving steps are strokes
+            edges = np.diff(np.concatenate(([0], moving.astype(np.int8), [0])))
+            starts = np.nonzero(edges == 1)[0]
+            ends = np.nonzero(edges == -1)[0]  # exclusive step index
+            for s, e in zip(starts, ends):
+                p0 = np.array([x[s], y[s]])
+                p1 = np.array([x[e], y[e]])
+                chord = p1 - p0
+                dist = float(np.hypot(*chord))
+                if dist < 2.0 or e - s < 2:
+                    continue
+                duration = float(t[e] - t[s])
+                if duration <= 0:
+                    continue
+                pts = np.stack([x[s:e + 1], y[s:e + 1]], axis=1) - p0
+                unit = chord / dist
+                perp = np.array([-unit[1], unit[0]])
+                progress = pts @ unit / dist
+                lateral = pts @ perp / dist
+                tau = (t[s:e + 1] - t[s]) / duration
+                curve = np.interp(np.linspace(0.0, 1.0, PROGRESS_POINTS), tau, progress)
+                lat = float(lateral[np.argmax(np.abs(lateral))])
+                strokes_by_bucket.setdefault(bucket_for(dist), []).append((duration, lat, curve))
+
+        if moving_dts:
+            dts = np.concatenate(moving_dts)
+            dts = dts[(dts > 0) & (dts < 0.05)]
+            if dts.size:
+                self.dts = dts
+        if micro:
+            steps = np.concatenate(micro)
+            steps = np.rint(steps[(steps > 0) & (steps <= 6.0)]).astype(int)
+            if steps.size:
+                self.micro_steps = np.maximum(1, steps)
+
+        self.n_strokes = 0
+        for b, strokes in strokes_by_bucket.items():
+            self.n_strokes += len(strokes)
+            if len(strokes) < MIN_STROKES_PER_BUCKET:
+                continue
+            self.durations[b] = np.array([s[0] for s in strokes])
+            self.laterals[b] = np.array([s[1] for s in strokes])
+            self.progress_curves[b] = np.mean(np.stack([s[2] for s in strokes]), axis=0)
+        with self._lock:
+            for pool in self._pools.values():
+                pool.clear()
+
+    # --- Sampling ---
+    def _sample_duration(self, b: int) -> float:
+        fitted = self.durations.get(b)
+        if fitted is not None:
+            return float(self.rng.choice(fitted) * self.rng.uniform(0.9, 1.1))
+        lo, hi = DEFAULT_DURATIONS[b]
+        return float(self.rng.uniform(lo, hi))
+
+    def _sample_lateral(self, b: int) -> float:
+        fitted = self.laterals.get(b)
+        if fitted is not None:
+            return float(self.rng.choice(fitted) * self.rng.choice((-1.0, 1.0)))
+        return float(self.rng.uniform(-DEFAULT_LATERAL, DEFAULT_LATERAL))
+
+    def sample_micro_step(self) -> int:
+        return int(self.rng.choice(self.micro_steps))
+
+    def generate_unit(self, b: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """One whole path in the unit frame: (progress[N], lateral[N], dts[N])."""
+        duration = self._sample_duration(b)
+        # Draw enough dt samples at once, then cut at the duration
+        n_max = int(duration / max(1e-4, float(self.dts.min()))) + 2
+        dts = self.rng.choice(self.dts, size=max(2, n_max))
+        t = np.cumsum(dts)
+        n = int(np.searchsorted(t, duration)) + 1
+        dts = dts[:n].copy()
+        dts[-1] = max(0.0, duration - (t[n - 2] if n > 1 else 0.0))
+        tau = np.clip(np.cumsum(dts) / duration, 0.0, 1.0)
+
+        base = min_jerk(tau)
+        curve = self.progress_curves.get(b)
+        if curve is not None:
+            fitted = np.interp(tau, np.linspace(0.0, 1.0, PROGRESS_POINTS), curve)
+            base = 0.5 * base + 0.5 * fitted
+        progress = np.maximum.accumulate(base)
+
+        lateral = self._sample_lateral(b) * np.sin(np.pi * np.clip(progress, 0.0, 1.0))
+        # Hand tremor: small smoothed noise that fades out at the target
+        noise = np.cumsum(self.rng.normal(0.0, 0.004, size=n)) * (1.0 - tau)
+        lateral = lateral + noise
+
+        progress[-1] = 1.0
+        lateral[-1] = 0.0
+        return progress, lateral, dts
+
+    def _refill(self, b: int, count: int = POOL_SIZE):
+        try:
+            fresh = [self.generate_unit(b) for _ in range(count)]
+            with self._lock:
+                self._pools[b].extend(fresh)
+        finally:
+            with self._lock:
+                self._refilling.discard(b)
+
+    def prewarm(self):
+        """Fill every bucket pool (call once at start-up, off the hot path)."""
+        for b in self._pools:
+            self._refill(b)
+
+    def path(self, start: Tuple[float, float], end: Tuple[float, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Trajectory from start to end: (points[N, 2] in screen px, dts[N] seconds)."""
+        p0 = np.asarray(start, dtype=np.float64)
+        p1 = np.asarray(end, dtype=np.float64)
+        chord = p1 - p0
+        dist = float(np.hypot(*chord))
+        if dist < 1.0:
+            return p1.reshape(1, 2), np.array([0.0])
+        b = bucket_for(dist)
+        with self._lock:
+            pool = self._pools[b]
+            unit_path = pool.popleft() if pool else None
+            # At most one refill per bucket: later calls see the flag and skip
+            low = len(pool) < POOL_SIZE // 4 and b not in self._refilling
+            if low:
+                self._refilling.add(b)
+        if unit_path is None:
+            unit_path = self.generate_unit(b)
+        if low:
+            threading.Thread(target=self._refill, args=(b,), daemon=True).start()
+
+        progress, lateral, dts = unit_path
+        perp = np.array([-chord[1], chord[0]])
+        points = p0 + np.outer(progress, chord) + np.outer(lateral, perp)
+        return points, dts
+
+    def summary(self) -> dict:
+        out = {"files": len(self.source_files), "strokes": self.n_strokes,
+               "dt_ms_p50": float(np.median(self.dts) * 1000.0), "buckets": {}}
+        for b in sorted(self.durations):
+            d = self.durations[b]
+            out["buckets"][b] = {
+                "strokes": int(d.size),
+                "duration_ms_p50": float(np.median(d) * 1000.0),
+                "lateral_p90": float(np.percentile(np.abs(self.laterals[b]), 90)),
+            }
+        return out
+
+
+_model: Optional[MousePathModel] = None
+_model_lock = threading.Lock()
+
+
+def get_mouse_path_model(data_dir: str = DATA_DIR) -> MousePathModel:
+    """Get the shared model, fitted from recorded profiles on first use."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = MousePathModel.from_profiles(data_dir)
+            _model.prewarm()
+        return _model
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    model = MousePathModel.from_profiles()
+    fit_ms = (time.perf_counter() - start) * 1000.0
+    print(f"🧠 Fitted mouse path model in {fit_ms:.1f} ms")
+    print(json.dumps(model.summary(), indent=2))
+    model.prewarm()
+    start = time.perf_counter()
+    for _ in range(1000):
+        model.path((100, 100), (400, 250))
+    per_path_us = (time.perf_counter() - start) / 1000 * 1e6
+    pts, dts = model.path((100, 100), (400, 250))
+    print(f"⚡ {per_path_us:.0f} µs per pooled path ({len(pts)} points over {dts.sum() * 1000:.0f} ms)")
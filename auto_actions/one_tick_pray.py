@@ -10,6 +10,10 @@ Hotkeys:
 
 Default timings target ~1 tick (~600–620 ms) on typical servers.
 Requires quick-prayer orb calibration (run qp_calibrate.py).
+
+Flicks are scheduled at absolute deadlines on the input scheduler thread
+(see input_scheduler.py), so the cadence does not drift with capture or
+movement time and the achieved timing error is reported on exit.
 """
 
 import os
@@ -23,6 +27,7 @@ sys.path.append(CURRENT_DIR)
 try:
     from pynput import keyboard
     from funcs import AutoActionFunctions
+    from input_scheduler import get_input_scheduler, now, precise_sleep_until
 except Exception as e:
     print(f"❌ Import error: {e}")
     sys.exit(1)
@@ -77,12 +82,41 @@ def main():
     tick_ms = 616
     settle_min, settle_max = 80, 120
 
+    sched = get_input_scheduler()
+    next_on = None  # absolute deadline (perf_counter s) of the next ON press
+
     try:
         while not STOP:
             if PAUSED:
+                next_on = None
                 time.sleep(0.05)
                 continue
 
+            if funcs.qp_center:
+                if next_on is None:
+                    next_on = now() + 0.4  # leave room to pre-position the cursor
+                plan = funcs.pray_tick_at(
+                    next_on,
+                    min_gap_ms=70,
+                    max_gap_ms=100,
+                    hold_on_ms_min=70,
+                    hold_on_ms_max=100,
+                    hold_off_ms_min=70,
+                    hold_off_ms_max=100,
+                    scheduler=sched,
+                )
+                if plan is None:
+                    next_on = None
+                    time.sleep(0.05)
+                    continue
+                # Advance from the deadline itself so the cadence never drifts; light jitter
+                next_on += (tick_ms + random.uniform(-12.0, 12.0)) / 1000.0
+                # Wake up once this flick is done, leaving the settle window before the next ON
+                settle = random.uniform(settle_min, settle_max) / 1000.0
+                wake = max(plan["off_up"] + 0.005, next_on - settle - 0.06)
+                precise_sleep_until(wake)
+                continue
+
             start = time.time()
 
             # Tick-aware flick with randomized in-orb points and held left-clicks
@@ -106,6 +140,7 @@ def main():
 
     finally:
         listener.stop()
+        sched.print_stats()
         print("👋 Exiting flicker")
 
 
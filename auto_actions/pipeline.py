@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Capture → Detect → Decide → Act Pipeline
+
+Runs the four phases of a bot loop on their own threads, connected by small
+bounded queues, so detection of frame N+1 overlaps with the input actions
+for frame N instead of everything being serialized in one while-loop.
+
+Stages:
+- capture: calls capture_fn() as fast as allowed (optional min interval, or
+           an adaptive capture_rate.CaptureRate)
+- detect:  runs every detector on the frame in a thread pool; OpenCV
+           releases the GIL, so independent detectors run in parallel
+- decide:  decide_fn(packet) turns detector results into actions
+- act:     runs the returned actions (callables) one at a time
+
+Backpressure: the frame queues hold at most `queue_size` items and drop the
+OLDEST item when full, and stages discard packets older than `max_age_s`.
+A slow stage therefore never builds up a backlog of outdated frames; it
+always works on the newest one. Drops are counted per stage.
+
+Actions are never dropped from the act queue: decide_fn has usually updated
+its own state for them already (e.g. "prayer is on now"). Stale actions are
+still skipped unless wrapped in must_run(), which state-changing inputs such
+as toggles should be; must_run actions still queued at stop() run before the
+act stage exits.
+
+A packet is a dict:
+    - seq (int): capture sequence number
+    - t_capture (float): perf_counter() when the frame was captured
+    - frame: the captured image
+    - results (dict): detector name -> return value (set by detect stage)
+
+Usage:
+    pipe = Pipeline(
+        capture_screen,
+        detectors={'crab': find_crab, 'digit': read_digit},
+        decide_fn=decide,
+    )
+    pipe.start()
+    while pipe.running and not STOP:
+        time.sleep(0.05)
+    pipe.stop()
+    pipe.print_stats()
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+
+class DropOldestQueue:
+    """Bounded FIFO that discards the oldest item instead of blocking the producer.
+
+    maxsize=None makes it unbounded (it never drops).
+    """
+
+    def __init__(self, maxsize: Optional[int] = 2):
+        self.maxsize = max(1, int(maxsize)) if maxsize is not None else None
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item) -> bool:
+        """Add an item; returns False if an older item had to be dropped."""
+        with self._cond:
+            dropped = False
+            while self.maxsize is not None and len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                dropped = True
+            self._items.append(item)
+            self._cond.notify()
+            return not dropped
+
+    def get(self, timeout: Optional[float] = None):
+        """Return the next item, or None on timeout / after close()."""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class StageStats:
+    """Throughput, busy time and drop counters for one stage."""
+
+    def __init__(self, name: str, history: int = 512):
+        self.name = name
+        self.count = 0
+        self.stale = 0
+        self.errors = 0
+        self.busy_ms: deque = deque(maxlen=history)
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, busy_s: float):
+        with self._lock:
+            self.count += 1
+            self.busy_ms.append(busy_s * 1000.0)
+
+    def summary(self, queue_dropped: int = 0) -> dict:
+        with self._lock:
+            busy = sorted(self.busy_ms)
+            elapsed = max(1e-6, time.perf_counter() - self.started)
+            n = len(busy)
+            return {
+                "count": self.count,
+                "per_s": self.count / elapsed,
+                "busy_p50_ms": busy[n // 2] if n else 0.0,
+                "busy_p99_ms": busy[min(n - 1, int(n * 0.99))] if n else 0.0,
+                "stale": self.stale,
+                "dropped": queue_dropped,
+                "errors": self.errors,
+            }
+
+
+class Pipeline:
+    def __init__(self, capture_fn: Callable[[], object], detectors: Dict[str, Callable[[object], object]],
+                 decide_fn: Callable[[dict], object], queue_size: int = 1, max_age_s: float = 0.25,
+                 capture_interval: float = 0.0, detect_workers: Optional[int] = None, name: str = "pipeline",
+                 timer: Optional[Callable[[str, float], None]] = None, rate=None):
+        """
+        Args:
+            capture_fn: Returns a frame (or None when capture failed).
+            detectors: name -> fn(frame); each runs on the detector thread pool.
+            decide_fn: fn(packet) -> None, a callable, or an iterable of callables
+                to run on the act stage. Runs on its own thread, so it may keep state.
+            queue_size: Capacity of each inter-stage queue (oldest dropped when full).
+            max_age_s: Packets older than this (since capture) are discarded.
+            capture_interval: Minimum seconds between captures (0 = as fast as possible).
+            detect_workers: Thread pool size (default: one per detector).
+            name: Used for thread names and stats output.
+            timer: Optional fn(stage, ms) also fed every stage / detector timing
+                (e.g. a metrics.Metrics object).
+            rate: Optional capture_rate.CaptureRate; paces captures instead of
+                capture_interval and counts them per state.
+        """
+        self.capture_fn = capture_fn
+        self.detectors = dict(detectors)
+        self.decide_fn = decide_fn
+        self.max_age_s = max_age_s
+        self.capture_interval = capture_interval
+        self.name = name
+        self.detect_workers = detect_workers or max(1, len(self.detectors))
+        self.queue_size = queue_size
+        self.timer = timer
+        self.rate = rate
+
+        self._make_queues()
+        self.stats_by_stage = {s: StageStats(s) for s in ("capture", "detect", "decide", "act")}
+        self.end_to_end_ms: deque = deque(maxlen=512)
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._decide_thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._seq = 0
+        self.last_packet: Optional[dict] = None
+
+    # --- Lifecycle ---
+    def _make_queues(self):
+        self.detect_q = DropOldestQueue(self.queue_size)
+        self.decide_q = DropOldestQueue(self.queue_size)
+        self.act_q = DropOldestQueue(None)  # lossless, see module docstring
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads) and not self._stop.is_set()
+
+    def start(self) -> "Pipeline":
+        if self._threads:
+            return self
+        self._stop.clear()
+        self._make_queues()  # queues are closed by a previous stop()
+        self._pool = ThreadPoolExecutor(max_workers=self.detect_workers, thread_name_prefix=f"{self.name}-detect")
+        for stage, target in (("capture", self._capture_loop), ("detect", self._detect_loop),
+                              ("decide", self._decide_loop), ("act", self._act_loop)):
+            t = threading.Thread(target=target, name=f"{self.name}-{stage}", daemon=True)
+            if stage == "decide":
+                self._decide_thread = t
+            self._threads.append(t)
+            t.start()
+        return self
+
+    def request_stop(self):
+        """Ask all stages to stop (safe to call from inside decide_fn or an action)."""
+        self._stop.set()
+        for q in (self.detect_q, self.decide_q, self.act_q):
+            q.close()
+
+    def stop(self, timeout: float = 1.0):
+        self.request_stop()
+        current = threading.current_thread()
+        for t in self._threads:
+            if t is not current:
+                t.join(timeout=timeout)
+        self._threads = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _record(self, stats: StageStats, busy_s: float):
+        stats.record(busy_s)
+        if self.timer is not None:
+            self.timer(stats.name, busy_s * 1000.0)
+
+    def _run_detector(self, name: str, fn, frame):
+        t0 = time.perf_counter()
+        try:
+            return fn(frame)
+        finally:
+            self.timer(f"detect:{name}", (time.perf_counter() - t0) * 1000.0)
+
+    def _is_stale(self, packet: dict) -> bool:
+        return time.perf_counter() - packet["t_capture"] > self.max_age_s
+
+    # --- Stages ---
+    def _capture_loop(self):
+        stats = self.stats_by_stage["capture"]
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                frame = self.capture_fn()
+            except Exception as e:
+                stats.errors += 1
+                print(f"⚠️ [{self.name}] capture failed: {e}")
+                frame = None
+            t1 = time.perf_counter()
+            if frame is None:
+                self._stop.wait(0.02)
+                continue
+            self._record(stats, t1 - t0)
+            self._seq += 1
+            self.detect_q.put({"seq": self._seq, "t_capture": t1, "frame": frame, "results": {}})
+            if self.rate is not None:
+                self.rate.frame()
+                self.rate.wait(started=t0, stop=self._stop)
+            elif self.capture_interval > 0:
+                self._stop.wait(max(0.0, self.capture_interval - (time.perf_counter() - t0)))
+
+    def _detect_loop(self):
+        stats = self.stats_by_stage["detect"]
+        while not self._stop.is_set():
+            packet = self.detect_q.get(timeout=0.1)
+            if packet is None:
+                continue
+            if self._is_stale(packet):
+                stats.stale += 1
+                continue
+            t0 = time.perf_counter()
+            frame = packet["frame"]
+            if self.timer is not None:
+                futures = {name: self._pool.submit(self._run_detector, name, fn, frame)
+                           for name, fn in self.detectors.items()}
+            else:
+                futures = {name: self._pool.submit(fn, frame) for name, fn in self.detectors.items()}
+            for name, fut in futures.items():
+                try:
+                    packet["results"][name] = fut.result()
+                except Exception as e:
+                    stats.errors += 1
+                    packet["results"][name] = None
+                    print(f"⚠️ [{self.name}] detector '{name}' failed: {e}")
+            self._record(stats, time.perf_counter() - t0)
+            self.decide_q.put(packet)
+
+    def _decide_loop(self):
+        stats = self.stats_by_stage["decide"]
+        while not self._stop.is_set():
+            packet = self.decide_q.get(timeout=0.1)
+            if packet is None:
+                continue
+            if self._is_stale(packet):
+                stats.stale += 1
+                continue
+            t0 = time.perf_counter()
+            self.last_packet = packet
+            try:
+                actions = self.decide_fn(packet)
+            except Exception as e:
+                stats.errors += 1
+                print(f"⚠️ [{self.name}] decide failed: {e}")
+                actions = None
+            self._record(stats, time.perf_counter() - t0)
+            if actions is None:
+                continue
+            if callable(actions):
+                actions = (actions,)
+            for action in actions:
+                self.act_q.put((packet["t_capture"], action))
+
+    def _act_loop(self):
+        stats = self.stats_by_stage["act"]
+        while not self._stop.is_set():
+            item = self.act_q.get(timeout=0.1)
+            if item is None:
+                continue
+            t_capture, action = item
+            if time.perf_counter() - t_capture > self.max_age_s and not getattr(action, "must_run", False):
+                stats.stale += 1
+                continue
+            self._run_action(stats, t_capture, action)
+
+        # Flush state-changing actions (e.g. the OFF toggle after an ON) once
+        # decide can no longer queue more; everything else is dropped
+        decide = self._decide_thread
+        if decide is not None and decide is not threading.current_thread():
+            decide.join(timeout=1.0)
+        while True:
+            item = self.act_q.get(timeout=0)
+            if item is None:
+                break
+            t_capture, action = item
+            if getattr(action, "must_run", False):
+                self._run_action(stats, t_capture, action)
+
+    def _run_action(self, stats: StageStats, t_capture: float, action):
+        t0 = time.perf_counter()
+        try:
+            action()
+        except Exception as e:
+            stats.errors += 1
+            print(f"⚠️ [{self.name}] action failed: {e}")
+        t1 = time.perf_counter()
+        self._record(stats, t1 - t0)
+        self.end_to_end_ms.append((t0 - t_capture) * 1000.0)
+        if self.timer is not None:
+            self.timer("capture_to_act", (t0 - t_capture) * 1000.0)
+
+    # --- Reporting ---
+    def stats(self) -> dict:
+        dropped = {"capture": 0, "detect": self.detect_q.dropped,
+                   "decide": self.decide_q.dropped, "act": self.act_q.dropped}
+        out = {stage: s.summary(dropped[stage]) for stage, s in self.stats_by_stage.items()}
+        lat = sorted(self.end_to_end_ms)
+        if lat:
+            out["capture_to_act_ms"] = {"p50": lat[len(lat) // 2], "p99": lat[min(len(lat) - 1, int(len(lat) * 0.99))]}
+        return out
+
+    def print_stats(self):
+        stats = self.stats()
+        for stage in ("capture", "detect", "decide", "act"):
+            s = stats[stage]
+            print(f"🧵 [{self.name}] {stage:<7} {s['per_s']:6.1f}/s  busy p50={s['busy_p50_ms']:.1f} ms "
+                  f"p99={s['busy_p99_ms']:.1f} ms  stale={s['stale']} dropped={s['dropped']} errors={s['errors']}")
+        if "capture_to_act_ms" in stats:
+            lat = stats["capture_to_act_ms"]
+            print(f"🧵 [{self.name}] capture→act p50={lat['p50']:.1f} ms p99={lat['p99']:.1f} ms")
+
+
+def must_run(action: Callable[[], object]) -> Callable[[], object]:
+    """Mark an action to run however late it is (state-changing inputs such as toggles)."""
+    def _run():
+        return action()
+    _run.must_run = True
+    return _run
+
+
+def run_actions(actions: Iterable[Callable[[], object]]):
+    """Helper for decide functions that want to run several actions in order as one unit."""
+    actions = list(actions)
+
+    def _run():
+        for action in actions:
+            action()
+    return _run
+
+
+if __name__ == "__main__":
+    # Self-check with a synthetic 60 fps source and a slow detector
+    import random
+
+    def fake_capture():
+        time.sleep(1 / 60)
+        return random.random()
+
+    def slow_detector(frame):
+        time.sleep(0.03)
+        return frame > 0.5
+
+    def fast_detector(frame):
+        return frame
+
+    hits = []
+    pipe = Pipeline(fake_capture, {"slow": slow_detector, "fast": fast_detector},
+                    decide_fn=lambda p: (lambda: hits.append(p["seq"])) if p["results"]["slow"] else None,
+                    name="selftest")
+    pipe.start()
+    time.sleep(2.0)
+    pipe.stop()
+    pipe.print_stats()
+    print(f"✅ {len(hits)} actions executed")
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Hotkey Sampling Profiler
+
+Profiles a bot while it runs, at the moment it gets slow, without restarting
+it under a profiler. A daemon thread samples every thread's Python stack
+(sys._current_frames) at a fixed interval and counts identical stacks; the
+bot's threads are never traced, so the overhead is one stack walk per
+sample (~1-2% at the default 5 ms interval).
+
+On stop the samples are written in collapsed-stack format under
+data/profiles/<app>-<timestamp>.folded, one "thread;frame;frame... count"
+line per stack. Open it with speedscope.app, or render it with
+flamegraph.pl / inferno-flamegraph.
+
+Runs are time-boxed (max_s, default 30 s) so a forgotten profiler stops by
+itself. cProfile is not offered: it only traces the thread that enables it,
+and the hotkey fires on the pynput listener thread, not the bot's loop.
+
+Usage:
+    profiler = get_profiler("alch_crab")
+    profiler.toggle()        # bind to the 'k' hotkey: start / stop + write
+
+    with SamplingProfiler("bench").running():
+        work()
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+PROFILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "profiles")
+DEFAULT_INTERVAL_S = 0.005
+DEFAULT_MAX_S = 30.0
+MAX_DEPTH = 128
+
+
+def _frame_label(code) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}:{code.co_firstlineno}"
+
+
+class SamplingProfiler:
+    def __init__(self, app: str, interval_s: float = DEFAULT_INTERVAL_S, max_s: float = DEFAULT_MAX_S,
+                 out_dir: str = PROFILES_DIR, include_idle: bool = False):
+        """
+        Args:
+            app: Used in the output file name.
+            interval_s: Time between samples.
+            max_s: Stop (and write) automatically after this long.
+            out_dir: Where .folded files are written.
+            include_idle: Keep samples of threads parked in Event.wait()/Queue.get()
+                (time.sleep() is C code and cannot be told apart from work).
+        """
+        self.app = app
+        self.interval_s = interval_s
+        self.max_s = max_s
+        self.out_dir = out_dir
+        self.include_idle = include_idle
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.last_path: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._started_at = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _sample_once(self, names: Dict[int, str], own_id: int):
+        for tid, frame in sys._current_frames().items():
+            if tid == own_id:
+                continue
+            stack = []
+            depth = 0
+            while frame is not None and depth < MAX_DEPTH:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+                depth += 1
+            if not stack:
+                continue
+            if not self.include_idle and stack[0].split(":")[1] in ("wait", "get", "select", "_wait_for_tstate_lock"):
+                continue
+            stack.append(names.get(tid, f"thread-{tid}"))
+            self.samples[";".join(reversed(stack))] += 1
+        self.sample_count += 1
+
+    def _run(self):
+        own_id = threading.get_ident()
+        deadline = time.perf_counter() + self.max_s
+        names: Dict[int, str] = {}
+        next_names = 0.0
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            if now >= deadline:
+                print(f"⏱️ Profiler time box ({self.max_s:.0f}s) reached")
+                break
+            if now >= next_names:  # thread names rarely change; refresh once a second
+                names = {t.ident: t.name for t in threading.enumerate()}
+                next_names = now + 1.0
+            self._sample_once(names, own_id)
+            self._stop.wait(self.interval_s)
+        self._finish()
+
+    def start(self) -> bool:
+        with self._lock:
+            if self.active:
+                return False
+            self.samples = Counter()
+            self.sample_count = 0
+            self._stop.clear()
+            self._started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        print(f"🔬 Profiler started ({self.interval_s * 1000:.0f} ms interval, max {self.max_s:.0f}s)")
+        return True
+
+    def stop(self) -> Optional[str]:
+        """Stop sampling and return the path of the written profile."""
+        thread = self._thread
+        if thread is None:
+            return None
+        self._stop.set()
+        if thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+        return self.last_path
+
+    def toggle(self) -> Optional[str]:
+        if self.active:
+            return self.stop()
+        self.start()
+        return None
+
+    def _finish(self):
+        elapsed = time.perf_counter() - self._started_at
+        try:
+            self.last_path = self.write()
+            print(f"🔬 Profiler stopped: {self.sample_count} samples in {elapsed:.1f}s → {self.last_path}")
+            for stack, count in self.samples.most_common(3):
+                leaf = stack.rsplit(";", 1)[-1]
+                print(f"   🔥 {count / max(1, self.sample_count) * 100:5.1f}%  {leaf}")
+        except Exception as e:
+            print(f"⚠️ Failed to write profile: {e}")
+        finally:
+            self._thread = None
+
+    def write(self, path: Optional[str] = None) -> str:
+        os.makedirs(self.out_dir, exist_ok=True)
+        if path is None:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(self.out_dir, f"{self.app}-{stamp}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        return path
+
+    @contextmanager
+    def running(self):
+        self.start()
+        try:
+            yield self
+        finally:
+            self.stop()
+
+
+_profilers: Dict[str, SamplingProfiler] = {}
+
+
+def get_profiler(app: str, **kwargs) -> SamplingProfiler:
+    if app not in _profilers:
+        _profilers[app] = SamplingProfiler(app, **kwargs)
+    return _profilers[app]
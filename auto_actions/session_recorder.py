@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+Session Recorder
+
+Records what a bot saw and did - frames, detection results and input
+events - on one time.perf_counter() timeline, so a slowdown or misclick
+from a real session can be replayed offline through the real detectors.
+
+Archive layout (data/recordings/<app>-<timestamp>/):
+    index.json          app, frame format, chunk list, drop counters
+    chunk-00000.rec     records: kind, t, length, payload
+    chunk-00001.rec     ...
+
+Frames are stored as a keyframe (lossless PNG) followed by tile diffs:
+only the 32x32 tiles that changed since the previously stored frame are
+written, zlib-compressed. Every chunk starts with a keyframe, so chunks
+decode on their own and old ones can be deleted. Events are small JSON
+records. Pixels round-trip exactly, so detectors see identical input on
+replay.
+
+The hot loop only copies the frame into a bounded queue; diffing and
+compression run on a background thread. Disk bandwidth is bounded by a
+token bucket (max_mb_s): frames that would exceed it are dropped and
+counted, events never are. Total size is capped (max_total_mb) by
+deleting the oldest chunks.
+
+Usage:
+    recorder = get_recorder("alch_crab")
+    recorder.start()                       # or the 'r' hotkey / AUTO_RECORD=1
+    recorder.frame(frame)                  # after each capture
+    recorder.detections(results, state="find_darts")
+    recorder.input("click", x=x, y=y)
+    recorder.stop()
+
+    python session_recorder.py info data/recordings/alch_crab-20250101-120000
+    python session_recorder.py replay data/recordings/alch_crab-... --detectors alch_crab --profile
+
+Exported:
+- SessionRecorder, SessionArchive
+- get_recorder(app), recording_enabled()
+- replay(archive, detect_fn) -> dict
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recordings")
+MAGIC = b"OSRC"
+VERSION = 1
+TILE = 32
+KEYFRAME_EVERY = 120
+DEFAULT_MAX_FPS = 10.0
+DEFAULT_MAX_MB_S = 4.0
+DEFAULT_CHUNK_S = 60.0
+DEFAULT_MAX_TOTAL_MB = 2048.0
+QUEUE_FRAMES = 8
+
+KIND_KEYFRAME = 1
+KIND_DIFF = 2
+KIND_EVENT = 3
+
+_FILE_HEADER = struct.Struct("<4sI")
+_RECORD = struct.Struct("<BdI")  # kind, perf_counter time, payload length
+_DIFF_HEADER = struct.Struct("<HHBHI")  # height, width, channels, tile, changed tiles
+
+
+def recording_enabled() -> bool:
+    return os.environ.get("AUTO_RECORD", "").strip().lower() not in ("", "0", "false", "no")
+
+
+def _jsonable(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+
+# --- Frame codec ---
+def _padded(frame: np.ndarray, tile: int) -> np.ndarray:
+    h, w = frame.shape[:2]
+    ph, pw = -h % tile, -w % tile
+    if not ph and not pw:
+        return frame
+    return np.pad(frame, ((0, ph), (0, pw), (0, 0)))
+
+
+def _tiles(padded: np.ndarray, tile: int) -> np.ndarray:
+    """(rows, cols, tile, tile, c) view of a padded frame."""
+    h, w, c = padded.shape
+    return padded.reshape(h // tile, tile, w // tile, tile, c).swapaxes(1, 2)
+
+
+def encode_keyframe(frame: np.ndarray) -> bytes:
+    ok, buf = cv2.imencode(".png", frame, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if not ok:
+        raise ValueError("PNG encoding failed")
+    return buf.tobytes()
+
+
+def decode_keyframe(payload: bytes) -> np.ndarray:
+    frame = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_UNCHANGED)
+    if frame is None:
+        raise ValueError("Corrupt keyframe")
+    return frame if frame.ndim == 3 else frame[:, :, None]
+
+
+def encode_diff(prev: np.ndarray, frame: np.ndarray, tile: int = TILE) -> Optional[bytes]:
+    """Tile diff of `frame` against `prev` (same shape), or None if nothing changed."""
+    a, b = _padded(prev, tile), _padded(frame, tile)
+    changed = np.any(a != b, axis=2)
+    rows, cols = a.shape[0] // tile, a.shape[1] // tile
+    changed = changed.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+    idx = np.flatnonzero(changed).astype(np.uint32)
+    if not len(idx):
+        return None
+    data = _tiles(b, tile).reshape(rows * cols, tile, tile, b.shape[2])[idx]
+    h, w = frame.shape[:2]
+    header = _DIFF_HEADER.pack(h, w, frame.shape[2], tile, len(idx))
+    return header + idx.tobytes() + zlib.compress(np.ascontiguousarray(data).tobytes(), 1)
+
+
+def apply_diff(canvas: np.ndarray, payload: bytes) -> np.ndarray:
+    """Apply a diff to the padded `canvas` in place; returns the visible frame."""
+    h, w, c, tile, n = _DIFF_HEADER.unpack_from(payload, 0)
+    off = _DIFF_HEADER.size
+    idx = np.frombuffer(payload, np.uint32, count=n, offset=off)
+    data = np.frombuffer(zlib.decompress(payload[off + 4 * n:]), np.uint8).reshape(n, tile, tile, c)
+    cols = canvas.shape[1] // tile
+    _tiles(canvas, tile)[idx // cols, idx % cols] = data
+    return canvas[:h, :w]
+
+
+# --- Recorder ---
+class SessionRecorder:
+    def __init__(self, app: str, out_dir: str = RECORDINGS_DIR, max_fps: float = DEFAULT_MAX_FPS,
+                 max_mb_s: float = DEFAULT_MAX_MB_S, chunk_s: float = DEFAULT_CHUNK_S,
+                 max_total_mb: float = DEFAULT_MAX_TOTAL_MB, keyframe_every: int = KEYFRAME_EVERY):
+        """
+        Args:
+            app: Used in the archive directory name.
+            out_dir: Parent directory for archives.
+            max_fps: Frames offered faster than this are skipped in the hot loop.
+            max_mb_s: Average disk bandwidth for frames (token bucket).
+            chunk_s: Start a new chunk (with a keyframe) this often.
+            max_total_mb: Delete the oldest chunks beyond this size.
+            keyframe_every: Stored frames between keyframes within a chunk.
+        """
+        self.app = app
+        self.out_dir = out_dir
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.max_bytes_s = max_mb_s * 1024 * 1024
+        self.chunk_s = chunk_s
+        self.max_total_bytes = max_total_mb * 1024 * 1024
+        self.keyframe_every = keyframe_every
+
+        self.active = False
+        self.path: Optional[str] = None
+        self._queue: Optional[queue.Queue] = None
+        self._pending_frames = 0
+        self._writer_state: Optional[_ArchiveWriter] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._last_offer = 0.0
+        self._last_frame_t: Optional[float] = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.frames_offered = 0
+        self.frames_written = 0
+        self.keyframes = 0
+        self.events_written = 0
+        self.dropped_rate = 0      # skipped by max_fps
+        self.dropped_queue = 0     # writer behind
+        self.dropped_bandwidth = 0  # over max_mb_s
+        self.bytes_written = 0
+
+    # --- Hot-loop API ---
+    def frame(self, frame: np.ndarray, t: Optional[float] = None):
+        """Offer a captured BGR frame (copied; cheap no-op when not recording)."""
+        if not self.active or frame is None:
+            return
+        t = time.perf_counter() if t is None else t
+        self.frames_offered += 1
+        self._last_frame_t = None  # detections on an unrecorded frame are not linked to one
+        if t - self._last_offer < self.min_interval:
+            self.dropped_rate += 1
+            return
+        if self._pending_frames >= QUEUE_FRAMES:
+            self.dropped_queue += 1
+            return
+        self._last_offer = t
+        if frame.ndim == 2:
+            frame = frame[:, :, None]
+        self._pending_frames += 1
+        self._queue.put((KIND_KEYFRAME, t, np.array(frame, copy=True)))
+        self._last_frame_t = t
+
+    def event(self, kind: str, t: Optional[float] = None, **fields):
+        if not self.active:
+            return
+        record = {"type": kind, "frame_t": self._last_frame_t}
+        record.update(fields)
+        # Events are tiny and never dropped; only frames count against QUEUE_FRAMES
+        self._queue.put((KIND_EVENT, time.perf_counter() if t is None else t, record))
+
+    def detections(self, results: Dict[str, object], **fields):
+        if self.active:
+            self.event("detections", results=results, **fields)
+
+    def input(self, action: str, **fields):
+        if self.active:
+            self.event("input", action=action, **fields)
+
+    # --- Control ---
+    def start(self, note: str = "") -> Optional[str]:
+        with self._lock:
+            if self.active:
+                return self.path
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            self.path = os.path.join(self.out_dir, f"{self.app}-{stamp}")
+            os.makedirs(self.path, exist_ok=True)
+            self._reset_stats()
+            self._queue = queue.Queue()
+            self._pending_frames = 0
+            self._writer_state = _ArchiveWriter(self, note)
+            self._thread = threading.Thread(target=self._writer_state.run, name=f"recorder-{self.app}", daemon=True)
+            self._thread.start()
+            self.active = True
+        print(f"🎥 Recording session → {self.path} (≤{self.max_bytes_s / 1048576:.1f} MB/s)")
+        return self.path
+
+    def stop(self) -> Optional[str]:
+        with self._lock:
+            if not self.active:
+                return None
+            self.active = False
+            self._queue.put(None)
+            self._thread.join(timeout=10.0)
+            self._thread = None
+        print(f"🎥 Recording stopped: {self.frames_written} frames ({self.keyframes} key), "
+              f"{self.events_written} events, {self.bytes_written / 1048576:.1f} MB | dropped: "
+              f"{self.dropped_rate} rate, {self.dropped_queue} queue, {self.dropped_bandwidth} bandwidth")
+        return self.path
+
+    def toggle(self) -> Optional[str]:
+        if self.active:
+            return self.stop()
+        return self.start()
+
+
+class _ArchiveWriter:
+    """Background half of SessionRecorder: diffing, compression, chunks, budget."""
+
+    def __init__(self, rec: SessionRecorder, note: str):
+        self.rec = rec
+        self.index = {
+            "app": rec.app, "version": VERSION, "tile": TILE, "note": note,
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "started_perf": time.perf_counter(), "chunks": [],
+        }
+        self.chunk = None
+        self.chunk_info = None
+        self.chunk_no = 0
+        self.prev: Optional[np.ndarray] = None
+        self.since_key = 0
+        self.tokens = rec.max_bytes_s  # one second of burst
+        self.last_refill = time.perf_counter()
+
+    def run(self):
+        q = self.rec._queue
+        try:
+            while True:
+                item = q.get()
+                if item is None:
+                    break
+                kind, t, payload = item
+                if self.chunk is None or t - self.chunk_info["t0"] >= self.rec.chunk_s:
+                    self._rotate(t)
+                if kind == KIND_EVENT:
+                    self._write(KIND_EVENT, t, json.dumps(payload, default=_jsonable).encode("utf-8"))
+                    self.rec.events_written += 1
+                else:
+                    self.rec._pending_frames -= 1
+                    self._frame(t, payload)
+        except Exception as e:
+            print(f"⚠️ Recorder stopped writing: {e}")
+            self.rec.active = False
+        finally:
+            self._close_chunk()
+            self._write_index()
+
+    def _frame(self, t: float, frame: np.ndarray):
+        now = time.perf_counter()
+        self.tokens = min(self.rec.max_bytes_s, self.tokens + (now - self.last_refill) * self.rec.max_bytes_s)
+        self.last_refill = now
+        if self.tokens <= 0:
+            self.rec.dropped_bandwidth += 1
+            return
+        key = self.prev is None or self.prev.shape != frame.shape or self.since_key >= self.rec.keyframe_every
+        if key:
+            payload = encode_keyframe(frame)
+        else:
+            payload = encode_diff(self.prev, frame)
+            if payload is None:
+                payload = b""  # unchanged frame: still keeps its timestamp
+        # The bucket may go negative once (a keyframe larger than the burst); the average stays bounded
+        self.tokens -= len(payload) + _RECORD.size
+        self._write(KIND_KEYFRAME if key else KIND_DIFF, t, payload)
+        self.prev = frame
+        self.since_key = 0 if key else self.since_key + 1
+        self.rec.frames_written += 1
+        self.rec.keyframes += int(key)
+        self.chunk_info["frames"] += 1
+
+    def _write(self, kind: int, t: float, payload: bytes):
+        self.chunk.write(_RECORD.pack(kind, t, len(payload)))
+        self.chunk.write(payload)
+        n = _RECORD.size + len(payload)
+        self.chunk_info["bytes"] += n
+        self.chunk_info["t1"] = t
+        self.rec.bytes_written += n
+
+    def _rotate(self, t: float):
+        self._close_chunk()
+        name = f"chunk-{self.chunk_no:05d}.rec"
+        self.chunk_no += 1
+        self.chunk = open(os.path.join(self.rec.path, name), "wb")
+        self.chunk.write(_FILE_HEADER.pack(MAGIC, VERSION))
+        self.chunk_info = {"file": name, "t0": t, "t1": t, "frames": 0, "bytes": _FILE_HEADER.size}
+        self.index["chunks"].append(self.chunk_info)
+        self.prev = None  # each chunk starts with a keyframe
+        self._enforce_total()
+        self._write_index()
+
+    def _close_chunk(self):
+        if self.chunk is not None:
+            self.chunk.close()
+            self.chunk = None
+
+    def _enforce_total(self):
+        chunks = self.index["chunks"]
+        while len(chunks) > 1 and sum(c["bytes"] for c in chunks) > self.rec.max_total_bytes:
+            old = chunks.pop(0)
+            try:
+                os.remove(os.path.join(self.rec.path, old["file"]))
+            except OSError:
+                pass
+
+    def _write_index(self):
+        rec = self.rec
+        self.index["stats"] = {
+            "frames_offered": rec.frames_offered, "frames_written": rec.frames_written,
+            "keyframes": rec.keyframes, "events": rec.events_written, "bytes": rec.bytes_written,
+            "dropped_rate": rec.dropped_rate, "dropped_queue": rec.dropped_queue,
+            "dropped_bandwidth": rec.dropped_bandwidth,
+        }
+        path = os.path.join(rec.path, "index.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+
+_recorders: Dict[str, SessionRecorder] = {}
+
+
+def get_recorder(app: str, **kwargs) -> SessionRecorder:
+    if app not in _recorders:
+        _recorders[app] = SessionRecorder(app, **kwargs)
+    return _recorders[app]
+
+
+# --- Reading ---
+class SessionArchive:
+    def __init__(self, path: str):
+        self.path = path
+        index_path = os.path.join(path, "index.json")
+        self.index = {}
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        # Chunks on disk are the source of truth (the index may lag after a crash)
+        self.chunk_files = sorted(glob.glob(os.path.join(path, "chunk-*.rec")))
+        if not self.chunk_files:
+            raise FileNotFoundError(f"No chunks in {path}")
+
+    def _raw(self, chunk_path: str) -> Iterator[Tuple[int, float, bytes]]:
+        with open(chunk_path, "rb") as f:
+            head = f.read(_FILE_HEADER.size)
+            if len(head) < _FILE_HEADER.size or _FILE_HEADER.unpack(head)[0] != MAGIC:
+                raise ValueError(f"{chunk_path} is not a session chunk")
+            while True:
+                rh = f.read(_RECORD.size)
+                if len(rh) < _RECORD.size:
+                    return
+                kind, t, n = _RECORD.unpack(rh)
+                payload = f.read(n)
+                if len(payload) < n:
+                    return  # truncated tail of a chunk that was being written
+                yield kind, t, payload
+
+    def records(self) -> Iterator[Tuple[str, float, object]]:
+        """Yield ('frame', t, BGR ndarray) and ('event', t, dict) in recorded order.
+
+        Frames are views of one decode canvas; copy them to keep them.
+        """
+        for chunk_path in self.chunk_files:
+            canvas = None
+            frame = None
+            for kind, t, payload in self._raw(chunk_path):
+                if kind == KIND_EVENT:
+                    yield "event", t, json.loads(payload.decode("utf-8"))
+                elif kind == KIND_KEYFRAME:
+                    frame = decode_keyframe(payload)
+                    canvas = _padded(frame, TILE).copy()
+                    frame = canvas[:frame.shape[0], :frame.shape[1]]
+                    yield "frame", t, frame
+                elif kind == KIND_DIFF and canvas is not None:
+                    if payload:
+                        frame = apply_diff(canvas, payload)
+                    yield "frame", t, frame
+
+    def frames(self) -> Iterator[Tuple[float, np.ndarray]]:
+        for kind, t, item in self.records():
+            if kind == "frame":
+                yield t, item
+
+    def summary(self) -> dict:
+        counts: Dict[str, int] = {}
+        frames = keyframes = 0
+        size = 0
+        t_first = t_last = None
+        for chunk_path in self.chunk_files:
+            size += os.path.getsize(chunk_path)
+            for kind, t, payload in self._raw(chunk_path):
+                t_first = t if t_first is None else t_first
+                t_last = t
+                if kind == KIND_EVENT:
+                    event = json.loads(payload.decode("utf-8"))
+                    key = event.get("type", "?")
+                    if key == "input":
+                        key = f"input:{event.get('action', '?')}"
+                    counts[key] = counts.get(key, 0) + 1
+                else:
+                    frames += 1
+                    keyframes += int(kind == KIND_KEYFRAME)
+        duration = (t_last - t_first) if t_first is not None else 0.0
+        return {
+            "app": self.index.get("app"), "chunks": len(self.chunk_files), "duration_s": duration,
+            "frames": frames, "keyframes": keyframes, "events": counts, "bytes": size,
+            "mb_per_min": size / 1048576 / max(1e-9, duration / 60.0),
+            "dropped": {k: v for k, v in self.index.get("stats", {}).items() if k.startswith("dropped")},
+        }
+
+
+# --- Replay ---
+def _found(result) -> bool:
+    if isinstance(result, (list, tuple)) and len(result) == 2:
+        return result[0] is not None
+    return bool(result)
+
+
+def replay(archive: SessionArchive, detect_fn: Callable[[np.ndarray], Dict[str, object]],
+           realtime: bool = False, timer: Optional[Callable[[str, float], None]] = None,
+           on_frame: Optional[Callable[[float, np.ndarray, Dict[str, object]], None]] = None) -> dict:
+    """Run detect_fn over every recorded frame and compare with the recorded detections.
+
+    Returns counts, per-frame detect timings and the mismatches (recorded found/not
+    found differs from the replayed result for the same frame).
+    """
+    frames = 0
+    compared = 0
+    mismatches: List[dict] = []
+    detect_ms: List[float] = []
+    results: Dict[str, object] = {}
+    frame_t = None
+    start_wall = time.perf_counter()
+    first_t = None
+    for kind, t, item in archive.records():
+        if kind == "frame":
+            if realtime:
+                first_t = t if first_t is None else first_t
+                delay = (t - first_t) - (time.perf_counter() - start_wall)
+                if delay > 0:
+                    time.sleep(delay)
+            t0 = time.perf_counter()
+            results = detect_fn(item) or {}
+            ms = (time.perf_counter() - t0) * 1000.0
+            detect_ms.append(ms)
+            if timer is not None:
+                timer("replay:detect", ms)
+            frames += 1
+            frame_t = t
+            if on_frame is not None:
+                on_frame(t, item, results)
+        elif item.get("type") == "detections" and frame_t is not None and item.get("frame_t") == frame_t:
+            for name, recorded in (item.get("results") or {}).items():
+                if name not in results:
+                    continue
+                compared += 1
+                if _found(recorded) != _found(results[name]):
+                    mismatches.append({"t": t, "detector": name, "recorded": recorded,
+                                       "replayed": results[name], "state": item.get("state")})
+    detect_ms.sort()
+    n = len(detect_ms)
+    return {
+        "frames": frames,
+        "compared": compared,
+        "mismatches": mismatches,
+        "detect_p50_ms": detect_ms[n // 2] if n else 0.0,
+        "detect_p99_ms": detect_ms[min(n - 1, int(n * 0.99))] if n else 0.0,
+        "detect_max_ms": detect_ms[-1] if n else 0.0,
+    }
+
+
+def _alch_crab_detectors(timer):
+    """The AutoAlchCrabBot's registry with every detector active."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.append(root)
+    from auto_alch_crab_bot import AutoAlchCrabBot
+    bot = AutoAlchCrabBot()
+    if bot.ticks is not None:
+        bot.ticks.stop()
+        bot.ticks = None
+    bot.debug = False
+    bot.log.set_level("INFO")
+    if not bot.load_templates():
+        raise RuntimeError("AutoAlchCrabBot templates missing")
+    bot.detectors.timer = timer
+    names = list(bot.detectors.detectors)
+    return lambda frame: bot.detectors.run(frame, active=names)['results']
+
+
+DETECTOR_SETS = {
+    "alch_crab": _alch_crab_detectors,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay recorded bot sessions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="Summarize an archive")
+    info.add_argument("archive")
+    rp = sub.add_parser("replay", help="Run real detectors over the recorded frames")
+    rp.add_argument("archive")
+    rp.add_argument("--detectors", default="alch_crab", choices=sorted(DETECTOR_SETS))
+    rp.add_argument("--realtime", action="store_true", help="Pace frames at the recorded rate")
+    rp.add_argument("--profile", action="store_true", help="Sample stacks during the replay")
+    rp.add_argument("--dump", metavar="DIR", help="Write every replayed frame as PNG")
+    args = parser.parse_args()
+
+    archive = SessionArchive(args.archive)
+    if args.command == "info":
+        s = archive.summary()
+        print(f"🎥 {args.archive}")
+        print(f"   {s['duration_s']:.1f}s, {s['frames']} frames ({s['keyframes']} key) in {s['chunks']} chunks, "
+              f"{s['bytes'] / 1048576:.1f} MB ({s['mb_per_min']:.1f} MB/min)")
+        print(f"   Events: {s['events']}")
+        print(f"   Dropped while recording: {s['dropped']}")
+        return 0
+
+    from metrics import Metrics
+    from profiler import SamplingProfiler
+    metrics = Metrics(f"replay-{args.detectors}")
+    detect_fn = DETECTOR_SETS[args.detectors](metrics)
+
+    on_frame = None
+    if args.dump:
+        os.makedirs(args.dump, exist_ok=True)
+
+        def on_frame(t, frame, results):
+            cv2.imwrite(os.path.join(args.dump, f"{t:.3f}.png"), frame)
+
+    profiler = SamplingProfiler(f"replay-{args.detectors}", max_s=3600.0) if args.profile else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        result = replay(archive, detect_fn, realtime=args.realtime, timer=metrics, on_frame=on_frame)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+
+    print(f"🔁 Replayed {result['frames']} frames: detect p50={result['detect_p50_ms']:.1f} ms "
+          f"p99={result['detect_p99_ms']:.1f} ms max={result['detect_max_ms']:.1f} ms")
+    print(f"   {result['compared']} recorded detections compared, {len(result['mismatches'])} differ")
+    for m in result["mismatches"][:10]:
+        print(f"   ⚠️ t={m['t']:.3f} [{m['state']}] {m['detector']}: recorded {m['recorded']} → replayed {m['replayed']}")
+    metrics.print_stats()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Multi-Client Session Manager
+
+Drives several game client windows from one process instead of assuming a
+single client on the primary monitor.
+
+- discover_client_windows() finds client windows (Win32 EnumWindows, or
+  `wmctrl -lG` on Linux) and returns their screen rectangles.
+- Session: one client. Captures only its own window region, maps frame
+  coordinates to screen coordinates (per-session scale instead of global
+  SCALE_X/SCALE_Y), and keeps its own layout calibration and bot state.
+- SharedTemplates: templates / lookup tables are loaded once per process and
+  served to every session.
+- SessionManager: one coordinator thread plus one shared worker pool. Each
+  bot step returns the delay until it wants to run again; due sessions are
+  dispatched to the pool (at most one step in flight per session), so N
+  sessions cost one pool instead of N busy loops.
+- Input from all sessions goes through the shared InputScheduler, so there
+  is one cursor owner and actions run in deadline order across sessions.
+  Each submitted action (move + click, key press) runs atomically. A session
+  given an `input_q` (a supervisor worker) puts its actions on that queue
+  instead, for the owning process to run (see supervisor.py).
+
+Usage:
+    manager = SessionManager()
+    manager.discover()                          # or manager.add_session("alt", (x, y, w, h))
+    manager.run(lambda session: TickReader(session))
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from input_backend import get_input_backend
+from input_scheduler import get_input_scheduler, now
+
+try:
+    from mss import mss  # type: ignore
+except Exception:
+    mss = None
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TICKS_DIR = os.path.join(CURRENT_DIR, "ticks")
+SESSIONS_PATH = os.path.join(CURRENT_DIR, "data", "sessions.json")
+DEFAULT_TITLE_PATTERNS = ("RuneLite", "Old School RuneScape")
+
+Region = Tuple[int, int, int, int]
+
+
+# --- Input actions ---
+def input_action(backend, kind: str, args: tuple) -> Callable[[], None]:
+    """Build the action for a ('click', (x, y, button)) or ('press', (key,)) input request."""
+    if kind == "click":
+        x, y, button = args
+
+        def _click():
+            backend.move_to(x, y)
+            backend.click(button=button)
+        return _click
+    if kind == "press":
+        (key,) = args
+        return lambda: backend.press(key)
+    raise ValueError(f"unknown input kind {kind!r}")
+
+
+# --- Window discovery ---
+def _discover_win32(patterns) -> List[dict]:
+    import ctypes
+    from ctypes import wintypes
+
+    user32 = ctypes.windll.user32
+    found = []
+
+    @ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+    def _enum(hwnd, _lparam):
+        if not user32.IsWindowVisible(hwnd):
+            return True
+        length = user32.GetWindowTextLengthW(hwnd)
+        if length == 0:
+            return True
+        buf = ctypes.create_unicode_buffer(length + 1)
+        user32.GetWindowTextW(hwnd, buf, length + 1)
+        title = buf.value
+        if not any(p.lower() in title.lower() for p in patterns):
+            return True
+        rect = wintypes.RECT()
+        user32.GetClientRect(hwnd, ctypes.byref(rect))
+        origin = wintypes.POINT(0, 0)
+        user32.ClientToScreen(hwnd, ctypes.byref(origin))
+        w, h = rect.right - rect.left, rect.bottom - rect.top
+        if w > 0 and h > 0:
+            found.append({"title": title, "handle": int(hwnd), "region": (origin.x, origin.y, w, h)})
+        return True
+
+    user32.EnumWindows(_enum, 0)
+    return found
+
+
+def _discover_wmctrl(patterns) -> List[dict]:
+    try:
+        out = subprocess.run(["wmctrl", "-lG"], capture_output=True, text=True, timeout=2.0).stdout
+    except Exception:
+        return []
+    found = []
+    for line in out.splitlines():
+        # id desktop x y w h host title...
+        parts = line.split(None, 7)
+        if len(parts) < 8:
+            continue
+        title = parts[7]
+        if not any(p.lower() in title.lower() for p in patterns):
+            continue
+        x, y, w, h = (int(v) for v in parts[2:6])
+        found.append({"title": title, "handle": int(parts[0], 16), "region": (x, y, w, h)})
+    return found
+
+
+def discover_client_windows(patterns=DEFAULT_TITLE_PATTERNS) -> List[dict]:
+    """Return [{'title', 'handle', 'region': (x, y, w, h)}] for visible client windows."""
+    if sys.platform.startswith("win"):
+        return _discover_win32(patterns)
+    return _discover_wmctrl(patterns)
+
+
+# --- Shared templates ---
+class SharedTemplates:
+    """Process-wide cache: each template set is loaded once and shared by all sessions."""
+
+    def __init__(self):
+        self._items: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, loader: Callable[[], object]):
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = loader()
+            return self._items[key]
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._items[key] = value
+
+    def keys(self):
+        with self._lock:
+            return list(self._items)
+
+
+_shared_templates = SharedTemplates()
+
+
+def get_shared_templates() -> SharedTemplates:
+    return _shared_templates
+
+
+# --- Session ---
+class Session:
+    def __init__(self, name: str, region: Region, scale: Tuple[float, float] = (1.0, 1.0),
+                 layout: Optional[dict] = None, title: str = "", input_q=None):
+        """
+        Args:
+            name: Session id (used for logs and saved calibration).
+            region: (x, y, w, h) of the client area on screen.
+            scale: Screen pixels per captured pixel (DPI scaling), per session.
+            layout: Calibration in window-relative coordinates, e.g.
+                {'qp_center': [x, y], 'qp_radius': r}.
+            title: Window title, if discovered.
+            input_q: Queue that input requests are sent to instead of the local
+                scheduler (a worker process whose supervisor owns the cursor).
+        """
+        self.name = name
+        self.region = tuple(int(v) for v in region)
+        self.scale = (float(scale[0]), float(scale[1]))
+        self.layout = dict(layout or {})
+        self.title = title
+        self.state: dict = {}  # bot-owned state
+        self.bot = None
+        self.steps = 0
+        self.step_ms_total = 0.0
+        self.errors = 0
+        self._local = threading.local()
+        self._backend = None
+        self.input_q = input_q
+        self._sent = 0
+
+    @property
+    def _input(self):
+        # Created on first input so capture-only sessions need no backend
+        if self._backend is None:
+            self._backend = get_input_backend()
+        return self._backend
+
+    @property
+    def _scheduler(self):
+        # Looked up per input: a forked worker gets its own scheduler thread
+        # instead of the parent's, which did not survive the fork
+        return get_input_scheduler()
+
+    # --- Capture ---
+    def capture(self):
+        """BGR capture of this session's client area only."""
+        x, y, w, h = self.region
+        try:
+            if mss is not None:
+                grab = getattr(self._local, "grab", None)
+                if grab is None:
+                    grab = self._local.grab = mss()  # mss handles are per thread
+                shot = grab.grab({"left": x, "top": y, "width": w, "height": h})
+                return cv2.cvtColor(np.asarray(shot), cv2.COLOR_BGRA2BGR)
+            import pyautogui
+            shot = pyautogui.screenshot(region=(x, y, w, h))
+            return cv2.cvtColor(np.array(shot), cv2.COLOR_RGB2BGR)
+        except Exception as e:
+            print(f"❌ [{self.name}] Error capturing window: {e}")
+            return None
+
+    # --- Coordinates ---
+    def to_screen(self, point) -> Tuple[int, int]:
+        """Map a point in this session's frame to absolute screen coordinates."""
+        return (int(round(self.region[0] + point[0] * self.scale[0])),
+                int(round(self.region[1] + point[1] * self.scale[1])))
+
+    def layout_point(self, key: str) -> Optional[Tuple[int, int]]:
+        """Screen coordinates of a calibrated window-relative layout point."""
+        pt = self.layout.get(key)
+        return self.to_screen(pt) if pt is not None else None
+
+    # --- Input (serialized through the shared scheduler) ---
+    def click(self, point, deadline: Optional[float] = None, button: str = "left", label: str = "click") -> int:
+        """Move to `point` (frame coords) and click at `deadline` (default: as soon as possible)."""
+        sx, sy = self.to_screen(point)
+        return self._submit("click", (sx, sy, button), deadline, label)
+
+    def press(self, key: str, deadline: Optional[float] = None, label: str = "press") -> int:
+        return self._submit("press", (key,), deadline, label)
+
+    def _submit(self, kind: str, args: tuple, deadline: Optional[float], label: str) -> int:
+        deadline = deadline if deadline is not None else now()
+        label = f"{self.name}:{label}"
+        if self.input_q is not None:
+            # perf_counter deadlines are valid across processes on one machine
+            self.input_q.put((kind, args, deadline, label))
+            self._sent += 1
+            return self._sent
+        return self._scheduler.submit(deadline, input_action(self._input, kind, args), label=label)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "region": list(self.region), "scale": list(self.scale),
+                "layout": self.layout, "title": self.title}
+
+
+# --- Manager ---
+class SessionManager:
+    def __init__(self, workers: Optional[int] = None, config_path: str = SESSIONS_PATH):
+        self.sessions: Dict[str, Session] = {}
+        self.templates = get_shared_templates()
+        self.config_path = config_path
+        self.workers = workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._heap: list = []  # (due, seq, session name)
+        self._seq = 0
+        self._in_flight = set()
+        self._cond = threading.Condition()
+        self._running = False
+
+    # --- Session setup ---
+    def add_session(self, name: str, region: Region, **kwargs) -> Session:
+        session = Session(name, region, **kwargs)
+        saved = self.load_config().get(name)
+        if saved and not kwargs.get("layout"):
+            session.layout = saved.get("layout", {})
+            session.scale = tuple(saved.get("scale", session.scale))
+        self.sessions[name] = session
+        return session
+
+    def discover(self, patterns=DEFAULT_TITLE_PATTERNS) -> List[Session]:
+        """Create one session per discovered client window (named client1, client2, ...)."""
+        windows = sorted(discover_client_windows(patterns), key=lambda w: (w["region"][1], w["region"][0]))
+        added = []
+        for i, win in enumerate(windows, 1):
+            added.append(self.add_session(f"client{i}", win["region"], title=win["title"]))
+        print(f"🪟 Found {len(windows)} client window(s)")
+        return added
+
+    def load_config(self) -> dict:
+        try:
+            if os.path.exists(self.config_path):
+                with open(self.config_path, "r", encoding="utf-8") as f:
+                    return {s["name"]: s for s in json.load(f).get("sessions", [])}
+        except Exception as e:
+            print(f"⚠️ Failed to load sessions config: {e}")
+        return {}
+
+    def save_config(self):
+        try:
+            os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
+            with open(self.config_path, "w", encoding="utf-8") as f:
+                json.dump({"sessions": [s.to_dict() for s in self.sessions.values()]}, f, indent=2)
+        except Exception as e:
+            print(f"⚠️ Failed to save sessions config: {e}")
+
+    # --- Scheduling ---
+    def _schedule(self, name: str, due: float):
+        with self._cond:
+            self._push(name, due)
+
+    def _push(self, name: str, due: float):
+        # Caller holds self._cond
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, name))
+        self._cond.notify()
+
+    def _run_step(self, session: Session):
+        t0 = now()
+        delay = 0.05
+        try:
+            delay = session.bot.step(session)
+        except Exception as e:
+            session.errors += 1
+            print(f"⚠️ [{session.name}] step failed: {e}")
+            delay = 1.0
+        finally:
+            session.steps += 1
+            session.step_ms_total += (now() - t0) * 1000.0
+            # Re-queue before leaving _in_flight, under the same lock, so run() never
+            # sees both empty and stops while this session is about to continue
+            with self._cond:
+                if delay is not None and self._running:
+                    self._push(session.name, now() + max(0.0, float(delay)))
+                self._in_flight.discard(session.name)
+
+    def submit(self, fn, *args):
+        """Run work (e.g. a detector) on the shared worker pool; returns a Future."""
+        return self._pool.submit(fn, *args)
+
+    def run(self, bot_factory: Callable[[Session], object], should_continue: Callable[[], bool] = lambda: True):
+        """Create a bot per session and run them until should_continue() is False.
+
+        bot.step(session) runs one iteration and returns the delay (seconds)
+        before its next step, or None to stop that session.
+        """
+        if not self.sessions:
+            print("❌ No sessions to run")
+            return
+        self._pool = ThreadPoolExecutor(max_workers=self.workers or len(self.sessions) + 2,
+                                        thread_name_prefix="session")
+        self._running = True
+        for name, session in self.sessions.items():
+            session.bot = bot_factory(session)
+            self._schedule(name, now())
+        try:
+            while self._running and should_continue():
+                with self._cond:
+                    if not self._heap:
+                        if not self._in_flight:
+                            break  # every session finished
+                        self._cond.wait(0.05)
+                        continue
+                    due, _, name = self._heap[0]
+                    wait = due - now()
+                    if wait > 0:
+                        self._cond.wait(min(wait, 0.05))
+                        continue
+                    heapq.heappop(self._heap)
+                    if name in self._in_flight:
+                        continue
+                    self._in_flight.add(name)
+                self._pool.submit(self._run_step, self.sessions[name])
+        except KeyboardInterrupt:
+            print("\n🛑 Stopping sessions...")
+        finally:
+            self._running = False
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+
+    def print_stats(self):
+        for s in self.sessions.values():
+            mean = s.step_ms_total / s.steps if s.steps else 0.0
+            print(f"🪟 [{s.name}] steps={s.steps} mean step={mean:.1f} ms errors={s.errors} region={s.region}")
+
+
+class TickReader:
+    """Minimal session bot: prints the tick digit whenever it changes."""
+
+    def __init__(self, session: Session, templates, timer=None):
+        if TICKS_DIR not in sys.path:
+            sys.path.append(TICKS_DIR)
+        from tm_detect import classify_digit_from_frame
+
+        self.classify = classify_digit_from_frame
+        self.templates = templates
+        self.timer = timer  # optional fn(stage, ms) for timing metrics
+        self.last = None
+
+    def step(self, session: Session):
+        t0 = now()
+        frame = session.capture()
+        t1 = now()
+        if frame is None:
+            return 0.5
+        digit, score = self.classify(frame, self.templates)
+        t2 = now()
+        if self.timer is not None:
+            self.timer("capture", (t1 - t0) * 1000.0)
+            self.timer("detect", (t2 - t1) * 1000.0)
+        if digit is not None and digit != self.last:
+            print(f"[{session.name}] tick {digit} ({score:.2f})")
+            self.last = digit
+        return 0.03
+
+
+def load_tick_templates():
+    if TICKS_DIR not in sys.path:
+        sys.path.append(TICKS_DIR)
+    from tm_detect import load_all_templates
+    return load_all_templates(os.path.join(TICKS_DIR, "templates"))
+
+
+if __name__ == "__main__":
+    # Demo: read the tick digit of every client using one shared template set
+    manager = SessionManager()
+    if not manager.discover():
+        print("No client windows found; pass regions with add_session() instead.")
+        sys.exit(0)
+    templates = manager.templates.get("tick_digits", load_tick_templates)
+    manager.run(lambda session: TickReader(session, templates))
+    manager.print_stats()
@@ -0,0 +1,986 @@
+#!/usr/bin/env python3
+"""
+Game Simulator for End-to-End Bot Benchmarks
+
+Runs the real bots (AutoAlchCrabBot, AutoWoodcutter) against a simulated
+game instead of a live client, so a change to detection, timing or input
+code can be measured on any Linux box - no game, no display, no mouse.
+
+- A Scene renders the UI state the bots look for into BGR frames: the
+  spellbook with the alch icon, the inventory with darts or logs, the crab
+  and tunnel overlays, the tree indicators with the orange player tile,
+  and the orange tick digits. The real template images from
+  auto_alch/images are drawn, so the bots' own detectors run unchanged.
+- Input goes through a RecordingBackend whose on_event callback feeds the
+  scene: '3' opens the spellbook, clicking the alch icon then the darts
+  casts (one cast per 5 ticks), clicking a tree walks to it and chops,
+  shift+click drops a log. The bots' `pyautogui` (and pynput's keyboard
+  listener) are replaced by small shims that route to the backend and the
+  scene, only inside the benchmark process.
+- A SimClock patches time.sleep/time.time/time.perf_counter while a bot
+  runs: sleeps advance virtual time instantly, computation still takes
+  real time. --deterministic also freezes computation (each frame costs a
+  fixed capture_cost_s) so two runs with the same seed are identical.
+
+Reported per bench: effective actions per minute/hour (counted by the
+scene, next to what the bot believes it did), wasted clicks, decision
+latency (real compute from the screenshot to the input it led to),
+reaction time (game ready -> productive action, virtual) and wasted
+sleeps (time the bot slept while the game was waiting for it).
+
+Usage:
+    python simulator.py alch_crab --minutes 10 --seed 1
+    python simulator.py woodcutter --minutes 30 --deterministic --json
+    python simulator.py --snapshot data/sim     # write one frame per scene state
+
+Exported:
+- SimClock, SimulationDone
+- Scene, AlchCrabScene, WoodcuttingScene
+- Simulation(bench, seed=..., deterministic=...).run(duration_s) -> dict
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import types
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from input_backend import RecordingBackend
+from metrics import METRICS_DIR, LatencyHistogram
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALCH_IMAGES_DIR = os.path.join(REPO_ROOT, "auto_alch", "images")
+
+TICK_S = 0.6
+DEFAULT_SIZE = (1280, 800)
+DEFAULT_CAPTURE_COST_S = 0.02  # a real full-screen grab; frames here render in ~1 ms
+BREAK_SLEEP_S = 10.0  # sleeps at least this long are humanization breaks, not waste
+
+
+class SimulationDone(BaseException):
+    """Raised inside the bot when the simulated duration is over.
+
+    A BaseException so the bots' `except Exception` retry loops let it through.
+    """
+
+
+# --- Clock ---
+class SimClock:
+    def __init__(self, deterministic: bool = False, capture_cost_s: float = DEFAULT_CAPTURE_COST_S):
+        """
+        Args:
+            deterministic: Only sleeps, captures and a 1 us step per clock read
+                advance time; otherwise computation advances it in real time.
+            capture_cost_s: Virtual time added per screenshot.
+        """
+        self.deterministic = deterministic
+        self.capture_cost_s = capture_cost_s
+        self._real_perf = time.perf_counter
+        self._real_time = time.time
+        self._real_sleep = time.sleep
+        self._perf0 = self._real_perf()
+        self._wall0 = self._real_time()
+        self._virtual = 0.0  # deterministic mode: elapsed virtual seconds
+        self._skipped = 0.0  # real mode: virtual seconds skipped by sleeps
+        self.thread_id: Optional[int] = None
+        self.deadline: Optional[float] = None
+        self.on_sleep = None  # callback(start, end) for sleep accounting
+        self.sleeps = 0
+        self.slept_s = 0.0
+
+    def real_perf(self) -> float:
+        return self._real_perf()
+
+    def now(self) -> float:
+        """Virtual seconds since the clock was created."""
+        if self.deterministic:
+            if threading.get_ident() == self.thread_id:
+                self._virtual += 1e-6  # keeps busy-wait loops (precise_sleep_until) finite
+            return self._virtual
+        return self._real_perf() - self._perf0 + self._skipped
+
+    def advance(self, seconds: float):
+        if self.deterministic:
+            self._virtual += seconds
+        else:
+            self._skipped += seconds
+
+    def check(self):
+        if self.deadline is not None and self.now() >= self.deadline:
+            raise SimulationDone()
+
+    # Replacements for the time module
+    def perf_counter(self) -> float:
+        return self._perf0 + self.now()
+
+    def time(self) -> float:
+        return self._wall0 + self.now()
+
+    def sleep(self, seconds: float):
+        if threading.get_ident() != self.thread_id:
+            self._real_sleep(seconds)  # writer/listener threads keep real time
+            return
+        seconds = max(0.0, float(seconds))
+        start = self.now()
+        self.advance(seconds)
+        self.sleeps += 1
+        self.slept_s += seconds
+        if self.on_sleep is not None:
+            self.on_sleep(start, start + seconds)
+        self.check()
+
+    @contextlib.contextmanager
+    def installed(self):
+        """Patch the time module for the calling (bot) thread's run."""
+        self.thread_id = threading.get_ident()
+        time.sleep, time.time, time.perf_counter = self.sleep, self.time, self.perf_counter
+        try:
+            yield self
+        finally:
+            time.sleep, time.time, time.perf_counter = self._real_sleep, self._real_time, self._real_perf
+
+
+# --- Drawing helpers ---
+def _hsv_bgr(h: int, s: int, v: int) -> Tuple[int, int, int]:
+    px = cv2.cvtColor(np.uint8([[[h, s, v]]]), cv2.COLOR_HSV2BGR)[0, 0]
+    return int(px[0]), int(px[1]), int(px[2])
+
+
+CRAB_BGR = _hsv_bgr(150, 200, 200)      # inside the crab mask [140-160]
+TUNNEL_BGR = _hsv_bgr(170, 200, 200)    # tunnel mask [135-175] only
+TREE_BGR = (120, 200, 0)                # Tree Indicator default #00C878
+PLAYER_BGR = (0, 125, 255)              # true tile #FF7D00
+TICK_BGR = (0, 125, 255)
+
+
+def _paste(dst: np.ndarray, img: np.ndarray, x: int, y: int):
+    h, w = img.shape[:2]
+    dst[y:y + h, x:x + w] = img[:max(0, dst.shape[0] - y), :max(0, dst.shape[1] - x)]
+
+
+def _texture(rng: np.random.Generator, h: int, w: int, base, spread: int) -> np.ndarray:
+    """Low-saturation noise: no detector fires on it and template matching never sees a flat window."""
+    noise = rng.integers(-spread, spread + 1, size=(h, w, 1), dtype=np.int16)
+    img = np.array(base, dtype=np.int16)[None, None, :] + noise
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def _log_sprite() -> np.ndarray:
+    sprite = np.full((30, 40, 3), (38, 48, 60), dtype=np.uint8)
+    cv2.rectangle(sprite, (4, 9), (32, 21), (30, 70, 110), -1)
+    cv2.line(sprite, (6, 12), (30, 12), (20, 50, 85), 2)
+    cv2.line(sprite, (6, 18), (30, 18), (40, 90, 135), 1)
+    cv2.ellipse(sprite, (33, 15), (5, 7), 0, 0, 360, (90, 160, 200), -1)
+    cv2.ellipse(sprite, (33, 15), (2, 3), 0, 0, 360, (40, 90, 140), -1)
+    return sprite
+
+
+def _load_template(name: str) -> np.ndarray:
+    img = cv2.imread(os.path.join(ALCH_IMAGES_DIR, name))
+    if img is None:
+        raise FileNotFoundError(f"Missing template {name} in {ALCH_IMAGES_DIR}")
+    return img
+
+
+# --- Scenes ---
+class Scene:
+    """Game state plus renderer; times are SimClock.now() seconds."""
+
+    name = "scene"
+
+    def __init__(self, size: Tuple[int, int] = DEFAULT_SIZE, seed: int = 0):
+        self.size = (int(size[0]), int(size[1]))
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+        w, h = self.size
+        self.background = _texture(self.np_rng, h, w, (70, 82, 76), 10)
+        self.panel_rect = (w - 250, h - 420, 240, 410)  # x, y, w, h of the side panel
+        px, py, pw, ph = self.panel_rect
+        self.panel = _texture(self.np_rng, ph, pw, (38, 48, 60), 6)
+        self.shift = False
+        self.actions = 0
+        self._cache_key = None
+        self._cache_frame = None
+
+    # Overridden by scenes
+    def advance(self, now: float):
+        pass
+
+    def draw(self, frame: np.ndarray, now: float):
+        pass
+
+    def render_key(self, now: float):
+        return None  # None = no caching
+
+    def click(self, x: int, y: int, button: str, now: float):
+        """Return 'action' for a productive action, True for an effective click, False if wasted."""
+        return False
+
+    def key_down(self, key: str, now: float) -> bool:
+        return False
+
+    def ready_at(self) -> Optional[float]:
+        """Since when the game has been waiting for the bot (None: the bot is waiting for the game)."""
+        return None
+
+    def score(self) -> Dict[str, float]:
+        return {}
+
+    # Shared
+    def render(self, now: float) -> np.ndarray:
+        self.advance(now)
+        key = self.render_key(now)
+        if key is not None and key == self._cache_key:
+            return self._cache_frame
+        frame = self.background.copy()
+        self.draw(frame, now)
+        if key is not None:
+            self._cache_key, self._cache_frame = key, frame
+        return frame
+
+    def handle_key(self, key: str, down: bool, now: float) -> bool:
+        if key == "shift":
+            self.shift = down
+            return True
+        return self.key_down(key, now) if down else True
+
+    def in_panel(self, x: int, y: int) -> bool:
+        px, py, pw, ph = self.panel_rect
+        return px <= x < px + pw and py <= y < py + ph
+
+
+def _hit(rect, x: int, y: int, pad: int = 0) -> bool:
+    rx, ry, rw, rh = rect
+    return rx - pad <= x < rx + rw + pad and ry - pad <= y < ry + rh + pad
+
+
+class AlchCrabScene(Scene):
+    """Spellbook/inventory side panel, a crab, a tunnel and the tick counter."""
+
+    name = "alch_crab"
+    CAST_COOLDOWN_TICKS = 5
+    DIGIT_ORIGIN = (60, 120)
+
+    def __init__(self, size: Tuple[int, int] = DEFAULT_SIZE, seed: int = 0):
+        super().__init__(size, seed)
+        w, h = self.size
+        px, py, pw, ph = self.panel_rect
+        self.alch_icon = _load_template("alc-spell.png")
+        self.darts = _load_template("dart2.png")
+
+        # Spellbook: a 5x7 grid of plain icons with the alch icon in it
+        self.spellbook = self.panel.copy()
+        cell = 46
+        for row in range(7):
+            for col in range(5):
+                cx, cy = 10 + col * cell + cell // 2, 12 + row * cell + cell // 2
+                shade = self.rng.randint(70, 150)
+                radius = self.rng.randint(8, 14)
+                cv2.circle(self.spellbook, (cx, cy), radius, (shade, shade - 10, shade - 25), -1)
+                cv2.circle(self.spellbook, (cx, cy), radius // 2, (shade + 40, shade + 30, shade + 20), -1)
+        ax, ay = 10 + 2 * cell + (cell - self.alch_icon.shape[1]) // 2, 12 + 3 * cell + (cell - self.alch_icon.shape[0]) // 2
+        self.spellbook[ay - 3:ay + self.alch_icon.shape[0] + 3, ax - 3:ax + self.alch_icon.shape[1] + 3] = self.panel[:self.alch_icon.shape[0] + 6, :self.alch_icon.shape[1] + 6]
+        _paste(self.spellbook, self.alch_icon, ax, ay)
+        self.alch_rect = (px + ax, py + ay, self.alch_icon.shape[1], self.alch_icon.shape[0])
+
+        # Inventory: darts in the first slot
+        self.inventory = self.panel.copy()
+        _paste(self.inventory, self.darts, 12, 12)
+        self.darts_rect = (px + 12, py + 12, self.darts.shape[1], self.darts.shape[0])
+
+        self.equipment = self.panel.copy()
+        for i in range(5):
+            cv2.rectangle(self.equipment, (90, 20 + i * 70), (150, 70 + i * 70), (60, 70, 80), 2)
+
+        self.crab_center = (int(w * 0.42), int(h * 0.48))
+        self.crab_axes = (70, 40)
+        self.tunnel_center = (int(w * 0.15), int(h * 0.25))
+        self.tunnel_axes = (32, 22)
+
+        self.tab = "spellbook"
+        self.selected = False
+        self.cast_ready_at = 0.0
+        self.tab_switch_at: Optional[float] = None
+        self.crab_clicks = 0
+        self.tunnel_clicks = 0
+        self.fighting = False
+
+    def advance(self, now: float):
+        if self.tab_switch_at is not None and now >= self.tab_switch_at:
+            self.tab = "spellbook"  # the client flips back to the spellbook after a cast
+            self.tab_switch_at = None
+
+    def render_key(self, now: float):
+        return self.tab, 4 - int(now / TICK_S) % 4
+
+    def draw(self, frame: np.ndarray, now: float):
+        cv2.ellipse(frame, self.tunnel_center, self.tunnel_axes, 0, 0, 360, TUNNEL_BGR, -1)
+        cv2.ellipse(frame, self.crab_center, self.crab_axes, 0, 0, 360, CRAB_BGR, -1)
+        digit = 4 - int(now / TICK_S) % 4
+        cv2.putText(frame, str(digit), self.DIGIT_ORIGIN, cv2.FONT_HERSHEY_SIMPLEX, 2.0, TICK_BGR, 5, cv2.LINE_AA)
+        px, py, pw, ph = self.panel_rect
+        panel = {"spellbook": self.spellbook, "inventory": self.inventory}.get(self.tab, self.equipment)
+        frame[py:py + ph, px:px + pw] = panel
+
+    def digit_rect(self, digit: int) -> Tuple[int, int, int, int]:
+        """Bounding box of the drawn tick digit (ground truth for datasets)."""
+        (w, h), base = cv2.getTextSize(str(digit), cv2.FONT_HERSHEY_SIMPLEX, 2.0, 5)
+        x, y = self.DIGIT_ORIGIN
+        return (x - 3, y - h - 3, w + 6, h + base + 6)
+
+    def _on_crab(self, x, y) -> bool:
+        (cx, cy), (ax, ay) = self.crab_center, self.crab_axes
+        return ((x - cx) / ax) ** 2 + ((y - cy) / ay) ** 2 <= 1.0
+
+    def _on_tunnel(self, x, y) -> bool:
+        (cx, cy), (ax, ay) = self.tunnel_center, self.tunnel_axes
+        return ((x - cx) / ax) ** 2 + ((y - cy) / ay) ** 2 <= 1.0
+
+    def click(self, x, y, button, now):
+        if self.tab == "spellbook" and _hit(self.alch_rect, x, y, pad=6):
+            self.selected = True
+            self.tab = "inventory"
+            return True
+        if self.tab == "inventory" and _hit(self.darts_rect, x, y):
+            if not self.selected:
+                return False
+            # Casts queue behind the cooldown, like clicking early in game
+            cast_at = max(now, self.cast_ready_at)
+            self.cast_ready_at = cast_at + self.CAST_COOLDOWN_TICKS * TICK_S
+            self.tab_switch_at = cast_at
+            self.selected = False
+            self.actions += 1
+            return "action"
+        if self._on_crab(x, y):
+            self.crab_clicks += 1
+            self.fighting = True
+            if self.selected:
+                self.selected = False  # "You can't cast that on the crab": spell dropped
+                return False
+            return True
+        if self._on_tunnel(x, y):
+            self.tunnel_clicks += 1
+            return self.tunnel_clicks == 1
+        self.selected = False
+        return False
+
+    def key_down(self, key, now):
+        tab = {"3": "spellbook", "0": "inventory", "5": "equipment"}.get(key)
+        if tab is None:
+            return False
+        changed = tab != self.tab
+        self.tab = tab
+        self.selected = False
+        self.tab_switch_at = None
+        return changed
+
+    def ready_at(self) -> Optional[float]:
+        return self.cast_ready_at
+
+    def score(self):
+        return {"alchs": self.actions, "crab_clicks": self.crab_clicks, "tunnel_clicks": self.tunnel_clicks}
+
+
+class _Tree:
+    def __init__(self, rect):
+        self.rect = rect  # x, y, w, h of the indicator
+        self.alive = True
+        self.respawn_at = 0.0
+
+    @property
+    def center(self):
+        x, y, w, h = self.rect
+        return x + w // 2, y + h // 2
+
+
+class WoodcuttingScene(Scene):
+    """Tree indicators, the orange player tile and a log inventory."""
+
+    name = "woodcutter"
+    SLOTS = 28
+    LOG_TICKS = 4
+    LOG_CHANCE = 0.45
+    DEPLETE_CHANCE = 0.125
+    RESPAWN_S = (8.0, 15.0)
+    WALK_PX_S = 180.0
+
+    def __init__(self, size: Tuple[int, int] = DEFAULT_SIZE, seed: int = 0, trees: int = 5):
+        super().__init__(size, seed)
+        w, h = self.size
+        self.log_sprite = _log_sprite()
+        self.trees: List[_Tree] = []
+        spots = [(0.12, 0.18), (0.38, 0.12), (0.62, 0.2), (0.18, 0.55), (0.5, 0.6), (0.3, 0.35)]
+        for fx, fy in spots[:trees]:
+            tw, th = 70, 90
+            x = int(fx * w) + self.rng.randint(-20, 20)
+            y = int(fy * h) + self.rng.randint(-20, 20)
+            self.trees.append(_Tree((x, y, tw, th)))
+        self.player = (int(w * 0.35), int(h * 0.82))
+        self.walk_from = self.player
+        self.walk_start = 0.0
+        self.arrive_at = 0.0
+        self.target: Optional[int] = None
+        self.events: deque = deque()  # pre-rolled (time, kind) for the current chop
+        self.idle_since = 0.0
+        self.slots = [False] * self.SLOTS
+        self.inventory_open = False
+        self.trees_felled = 0
+        self.logs_cut = 0
+        self.logs_dropped = 0
+        self.full_at: Optional[float] = None
+
+    # --- Game logic ---
+    def log_count(self) -> int:
+        return sum(self.slots)
+
+    def _stand_at(self, tree: _Tree):
+        x, y, w, h = tree.rect
+        return x + w // 2, y + h + 45
+
+    def _roll_chop(self, start: float):
+        """Pre-roll the chop from `start` so the end (and ready_at) is known in advance."""
+        self.events.clear()
+        logs = self.log_count()
+        if logs >= self.SLOTS:
+            return
+        t = start
+        for _ in range(10000):
+            t += self.LOG_TICKS * TICK_S
+            if self.rng.random() >= self.LOG_CHANCE:
+                continue
+            logs += 1
+            self.events.append((t, "log"))
+            if logs >= self.SLOTS:
+                self.events.append((t, "full"))
+                return
+            if self.rng.random() < self.DEPLETE_CHANCE:
+                self.events.append((t, "deplete"))
+                return
+
+    def _stop(self, t: float):
+        self.target = None
+        self.events.clear()
+        self.idle_since = t
+
+    def advance(self, now: float):
+        for tree in self.trees:
+            if not tree.alive and now >= tree.respawn_at:
+                tree.alive = True
+        if self.target is not None and self.arrive_at and now >= self.arrive_at:
+            self.player = self.walk_from = self._stand_at(self.trees[self.target])
+            self.arrive_at = 0.0
+        while self.events and self.events[0][0] <= now:
+            t, kind = self.events.popleft()
+            if kind == "log":
+                self.slots[self.slots.index(False)] = True
+                self.logs_cut += 1
+            elif kind == "full":
+                self.full_at = t
+                self._stop(t)
+            elif kind == "deplete":
+                tree = self.trees[self.target]
+                tree.alive = False
+                tree.respawn_at = t + self.rng.uniform(*self.RESPAWN_S)
+                self.trees_felled += 1
+                self.actions += 1
+                self._stop(t)
+
+    def _player_pos(self, now: float):
+        if self.target is None or not self.arrive_at:
+            return self.player
+        dest = self._stand_at(self.trees[self.target])
+        span = max(1e-6, self.arrive_at - self.walk_start)
+        f = min(1.0, max(0.0, (now - self.walk_start) / span))
+        return (int(self.walk_from[0] + (dest[0] - self.walk_from[0]) * f),
+                int(self.walk_from[1] + (dest[1] - self.walk_from[1]) * f))
+
+    def _slot_rect(self, i: int):
+        px, py, _, _ = self.panel_rect
+        col, row = i % 4, i // 4
+        return px + 14 + col * 56, py + 14 + row * 56, self.log_sprite.shape[1], self.log_sprite.shape[0]
+
+    def click(self, x, y, button, now):
+        if self.inventory_open and self.in_panel(x, y):
+            for i, filled in enumerate(self.slots):
+                if filled and _hit(self._slot_rect(i), x, y, pad=6):
+                    if not self.shift:
+                        return False  # "Use" on a log does nothing useful here
+                    self.slots[i] = False
+                    self.logs_dropped += 1
+                    self.full_at = None
+                    if self.target is not None:
+                        self._roll_chop(max(now, self.arrive_at))  # room again: the chop carries on
+                    return True
+            return False
+        for i, tree in enumerate(self.trees):
+            if not tree.alive or not _hit(tree.rect, x, y, pad=8):
+                continue
+            if i == self.target:
+                return False  # already walking to / chopping it
+            if self.log_count() >= self.SLOTS:
+                return False  # "Your inventory is too full"
+            self.walk_from = self._player_pos(now)
+            dest = self._stand_at(tree)
+            self.walk_start = now
+            self.arrive_at = now + max(TICK_S, math.dist(self.walk_from, dest) / self.WALK_PX_S)
+            self.target = i
+            self._roll_chop(self.arrive_at)
+            return "action"
+        return False
+
+    def key_down(self, key, now):
+        if key == "0":
+            self.inventory_open = True
+            return True
+        if key == "escape":
+            self.inventory_open = False
+            return True
+        return False  # camera keys: the scene is top-down
+
+    def ready_at(self) -> Optional[float]:
+        if self.target is not None:
+            return self.events[-1][0] if self.events else None
+        if self.full_at is not None:
+            return self.full_at
+        if any(t.alive for t in self.trees):
+            return self.idle_since
+        return max(self.idle_since, min(t.respawn_at for t in self.trees))
+
+    def score(self):
+        return {"trees": self.trees_felled, "logs": self.logs_cut, "logs_dropped": self.logs_dropped}
+
+    # --- Rendering ---
+    def render_key(self, now: float):
+        if self.target is not None and self.arrive_at:
+            return None  # walking: the tile moves every frame
+        return (tuple(t.alive for t in self.trees), self.player, self.inventory_open, tuple(self.slots))
+
+    def draw(self, frame: np.ndarray, now: float):
+        for tree in self.trees:
+            x, y, w, h = tree.rect
+            cx = x + w // 2
+            if tree.alive:
+                cv2.rectangle(frame, (cx - 6, y + h // 2), (cx + 6, y + h - 8), (40, 55, 70), -1)
+                cv2.circle(frame, (cx, y + h // 3), w // 3, (55, 75, 60), -1)
+                cv2.rectangle(frame, (x, y), (x + w, y + h), TREE_BGR, 5)
+            else:
+                cv2.rectangle(frame, (cx - 8, y + h - 20), (cx + 8, y + h - 8), (40, 55, 70), -1)
+        px, py = self._player_pos(now)
+        cv2.rectangle(frame, (px - 18, py - 18), (px + 18, py + 18), PLAYER_BGR, -1)
+        if self.inventory_open:
+            x0, y0, pw, ph = self.panel_rect
+            panel = self.panel.copy()
+            for i, filled in enumerate(self.slots):
+                if filled:
+                    sx, sy, _, _ = self._slot_rect(i)
+                    _paste(panel, self.log_sprite, sx - x0, sy - y0)
+            frame[y0:y0 + ph, x0:x0 + pw] = panel
+
+
+# --- Shims for the bots' device modules ---
+class _SimPyAutoGui(types.ModuleType):
+    """The subset of pyautogui the bots use, routed to the active Simulation."""
+
+    def __init__(self):
+        super().__init__("pyautogui")
+        self.FAILSAFE = False
+        self.PAUSE = 0.1
+        self.sim: Optional["Simulation"] = None
+
+    def _pause(self):
+        if self.PAUSE:
+            time.sleep(self.PAUSE)  # real pyautogui sleeps PAUSE after every call
+
+    def size(self):
+        return self.sim.backend.size()
+
+    def position(self):
+        return self.sim.backend.position()
+
+    def screenshot(self, region=None, *args, **kwargs):
+        frame = self.sim.screenshot()
+        if region is not None:
+            x, y, w, h = (int(v) for v in region)
+            frame = frame[y:y + h, x:x + w]
+        return frame[:, :, ::-1]  # pyautogui returns RGB
+
+    def moveTo(self, x=None, y=None, duration=0.0, *args, **kwargs):
+        cx, cy = self.sim.backend.position()
+        if duration:
+            time.sleep(duration)  # the tween itself is not interesting to the game
+        self.sim.backend.move_to(cx if x is None else x, cy if y is None else y)
+        self._pause()
+
+    def click(self, x=None, y=None, clicks=1, interval=0.0, button="left", *args, **kwargs):
+        for i in range(max(1, int(clicks))):
+            if i and interval:
+                time.sleep(interval)
+            self.sim.backend.click(x, y, button=button)
+        self._pause()
+
+    def mouseDown(self, x=None, y=None, button="left", *args, **kwargs):
+        self.sim.backend.mouse_down(button, x, y)
+        self._pause()
+
+    def mouseUp(self, x=None, y=None, button="left", *args, **kwargs):
+        self.sim.backend.mouse_up(button, x, y)
+        self._pause()
+
+    def press(self, keys, presses=1, interval=0.0, *args, **kwargs):
+        for key in ([keys] if isinstance(keys, str) else keys) * max(1, int(presses)):
+            self.sim.backend.press(key)
+            if interval:
+                time.sleep(interval)
+        self._pause()
+
+    def keyDown(self, key, *args, **kwargs):
+        self.sim.backend.key_down(key)
+        self._pause()
+
+    def keyUp(self, key, *args, **kwargs):
+        self.sim.backend.key_up(key)
+        self._pause()
+
+    def hotkey(self, *keys, **kwargs):
+        for key in keys:
+            self.sim.backend.key_down(key)
+        for key in reversed(keys):
+            self.sim.backend.key_up(key)
+        self._pause()
+
+
+class _SimListener:
+    """pynput.keyboard.Listener stand-in: the simulated bot never hears the real keyboard."""
+
+    def __init__(self, on_press=None, on_release=None, **kwargs):
+        self.on_press = on_press
+        self.on_release = on_release
+        self.running = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def join(self, timeout=None):
+        pass
+
+    def is_alive(self):
+        return self.running
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _make_pynput_shim() -> types.ModuleType:
+    pynput = types.ModuleType("pynput")
+    keyboard = types.ModuleType("pynput.keyboard")
+    keyboard.Listener = _SimListener
+    keyboard.Key = types.SimpleNamespace(esc="esc", space="space", shift="shift", ctrl="ctrl", alt="alt",
+                                         f1="f1", f2="f2", f3="f3", f4="f4", f5="f5", f6="f6")
+    keyboard.KeyCode = types.SimpleNamespace(from_char=lambda c: types.SimpleNamespace(char=c))
+    pynput.keyboard = keyboard
+    return pynput
+
+
+_PYAUTOGUI = _SimPyAutoGui()
+_PYNPUT = _make_pynput_shim()
+
+
+@contextlib.contextmanager
+def _shims_installed(sim: "Simulation"):
+    names = ("pyautogui", "pynput", "pynput.keyboard")
+    saved = {name: sys.modules.get(name) for name in names}
+    _PYAUTOGUI.sim = sim
+    sys.modules.update({"pyautogui": _PYAUTOGUI, "pynput": _PYNPUT, "pynput.keyboard": _PYNPUT.keyboard})
+    try:
+        yield
+    finally:
+        _PYAUTOGUI.sim = None
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+# --- Benches ---
+class Bench:
+    """How to build, run and read back one bot against one scene."""
+
+    def __init__(self, name: str, scene_cls, make, run, reported, unit: str, per: str = "min", stop=None):
+        self.name = name
+        self.scene_cls = scene_cls
+        self.make = make
+        self.run = run
+        self.reported = reported
+        self.stop = stop
+        self.unit = unit
+        self.per = per
+
+
+def _make_alch_crab(sim: "Simulation"):
+    if REPO_ROOT not in sys.path:
+        sys.path.append(REPO_ROOT)
+    import auto_alch_crab_bot
+    bot = auto_alch_crab_bot.AutoAlchCrabBot()
+    if bot.ticks is not None:
+        bot.ticks.stop()  # no flicker scripts in the simulation
+        bot.ticks = None
+    bot.metrics.out_dir = os.path.join(METRICS_DIR, "sim")
+    bot.telemetry.disable()  # virtual clock: keep simulated runs out of the telemetry store
+    bot.is_paused = False
+    return bot
+
+
+def _make_woodcutter(sim: "Simulation"):
+    tree_dir = os.path.join(REPO_ROOT, "auto_tree")
+    if tree_dir not in sys.path:
+        sys.path.append(tree_dir)
+    import auto_woodcutter
+    bot = auto_woodcutter.AutoWoodcutter()
+    bot.inventory_manager.log_template = sim.scene.log_sprite
+    bot.paused = False
+    return bot
+
+
+BENCHES: Dict[str, Bench] = {
+    "alch_crab": Bench("alch_crab", AlchCrabScene, _make_alch_crab,
+                       run=lambda bot: bot.start(),
+                       reported=lambda bot: {"alchs": bot.click_count, "crab_clicks": bot.crab_click_count},
+                       unit="alchs", per="min", stop=lambda bot: bot.metrics.stop_writer()),
+    "woodcutter": Bench("woodcutter", WoodcuttingScene, _make_woodcutter,
+                        run=lambda bot: bot.run_woodcutting_loop(),
+                        reported=lambda bot: {"trees": bot.trees_chopped, "drops": bot.logs_dropped},
+                        unit="trees", per="hour"),
+}
+
+
+# --- Simulation ---
+class Simulation:
+    def __init__(self, bench: str, seed: int = 0, size: Tuple[int, int] = DEFAULT_SIZE,
+                 deterministic: bool = False, capture_cost_s: float = DEFAULT_CAPTURE_COST_S,
+                 verbose: bool = False):
+        """
+        Args:
+            bench: Key of BENCHES ('alch_crab', 'woodcutter').
+            seed: Seeds the scene and the bot's `random` module.
+            size: Simulated screen size.
+            deterministic: Exclude computation from virtual time (see SimClock).
+            capture_cost_s: Virtual time per screenshot.
+            verbose: Keep the bot's console output.
+        """
+        self.bench = BENCHES[bench]
+        self.seed = seed
+        self.verbose = verbose
+        self.clock = SimClock(deterministic=deterministic, capture_cost_s=capture_cost_s)
+        self.clock.on_sleep = self._on_sleep
+        self.scene: Scene = self.bench.scene_cls(size=size, seed=seed)
+        self.backend = RecordingBackend(screen_size=size, start=(size[0] // 2, size[1] // 2),
+                                        failsafe=False, on_event=self._on_event)
+        self.bot = None
+
+        self.frames = 0
+        self.clicks = 0
+        self.wasted_clicks = 0
+        self.keys = 0
+        self.wasted_keys = 0
+        self.wasted_sleep_s = 0.0
+        self.break_s = 0.0
+        self.decision = LatencyHistogram()  # real ms: screenshot -> first input it led to
+        self.reaction = LatencyHistogram()  # virtual ms: game ready -> productive action
+        self._frame_real_t: Optional[float] = None
+
+    # Hooks
+    def screenshot(self) -> np.ndarray:
+        self.clock.advance(self.clock.capture_cost_s)
+        self.clock.check()
+        frame = self.scene.render(self.clock.now())
+        self.frames += 1
+        self._frame_real_t = self.clock.real_perf()
+        return frame
+
+    def _on_sleep(self, start: float, end: float):
+        if end - start >= BREAK_SLEEP_S:
+            self.break_s += end - start
+            return
+        self.scene.advance(start)
+        ready = self.scene.ready_at()
+        if ready is not None:
+            self.wasted_sleep_s += max(0.0, end - max(start, ready))
+
+    def _on_event(self, event: dict):
+        kind = event["type"]
+        if kind not in ("mouse_down", "key_down", "key_up"):
+            return
+        now = self.clock.now()
+        self.scene.advance(now)
+        if kind != "key_up" and self._frame_real_t is not None:
+            self.decision.record_us((self.clock.real_perf() - self._frame_real_t) * 1e6)
+            self._frame_real_t = None
+        if kind == "mouse_down":
+            self.clicks += 1
+            ready = self.scene.ready_at()
+            result = self.scene.click(event["x"], event["y"], event.get("button", "left"), now)
+            if result == "action" and ready is not None and ready <= now:
+                self.reaction.record_ms((now - ready) * 1000.0)
+            if not result:
+                self.wasted_clicks += 1
+        else:
+            down = kind == "key_down"
+            if down:
+                self.keys += 1
+            if not self.scene.handle_key(event["key"], down, now) and down:
+                self.wasted_keys += 1
+        self.clock.check()
+
+    # Running
+    def run(self, duration_s: float) -> dict:
+        random.seed(self.seed)
+        out = io.StringIO() if not self.verbose else None
+        real_start = self.clock.real_perf()
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(_shims_installed(self))
+            if out is not None:
+                stack.enter_context(contextlib.redirect_stdout(out))
+            stack.enter_context(self.clock.installed())
+            self.clock.deadline = self.clock.now() + duration_s
+            try:
+                self.bot = self.bench.make(self)
+                self.bench.run(self.bot)
+            except SimulationDone:
+                pass
+            finally:
+                self.clock.deadline = None
+                if self.bench.stop is not None and self.bot is not None:
+                    self.bench.stop(self.bot)
+        elapsed = self.clock.now()
+        return self.report(elapsed, self.clock.real_perf() - real_start)
+
+    def report(self, sim_s: float, real_s: float) -> dict:
+        score = self.scene.score()
+        actions = self.scene.actions
+        per_s = 60.0 if self.bench.per == "min" else 3600.0
+        active_s = max(1e-9, sim_s - self.break_s)
+        return {
+            "bench": self.bench.name,
+            "seed": self.seed,
+            "deterministic": self.clock.deterministic,
+            "sim_s": round(sim_s, 3),
+            "real_s": round(real_s, 3),
+            "frames": self.frames,
+            "actions": actions,
+            "unit": self.bench.unit,
+            "per": self.bench.per,
+            f"{self.bench.unit}_per_{self.bench.per}": round(actions / max(1e-9, sim_s) * per_s, 2),
+            f"{self.bench.unit}_per_{self.bench.per}_excl_breaks": round(actions / active_s * per_s, 2),
+            "scene": score,
+            "bot_reported": self.bench.reported(self.bot) if self.bot is not None else {},
+            "clicks": self.clicks,
+            "wasted_clicks": self.wasted_clicks,
+            "keys": self.keys,
+            "wasted_keys": self.wasted_keys,
+            "decision_ms": self.decision.summary(),
+            "reaction_ms": self.reaction.summary(),
+            "sleeps": self.clock.sleeps,
+            "slept_s": round(self.clock.slept_s, 3),
+            "break_s": round(self.break_s, 3),
+            "wasted_sleep_s": round(self.wasted_sleep_s, 3),
+            "wasted_sleep_pct": round(100.0 * self.wasted_sleep_s / active_s, 1),
+        }
+
+
+def print_report(r: dict):
+    per = r["per"]
+    rate = r[f"{r['unit']}_per_{per}"]
+    rate_ex = r[f"{r['unit']}_per_{per}_excl_breaks"]
+    d, re_ = r["decision_ms"], r["reaction_ms"]
+    print(f"🎮 {r['bench']}: {r['sim_s'] / 60:.1f} min simulated in {r['real_s']:.1f}s "
+          f"({r['sim_s'] / max(1e-9, r['real_s']):.1f}x, seed {r['seed']}"
+          f"{', deterministic' if r['deterministic'] else ''}, {r['frames']} frames)")
+    print(f"   ✅ {r['actions']} {r['unit']}: {rate:.1f}/{per} ({rate_ex:.1f}/{per} excluding breaks) | "
+          f"scene {r['scene']} | bot reported {r['bot_reported']}")
+    print(f"   🖱️ Clicks: {r['clicks']} ({r['wasted_clicks']} wasted) | Keys: {r['keys']} ({r['wasted_keys']} wasted)")
+    print(f"   🧠 Decision latency (frame → input): p50={d['p50_ms']:.1f} ms p99={d['p99_ms']:.1f} ms (n={d['count']})")
+    print(f"   ⏱️ Reaction (game ready → action): p50={re_['p50_ms']:.0f} ms p90={re_['p90_ms']:.0f} ms "
+          f"p99={re_['p99_ms']:.0f} ms (n={re_['count']})")
+    print(f"   💤 Sleeps: {r['sleeps']} totalling {r['slept_s']:.1f}s | breaks {r['break_s']:.0f}s | "
+          f"wasted {r['wasted_sleep_s']:.1f}s ({r['wasted_sleep_pct']:.1f}% of active time)")
+
+
+def write_snapshots(out_dir: str, seed: int = 0, size: Tuple[int, int] = DEFAULT_SIZE) -> List[str]:
+    """Render each scene in its main states (for eyeballing the detectors' inputs)."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    alch = AlchCrabScene(size=size, seed=seed)
+    for tab in ("spellbook", "inventory"):
+        alch.tab = tab
+        path = os.path.join(out_dir, f"alch_crab_{tab}.png")
+        cv2.imwrite(path, alch.render(0.0))
+        paths.append(path)
+    wood = WoodcuttingScene(size=size, seed=seed)
+    wood.slots = [i < 20 for i in range(wood.SLOTS)]
+    wood.inventory_open = True
+    path = os.path.join(out_dir, "woodcutter.png")
+    cv2.imwrite(path, wood.render(0.0))
+    paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bots end-to-end against a simulated game")
+    parser.add_argument("bench", nargs="*", default=list(BENCHES), help=f"One or more of: {', '.join(BENCHES)}")
+    parser.add_argument("--minutes", type=float, default=5.0, help="Simulated duration per bench")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--deterministic", action="store_true",
+                        help="Exclude compute time from the simulated clock (identical runs per seed)")
+    parser.add_argument("--capture-cost-ms", type=float, default=DEFAULT_CAPTURE_COST_S * 1000.0,
+                        help="Simulated time per screenshot")
+    parser.add_argument("--size", default=f"{DEFAULT_SIZE[0]}x{DEFAULT_SIZE[1]}", help="Screen size WxH")
+    parser.add_argument("--json", action="store_true", help="Print JSON reports instead of text")
+    parser.add_argument("--verbose", action="store_true", help="Show the bots' own output")
+    parser.add_argument("--snapshot", metavar="DIR", help="Only write one frame per scene state to DIR")
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    if args.snapshot:
+        for path in write_snapshots(args.snapshot, seed=args.seed, size=size):
+            print(f"🖼️ {path}")
+        return 0
+
+    reports = []
+    for name in args.bench:
+        if name not in BENCHES:
+            print(f"❌ Unknown bench '{name}' (choose from {', '.join(BENCHES)})")
+            return 2
+        sim = Simulation(name, seed=args.seed, size=size, deterministic=args.deterministic,
+                         capture_cost_s=args.capture_cost_ms / 1000.0, verbose=args.verbose)
+        report = sim.run(args.minutes * 60.0)
+        reports.append(report)
+        if not args.json:
+            print_report(report)
+    if args.json:
+        print(json.dumps(reports if len(reports) > 1 else reports[0], indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Event-Driven State Machine
+
+Declarative replacement for bot loops that juggle waiting_for_* booleans,
+fail counters and fixed random sleeps.
+
+- A state names the detections it waits for (detector names), an optional
+  timeout with the state to go to when it expires, and an optional minimum
+  dwell (a humanized reaction delay, fixed or a (min, max) range).
+- Transitions fire on detection events: every step() captures one frame,
+  runs only the current state's detectors, and takes the first transition
+  whose condition holds. The bot therefore moves on as soon as the
+  spellbook / inventory visibly changes instead of after a sleep.
+  During a state's minimum dwell step() sleeps instead of capturing, and a
+  step with no transition sleeps poll_interval (50 ms by default).
+- Time spent in each state (dwell) and timeouts are recorded per state.
+- With a capture_rate.CaptureRate the machine paces its own captures: fast
+  right after a transition (the UI is reacting to the action), none until a
+  minimum dwell is nearly over, and a wake-up exactly at the timeout.
+
+Usage:
+    sm = StateMachine("alch", capture_fn, detect_fn, initial="find_alch")
+    sm.add_state("find_alch", wait_for=["alch_spell"], timeout_s=1.5, on_timeout=open_spellbook)
+    sm.add_state("find_darts", wait_for=["darts"], timeout_s=2.0, on_timeout="find_alch")
+    sm.on("find_alch", "alch_spell", "find_darts", do=click_alch)
+    sm.on("find_darts", "darts", "find_alch", do=click_darts)
+    while running:
+        sm.step()
+    sm.print_stats()
+
+detect_fn(frame, names) must return a dict name -> result. The default
+condition treats (position, confidence) results as found when position is
+not None; pass when=... for anything else. An action returning False
+cancels its transition (e.g. the click failed) and the state is kept.
+on_timeout may be a state name or a callable(machine) returning one
+(None = re-enter the current state).
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+DEFAULT_POLL_INTERVAL_S = 0.05  # sleep after a step with no transition (no capture rate)
+URGENT_AFTER_TRANSITION_S = 0.5  # fast capture while the UI reacts to the action just taken
+DWELL_WINDOW_S = 0.25            # fast capture for this long either side of a min dwell ending
+
+
+def found(result) -> bool:
+    """Default event condition: detector returned a (position, confidence) hit."""
+    if result is None:
+        return False
+    if isinstance(result, tuple) and len(result) == 2:
+        return result[0] is not None
+    return bool(result)
+
+
+class State:
+    def __init__(self, name: str, wait_for: Iterable[str] = (), timeout_s: Optional[float] = None,
+                 on_timeout: Union[str, Callable, None] = None,
+                 min_dwell_s: Union[float, Tuple[float, float]] = 0.0,
+                 on_enter: Optional[Callable[["StateMachine"], None]] = None):
+        self.name = name
+        self.wait_for = list(wait_for)
+        self.timeout_s = timeout_s
+        self.on_timeout = on_timeout
+        self.min_dwell_s = min_dwell_s
+        self.on_enter = on_enter
+        self.transitions: List[Transition] = []
+
+        # Instrumentation
+        self.entries = 0
+        self.timeouts = 0
+        self.dwell_ms: deque = deque(maxlen=512)
+
+    def sample_min_dwell(self) -> float:
+        if isinstance(self.min_dwell_s, tuple):
+            return random.uniform(*self.min_dwell_s)
+        return float(self.min_dwell_s or 0.0)
+
+
+class Transition:
+    def __init__(self, event: str, target: str, when: Optional[Callable[[object], bool]] = None,
+                 do: Optional[Callable[[object], object]] = None):
+        self.event = event
+        self.target = target
+        self.when = when or found
+        self.do = do
+        self.fired = 0
+
+
+class StateMachine:
+    def __init__(self, name: str, capture_fn: Callable[[], object],
+                 detect_fn: Callable[[object, List[str]], Dict[str, object]],
+                 initial: str, poll_interval: float = DEFAULT_POLL_INTERVAL_S, debug: bool = False,
+                 timer: Optional[Callable[[str, float], None]] = None, rate=None):
+        """
+        Args:
+            name: Used in log output.
+            capture_fn: Returns a BGR frame (or None).
+            detect_fn: fn(frame, detector_names) -> {name: result}.
+            initial: Name of the first state.
+            poll_interval: Sleep after a step with no transition (0 = spin).
+            debug: Print every transition.
+            timer: Optional fn(stage, ms) fed 'capture', 'detect', 'act:<event>'
+                and 'capture_to_act' timings (e.g. a metrics.Metrics object).
+            rate: Optional capture_rate.CaptureRate replacing poll_interval.
+        """
+        self.name = name
+        self.capture_fn = capture_fn
+        self.detect_fn = detect_fn
+        self.initial = initial
+        self.poll_interval = poll_interval
+        self.debug = debug
+        self.timer = timer
+        self.rate = rate
+
+        self.states: Dict[str, State] = {}
+        self.current: Optional[State] = None
+        self.entered_at = 0.0
+        self.min_dwell = 0.0
+        self.last_results: Dict[str, object] = {}
+        self.history: deque = deque(maxlen=256)  # (time, from, to, reason)
+        self.started_at = None
+
+    # --- Definition ---
+    def add_state(self, name: str, **kwargs) -> State:
+        state = State(name, **kwargs)
+        self.states[name] = state
+        return state
+
+    def on(self, state: str, event: str, target: str, when=None, do=None) -> Transition:
+        """When `event` (a detector of `state`) satisfies `when`, run `do` and go to `target`."""
+        st = self.states[state]
+        if event not in st.wait_for:
+            st.wait_for.append(event)
+        tr = Transition(event, target, when=when, do=do)
+        st.transitions.append(tr)
+        return tr
+
+    # --- Running ---
+    @property
+    def state(self) -> Optional[str]:
+        return self.current.name if self.current else None
+
+    @property
+    def dwell_s(self) -> float:
+        return time.perf_counter() - self.entered_at
+
+    def reset(self, state: Optional[str] = None):
+        """(Re)start in `state` (default: the initial state) without recording dwell."""
+        self.current = None
+        self.goto(state or self.initial, reason="reset")
+
+    def goto(self, target: str, reason: str = ""):
+        now = time.perf_counter()
+        prev = self.current
+        if prev is not None:
+            prev.dwell_ms.append((now - self.entered_at) * 1000.0)
+        if self.started_at is None:
+            self.started_at = now
+        self.current = self.states[target]
+        self.current.entries += 1
+        self.entered_at = now
+        self.min_dwell = self.current.sample_min_dwell()
+        self.history.append((now, prev.name if prev else None, target, reason))
+        if self.rate is not None:
+            self._pace(now)
+        if self.debug:
+            print(f"   🔀 [{self.name}] {prev.name if prev else '-'} → {target} ({reason})")
+        if self.current.on_enter is not None:
+            self.current.on_enter(self)
+
+    def _pace(self, entered: float):
+        """Tell the capture rate what the new state is waiting for."""
+        st = self.current
+        self.rate.clear("dwell")
+        self.rate.clear("timeout")
+        if self.min_dwell > 0:
+            # Nothing can fire before the dwell is over: no captures until then, fast once it is
+            self.rate.expect(entered + self.min_dwell + DWELL_WINDOW_S, window_s=DWELL_WINDOW_S, key="dwell",
+                             hold=True)
+        elif st.wait_for:
+            self.rate.urgent(URGENT_AFTER_TRANSITION_S)
+        if st.timeout_s is not None:
+            self.rate.expect(entered + max(st.timeout_s, self.min_dwell), window_s=0.0, key="timeout")
+
+    def step(self) -> Optional[str]:
+        """Capture one frame, evaluate the current state, and return the (new) state name."""
+        if self.current is None:
+            self.reset()
+        st = self.current
+
+        # Nothing can fire before the minimum dwell is over: sleep instead of capturing
+        remaining = self.min_dwell - self.dwell_s
+        if remaining > 0:
+            time.sleep(remaining)
+
+        t_capture = time.perf_counter()
+        frame = self.capture_fn()
+        t_detect = time.perf_counter()
+        if frame is None:
+            return st.name
+        if self.rate is not None:
+            self.rate.frame()
+        results = self.detect_fn(frame, st.wait_for) if st.wait_for else {}
+        self.last_results = results
+        if self.timer is not None:
+            self.timer("capture", (t_detect - t_capture) * 1000.0)
+            if st.wait_for:
+                self.timer("detect", (time.perf_counter() - t_detect) * 1000.0)
+
+        if self.dwell_s >= self.min_dwell:
+            for tr in st.transitions:
+                result = results.get(tr.event)
+                if not tr.when(result):
+                    continue
+                if tr.do is not None:
+                    t_act = time.perf_counter()
+                    ok = tr.do(result)
+                    if self.timer is not None:
+                        self.timer(f"act:{tr.event}", (time.perf_counter() - t_act) * 1000.0)
+                        self.timer("capture_to_act", (t_act - t_capture) * 1000.0)
+                    if ok is False:
+                        continue
+                tr.fired += 1
+                self.goto(tr.target, reason=tr.event)
+                return self.current.name
+
+        if st.timeout_s is not None and self.dwell_s >= st.timeout_s:
+            st.timeouts += 1
+            target = st.on_timeout(self) if callable(st.on_timeout) else st.on_timeout
+            self.goto(target or st.name, reason="timeout")
+            return self.current.name
+
+        if self.rate is not None:
+            self.rate.wait(started=t_capture)
+        elif self.poll_interval > 0:
+            time.sleep(self.poll_interval)
+        return st.name
+
+    # --- Reporting ---
+    def stats(self) -> Dict[str, dict]:
+        out = {}
+        for name, st in self.states.items():
+            dwell = sorted(st.dwell_ms)
+            n = len(dwell)
+            out[name] = {
+                'entries': st.entries,
+                'timeouts': st.timeouts,
+                'mean_ms': sum(dwell) / n if n else 0.0,
+                'p50_ms': dwell[n // 2] if n else 0.0,
+                'p90_ms': dwell[min(n - 1, int(n * 0.9))] if n else 0.0,
+            }
+        return out
+
+    def print_stats(self):
+        print(f"📊 [{self.name}] State dwell times:")
+        for name, s in self.stats().items():
+            if not s['entries']:
+                continue
+            print(f"   {name:<16} entries={s['entries']:<5} timeouts={s['timeouts']:<4} "
+                  f"dwell mean={s['mean_ms']:.0f} ms p50={s['p50_ms']:.0f} ms p90={s['p90_ms']:.0f} ms")
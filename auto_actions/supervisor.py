@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Process-per-Session Supervisor
+
+Runs one worker process per client session so a crash or a stuck OpenCV
+call in one bot cannot take the others down, without every process loading
+its own copy of the templates.
+
+- The supervisor loads templates / lookup tables ONCE, freezes the GC
+  (gc.freeze) and then forks the workers. NumPy array buffers are never
+  written after load, so their pages stay shared copy-on-write; each extra
+  session costs roughly its frame buffers plus interpreter overhead.
+- Crashed workers are restarted with exponential backoff, and exit codes /
+  restart counts are reported instead of dying silently.
+- Workers never drive the cursor themselves: Session.click/press in a worker
+  go over a queue to the supervisor, whose single InputScheduler runs input
+  from every session in deadline order (there is only one OS cursor).
+- Workers report per-stage timings (capture, detect, act, ...) back over a
+  queue; the supervisor aggregates them per session and prints p50/p99
+  together with each worker's private / proportional memory (Linux).
+
+fork is POSIX-only; on Windows the 'spawn' start method is used, which works
+but reloads the templates in every worker.
+
+Usage:
+    python supervisor.py                      # one tick reader per client window
+    python supervisor.py --bot mymod:factory  # factory(session, shared, timer) -> bot with step()
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import importlib
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from input_backend import get_input_backend
+from input_scheduler import get_input_scheduler
+from sessions import Session, SessionManager, TickReader, get_shared_templates, input_action, load_tick_templates
+
+METRICS_FLUSH_S = 2.0
+RESTART_BACKOFF_S = (1.0, 30.0)  # first delay, max delay
+HEALTHY_RUN_S = 60.0  # a worker that ran this long resets its backoff
+
+
+def _start_method() -> str:
+    return "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+
+
+# --- Worker side ---
+class WorkerTimer:
+    """Collects stage timings in the worker and ships them in batches."""
+
+    def __init__(self, name: str, metrics_q, flush_s: float = METRICS_FLUSH_S):
+        self.name = name
+        self.metrics_q = metrics_q
+        self.flush_s = flush_s
+        self.samples: Dict[str, List[float]] = {}
+        self.last_flush = time.perf_counter()
+
+    def __call__(self, stage: str, ms: float):
+        self.samples.setdefault(stage, []).append(ms)
+        if time.perf_counter() - self.last_flush >= self.flush_s:
+            self.flush()
+
+    def flush(self):
+        if self.samples:
+            try:
+                self.metrics_q.put_nowait((self.name, os.getpid(), self.samples))
+            except Exception:
+                pass  # metrics are best effort; never block the bot
+        self.samples = {}
+        self.last_flush = time.perf_counter()
+
+
+def _worker_main(spec: dict, bot_factory: Callable, shared: dict, metrics_q, input_q):
+    """Entry point of one worker process: run a single session's bot forever."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor handles Ctrl+C
+    session = Session(spec["name"], spec["region"], scale=spec.get("scale", (1.0, 1.0)),
+                      layout=spec.get("layout"), title=spec.get("title", ""), input_q=input_q)
+    timer = WorkerTimer(session.name, metrics_q)
+    bot = bot_factory(session, shared, timer)
+    while True:
+        t0 = time.perf_counter()
+        delay = bot.step(session)
+        timer("step", (time.perf_counter() - t0) * 1000.0)
+        if delay is None:
+            timer.flush()
+            return
+        if delay > 0:
+            time.sleep(delay)
+
+
+def tick_reader_factory(session, shared, timer):
+    return TickReader(session, shared["tick_digits"], timer=timer)
+
+
+# --- Supervisor side ---
+def _read_memory_kb(pid: int) -> Optional[dict]:
+    """Private and proportional (shared pages split between sharers) memory, Linux only."""
+    path = f"/proc/{pid}/smaps_rollup"
+    if not os.path.exists(path):
+        return None
+    out = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                    out[key] = int(rest.split()[0])
+    except Exception:
+        return None
+    out["Private"] = out.pop("Private_Clean", 0) + out.pop("Private_Dirty", 0)
+    return out
+
+
+class WorkerSlot:
+    def __init__(self, spec: dict):
+        self.spec = spec
+        self.name = spec["name"]
+        self.process = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.backoff = RESTART_BACKOFF_S[0]
+        self.restart_at = 0.0
+        self.last_exit = None
+
+
+class Supervisor:
+    def __init__(self, specs: List[dict], bot_factory: Callable = tick_reader_factory,
+                 loaders: Optional[Dict[str, Callable[[], object]]] = None, history: int = 2048):
+        """
+        Args:
+            specs: Session specs ({'name', 'region', 'scale', 'layout', 'title'}).
+            bot_factory: Module-level fn(session, shared, timer) -> bot with step(session).
+            loaders: name -> loader for shared read-only data, loaded once before forking.
+            history: Timing samples kept per (session, stage).
+        """
+        self.ctx = mp.get_context(_start_method())
+        self.slots = [WorkerSlot(spec) for spec in specs]
+        self.bot_factory = bot_factory
+        self.loaders = loaders if loaders is not None else {"tick_digits": load_tick_templates}
+        self.shared: dict = {}
+        self.metrics_q = self.ctx.Queue(maxsize=1024)
+        self.input_q = self.ctx.Queue()
+        self._input_thread: Optional[threading.Thread] = None
+        self.timings: Dict[tuple, deque] = {}
+        self.history = history
+        self.running = False
+
+    def load_shared(self):
+        templates = get_shared_templates()
+        start = time.perf_counter()
+        for name, loader in self.loaders.items():
+            self.shared[name] = templates.get(name, loader)
+        print(f"🧩 Loaded shared data {list(self.shared)} in {(time.perf_counter() - start) * 1000.0:.0f} ms")
+        # Keep the collector from touching (and un-sharing) every object page after fork
+        gc.collect()
+        if hasattr(gc, "freeze"):
+            gc.freeze()
+
+    def _spawn(self, slot: WorkerSlot):
+        proc = self.ctx.Process(
+            target=_worker_main,
+            args=(slot.spec, self.bot_factory, self.shared, self.metrics_q, self.input_q),
+            name=f"session-{slot.name}",
+            daemon=True,
+        )
+        proc.start()
+        slot.process = proc
+        slot.started_at = time.time()
+        print(f"🚀 [{slot.name}] worker started (pid {proc.pid}, {self.ctx.get_start_method()})")
+
+    def _check_workers(self):
+        now = time.time()
+        for slot in self.slots:
+            proc = slot.process
+            if proc is not None and proc.is_alive():
+                if now - slot.started_at > HEALTHY_RUN_S:
+                    slot.backoff = RESTART_BACKOFF_S[0]
+                continue
+            if proc is not None:
+                slot.last_exit = proc.exitcode
+                slot.process = None
+                if proc.exitcode == 0:
+                    print(f"🏁 [{slot.name}] worker finished")
+                    slot.restart_at = float("inf")
+                    continue
+                slot.restart_at = now + slot.backoff
+                print(f"💥 [{slot.name}] worker exited with code {proc.exitcode}; "
+                      f"restarting in {slot.backoff:.0f}s")
+                slot.backoff = min(RESTART_BACKOFF_S[1], slot.backoff * 2)
+            if slot.process is None and now >= slot.restart_at:
+                slot.restarts += 1
+                self._spawn(slot)
+
+    def _input_loop(self):
+        """Run every worker's input requests on this process's one scheduler."""
+        scheduler = get_input_scheduler()
+        backend = None
+        while self.running:
+            try:
+                kind, args, deadline, label = self.input_q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                backend = backend or get_input_backend()
+                scheduler.submit(deadline, input_action(backend, kind, args), label=label)
+            except Exception as e:
+                print(f"⚠️ Dropped input request {label}: {e}")
+
+    def _drain_metrics(self):
+        while True:
+            try:
+                name, _pid, samples = self.metrics_q.get_nowait()
+            except queue.Empty:
+                return
+            for stage, values in samples.items():
+                key = (name, stage)
+                if key not in self.timings:
+                    self.timings[key] = deque(maxlen=self.history)
+                self.timings[key].extend(values)
+
+    def stats(self) -> Dict[str, dict]:
+        out: Dict[str, dict] = {}
+        for (name, stage), values in self.timings.items():
+            vals = sorted(values)
+            n = len(vals)
+            if n:
+                out.setdefault(name, {})[stage] = {
+                    "count": n,
+                    "p50_ms": vals[n // 2],
+                    "p99_ms": vals[min(n - 1, int(n * 0.99))],
+                }
+        return out
+
+    def print_stats(self):
+        stats = self.stats()
+        for slot in self.slots:
+            pid = slot.process.pid if slot.process is not None else None
+            mem = _read_memory_kb(pid) if pid else None
+            mem_txt = f" pss={mem['Pss'] / 1024:.1f} MB private={mem['Private'] / 1024:.1f} MB" if mem else ""
+            print(f"📊 [{slot.name}] pid={pid} restarts={max(0, slot.restarts - 1)} "
+                  f"last_exit={slot.last_exit}{mem_txt}")
+            for stage, s in sorted(stats.get(slot.name, {}).items()):
+                print(f"     {stage:<8} n={s['count']:<5} p50={s['p50_ms']:.1f} ms p99={s['p99_ms']:.1f} ms")
+
+    def run(self, report_every_s: float = 30.0):
+        if not self.slots:
+            print("❌ No sessions to supervise")
+            return
+        self.load_shared()
+        self.running = True
+        self._input_thread = threading.Thread(target=self._input_loop, name="supervisor-input", daemon=True)
+        self._input_thread.start()
+        last_report = time.time()
+        try:
+            while self.running:
+                self._check_workers()
+                self._drain_metrics()
+                if time.time() - last_report >= report_every_s:
+                    self.print_stats()
+                    last_report = time.time()
+                if all(s.restart_at == float("inf") and s.process is None for s in self.slots):
+                    break
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            print("\n🛑 Stopping workers...")
+        finally:
+            self.running = False
+            self._drain_metrics()
+            self.print_stats()
+            for slot in self.slots:
+                if slot.process is not None and slot.process.is_alive():
+                    slot.process.terminate()
+                    slot.process.join(timeout=2.0)
+
+
+def _load_factory(path: str) -> Callable:
+    module_name, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module_name), attr or "bot_factory")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one supervised worker process per client session")
+    parser.add_argument("--bot", default=None, help="module:factory(session, shared, timer); default: tick reader")
+    parser.add_argument("--report", type=float, default=30.0, help="Seconds between stats reports")
+    args = parser.parse_args()
+
+    manager = SessionManager()
+    sessions = list(manager.load_config().values()) or [s.to_dict() for s in manager.discover()]
+    if not sessions:
+        print("❌ No client windows found and no sessions in data/sessions.json")
+        return
+    factory = _load_factory(args.bot) if args.bot else tick_reader_factory
+    Supervisor(sessions, bot_factory=factory).run(report_every_s=args.report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+Telemetry Store
+
+One local SQLite database (data/telemetry.sqlite3, WAL mode) for what used to
+be scattered over click_timing.csv, damage_log.json, flick_timing.json and
+mouse_profile_*.jsonl, with typed tables:
+
+    sessions    id, app, started, ended, pid
+    actions     clicks / key presses (+ tick digit and phase when known)
+    detections  detector results (found, position, confidence, value)
+    ticks       tick-counter observations (digit, confidence, period)
+    timings     per-stage latency, rolled up per `rollup_s` window
+                (n, mean, p50/p90/p99, max - raw per-frame rows would be
+                tens of millions a day)
+
+The database and the session row are written with the first data, so a
+process that only builds a bot offline (replay, scoring) leaves nothing
+behind.
+
+Every row carries the session id and a wall-clock `t` (epoch seconds); each
+table is indexed on (session, t) and on t, so a time range over months of
+sessions is an index range scan.
+
+Hot-loop cost is one tuple put on a bounded queue (~1 us). A writer thread
+drains it in batches - one executemany per table and one commit per batch.
+If the disk stalls, rows are dropped and counted instead of blocking.
+Detections are throttled per detector: a row is written when `found`
+changes, otherwise at most every `detection_every_s`.
+
+Set AUTO_TELEMETRY=0 to turn recording off.
+
+Usage:
+    telemetry = get_telemetry("alch_crab")
+    telemetry.action("click", x=x, y=y, target="alch")
+    telemetry.detection("crab", True, (x, y), confidence=0.91)
+    telemetry.tick(3, confidence=0.8)
+    metrics.add_sink(telemetry.timing)          # stage timings from metrics.py
+
+    python telemetry.py sessions --since 30d
+    python telemetry.py stages --app alch_crab --since 7d
+    python telemetry.py sql "SELECT target, COUNT(*) FROM actions GROUP BY target"
+    python telemetry.py import-legacy           # old CSV / JSON / JSONL files
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import csv
+import glob
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metrics import LatencyHistogram
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DB_PATH = os.path.join(DATA_DIR, "telemetry.sqlite3")
+QUEUE_SIZE = 65536
+BATCH_ROWS = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    app TEXT NOT NULL,
+    started REAL NOT NULL,
+    ended REAL,
+    pid INTEGER
+);
+CREATE TABLE IF NOT EXISTS actions (
+    session INTEGER NOT NULL,
+    t REAL NOT NULL,
+    kind TEXT NOT NULL,
+    target TEXT,
+    x INTEGER,
+    y INTEGER,
+    key TEXT,
+    duration_ms REAL,
+    ok INTEGER,
+    digit INTEGER,
+    ms_since_tick REAL
+);
+CREATE TABLE IF NOT EXISTS detections (
+    session INTEGER NOT NULL,
+    t REAL NOT NULL,
+    detector TEXT NOT NULL,
+    found INTEGER NOT NULL,
+    x REAL,
+    y REAL,
+    confidence REAL,
+    value REAL
+);
+CREATE TABLE IF NOT EXISTS ticks (
+    session INTEGER NOT NULL,
+    t REAL NOT NULL,
+    digit INTEGER,
+    confidence REAL,
+    period_ms REAL
+);
+CREATE TABLE IF NOT EXISTS timings (
+    session INTEGER NOT NULL,
+    t REAL NOT NULL,
+    stage TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    mean_ms REAL,
+    p50_ms REAL,
+    p90_ms REAL,
+    p99_ms REAL,
+    max_ms REAL
+);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    session INTEGER NOT NULL,
+    bytes_read INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_app_started ON sessions (app, started);
+CREATE INDEX IF NOT EXISTS actions_session_t ON actions (session, t);
+CREATE INDEX IF NOT EXISTS actions_t ON actions (t);
+CREATE INDEX IF NOT EXISTS detections_session_t ON detections (session, t);
+CREATE INDEX IF NOT EXISTS detections_t ON detections (t);
+CREATE INDEX IF NOT EXISTS detections_detector_t ON detections (detector, t);
+CREATE INDEX IF NOT EXISTS ticks_session_t ON ticks (session, t);
+CREATE INDEX IF NOT EXISTS ticks_t ON ticks (t);
+CREATE INDEX IF NOT EXISTS timings_session_t ON timings (session, t);
+CREATE INDEX IF NOT EXISTS timings_stage_t ON timings (stage, t);
+"""
+
+INSERTS = {
+    "actions": "INSERT INTO actions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "detections": "INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "ticks": "INSERT INTO ticks VALUES (?, ?, ?, ?, ?)",
+    "timings": "INSERT INTO timings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+}
+_STAGE = "stage"  # queue marker for raw stage timings (rolled up by the writer)
+
+
+def connect(path: str = DB_PATH, readonly: bool = False) -> sqlite3.Connection:
+    """Connection with the schema in place (WAL: readers never block the writer)."""
+    if readonly:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: durable except on power loss
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class Telemetry:
+    def __init__(self, app: str, path: str = DB_PATH, enabled: bool = True, flush_s: float = 1.0,
+                 rollup_s: float = 10.0, detection_every_s: float = 1.0, queue_size: int = QUEUE_SIZE):
+        """
+        Args:
+            app: Stored on the session row.
+            path: SQLite database file.
+            enabled: False makes every call a no-op (no file, no thread).
+            flush_s: Longest time a row waits in the queue.
+            rollup_s: Window of the per-stage timing rollups.
+            detection_every_s: Minimum gap between unchanged detection rows
+                per detector (0 = every call).
+        """
+        self.app = app
+        self.path = path
+        self.enabled = enabled
+        self.flush_s = flush_s
+        self.rollup_s = rollup_s
+        self.detection_every_s = detection_every_s
+        self.session: Optional[int] = None
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self._last_detection: Dict[str, Tuple[bool, float]] = {}
+        self._q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._started = time.time()
+        if enabled:
+            self._thread = threading.Thread(target=self._run, name=f"telemetry-{app}", daemon=True)
+            self._thread.start()
+
+    # --- Hot-loop side ---
+    def _put(self, item):
+        try:
+            self._q.put_nowait(item)
+            self.queued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def action(self, kind: str, target: Optional[str] = None, x: Optional[int] = None, y: Optional[int] = None,
+               key: Optional[str] = None, duration_ms: Optional[float] = None, ok: Optional[bool] = None,
+               digit: Optional[int] = None, ms_since_tick: Optional[float] = None, t: Optional[float] = None):
+        if self.enabled:
+            self._put(("actions", (time.time() if t is None else t, kind, target,
+                                   None if x is None else int(x), None if y is None else int(y), key,
+                                   duration_ms, None if ok is None else int(ok), digit, ms_since_tick)))
+
+    def detection(self, detector: str, found: bool, pos=None, confidence: Optional[float] = None,
+                  value: Optional[float] = None, t: Optional[float] = None, every_s: Optional[float] = None):
+        """every_s overrides detection_every_s (0 for events that are each distinct, e.g. hits)."""
+        if not self.enabled:
+            return
+        now = time.time() if t is None else t
+        found = bool(found)
+        last = self._last_detection.get(detector)
+        gap = self.detection_every_s if every_s is None else every_s
+        if last is not None and last[0] == found and now - last[1] < gap:
+            return
+        self._last_detection[detector] = (found, now)
+        x, y = (float(pos[0]), float(pos[1])) if pos is not None else (None, None)
+        self._put(("detections", (now, detector, int(found), x, y,
+                                  None if confidence is None else float(confidence),
+                                  None if value is None else float(value))))
+
+    def detections(self, results: Dict[str, object]):
+        """Detector-registry results: name -> (position, confidence) or None."""
+        for name, result in results.items():
+            if isinstance(result, (list, tuple)) and len(result) == 2:
+                pos, conf = result
+                self.detection(name, pos is not None, pos, confidence=conf)
+            else:
+                self.detection(name, result is not None)
+
+    def tick(self, digit: Optional[int], confidence: Optional[float] = None, period_ms: Optional[float] = None,
+             t: Optional[float] = None):
+        if self.enabled:
+            self._put(("ticks", (time.time() if t is None else t, digit, confidence, period_ms)))
+
+    def timing(self, stage: str, ms: float):
+        """Timer protocol (stage, ms); rolled up per window by the writer."""
+        if self.enabled:
+            self._put((_STAGE, (stage, ms)))
+
+    __call__ = timing
+
+    # --- Writer thread ---
+    def _run(self):
+        conn: Optional[sqlite3.Connection] = None
+        window: Dict[str, LatencyHistogram] = {}
+        window_start = time.time()
+        stop = False
+        while not stop:
+            rows: Dict[str, List[tuple]] = {}
+            waiters = []
+            try:
+                items = [self._q.get(timeout=self.flush_s)]
+            except queue.Empty:
+                items = []
+            while items and len(items) < BATCH_ROWS:
+                try:
+                    items.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            for item in items:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                elif item[0] == _STAGE:
+                    stage, ms = item[1]
+                    hist = window.get(stage)
+                    if hist is None:
+                        hist = window[stage] = LatencyHistogram()
+                    hist.record_ms(ms)
+                else:
+                    rows.setdefault(item[0], []).append(item[1])
+            now = time.time()
+            if window and (stop or waiters or now - window_start >= self.rollup_s):
+                rows["timings"] = [(now, stage, s["count"], s["mean_ms"], s["p50_ms"], s["p90_ms"],
+                                    s["p99_ms"], s["max_ms"])
+                                   for stage, s in ((st, h.summary()) for st, h in sorted(window.items()))]
+                window = {}
+                window_start = now
+            if rows and conn is None:
+                try:
+                    conn = connect(self.path)
+                except sqlite3.Error as e:
+                    print(f"⚠️ Telemetry unavailable ({e}); continuing without it")
+                    self.enabled = False
+                    rows = {}
+            if rows:
+                try:
+                    with conn:
+                        if self.session is None:  # first data: sessions without rows are never created
+                            cur = conn.execute("INSERT INTO sessions (app, started, pid) VALUES (?, ?, ?)",
+                                               (self.app, self._started, os.getpid()))
+                            self.session = cur.lastrowid
+                        for table, batch in rows.items():
+                            conn.executemany(INSERTS[table], [(self.session,) + row for row in batch])
+                    self.written += sum(len(b) for b in rows.values())
+                except sqlite3.Error as e:
+                    print(f"⚠️ Telemetry write failed: {e}")
+            for waiter in waiters:
+                waiter.set()
+        if conn is None:
+            return
+        if self.session is not None:
+            try:
+                with conn:
+                    conn.execute("UPDATE sessions SET ended = ? WHERE id = ?", (time.time(), self.session))
+            except sqlite3.Error:
+                pass
+        conn.close()
+
+    def flush(self, timeout: float = 2.0):
+        """Wait (bounded) until everything queued so far is committed (timing window included)."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        try:
+            self._q.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def close(self, timeout: float = 2.0):
+        if self._thread is None:
+            return
+        self._q.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def disable(self):
+        """Stop recording (e.g. a simulated run whose clock is virtual)."""
+        self.enabled = False
+        self.close()
+
+
+def telemetry_enabled() -> bool:
+    return os.environ.get("AUTO_TELEMETRY", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+_stores: Dict[str, Telemetry] = {}
+
+
+def get_telemetry(app: str, **kwargs) -> Telemetry:
+    if app not in _stores:
+        store = Telemetry(app, enabled=telemetry_enabled(), **kwargs)
+        atexit.register(store.close)
+        _stores[app] = store
+    return _stores[app]
+
+
+# --- Queries ---
+def parse_since(text: Optional[str]) -> float:
+    """'30d', '12h', '45m' or an epoch -> epoch seconds (0 = everything)."""
+    if not text:
+        return 0.0
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", text.strip())
+    if not m:
+        return float(text)
+    scale = {"s": 1, "m": 60, "h": 3600, "d": 86400}[m.group(2)]
+    return time.time() - float(m.group(1)) * scale
+
+
+def _print_rows(cursor: sqlite3.Cursor):
+    names = [d[0] for d in cursor.description or ()]
+    rows = cursor.fetchall()
+    widths = [max([len(n)] + [len(_cell(r[i])) for r in rows]) for i, n in enumerate(names)]
+    print("  ".join(n.ljust(w) for n, w in zip(names, widths)))
+    for r in rows:
+        print("  ".join(_cell(v).ljust(w) for v, w in zip(r, widths)))
+    print(f"({len(rows)} rows)")
+
+
+def _cell(v) -> str:
+    if isinstance(v, float):
+        if v > 1e9:  # epoch
+            return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(v))
+        return f"{v:.2f}"
+    return "" if v is None else str(v)
+
+
+def cmd_sessions(conn, args):
+    _print_rows(conn.execute(
+        """SELECT s.id, s.app, s.started, s.ended,
+                  (SELECT COUNT(*) FROM actions a WHERE a.session = s.id) AS actions,
+                  (SELECT COUNT(*) FROM detections d WHERE d.session = s.id) AS detections,
+                  (SELECT COUNT(*) FROM ticks k WHERE k.session = s.id) AS ticks
+           FROM sessions s WHERE s.started >= ? AND (? IS NULL OR s.app = ?)
+           ORDER BY s.started DESC LIMIT ?""",
+        (parse_since(args.since), args.app, args.app, args.limit)))
+
+
+def cmd_stages(conn, args):
+    # Weighted mean over rollups; quantiles are shown as the worst window's value
+    _print_rows(conn.execute(
+        """SELECT t.stage, SUM(t.n) AS n, SUM(t.mean_ms * t.n) / SUM(t.n) AS mean_ms,
+                  MAX(t.p99_ms) AS worst_p99_ms, MAX(t.max_ms) AS max_ms
+           FROM timings t JOIN sessions s ON s.id = t.session
+           WHERE t.t >= ? AND (? IS NULL OR s.app = ?)
+           GROUP BY t.stage ORDER BY t.stage""",
+        (parse_since(args.since), args.app, args.app)))
+
+
+def cmd_actions(conn, args):
+    _print_rows(conn.execute(
+        """SELECT a.kind, a.target, COUNT(*) AS n, AVG(a.duration_ms) AS avg_ms
+           FROM actions a JOIN sessions s ON s.id = a.session
+           WHERE a.t >= ? AND (? IS NULL OR s.app = ?)
+           GROUP BY a.kind, a.target ORDER BY n DESC""",
+        (parse_since(args.since), args.app, args.app)))
+
+
+# --- Import of the old ad-hoc files ---
+def _imported(conn, app: str) -> bool:
+    return conn.execute("SELECT 1 FROM sessions WHERE app = ? LIMIT 1", (app,)).fetchone() is not None
+
+
+def _legacy_session(conn, app: str, rows_t: Iterable[float]) -> int:
+    ts = list(rows_t)
+    cur = conn.execute("INSERT INTO sessions (app, started, ended, pid) VALUES (?, ?, ?, NULL)",
+                       (app, min(ts) if ts else time.time(), max(ts) if ts else None))
+    return cur.lastrowid
+
+
+def _damage_rows(sid: Optional[int], damage: List[dict]) -> List[tuple]:
+    from datetime import datetime
+    return [(sid, datetime.fromisoformat(d["timestamp"]).timestamp(), "damage", 1,
+             d["position"][0], d["position"][1], d.get("confidence"), d["damage"]) for d in damage]
+
+
+def _import_jsonl_tail(conn, path: str) -> int:
+    """Import the damage records appended to `path` since the last import.
+
+    Progress is a byte offset per file, keyed by a hash of the file's first
+    line so it follows the file when event_log rotation renames it to
+    .jsonl.1, .jsonl.2, ... A torn last line is left for the next run.
+    """
+    with open(path, "rb") as f:
+        first = f.readline()
+        if not first.endswith(b"\n"):
+            return 0
+        source = "damage_log:" + hashlib.sha1(first).hexdigest()
+        row = conn.execute("SELECT session, bytes_read FROM imports WHERE source = ?", (source,)).fetchone()
+        sid, start = row if row else (None, 0)
+        f.seek(start)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    if end <= 0:
+        return 0
+    damage = []
+    for line in data[:end].decode("utf-8", errors="replace").splitlines():
+        if not line.strip():
+            continue
+        try:
+            damage.append(json.loads(line))
+        except ValueError:
+            continue
+    rows = _damage_rows(sid, damage)
+    ts = [r[1] for r in rows]
+    if sid is None:
+        sid = _legacy_session(conn, f"legacy:{os.path.basename(path)}", ts)
+        rows = [(sid,) + r[1:] for r in rows]
+    elif ts:
+        conn.execute("UPDATE sessions SET started = MIN(started, ?), ended = MAX(COALESCE(ended, ?), ?) WHERE id = ?",
+                     (min(ts), max(ts), max(ts), sid))
+    conn.executemany(INSERTS["detections"], rows)
+    conn.execute("INSERT OR REPLACE INTO imports (source, session, bytes_read) VALUES (?, ?, ?)",
+                 (source, sid, start + end))
+    return len(rows)
+
+
+def import_legacy(conn, data_dir: str = DATA_DIR) -> Dict[str, int]:
+    """Copy the old telemetry files into the store (each file becomes one session; imported ones are skipped).
+
+    damage_log.jsonl and its rotated files are append-only, so they are
+    imported incrementally: rerunning picks up records written since.
+    """
+    from datetime import datetime
+    counts: Dict[str, int] = {}
+    with conn:
+        path = os.path.join(data_dir, "click_timing.csv")
+        if os.path.exists(path) and not _imported(conn, "legacy:click_timing"):
+            with open(path, newline="") as f:
+                rows = list(csv.DictReader(f))
+            sid = _legacy_session(conn, "legacy:click_timing", (int(r["timestamp_ms"]) / 1000.0 for r in rows))
+            conn.executemany(INSERTS["actions"], [
+                (sid, int(r["timestamp_ms"]) / 1000.0, "click", None, int(r["mouse_x"]), int(r["mouse_y"]), None,
+                 None, None, int(r["digit"]) if r.get("digit") else None,
+                 float(r["ms_since_last_digit_change"]) if r.get("ms_since_last_digit_change") else None)
+                for r in rows])
+            counts["click_timing"] = len(rows)
+
+        path = os.path.join(data_dir, "damage_log.json")
+        if os.path.exists(path) and not _imported(conn, "legacy:damage_log"):
+            with open(path, encoding="utf-8") as f:
+                damage = json.load(f)
+            sid = _legacy_session(conn, "legacy:damage_log",
+                                  (datetime.fromisoformat(d["timestamp"]).timestamp() for d in damage))
+            conn.executemany(INSERTS["detections"], _damage_rows(sid, damage))
+            counts["damage_log"] = len(damage)
+
+        # Oldest rotated file first, the live file last
+        base = os.path.join(data_dir, "damage_log.jsonl")
+        rotated = [p for p in glob.glob(base + ".*") if p.rsplit(".", 1)[1].isdigit()]
+        for path in sorted(rotated, key=lambda p: -int(p.rsplit(".", 1)[1])) + [base]:
+            if os.path.exists(path):
+                n = _import_jsonl_tail(conn, path)
+                if n:
+                    counts[os.path.basename(path)] = n
+
+        path = os.path.join(data_dir, "flick_timing.json")
+        if os.path.exists(path) and not _imported(conn, "legacy:flick_timing"):
+            with open(path, encoding="utf-8") as f:
+                flick = json.load(f)
+            t = os.path.getmtime(path)
+            sid = _legacy_session(conn, "legacy:flick_timing", [t])
+            conn.executemany(INSERTS["timings"], [
+                (sid, t, "flick.sample", 1, ms, ms, ms, ms, ms) for ms in flick.get("samples", [])])
+            counts["flick_timing"] = len(flick.get("samples", []))
+
+        for path in sorted(glob.glob(os.path.join(data_dir, "mouse_profile_*.jsonl"))):
+            if _imported(conn, f"legacy:{os.path.basename(path)}"):
+                continue
+            with open(path, encoding="utf-8") as f:
+                events = [json.loads(line) for line in f if line.strip()]
+            # Profile times are perf_counter(); anchor the file at its mtime
+            offset = os.path.getmtime(path) - (events[-1]["t"] if events else 0.0)
+            sid = _legacy_session(conn, f"legacy:{os.path.basename(path)}", (e["t"] + offset for e in events))
+            conn.executemany(INSERTS["actions"], [
+                (sid, e["t"] + offset, e.get("type", "event"), e.get("button"), e.get("x"), e.get("y"), e.get("key"),
+                 None, None, None, None)
+                for e in events])
+            counts[os.path.basename(path)] = len(events)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the local telemetry store")
+    parser.add_argument("--db", default=DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("sessions", "List sessions with row counts"),
+                            ("stages", "Stage latency over a time range"),
+                            ("actions", "Action counts by kind and target")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--app")
+        p.add_argument("--since", help="e.g. 7d, 12h, 30m (default: everything)")
+        if name == "sessions":
+            p.add_argument("--limit", type=int, default=50)
+    p = sub.add_parser("sql", help="Run a read-only SQL query")
+    p.add_argument("query")
+    p = sub.add_parser("import-legacy", help="Import click_timing.csv, damage_log.json(l), flick_timing.json, "
+                                             "mouse_profile_*.jsonl")
+    p.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args()
+
+    if args.command == "import-legacy":
+        conn = connect(args.db)
+        for name, n in import_legacy(conn, args.data_dir).items():
+            print(f"📥 {name}: {n} rows")
+        conn.close()
+        return 0
+    if not os.path.exists(args.db):
+        print(f"❌ No telemetry database at {args.db}")
+        return 1
+    conn = connect(args.db, readonly=True)
+    if args.command == "sql":
+        _print_rows(conn.execute(args.query))
+    else:
+        {"sessions": cmd_sessions, "stages": cmd_stages, "actions": cmd_actions}[args.command](conn, args)
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,11 +4,16 @@ Attack Flicker
 
 Detect the orange attack timer (bar + digit) above the player and flick
 Quick-prayer when the countdown shows the target tick value (default 2).
+Toggles are handed to the input scheduler at a deadline from the online
+latency model (latency_model.py) so the press lands in the middle of the
+tick whatever the current capture, detect and input latencies are, while
+the capture/detect loop keeps running.
 
 Hotkeys:
 - p: pause / resume
 - q: quit
 - 0..4: set target tick value (e.g., press '2' to flick at 2 ticks)
+- k: start / stop the sampling profiler (writes data/profiles/*.folded)
 
 Requirements:
 - Uses color detection (HSV) to isolate the orange UI elements
@@ -49,6 +54,11 @@ except Exception:
 try:
     from pynput import keyboard
     from funcs import AutoActionFunctions
+    from input_scheduler import get_input_scheduler, now as sched_now
+    from latency_model import get_latency_model
+    from event_channel import get_publisher
+    from profiler import get_profiler
+    from telemetry import get_telemetry
     # Template-based '1' detector (no OCR)
     from tm_detect import (
         load_one_templates,
@@ -131,8 +141,8 @@ DETECTION_MODE = True  # if True, sync to detected ticks; if False, pure 1-tick
 # Template mode to detect orange digits via templates
 USE_TEMPLATE_ONE = True   # detect '1' for logging/diagnostics
 USE_TEMPLATE_TWO = True   # detect '2' to toggle ON and '4' to toggle OFF
-PRE_DELAY_MS: Optional[float] = 40.0  # default small delay after '1' (ms)
 MIN_COOLDOWN_MS = 200                 # minimum ms between flicks to prevent double fire
+FLICK_BUSY_MS = 250                   # input claim announced to other scripts per flick
 
 
 def on_key_press(key):
@@ -171,6 +181,8 @@ def on_key_press(key):
             global FULL_SCAN
             FULL_SCAN = not FULL_SCAN
             print(f"🖼️ Search area: {'FULL SCREEN' if FULL_SCAN else 'CENTER ROI'}")
+        elif key.char == 'k':
+            get_profiler("attack_flicker").toggle()
         
     except AttributeError:
         pass
@@ -318,7 +330,7 @@ def detect_orange_digit(frame):
 
 
 def main():
-    print("Hotkeys: p=pause/resume, q=quit, c=set ROI near timer, x=clear ROI, d=debug, o=toggle OCR, m=toggle detection mode")
+    print("Hotkeys: p=pause/resume, q=quit, c=set ROI near timer, x=clear ROI, d=debug, o=toggle OCR, m=toggle detection mode, k=profile")
     print("⏸️  PAUSED - Press 'p' to start")
 
     funcs = AutoActionFunctions()
@@ -329,7 +341,12 @@ def main():
     listener = keyboard.Listener(on_press=on_key_press)
     listener.start()
 
-    global TICK_MS, SYNCED, cycle_start_ms, next_flick_ms, PRE_DELAY_MS
+    # Tick boundaries and flick claims for other scripts (see event_channel.py)
+    events = get_publisher("attack_flicker")
+    telemetry = get_telemetry("attack_flicker")
+    tick_index = 0
+
+    global TICK_MS, SYNCED, cycle_start_ms, next_flick_ms
     last_trigger_ts = 0.0
     last_detected_digit = None
     stability_counter = 0
@@ -372,28 +389,38 @@ def main():
             USE_TEMPLATE_ONE = False
             USE_TEMPLATE_TWO = False
 
-    # Load pre-delay from recorded data if available (based on digit 1)
+    # Online capture->detect->input latency model; toggles are delayed so they land mid-tick
+    latency = get_latency_model()
+    # Until the tick phase is known, press where recorded human clicks landed:
+    # the median ms since the toggle digit appeared
+    fallback_ms = {}
     try:
-        data_csv = os.path.join(os.path.dirname(CURRENT_DIR), 'data', 'click_timing.csv')
-        if os.path.exists(data_csv):
-            import csv, statistics
-            deltas = []
-            with open(data_csv, 'r', newline='') as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    if row.get('digit') == '1' and row.get('ms_since_last_digit_change'):
-                        try:
-                            deltas.append(float(row['ms_since_last_digit_change']))
-                        except Exception:
-                            pass
-            if deltas:
-                med = statistics.median(deltas)
-                PRE_DELAY_MS = max(0.0, med - 10.0)
-                print(f"🧪 Learned pre-delay for '1': ~{int(PRE_DELAY_MS)} ms (median-10ms)")
-            elif PRE_DELAY_MS is not None:
-                print(f"🧪 Using default pre-delay for '1': {int(PRE_DELAY_MS)} ms")
-    except Exception as _e:
-        pass
+        from click_analytics import learned_pre_delay
+        for d in (2, 4):
+            fallback_ms[d] = learned_pre_delay(d, margin_ms=0.0)
+        if any(v is not None for v in fallback_ms.values()):
+            print("🧪 Press delay after digit change until the tick phase locks: "
+                  + ", ".join(f"'{d}' ~{v:.0f} ms" for d, v in fallback_ms.items() if v is not None))
+    except Exception as e:
+        print(f"⚠️ Click timing data unavailable: {e}")
+
+    scheduler = get_input_scheduler()
+
+    def schedule_toggle(deadline: float, target: str, digit: int, change_ms: float):
+        """Press at `deadline` from the input scheduler thread; capture and detect keep running meanwhile."""
+        claim = events.claim("flick", max(0.0, deadline - sched_now()) * 1000.0 + FLICK_BUSY_MS)
+
+        def _press():
+            issued = sched_now()
+            ok = funcs.quick_prayer_toggle(use_mouse=True, settle_ms_min=50, settle_ms_max=100, hold_ms_min=55, hold_ms_max=90)
+            latency.observe_input(issued, funcs.last_press_time if ok else None)
+            events.ack("flick", ok=ok, ref=claim)
+            telemetry.action("flick", target=target, ok=ok, digit=digit, ms_since_tick=time.time() * 1000.0 - change_ms)
+            if ok:
+                print(f"⚡ Toggle {target.upper()} ({digit})")
+        scheduler.submit(deadline, _press, label=f"flick_{target}")
+    if latency.stages["input"].mean is not None:
+        print(f"🧪 Prior input latency ~{latency.input_ms():.0f} ms; toggles target {latency.target_phase:.0%} of the tick")
 
     try:
         scheduled_flick_ms = None
@@ -413,7 +440,9 @@ def main():
             if DETECTION_MODE and (USE_OCR_MODE or USE_TEMPLATE_ONE or USE_TEMPLATE_TWO):
                 if DEBUG:
                     print("📸 Capturing screen for detection...")
+                t_capture = sched_now()
                 frame = funcs.capture_screen()
+                t_frame = sched_now()
                 if frame is not None:
                     if DEBUG:
                         print(f"📸 Screen captured: {frame.shape}")
@@ -452,18 +481,20 @@ def main():
                                     intervals.pop(0)
                                 tick_ms_estimate = sum(intervals) / len(intervals)
                         last_change_ms = now
+                        tick_index += 1
+                        events.tick(digit=detected_digit, period_ms=tick_ms_estimate, index=tick_index)
+                        telemetry.tick(detected_digit, period_ms=tick_ms_estimate)
+                    t_detect = sched_now()
+                    latency.observe_frame(t_capture, t_frame, t_detect, period_ms=tick_ms_estimate,
+                                          changed=detected_digit != prev_digit and detected_digit is not None)
 
                     # Toggle ON when '2' appears; OFF when '4' appears
                     if detected_digit == 2 and prev_digit != 2 and (now - last_trigger_ts) > MIN_COOLDOWN_MS:
-                        ok = funcs.quick_prayer_toggle(use_mouse=True, settle_ms_min=50, settle_ms_max=100, hold_ms_min=55, hold_ms_max=90)
-                        if ok:
-                            print("⚡ Toggle ON (2)")
-                            last_trigger_ts = now
+                        schedule_toggle(latency.press_deadline(t_detect, fallback_ms=fallback_ms.get(2)), "on", 2, last_change_ms)
+                        last_trigger_ts = now
                     if detected_digit == 4 and prev_digit != 4 and (now - last_trigger_ts) > MIN_COOLDOWN_MS:
-                        ok = funcs.quick_prayer_toggle(use_mouse=True, settle_ms_min=50, settle_ms_max=100, hold_ms_min=55, hold_ms_max=90)
-                        if ok:
-                            print("⚡ Toggle OFF (4)")
-                            last_trigger_ts = now
+                        schedule_toggle(latency.press_deadline(t_detect, fallback_ms=fallback_ms.get(4)), "off", 4, last_change_ms)
+                        last_trigger_ts = now
                     
                     # Log only when digit changes and we actually know the digit
                     if detected_digit != prev_digit and detected_digit is not None:
@@ -473,7 +504,30 @@ def main():
             
             else:
                 # Fallback: pure timing mode (flick every tick)
-                if next_flick_ms is not None and now >= next_flick_ms:
+                if next_flick_ms is None and funcs.qp_center:
+                    next_flick_ms = now + 400.0
+                if next_flick_ms is not None and funcs.qp_center and (next_flick_ms - now) <= 400.0:
+                    # Claim the input from now until the scheduled flick has played out
+                    events.claim("flick", max(0.0, next_flick_ms - now) + FLICK_BUSY_MS)
+                    # Hand the flick to the input scheduler with an absolute deadline
+                    plan = funcs.pray_tick_at(
+                        sched_now() + max(0.0, next_flick_ms - now) / 1000.0,
+                        min_gap_ms=45,
+                        max_gap_ms=75,
+                        hold_on_ms_min=40,
+                        hold_on_ms_max=70,
+                        hold_off_ms_min=40,
+                        hold_off_ms_max=70,
+                    )
+                    last_trigger_ts = now
+                    next_flick_ms += TICK_MS
+                    if plan is not None:
+                        print("⚡ Timing-based flick (scheduled)")
+                elif next_flick_ms is not None and now >= next_flick_ms:
+                    tick_index += 1
+                    events.tick(period_ms=TICK_MS, index=tick_index)
+                    telemetry.tick(None, period_ms=TICK_MS)
+                    claim = events.claim("flick", FLICK_BUSY_MS)
                     ok = funcs.pray_tick(
                         use_mouse=True,
                         min_gap_ms=45,
@@ -485,6 +539,8 @@ def main():
                         hold_off_ms_min=40,
                         hold_off_ms_max=70,
                     )
+                    events.ack("flick", ok=ok, ref=claim)
+                    telemetry.action("flick", target="tick", ok=ok)
                     last_trigger_ts = now
                     next_flick_ms += TICK_MS
                     while next_flick_ms <= now:
@@ -501,6 +557,9 @@ def main():
 
     finally:
         listener.stop()
+        get_input_scheduler().print_stats()
+        latency.print_summary()
+        latency.save()
         print("👋 Exiting attack flicker")
 
 
@@ -41,6 +41,8 @@ sys.path.append(CURRENT_DIR)
 # Import helpers
 from funcs import AutoActionFunctions
 from tm_detect import load_digit_templates, detect_digit_from_frame
+from input_scheduler import now as sched_now
+from latency_model import get_latency_model
 from pynput import keyboard
 
 
@@ -54,6 +56,7 @@ def main():
     print("⏸️  PAUSED - Press 'p'. It will NOT toggle until you provide enough '+' samples.")
 
     funcs = AutoActionFunctions()
+    latency = get_latency_model()  # toggles here also train attack_flicker's input latency
 
     # Templates
     templates_dir = os.path.join(CURRENT_DIR, 'templates')
@@ -208,7 +211,9 @@ def main():
             # Execute if due
             now = time.time() * 1000.0
             if last_schedule_time is not None and now >= last_schedule_time:
+                issued = sched_now()
                 ok = funcs.quick_prayer_toggle(use_mouse=True, settle_ms_min=60, settle_ms_max=110, hold_ms_min=55, hold_ms_max=90)
+                latency.observe_input(issued, funcs.last_press_time if ok else None)
                 if ok:
                     print("⚡ toggle")
                 last_toggle_time = now
@@ -216,6 +221,7 @@ def main():
             time.sleep(0.02)
     finally:
         listener.stop()
+        latency.save()
         print("👋 Exiting calibrator")
 
 
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Click Timing Analytics
+
+Column-wise, incremental view of data/click_timing.csv (written by
+record_click_timing.py) that stays instant as the file grows to millions of
+rows:
+
+- Columns: each CSV column is kept as a raw binary file under
+  data/click_timing.cols/ and opened with np.memmap. refresh() parses only
+  the bytes appended to the CSV since the last run and appends them to the
+  column files; a truncated or replaced CSV triggers a rebuild.
+- Sessions: rows are split into sessions at gaps longer than `session_gap_s`.
+- Sketches: a mergeable quantile sketch (relative-error log buckets, like
+  DDSketch) per session and digit, persisted in sketches.json. Quantiles for
+  a digit over any set of sessions come from merging a handful of sketches,
+  never from rescanning rows.
+
+Usage:
+    store = get_click_store()               # refreshes on first use
+    store.sketch(digit=1).quantile(0.5)     # median ms since digit change
+    cols = store.columns()                  # dict of np.memmap arrays
+    learned_pre_delay(1, margin_ms=10)      # attack_flicker's press delay until the tick phase locks
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(os.path.dirname(BASE_DIR), "data")
+CSV_PATH = os.path.join(DATA_DIR, "click_timing.csv")
+HEADER = "timestamp_ms,digit,digit_conf,ms_since_last_digit_change,mouse_x,mouse_y"
+
+# Column name -> dtype; missing digit is -1, missing delta/conf NaN
+COLUMNS = {
+    "timestamp_ms": np.int64,
+    "digit": np.int8,
+    "digit_conf": np.float32,
+    "delta_ms": np.float32,
+    "mouse_x": np.int32,
+    "mouse_y": np.int32,
+    "session": np.int32,
+}
+DEFAULT_SESSION_GAP_S = 600.0
+HEAD_BYTES = 256  # start of the CSV, to notice a replaced file
+DEFAULT_RELATIVE_ERROR = 0.005
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with bounded relative error.
+
+    Positive values go to bucket ceil(log_gamma(v)), so any quantile is
+    returned within `relative_error` of a value of the right rank; zero and
+    negative values are counted in a single zero bucket. Merging adds bucket
+    counts, so the sketch of a union is exact to the same error.
+    """
+
+    def __init__(self, relative_error: float = DEFAULT_RELATIVE_ERROR):
+        self.relative_error = relative_error
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add_many(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        self.count += int(values.size)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > 0]
+        self.zero += int(values.size - positive.size)
+        if positive.size:
+            keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64),
+                                     return_counts=True)
+            for k, c in zip(keys.tolist(), counts.tolist()):
+                self.buckets[k] = self.buckets.get(k, 0) + c
+
+    def add(self, value: float):
+        self.add_many(np.array([value]))
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if abs(other.gamma - self.gamma) > 1e-12:
+            raise ValueError("cannot merge sketches with different relative error")
+        for k, c in other.buckets.items():
+            self.buckets[k] = self.buckets.get(k, 0) + c
+        self.zero += other.zero
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        if rank < self.zero:
+            return min(max(0.0, self.min), self.max)
+        seen = self.zero
+        for k in sorted(self.buckets):
+            seen += self.buckets[k]
+            if seen > rank:
+                value = 2 * self.gamma ** k / (self.gamma + 1)  # bucket midpoint (relative)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        keys = sorted(self.buckets)
+        return {"relative_error": self.relative_error, "count": self.count, "zero": self.zero,
+                "min": self.min if self.count else None, "max": self.max if self.count else None,
+                "keys": keys, "counts": [self.buckets[k] for k in keys]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(data.get("relative_error", DEFAULT_RELATIVE_ERROR))
+        sketch.buckets = dict(zip(data["keys"], data["counts"]))
+        sketch.zero = data["zero"]
+        sketch.count = data["count"]
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+
+def _to_numbers(values, missing: float) -> np.ndarray:
+    """Strings -> float64 in one vectorized cast ('' becomes `missing`); per value only if some are bad."""
+    arr = np.array(values, dtype=str)
+    arr = arr.astype(f"<U{max(3, arr.dtype.itemsize // 4)}")  # room for "nan" in one-character columns
+    arr[np.char.str_len(arr) == 0] = "nan"
+    try:
+        out = arr.astype(np.float64)
+    except ValueError:
+        out = np.array([_number_or_nan(v) for v in arr], dtype=np.float64)
+    out[np.isnan(out)] = missing
+    return out
+
+
+def _number_or_nan(v: str) -> float:
+    try:
+        return float(v)
+    except ValueError:
+        return math.nan
+
+
+def _parse_lines(lines: List[str]) -> Dict[str, np.ndarray]:
+    """CSV rows -> column arrays ('' becomes -1 / NaN). Malformed rows are skipped."""
+    rows = [r for r in (line.split(",") for line in lines) if len(r) == 6 and r[0].isdigit()]
+    cols = list(zip(*rows)) if rows else [()] * 6
+    return {
+        "timestamp_ms": np.array(cols[0], dtype=str).astype(np.int64) if rows else np.empty(0, np.int64),
+        "digit": _to_numbers(cols[1], -1).astype(np.int8),
+        "digit_conf": _to_numbers(cols[2], math.nan).astype(np.float32),
+        "delta_ms": _to_numbers(cols[3], math.nan).astype(np.float32),
+        "mouse_x": _to_numbers(cols[4], 0).astype(np.int32),
+        "mouse_y": _to_numbers(cols[5], 0).astype(np.int32),
+    }
+
+
+class ClickTimingStore:
+    def __init__(self, csv_path: str = CSV_PATH, cache_dir: Optional[str] = None,
+                 session_gap_s: float = DEFAULT_SESSION_GAP_S):
+        self.csv_path = csv_path
+        self.cache_dir = cache_dir or os.path.splitext(csv_path)[0] + ".cols"
+        self.session_gap_s = session_gap_s
+        self.meta_path = os.path.join(self.cache_dir, "meta.json")
+        self.sketch_path = os.path.join(self.cache_dir, "sketches.json")
+        self.meta: dict = {}
+        self.sessions: Dict[int, dict] = {}
+        self._load()
+
+    # --- Cache files ---
+    def _col_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}.bin")
+
+    def _load(self):
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                self.meta = json.load(f)
+            with open(self.sketch_path, encoding="utf-8") as f:
+                raw = json.load(f)
+            self.sessions = {int(sid): {**s, "digits": {int(d): QuantileSketch.from_dict(sk)
+                                                        for d, sk in s["digits"].items()}}
+                             for sid, s in raw.items()}
+        except (OSError, ValueError, KeyError):
+            self._reset()
+
+    def _reset(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for name in COLUMNS:
+            open(self._col_path(name), "wb").close()
+        self.meta = {"offset": 0, "rows": 0, "session_gap_s": self.session_gap_s, "last_ts": None, "session": -1}
+        self.sessions = {}
+
+    def _save(self):
+        raw = {str(sid): {**s, "digits": {str(d): sk.to_dict() for d, sk in s["digits"].items()}}
+               for sid, s in self.sessions.items()}
+        for path, data in ((self.sketch_path, raw), (self.meta_path, self.meta)):
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+
+    # --- Ingest ---
+    def refresh(self) -> int:
+        """Ingest rows appended to the CSV since the last call; returns the number of new rows."""
+        if not os.path.exists(self.csv_path):
+            return 0
+        size = os.path.getsize(self.csv_path)
+        with open(self.csv_path, "rb") as f:
+            head = f.read(HEAD_BYTES).decode("utf-8", errors="replace")
+        if (size < self.meta.get("offset", 0) or self.meta.get("session_gap_s") != self.session_gap_s
+                or (self.meta.get("offset") and not head.startswith(self.meta.get("head", "")))):
+            self._reset()  # CSV truncated/replaced or sessions defined differently: rebuild
+        elif not self._trim_columns():
+            self._reset()  # a column file lost rows: rebuild
+        offset = self.meta["offset"]
+        if size == offset:
+            return 0
+        with open(self.csv_path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1  # only complete lines; a row being written is picked up next time
+        if end <= 0:
+            return 0
+        lines = chunk[:end].decode("utf-8", errors="replace").splitlines()
+        if offset == 0 and lines and lines[0].startswith("timestamp_ms"):
+            lines = lines[1:]
+        cols = _parse_lines(lines)
+        n = len(cols["timestamp_ms"])
+        if n:
+            cols["session"] = self._assign_sessions(cols["timestamp_ms"])
+            for name, dtype in COLUMNS.items():
+                with open(self._col_path(name), "ab") as f:
+                    cols[name].astype(dtype).tofile(f)
+            self._update_sketches(cols)
+        self.meta["offset"] = offset + end
+        if not self.meta.get("head"):
+            self.meta["head"] = head[:min(len(head), self.meta["offset"])]
+        self.meta["rows"] += n
+        self._save()
+        return n
+
+    def _trim_columns(self) -> bool:
+        """Cut column files back to meta['rows'] (an interrupted refresh may have appended
+        rows it never recorded); False if a file is shorter than that."""
+        rows = self.meta["rows"]
+        for name, dtype in COLUMNS.items():
+            path = self._col_path(name)
+            want = rows * np.dtype(dtype).itemsize
+            have = os.path.getsize(path) if os.path.exists(path) else 0
+            if have < want:
+                return False
+            if have > want:
+                os.truncate(path, want)
+        return True
+
+    def _assign_sessions(self, ts: np.ndarray) -> np.ndarray:
+        gap_ms = self.session_gap_s * 1000.0
+        prev = np.empty_like(ts)
+        prev[0] = ts[0] if self.meta["last_ts"] is None else self.meta["last_ts"]
+        prev[1:] = ts[:-1]
+        breaks = (ts - prev) > gap_ms
+        if self.meta["last_ts"] is None:
+            breaks[0] = True
+        sessions = self.meta["session"] + np.cumsum(breaks)
+        self.meta["last_ts"] = int(ts[-1])
+        self.meta["session"] = int(sessions[-1])
+        return sessions.astype(np.int32)
+
+    def _update_sketches(self, cols: Dict[str, np.ndarray]):
+        sessions, digits, deltas, ts = cols["session"], cols["digit"], cols["delta_ms"], cols["timestamp_ms"]
+        for sid in np.unique(sessions).tolist():
+            in_session = sessions == sid
+            info = self.sessions.setdefault(sid, {"start_ms": int(ts[in_session][0]), "end_ms": 0, "rows": 0,
+                                                  "digits": {}})
+            info["end_ms"] = int(ts[in_session][-1])
+            info["rows"] += int(in_session.sum())
+            for d in np.unique(digits[in_session]).tolist():
+                if d < 0:
+                    continue
+                values = deltas[in_session & (digits == d)]
+                info["digits"].setdefault(d, QuantileSketch()).add_many(values)
+
+    # --- Queries ---
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Every column as a read-only memmap (empty arrays before the first row)."""
+        rows = self.meta.get("rows", 0)
+        if not rows:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        return {name: np.memmap(self._col_path(name), dtype=dtype, mode="r", shape=(rows,))
+                for name, dtype in COLUMNS.items()}
+
+    def sketch(self, digit: Optional[int] = None, sessions: Optional[Iterable[int]] = None) -> QuantileSketch:
+        """Merged sketch of ms-since-digit-change for one digit (None = all) over sessions (None = all)."""
+        merged = QuantileSketch()
+        for sid in (self.sessions if sessions is None else sessions):
+            for d, sk in self.sessions.get(sid, {}).get("digits", {}).items():
+                if digit is None or d == digit:
+                    merged.merge(sk)
+        return merged
+
+    def digit_stats(self, digit: int) -> Optional[dict]:
+        """Exact stats for one digit, vectorized over the memmapped columns."""
+        cols = self.columns()
+        values = cols["delta_ms"][(cols["digit"] == digit)]
+        values = values[~np.isnan(values)].astype(np.float64)
+        if not values.size:
+            return None
+        p25, median, p75 = np.percentile(values, (25, 50, 75))
+        return {"n": int(values.size), "mean": float(values.mean()), "median": float(median),
+                "p25": float(p25), "p75": float(p75), "sd": float(values.std())}
+
+
+_stores: Dict[str, ClickTimingStore] = {}
+
+
+def get_click_store(csv_path: str = CSV_PATH) -> ClickTimingStore:
+    if csv_path not in _stores:
+        store = ClickTimingStore(csv_path)
+        store.refresh()
+        _stores[csv_path] = store
+    return _stores[csv_path]
+
+
+def learned_pre_delay(digit: int, margin_ms: float = 10.0, q: float = 0.5,
+                      csv_path: str = CSV_PATH) -> Optional[float]:
+    """Quantile `q` of ms-since-digit-change for clicks on `digit`, minus a margin (None without data)."""
+    sketch = get_click_store(csv_path).sketch(digit=digit)
+    if not sketch.count:
+        return None
+    return max(0.0, sketch.quantile(q) - margin_ms)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Online Flick Latency Model
+
+Keeps a live estimate of the capture -> detect -> input latency chain and of
+where the current game tick started, and turns them into the delay after a
+detection that lands the next press at a fixed phase of the tick (the centre
+by default). Everything updates per frame, so the offset follows the machine
+as load changes instead of being learned once at startup.
+
+- Stages: capture (grab start -> frame), detect (frame -> digit known) and
+  input (press issued -> press achieved, e.g. funcs.last_press_time) each
+  keep an EWMA mean and mean deviation (Jacobson/Karels, the TCP RTT
+  estimator) plus a short window for quantiles.
+- Tick phase: a digit change seen in a frame sampled at s_k (and not in the
+  one sampled at s_k-1) means the boundary lies in (s_k-1, s_k]. The estimate
+  is the interval midpoint, locked to the period: when the boundary predicted
+  from the last one falls inside the interval it is only nudged toward the
+  midpoint, so jittery frames do not move the phase much.
+- Landing: for every achieved press the model records its offset from the
+  estimated boundary, so centring error is visible in summary().
+
+Until the tick phase is known, a press lands `fallback_ms` after the last
+observed digit change (e.g. click_analytics.learned_pre_delay(digit), the
+recorded human click time since that digit appeared) instead of going out
+immediately.
+
+State is saved to data/flick_latency.json and loaded as the prior for the
+next run (and shared with calibrate_flick.py). All times are perf_counter
+seconds, the input_scheduler clock.
+
+Usage:
+    model = get_latency_model()
+    t0 = now(); frame = capture(); t1 = now(); digit = detect(frame); t2 = now()
+    model.observe_frame(t0, t1, t2, changed=digit != prev_digit, period_ms=tick_ms)
+    if digit == 2 and changed:
+        deadline = model.press_deadline(t2, fallback_ms=learned_pre_delay(2))
+        scheduler.submit(deadline, press)        # press(): issued = now(); toggle();
+                                                 #   model.observe_input(issued, funcs.last_press_time)
+    model.save()
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(os.path.dirname(BASE_DIR), "data", "flick_latency.json")
+DEFAULT_TICK_MS = 600.0
+DEFAULT_TARGET_PHASE = 0.5       # land presses at the centre of the tick
+PHASE_GAIN = 0.25                # pull of the interval midpoint on a locked phase
+MAX_CHANGE_GAP_S = 0.25          # ignore boundaries bracketed by frames further apart than this
+
+
+class RunningLatency:
+    """EWMA mean and mean deviation of a latency (ms), plus a recent window for quantiles."""
+
+    def __init__(self, alpha: float = 0.125, beta: float = 0.25, window: int = 64,
+                 mean: Optional[float] = None, dev: float = 0.0):
+        self.alpha = alpha
+        self.beta = beta
+        self.mean = mean
+        self.dev = dev
+        self.count = 0
+        self.recent: deque = deque(maxlen=window)
+
+    def add(self, ms: float):
+        if self.mean is None:
+            self.mean, self.dev = ms, ms / 2.0
+        else:
+            self.dev += self.beta * (abs(ms - self.mean) - self.dev)
+            self.mean += self.alpha * (ms - self.mean)
+        self.count += 1
+        self.recent.append(ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return self.mean
+        return float(np.quantile(np.fromiter(self.recent, dtype=np.float64), q))
+
+    def to_dict(self) -> dict:
+        return {"mean": self.mean, "dev": self.dev, "count": self.count}
+
+
+class FlickLatencyModel:
+    STAGES = ("capture", "detect", "input", "landing")
+
+    def __init__(self, tick_ms: float = DEFAULT_TICK_MS, target_phase: float = DEFAULT_TARGET_PHASE,
+                 path: Optional[str] = MODEL_PATH):
+        """
+        Args:
+            tick_ms: Initial tick period; observe_frame(period_ms=...) keeps it current.
+            target_phase: Where in the tick presses should land (0 = boundary, 0.5 = centre).
+            path: JSON file for the learned latencies (None = do not persist).
+        """
+        self.tick_ms = tick_ms
+        self.target_phase = target_phase
+        self.path = path
+        self.stages: Dict[str, RunningLatency] = {name: RunningLatency() for name in self.STAGES}
+        self.boundary: Optional[float] = None   # last estimated tick start (perf_counter s)
+        self.uncertainty_ms: Optional[float] = None
+        self.locked = False
+        self.late = 0
+        self.last_change: Optional[float] = None  # estimated time of the last digit change
+        self._last_sample: Optional[float] = None
+        self._load()
+
+    # --- Persistence ---
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            for name, s in data.get("stages", {}).items():
+                if name in self.stages and s.get("mean") is not None:
+                    self.stages[name].mean = float(s["mean"])
+                    self.stages[name].dev = float(s.get("dev", 0.0))
+            self.tick_ms = float(data.get("tick_ms", self.tick_ms))
+        except Exception as e:
+            print(f"⚠️ Could not load flick latency model: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"stages": {name: s.to_dict() for name, s in self.stages.items()},
+                           "tick_ms": self.tick_ms, "target_phase": self.target_phase,
+                           "updated_at": int(time.time())}, f, indent=2)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️ Could not save flick latency model: {e}")
+
+    # --- Observations ---
+    def observe_frame(self, capture_start: float, capture_end: float, detect_end: float,
+                      changed: bool = False, period_ms: Optional[float] = None):
+        """One processed frame; `changed` when its digit differs from the previous frame's."""
+        if period_ms:
+            self.tick_ms = float(period_ms)
+        self.stages["capture"].add((capture_end - capture_start) * 1000.0)
+        self.stages["detect"].add((detect_end - capture_end) * 1000.0)
+        sample = (capture_start + capture_end) / 2.0
+        prev, self._last_sample = self._last_sample, sample
+        if changed:
+            bracketed = prev is not None and sample - prev <= MAX_CHANGE_GAP_S
+            self.last_change = (prev + sample) / 2.0 if bracketed else sample
+            if bracketed:
+                self._observe_boundary(prev, sample)
+
+    def _observe_boundary(self, lo: float, hi: float):
+        mid = (lo + hi) / 2.0
+        self.uncertainty_ms = (hi - lo) * 500.0
+        predicted = self.predicted_boundary(hi)
+        if predicted is not None and lo < predicted <= hi:
+            self.boundary = predicted + PHASE_GAIN * (mid - predicted)
+            self.locked = True
+        else:
+            self.boundary = mid
+            self.locked = False
+
+    def observe_input(self, issued: float, achieved: Optional[float]):
+        """A press issued at `issued` that took effect at `achieved` (None if it failed)."""
+        if achieved is None or achieved < issued:
+            return
+        self.stages["input"].add((achieved - issued) * 1000.0)
+        boundary = self.predicted_boundary(achieved)
+        if boundary is not None:
+            self.stages["landing"].add((achieved - boundary) * 1000.0)
+
+    # --- Predictions ---
+    def predicted_boundary(self, t: float) -> Optional[float]:
+        """Start of the tick containing time `t`, extrapolated from the last estimate."""
+        if self.boundary is None:
+            return None
+        period = self.tick_ms / 1000.0
+        return self.boundary + np.floor((t - self.boundary) / period) * period
+
+    def input_ms(self) -> float:
+        return self.stages["input"].mean or 0.0
+
+    def press_deadline(self, t: float, phase: Optional[float] = None, fallback_ms: Optional[float] = None) -> float:
+        """When to issue a press so it lands at `phase` of the tick current at time `t`.
+
+        Without a boundary estimate it aims `fallback_ms` after the last digit
+        change instead (or returns `t` if that is None too). If the moment (minus
+        the expected input latency) has passed, returns `t` and counts the press
+        as late.
+        """
+        boundary = self.predicted_boundary(t)
+        if boundary is not None:
+            target = boundary + (self.target_phase if phase is None else phase) * self.tick_ms / 1000.0
+        elif fallback_ms is not None and self.last_change is not None:
+            target = self.last_change + fallback_ms / 1000.0
+        else:
+            return t
+        deadline = target - self.input_ms() / 1000.0
+        if deadline < t:
+            self.late += 1
+            return t
+        return deadline
+
+    def delay_ms(self, t: float, phase: Optional[float] = None) -> float:
+        return (self.press_deadline(t, phase) - t) * 1000.0
+
+    # --- Reporting ---
+    def summary(self) -> dict:
+        out = {name: s.to_dict() for name, s in self.stages.items()}
+        landing = self.stages["landing"]
+        out["tick_ms"] = self.tick_ms
+        out["target_ms"] = self.target_phase * self.tick_ms
+        out["landing_p10_ms"] = landing.quantile(0.1)
+        out["landing_p90_ms"] = landing.quantile(0.9)
+        out["late"] = self.late
+        return out
+
+    def print_summary(self):
+        s = self.summary()
+        parts = [f"{name}={s[name]['mean']:.1f}±{s[name]['dev']:.1f}"
+                 for name in ("capture", "detect", "input") if s[name]["mean"] is not None]
+        print(f"⏱️ Latency ms: {' '.join(parts) or 'no samples'}")
+        if s["landing"]["mean"] is not None:
+            print(f"🎯 Landing {s['landing']['mean']:.0f} ms into tick (target {s['target_ms']:.0f}, "
+                  f"p10={s['landing_p10_ms']:.0f} p90={s['landing_p90_ms']:.0f}, late={s['late']})")
+
+
+_model: Optional[FlickLatencyModel] = None
+
+
+def get_latency_model(**kwargs) -> FlickLatencyModel:
+    """Shared model, loaded from data/flick_latency.json on first use."""
+    global _model
+    if _model is None:
+        _model = FlickLatencyModel(**kwargs)
+    return _model
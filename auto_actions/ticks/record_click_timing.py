@@ -4,6 +4,7 @@ Record timing between detected orange digit changes and your mouse clicks.
 
 Writes CSV to auto_actions/data/click_timing.csv with columns:
   timestamp_ms, digit, digit_conf, ms_since_last_digit_change, mouse_x, mouse_y
+Clicks and digit changes also go to the telemetry store (data/telemetry.sqlite3).
 
 Run:
   python auto_actions/ticks/record_click_timing.py
@@ -28,6 +29,7 @@ os.makedirs(DATA_DIR, exist_ok=True)
 CSV_PATH = os.path.join(DATA_DIR, 'click_timing.csv')
 
 sys.path.append(BASE_DIR)
+sys.path.append(ROOT_DIR)
 try:
     from mss import mss  # type: ignore
 except Exception:
@@ -41,6 +43,7 @@ except Exception as e:
 
 try:
     from tm_detect import load_all_templates, classify_digit_from_frame
+    from telemetry import get_telemetry
 except Exception as e:
     print(f"❌ Import error: {e}")
     sys.exit(1)
@@ -96,6 +99,7 @@ def main():
         sys.exit(1)
 
     cap = capture_bgr()
+    telemetry = get_telemetry("click_timing")
 
     last_digit: Optional[int] = None
     last_digit_change_ms: Optional[float] = None
@@ -112,6 +116,8 @@ def main():
             with open(CSV_PATH, 'a', newline='') as f:
                 w = csv.writer(f)
                 w.writerow([int(ts), current_digit if current_digit is not None else '', f"{current_conf:.3f}", int(delta) if delta>=0 else '', x, y])
+            telemetry.action("click", x=x, y=y, digit=current_digit, ms_since_tick=delta if delta >= 0 else None,
+                             t=ts / 1000.0)
             print(f"🖱️ click: digit={current_digit} conf={current_conf:.2f} Δ={int(delta)}ms @({x},{y})")
 
     listener = mouse.Listener(on_click=on_click)
@@ -132,11 +138,13 @@ def main():
             if d is not None and d != last_digit:
                 last_digit = d
                 last_digit_change_ms = cur_ms()
+                telemetry.tick(d, confidence=current_conf, t=last_digit_change_ms / 1000.0)
             time.sleep(0.03)
     except KeyboardInterrupt:
         pass
     finally:
         listener.stop()
+        telemetry.close()
         print("👋 Stopped timing recorder")
 
 
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Timer Wheel for Periodic Background Tasks
+
+Replaces the pile of last_* timestamps and randomized intervals that bot
+loops check on every pass (re-click, camera rotates, skills/equipment
+checks, breaks) with one hashed timer wheel:
+
+- Tasks are hashed into `slots` buckets of `resolution_s` each by deadline
+  (far deadlines just wait a few more laps), so add/cancel/reschedule are O(1).
+- poll() is O(1) while nothing is due (one compare against the cached
+  earliest deadline); when something is, it walks only the buckets passed
+  since the last poll and re-takes the minimum over the handful of tasks.
+- Intervals are fixed or (min, max) ranges re-drawn after every run, like the
+  random.uniform(...) the loops used to reset by hand; `first` sets a
+  different range for the first run.
+- run_due() runs due tasks cooperatively: it stops after `budget_s` or as
+  soon as `should_yield()` is true, and leftover tasks run first next pass,
+  so background chores never hold up tick-critical work.
+- next_delay() is the time until the next deadline, for the loop's sleep.
+
+Usage:
+    wheel = TimerWheel(timer=metrics)                  # timer(stage, ms) per task run
+    wheel.every("camera_rotate", (45, 90), gentle_camera_rotate)
+    wheel.every("skills_check", (60, 120), check_skills, first=(90, 160))
+    while running:
+        ...tick-critical work...
+        wheel.run_due(budget_s=0.2, should_yield=lambda: flick_due_soon())
+        time.sleep(min(0.05, wheel.next_delay()))
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+Interval = Union[float, Tuple[float, float]]
+
+DEFAULT_RESOLUTION_S = 0.1
+DEFAULT_SLOTS = 512  # one lap = 51.2 s at the default resolution
+
+
+def _clock() -> float:
+    # Looked up per call so a patched clock (simulator.SimClock) is honoured
+    return time.perf_counter()
+
+
+def _draw(interval: Interval) -> float:
+    if isinstance(interval, (tuple, list)):
+        return random.uniform(*interval)
+    return float(interval)
+
+
+class TimerTask:
+    __slots__ = ("name", "fn", "interval", "deadline", "tick", "queued", "runs", "total_ms", "max_ms",
+                 "last_run")
+
+    def __init__(self, name: str, fn: Callable[[], object], interval: Optional[Interval]):
+        self.name = name
+        self.fn = fn
+        self.interval = interval  # None = one-shot
+        self.deadline = 0.0
+        self.tick = 0
+        self.queued = False  # popped as due, waiting in run_due's queue
+        self.runs = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_run: Optional[float] = None
+
+
+class TimerWheel:
+    def __init__(self, resolution_s: float = DEFAULT_RESOLUTION_S, slots: int = DEFAULT_SLOTS,
+                 clock: Callable[[], float] = _clock,
+                 timer: Optional[Callable[[str, float], None]] = None, debug: bool = False):
+        """
+        Args:
+            resolution_s: Bucket width; tasks fire up to one bucket late at most.
+            slots: Buckets per lap.
+            clock: Time source in seconds (perf_counter by default).
+            timer: Optional fn(stage, ms) fed 'task:<name>' for every run.
+        """
+        self.resolution_s = resolution_s
+        self.clock = clock
+        self.timer = timer
+        self.debug = debug
+        self._origin = clock()
+        self._wheel: List[Dict[str, TimerTask]] = [{} for _ in range(slots)]
+        self._tasks: Dict[str, TimerTask] = {}
+        self._cursor = 0  # next tick index to examine
+        self._next_due = float("inf")
+        self._ready: deque = deque()  # due but not yet run (budget ran out / yielded)
+
+    # --- Registration ---
+    def every(self, name: str, interval: Interval, fn: Callable[[], object],
+              first: Optional[Interval] = None) -> TimerTask:
+        """Run `fn` every `interval` seconds (a (min, max) range is re-drawn each time)."""
+        task = TimerTask(name, fn, interval)
+        self._add(task, _draw(interval if first is None else first))
+        return task
+
+    def after(self, name: str, delay_s: float, fn: Callable[[], object]) -> TimerTask:
+        """Run `fn` once, `delay_s` seconds from now."""
+        task = TimerTask(name, fn, None)
+        self._add(task, delay_s)
+        return task
+
+    def cancel(self, name: str) -> bool:
+        task = self._tasks.pop(name, None)
+        if task is None:
+            return False
+        self._unlink(task)
+        return True
+
+    def reschedule(self, name: str, delay_s: Optional[float] = None):
+        """Move a task's next run to `delay_s` from now (None = a fresh interval)."""
+        task = self._tasks.get(name)
+        if task is None:
+            return
+        self._unlink(task)
+        self._insert(task, self.clock() + (_draw(task.interval) if delay_s is None else delay_s))
+
+    def _add(self, task: TimerTask, delay_s: float):
+        if task.name in self._tasks:
+            self.cancel(task.name)
+        self._tasks[task.name] = task
+        self._insert(task, self.clock() + delay_s)
+
+    # --- Wheel internals ---
+    def _insert(self, task: TimerTask, deadline: float):
+        task.deadline = deadline
+        # Never behind the cursor, or the task would wait a full lap
+        task.tick = max(self._cursor, int((deadline - self._origin) / self.resolution_s))
+        self._wheel[task.tick % len(self._wheel)][task.name] = task
+        self._next_due = min(self._next_due, deadline)
+
+    def _unlink(self, task: TimerTask):
+        self._wheel[task.tick % len(self._wheel)].pop(task.name, None)
+        if task.queued:
+            self._ready.remove(task)
+            task.queued = False
+
+    def poll(self, now: Optional[float] = None) -> List[TimerTask]:
+        """Pop the tasks whose deadline has passed (earliest first)."""
+        now = self.clock() if now is None else now
+        if now < self._next_due:
+            return []
+        current = int((now - self._origin) / self.resolution_s)
+        slots = len(self._wheel)
+        due: List[TimerTask] = []
+        # After a long stall every bucket is visited once instead of once per elapsed tick
+        for tick in range(self._cursor, min(current, self._cursor + slots - 1) + 1):
+            bucket = self._wheel[tick % slots]
+            for name, task in list(bucket.items()):
+                if task.tick <= current and task.deadline <= now:
+                    del bucket[name]
+                    task.queued = True
+                    due.append(task)
+        # The current bucket is looked at again next time (deadlines later in this tick)
+        self._cursor = current
+        self._next_due = min((t.deadline for t in self._tasks.values() if not t.queued), default=float("inf"))
+        due.sort(key=lambda t: t.deadline)
+        return due
+
+    # --- Running ---
+    def run_due(self, budget_s: Optional[float] = None,
+                should_yield: Optional[Callable[[], bool]] = None) -> int:
+        """Run due tasks until done, `budget_s` is spent or `should_yield()`; returns tasks run.
+
+        Leftovers stay queued and run first on the next call. Periodic tasks
+        are rescheduled from when they finished, one-shots are dropped.
+        """
+        self._ready.extend(self.poll())
+        start = time.perf_counter()
+        ran = 0
+        while self._ready:
+            if should_yield is not None and should_yield():
+                break
+            if budget_s is not None and ran and time.perf_counter() - start >= budget_s:
+                break
+            task = self._ready.popleft()
+            task.queued = False
+            t0 = time.perf_counter()
+            try:
+                task.fn()
+            except Exception as e:
+                print(f"⚠️ Background task '{task.name}' failed: {e}")
+            ms = (time.perf_counter() - t0) * 1000.0
+            task.runs += 1
+            task.total_ms += ms
+            task.max_ms = max(task.max_ms, ms)
+            task.last_run = self.clock()
+            ran += 1
+            if self.timer is not None:
+                self.timer(f"task:{task.name}", ms)
+            if self.debug:
+                print(f"⏲️ {task.name} ran in {ms:.0f} ms")
+            if self._tasks.get(task.name) is not task:
+                continue  # cancelled or replaced while running
+            if task.interval is None:
+                del self._tasks[task.name]
+            elif self._wheel[task.tick % len(self._wheel)].get(task.name) is not task:  # not rescheduled by fn
+                self._insert(task, task.last_run + _draw(task.interval))
+        return ran
+
+    # --- Queries ---
+    def next_delay(self, now: Optional[float] = None) -> float:
+        """Seconds until the next deadline (0 if something is due or queued, inf if idle)."""
+        if self._ready:
+            return 0.0
+        now = self.clock() if now is None else now
+        return max(0.0, self._next_due - now)
+
+    def time_until(self, name: str, now: Optional[float] = None) -> Optional[float]:
+        task = self._tasks.get(name)
+        if task is None:
+            return None
+        if task.queued:
+            return 0.0
+        return max(0.0, task.deadline - (self.clock() if now is None else now))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tasks
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: {"runs": t.runs, "mean_ms": t.total_ms / t.runs if t.runs else 0.0,
+                       "max_ms": t.max_ms, "next_in_s": self.time_until(name)}
+                for name, t in self._tasks.items()}
+
+    def print_stats(self):
+        if not self._tasks:
+            return
+        print("⏲️ Background tasks:")
+        for name, s in sorted(self.stats().items()):
+            print(f"   - {name}: runs={s['runs']} mean={s['mean_ms']:.0f} ms max={s['max_ms']:.0f} ms "
+                  f"next in {s['next_in_s']:.0f}s")
@@ -17,10 +17,19 @@ from pynput import keyboard
 # Add auto_actions to path for skill testing
 auto_actions_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "auto_actions")
 sys.path.append(auto_actions_dir)
+from state_machine import StateMachine
+from timer_wheel import TimerWheel
+from capture_rate import CaptureRate
+from profiler import get_profiler
+
+# High alch takes 5 game ticks (3.0 s); the spellbook is back well before that,
+# so don't re-cast until most of the delay has passed since the darts click
+ALCH_RECAST_S = (2.3, 2.6)
 
 # Configure pyautogui for safety
 pyautogui.FAILSAFE = True  # Move mouse to corner to stop
 pyautogui.PAUSE = 0.1  # Small pause between actions
+STATUS_INTERVAL_S = 5.0  # non-debug status line cadence
 
 class SimpleAutoAlch:
     def __init__(self):
@@ -29,25 +38,13 @@ class SimpleAutoAlch:
         self.click_count = 0
         self.is_running = False
         self.is_paused = True
+        self.profiler = get_profiler("high_alch")
         
         # Humanization settings
         self.session_start_time = time.time()
-        self.last_break_time = time.time()
-        self.break_interval = random.randint(600, 1200)  # 10-20 minutes
+        self.break_interval = random.randint(600, 1200)  # first break after 10-20 minutes
         self.break_duration = random.randint(30, 120)  # 30 seconds - 2 minutes
         
-        # State tracking
-        self.waiting_for_alch_spell = True
-        self.waiting_for_darts = False
-        
-        # Recovery tracking
-        self.dart_fail_count = 0
-        self.max_dart_fails = 3  # After 3 failed attempts, try inventory recovery
-        
-        # Alch spell recovery tracking
-        self.alch_fail_count = 0
-        self.max_alch_fails = 3  # After 5 failed attempts, press '3' to open spellbook
-        
         # Keyboard listener for pause functionality
         self.keyboard_listener = None
         
@@ -66,19 +63,26 @@ class SimpleAutoAlch:
         self.key_equipment = '5'     # Worn equipment tab
         self.key_spellbook = '3'     # Spellbook tab
 
-        # Flow control: ensure we only click darts right after alch
-        self.alch_armed = False
-
         # Logging and metrics
         self.debug = False  # Set True to log all steps
         self.messed_up_count = 0  # Times we had to recover (inventory/equipment)
         self.total_break_time = 0.0  # Seconds spent in breaks
         
         # Skill testing settings
-        self.last_skill_test_time = time.time()
         self.skill_test_interval = 120  # Test skills every 2 minutes (120 seconds)
         self.skills_to_test = ['magic']  # Skills to test (can be multiple)
         self.skill_test_hover_range = (2, 5)  # Hover duration range in seconds
+        # Breaks, skill tests and the status line run from one timer wheel instead
+        # of being checked on every loop pass
+        self.background = TimerWheel()
+        self.background.every("break", (600, 1200), self.take_break, first=self.break_interval)
+        self.background.every("skill_test", self.skill_test_interval, self.perform_skill_test)
+        self.background.every("status", STATUS_INTERVAL_S, self.print_status)
+        # Captures at 10 Hz, faster right after a click or when a dwell ends, 2 Hz paused
+        self.capture_rate = CaptureRate("alch")
+
+        # Alch spell -> darts -> wait for spellbook, driven by detections
+        self.machine = self.build_state_machine()
         
     def load_templates(self):
         """Load the template images"""
@@ -297,6 +301,58 @@ class SimpleAutoAlch:
             print(f"   ❌ Error in color-based dart detection: {e}")
             return None, 0.0
     
+    def build_state_machine(self):
+        """Alch spell → darts → spellbook loop; darts are only clicked right after the alch spell."""
+        detectors = {'alch_spell': self.find_alch_spell, 'darts': self.find_darts}
+        sm = StateMachine(
+            "alch",
+            self.capture_screen,
+            lambda frame, names: {name: detectors[name](frame) for name in names},
+            initial='find_alch',
+            debug=self.debug,
+            rate=self.capture_rate,
+        )
+
+        def confident(threshold):
+            return lambda r: r is not None and r[0] is not None and r[1] > threshold
+
+        sm.add_state('find_alch', wait_for=['alch_spell'], timeout_s=1.5, on_timeout=self._alch_not_found)
+        sm.on('find_alch', 'alch_spell', 'find_darts', when=confident(0.62),
+              do=lambda r: self.human_click(r[0], "🔮 Clicked alch spell"))
+        sm.add_state('find_darts', wait_for=['darts'], timeout_s=2.0, on_timeout=self._darts_not_found)
+        sm.on('find_darts', 'darts', 'await_spellbook', when=confident(0.55), do=self._click_darts)
+        # The client flips back to the spellbook after the cast; re-cast once it is
+        # visible and the alch delay has passed, open it ourselves if it doesn't show
+        sm.add_state('await_spellbook', wait_for=['alch_spell'], min_dwell_s=ALCH_RECAST_S, timeout_s=4.0,
+                     on_timeout=self._alch_not_found)
+        sm.on('await_spellbook', 'alch_spell', 'find_darts', when=confident(0.62),
+              do=lambda r: self.human_click(r[0], "🔮 Clicked alch spell"))
+        return sm
+
+    def _click_darts(self, result):
+        if not self.human_click(result[0], "🎯 Clicked darts"):
+            return False
+        self.click_count += 1
+        if self.debug:
+            print(f"   📊 Total clicks: {self.click_count}")
+        return True
+
+    def _alch_not_found(self, sm):
+        print("   📚 Alch spell not found - pressing '3' to open spellbook...")
+        self.press_key('3', "open spellbook")
+        # Move the mouse away to clear potential popups over the spell
+        self.move_mouse_away_from_spells()
+        return 'find_alch'
+
+    def _darts_not_found(self, sm):
+        if self.debug:
+            print("   🚨 Darts not found - attempting inventory recovery...")
+        if self.recover_from_inventory():
+            print("   ✅ Recovery successful - returning to alch spell...")
+            return 'find_alch'
+        print("   ❌ Recovery failed - continuing to retry...")
+        return 'find_darts'
+
     def add_click_variation(self, position, base_range: tuple | None = None):
         """Add random variation to click position"""
         x, y = position
@@ -394,57 +450,40 @@ class SimpleAutoAlch:
             print(f"Error pressing key '{key}': {e}")
             return False
     
-    def check_break_time(self):
-        """Check if it's time for a break"""
+    def print_status(self):
+        """Print a concise status line (non-debug runs)"""
+        if self.debug:
+            return
         current_time = time.time()
-        session_time = current_time - self.session_start_time
-        time_since_last_break = current_time - self.last_break_time
-        
-        # For non-debug, periodically print a concise status line
-        if not self.debug:
-            next_break_in = max(0, int(self.break_interval - time_since_last_break))
-            next_break_min = next_break_in // 60
-            next_break_sec = next_break_in % 60
-            
-            # Calculate next skill test time
-            time_since_last_skill_test = current_time - self.last_skill_test_time
-            next_skill_test_in = max(0, int(self.skill_test_interval - time_since_last_skill_test))
-            next_skill_test_min = next_skill_test_in // 60
-            next_skill_test_sec = next_skill_test_in % 60
-            
-            # Estimate alchs per hour factoring break ratio so far
-            elapsed = max(1e-6, current_time - self.session_start_time)
-            effective_time = max(1e-6, elapsed - self.total_break_time)
-            alchs_per_hour = (self.click_count / effective_time) * 3600.0
-            print(
-                f"Alchs: {self.click_count} | Recoveries: {self.messed_up_count} | Next break in {next_break_min}m {next_break_sec}s | Next skill test in {next_skill_test_min}m {next_skill_test_sec}s | ~{alchs_per_hour:.1f} alchs/hr"
-            )
+        next_break_in = int(self.background.time_until("break") or 0)
+        next_break_min = next_break_in // 60
+        next_break_sec = next_break_in % 60
+        next_skill_test_in = int(self.background.time_until("skill_test") or 0)
+        next_skill_test_min = next_skill_test_in // 60
+        next_skill_test_sec = next_skill_test_in % 60
+
+        # Estimate alchs per hour factoring break ratio so far
+        elapsed = max(1e-6, current_time - self.session_start_time)
+        effective_time = max(1e-6, elapsed - self.total_break_time)
+        alchs_per_hour = (self.click_count / effective_time) * 3600.0
+        print(
+            f"Alchs: {self.click_count} | Recoveries: {self.messed_up_count} | Next break in {next_break_min}m {next_break_sec}s | Next skill test in {next_skill_test_min}m {next_skill_test_sec}s | ~{alchs_per_hour:.1f} alchs/hr"
+        )
+
+    def take_break(self):
+        """Take a break of break_duration seconds"""
+        if self.debug:
+            session_time = time.time() - self.session_start_time
+            print(f"   ☕ Break time! Taking a {self.break_duration} second break...")
+            print(f"   📊 Session stats: {self.click_count} clicks in {session_time/60:.1f} minutes")
+        before = time.time()
+        self.capture_rate.set_state("break")
+        time.sleep(self.break_duration)
+        self.capture_rate.set_state("active")
+        self.total_break_time += time.time() - before
+        if self.debug:
+            print("   ✅ Break finished, resuming...")
 
-        if time_since_last_break >= self.break_interval:
-            if self.debug:
-                print(f"   ☕ Break time! Taking a {self.break_duration} second break...")
-                print(f"   📊 Session stats: {self.click_count} clicks in {session_time/60:.1f} minutes")
-            before = time.time()
-            time.sleep(self.break_duration)
-            self.total_break_time += time.time() - before
-            self.last_break_time = current_time
-            self.break_interval = random.randint(600, 1200)  # New random interval
-            if self.debug:
-                print("   ✅ Break finished, resuming...")
-            return True
-        return False
-    
-    def check_skill_test_time(self):
-        """Check if it's time to test skills"""
-        current_time = time.time()
-        time_since_last_skill_test = current_time - self.last_skill_test_time
-        
-        if time_since_last_skill_test >= self.skill_test_interval:
-            if self.debug:
-                print(f"   🧪 Skill test time! Testing skills: {', '.join(self.skills_to_test)}")
-            return True
-        return False
-    
     def perform_skill_test(self):
         """Perform skill testing"""
         try:
@@ -460,9 +499,6 @@ class SimpleAutoAlch:
                 interactive=False  # Non-interactive for automation
             )
             
-            # Update last test time
-            self.last_skill_test_time = time.time()
-            
             # Print results
             successful_skills = [skill for skill, result in results.items() if result]
             failed_skills = [skill for skill, result in results.items() if not result]
@@ -504,6 +540,9 @@ class SimpleAutoAlch:
                 else:
                     print("\n▶️  Script RESUMED...")
                 time.sleep(0.3)  # Prevent multiple toggles
+            elif key.char == 'k':
+                # Sample the running loop; a second 'k' writes data/profiles/*.folded
+                self.profiler.toggle()
         except AttributeError:
             pass
     
@@ -512,7 +551,7 @@ class SimpleAutoAlch:
         try:
             self.keyboard_listener = keyboard.Listener(on_press=self.on_key_press)
             self.keyboard_listener.start()
-            print("✅ Keyboard listener started - Press 'p' to pause/resume")
+            print("✅ Keyboard listener started - Press 'p' to pause/resume, 'k' to start/stop profiling")
         except Exception as e:
             print(f"⚠️  Could not start keyboard listener: {e}")
             print("   Pause functionality will not be available")
@@ -696,123 +735,16 @@ class SimpleAutoAlch:
             try:
                 # Check if script is paused
                 if self.is_paused:
-                    time.sleep(0.5)
-                    continue
-                
-                # Check for break time
-                self.check_break_time()
-                
-                # Check for skill testing time
-                if self.check_skill_test_time():
-                    self.perform_skill_test()
-                
-                # Capture screen
-                screen = self.capture_screen()
-                if screen is None:
+                    self.capture_rate.set_state("paused")
+                    self.capture_rate.wait()
                     continue
+                self.capture_rate.set_state("active")
                 
-                if self.waiting_for_alch_spell:
-                    print("   🔍 Looking for alch spell...")
-                    
-                    # Try to find alch spell
-                    alch_position, alch_confidence = self.find_alch_spell(screen)
-                    
-                    if alch_position and alch_confidence > 0.62:
-                        if self.debug:
-                            print(f"   🔮 Found alch spell (confidence: {alch_confidence:.2f})")
-                        if self.human_click(alch_position, "🔮 Clicked alch spell"):
-                            self.waiting_for_alch_spell = False
-                            self.waiting_for_darts = True
-                            self.alch_armed = True
-                            self.alch_fail_count = 0  # Reset fail count on success
-                            print("   🔄 Now looking for darts...")
-                    else:
-                        self.alch_fail_count += 1
-                        if self.debug:
-                            print(f"   ℹ️  Current alch confidence: {alch_confidence:.2f} (need ≥ 0.62), attempt {self.alch_fail_count}/{self.max_alch_fails}")
-                        
-                        # If we've failed too many times, press '3' to open spellbook
-                        if self.alch_fail_count >= self.max_alch_fails:
-                            print("   📚 Alch spell not found - pressing '3' to open spellbook...")
-                            self.press_key('3', "open spellbook")
-                            time.sleep(0.5)
-                            self.alch_fail_count = 0  # Reset counter after pressing '3'
-                            
-                            # Check again after pressing '3'
-                            screen = self.capture_screen()
-                            if screen is not None:
-                                alch_position, alch_confidence = self.find_alch_spell(screen)
-                                if alch_position and alch_confidence > 0.62:
-                                    if self.debug:
-                                        print(f"   🔮 Found alch spell after opening spellbook (confidence: {alch_confidence:.2f})")
-                                    if self.human_click(alch_position, "🔮 Clicked alch spell"):
-                                        self.waiting_for_alch_spell = False
-                                        self.waiting_for_darts = True
-                                        self.alch_armed = True
-                                        print("   🔄 Now looking for darts...")
-                                else:
-                                    if self.debug:
-                                        print(f"   ℹ️  Still no alch spell found (confidence: {alch_confidence:.2f})")
-                                    # Try moving mouse away to clear potential popups
-                                    self.move_mouse_away_from_spells()
-                                    time.sleep(0.3)
-                        else:
-                            # Try moving mouse away to clear potential popups on early failures
-                            if self.alch_fail_count >= 2:
-                                if self.debug:
-                                    print("   🔍 Moving mouse to clear potential popup...")
-                                self.move_mouse_away_from_spells()
-                                time.sleep(0.3)
-                            else:
-                                time.sleep(0.5)
+                # Breaks, skill tests and the status line, at most one per pass
+                self.background.run_due(budget_s=0.0)
                 
-                elif self.waiting_for_darts:
-                    if self.debug:
-                        print("   🔍 Looking for darts...")
-                    dart_position, dart_confidence = self.find_darts(screen)
-                    
-                    if dart_position and dart_confidence > 0.55:
-                        if self.debug:
-                            print(f"   🎯 Found darts (confidence: {dart_confidence:.2f})")
-                        # Only click darts if alch was just clicked (armed)
-                        if not self.alch_armed:
-                            print("   ⚠️  Skipping darts click because alch is not armed.")
-                            time.sleep(0.2)
-                            continue
-                        if self.human_click(dart_position, "🎯 Clicked darts"):
-                            # Wait for alch animation AFTER clicking darts
-                            if self.debug:
-                                print("   ⏳ Waiting for alch animation to finish...")
-                            time.sleep(random.uniform(2.0, 3.0))
-                            self.click_count += 1
-                            if self.debug:
-                                print(f"   📊 Total clicks: {self.click_count}")
-                            self.waiting_for_alch_spell = True
-                            self.waiting_for_darts = False
-                            self.alch_armed = False
-                            self.dart_fail_count = 0  # Reset fail count on success
-                            if self.debug:
-                                print("   🔄 Now looking for alch spell...")
-                    else:
-                        self.dart_fail_count += 1
-                        if self.debug:
-                            print(f"   🔍 Darts not found (best match: {dart_confidence:.2f}), attempt {self.dart_fail_count}/{self.max_dart_fails}")
-                        
-                        # If we've failed too many times, try inventory recovery
-                        if self.dart_fail_count >= self.max_dart_fails:
-                            if self.debug:
-                                print("   🚨 Too many dart failures - attempting inventory recovery...")
-                            if self.recover_from_inventory():
-                                self.dart_fail_count = 0  # Reset counter
-                                self.waiting_for_alch_spell = True
-                                self.waiting_for_darts = False
-                                self.alch_armed = False
-                                print("   ✅ Recovery successful - returning to alch spell...")
-                            else:
-                                print("   ❌ Recovery failed - continuing to retry...")
-                                self.dart_fail_count = 0  # Reset counter to try again
-                        else:
-                            time.sleep(0.5)
+                # Advance the state machine by one frame
+                self.machine.step()
                 
             except KeyboardInterrupt:
                 print("\n🛑 Stopping Auto Alch...")
@@ -821,6 +753,8 @@ class SimpleAutoAlch:
                 print(f"   - Total clicks: {self.click_count}")
                 print(f"   - Session time: {session_time/60:.1f} minutes")
                 print(f"   - Clicks per minute: {self.click_count/(session_time/60):.1f}")
+                self.machine.print_stats()
+                self.capture_rate.print_stats()
                 self.is_running = False
                 break
             except Exception as e:
@@ -23,9 +23,22 @@ sys.path.append(auto_actions_dir)
 auto_find_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "auto_find")
 sys.path.append(auto_find_dir)
 
+from detector_registry import DetectorRegistry
+from frame_bus import read_bus_frame
+from event_channel import TickFollower
+from hotlog import DEBUG, INFO, get_logger
+from metrics import get_metrics
+from profiler import get_profiler
+from session_recorder import get_recorder, recording_enabled
+from telemetry import get_telemetry
+from state_machine import StateMachine
+from timer_wheel import TimerWheel
+from capture_rate import CaptureRate
+
 # Configure pyautogui for safety
 pyautogui.FAILSAFE = True  # Move mouse to corner to stop
 pyautogui.PAUSE = 0.1  # Small pause between actions
+STATUS_INTERVAL_S = 5.0  # non-debug status line cadence
 
 class AutoAlchCrabBot:
     def __init__(self):
@@ -38,23 +51,9 @@ class AutoAlchCrabBot:
         
         # Humanization settings
         self.session_start_time = time.time()
-        self.last_break_time = time.time()
-        self.break_interval = random.randint(600, 1200)  # 10-20 minutes
+        self.break_interval = random.randint(600, 1200)  # first break after 10-20 minutes
         self.break_duration = random.randint(30, 120)  # 30 seconds - 2 minutes
         
-        # State tracking
-        self.waiting_for_alch_spell = True
-        self.waiting_for_darts = False
-        self.waiting_for_crab = False
-        
-        # Recovery tracking
-        self.dart_fail_count = 0
-        self.max_dart_fails = 3
-        self.alch_fail_count = 0
-        self.max_alch_fails = 3
-        self.crab_fail_count = 0
-        self.max_crab_fails = 5
-        
         # Keyboard listener for pause functionality
         self.keyboard_listener = None
         
@@ -84,25 +83,51 @@ class AutoAlchCrabBot:
         self.key_spellbook = '3'
 
         # Flow control
-        self.alch_armed = False
         self.crab_click_interval = 3  # Click crab every 3 alchs
         self.alch_count_since_crab = 0
-        
-        # Initial setup tracking
-        self.tunnel_clicked = False  # Need to find tunnel first
-        self.initial_crab_clicked = False
-        self.setup_complete = False
 
         # Logging and metrics
         self.debug = True
+        # Per-frame detection logging goes through the async logger; repeated
+        # lines are limited to one per template every 0.5 s
+        self.log = get_logger("alch_crab", level=DEBUG if self.debug else INFO, repeat_s=0.5)
         self.messed_up_count = 0
         self.total_break_time = 0.0
         
         # Skill testing settings
-        self.last_skill_test_time = time.time()
         self.skill_test_interval = 120
         self.skills_to_test = ['magic']
         self.skill_test_hover_range = (2, 5)
+
+        # Per-stage latency histograms, written to data/metrics/alch_crab.{prom,json}
+        self.metrics = get_metrics("alch_crab")
+        self.profiler = get_profiler("alch_crab")
+        # Frames, detections and inputs on one timeline for offline replay ('r' / AUTO_RECORD=1)
+        self.recorder = get_recorder("alch_crab")
+        # Actions, detections and stage timings in data/telemetry.sqlite3 (AUTO_TELEMETRY=0 disables)
+        self.telemetry = get_telemetry("alch_crab")
+        if self.telemetry.enabled:
+            self.metrics.add_sink(self.telemetry.timing)
+        # Breaks, skill tests and the status line run from one timer wheel instead
+        # of being checked on every loop pass
+        self.background = TimerWheel(timer=self.metrics)
+        self.background.every("break", (600, 1200), self.take_break, first=self.break_interval)
+        self.background.every("skill_test", self.skill_test_interval, self.perform_skill_test)
+        self.background.every("status", STATUS_INTERVAL_S, self.print_status)
+        # Captures at 10 Hz, faster right after a click or when a dwell ends, 2 Hz paused
+        self.capture_rate = CaptureRate("alch_crab", timer=self.metrics)
+
+        # Detectors run once per frame with shared gray/HSV/mask views; the
+        # state machine decides which of them the current step needs
+        self.detectors = self._build_detectors()
+        self.machine = self.build_state_machine()
+
+        # Input claims from flicker scripts; clicks wait while a flick is in flight
+        try:
+            self.ticks = TickFollower().start()
+        except OSError as e:
+            self.ticks = None
+            print(f"⚠️ Event channel unavailable, not coordinating with flickers: {e}")
         
     def load_templates(self):
         """Load the template images"""
@@ -162,14 +187,15 @@ class AutoAlchCrabBot:
         
         return templates
     
-    def find_template(self, screen, template, threshold=0.7):
+    def find_template(self, screen, template, threshold=0.7, screen_gray=None):
         """Find template in screen using template matching"""
         try:
             if template is None:
                 return None, 0
             
-            # Convert to grayscale
-            screen_gray = cv2.cvtColor(screen, cv2.COLOR_BGR2GRAY)
+            # Convert to grayscale (reuse the shared gray view when given)
+            if screen_gray is None:
+                screen_gray = cv2.cvtColor(screen, cv2.COLOR_BGR2GRAY)
             template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
             
             # Template matching
@@ -188,7 +214,7 @@ class AutoAlchCrabBot:
             print(f"Error in template matching: {e}")
             return None, 0
     
-    def find_item(self, screen, item_name, threshold=0.55, use_color_fallback=False):
+    def find_item(self, screen, item_name, threshold=0.55, use_color_fallback=False, screen_gray=None):
         """Generic method to find any item using template matching and optional color fallback"""
         # Handle special case for alch spell templates
         if item_name == "alc-spell":
@@ -211,7 +237,7 @@ class AutoAlchCrabBot:
         best_template_index = -1
         
         for i, template in enumerate(templates):
-            result, confidence = self.find_template(screen, template, threshold=threshold)
+            result, confidence = self.find_template(screen, template, threshold=threshold, screen_gray=screen_gray)
             if confidence > best_confidence:
                 best_confidence = confidence
                 best_result = result
@@ -235,17 +261,17 @@ class AutoAlchCrabBot:
             print(f"   📊 Best {item_name} template match: {best_confidence:.2f} (need ≥ {threshold})")
         return None, best_confidence
     
-    def find_spell(self, screen, spell_name, threshold=0.62):
+    def find_spell(self, screen, spell_name, threshold=0.62, screen_gray=None):
         """Find any spell using the generic find_item method"""
-        return self.find_item(screen, spell_name, threshold=threshold, use_color_fallback=False)
+        return self.find_item(screen, spell_name, threshold=threshold, use_color_fallback=False, screen_gray=screen_gray)
     
-    def find_alch_spell(self, screen):
+    def find_alch_spell(self, screen, screen_gray=None):
         """Find alch spell using the generic find_spell method"""
-        return self.find_spell(screen, "alc-spell", threshold=0.62)
+        return self.find_spell(screen, "alc-spell", threshold=0.62, screen_gray=screen_gray)
     
-    def find_darts(self, screen):
+    def find_darts(self, screen, screen_gray=None):
         """Find darts using the generic find_item method with color fallback"""
-        return self.find_item(screen, "dart", threshold=0.45, use_color_fallback=True)
+        return self.find_item(screen, "dart", threshold=0.45, use_color_fallback=True, screen_gray=screen_gray)
 
     def _find_darts_by_color(self, screen):
         """Detect blue-colored dart region and optionally confirm with templates.
@@ -327,32 +353,32 @@ class AutoAlchCrabBot:
             print(f"   ❌ Error in color-based dart detection: {e}")
             return None, 0.0
 
-    def _find_crab_by_color(self, screen):
+    def _find_crab_by_color(self, screen, mask=None):
         """Detect cyan-colored crab region using color detection.
         Returns: (position_tuple_or_None, confidence_float)
         """
+        log = self.log
         try:
-            hsv = cv2.cvtColor(screen, cv2.COLOR_BGR2HSV)
-            mask = cv2.inRange(hsv, self.crab_hsv_lower, self.crab_hsv_upper)
-            kernel = np.ones((3, 3), np.uint8)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_DILATE, kernel, iterations=1)
+            if mask is None:
+                hsv = cv2.cvtColor(screen, cv2.COLOR_BGR2HSV)
+                mask = cv2.inRange(hsv, self.crab_hsv_lower, self.crab_hsv_upper)
+                kernel = np.ones((3, 3), np.uint8)
+                mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
+                mask = cv2.morphologyEx(mask, cv2.MORPH_DILATE, kernel, iterations=1)
 
-            # Debug: count non-zero pixels
-            non_zero = cv2.countNonZero(mask)
-            total_pixels = mask.shape[0] * mask.shape[1]
-            percentage = (non_zero / total_pixels) * 100
-            if self.debug:
-                print(f"   🎨 Color mask: {non_zero} pixels ({percentage:.2f}%) - HSV range: {self.crab_hsv_lower} to {self.crab_hsv_upper}")
+            # Debug: count non-zero pixels (skipped entirely unless debug logging is on)
+            if log.debug_enabled:
+                non_zero = cv2.countNonZero(mask)
+                percentage = (non_zero / (mask.shape[0] * mask.shape[1])) * 100
+                log.debug("   🎨 Color mask: {} pixels ({:.2f}%) - HSV range: {} to {}",
+                          non_zero, percentage, self.crab_hsv_lower, self.crab_hsv_upper)
 
             contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             if not contours:
-                if self.debug:
-                    print(f"   🎨 No contours found in color mask")
+                log.debug("   🎨 No contours found in color mask")
                 return None, 0.0
 
-            if self.debug:
-                print(f"   🎨 Found {len(contours)} contours in color mask")
+            log.debug("   🎨 Found {} contours in color mask", len(contours))
 
             # Pick the largest valid cyan region
             h_img, w_img = screen.shape[:2]
@@ -360,44 +386,39 @@ class AutoAlchCrabBot:
             best_area = 0.0
             for i, c in enumerate(contours):
                 area = float(cv2.contourArea(c))
-                if self.debug:
-                    print(f"   🎨 Contour {i+1}: area={area:.0f} (min: {self.min_area_crab}, max: {self.max_area_crab})")
+                log.debug("   🎨 Contour {}: area={:.0f} (min: {}, max: {})",
+                          i + 1, area, self.min_area_crab, self.max_area_crab)
                 if area < self.min_area_crab or area > self.max_area_crab:
-                    if self.debug:
-                        print(f"   🎨 Contour {i+1}: area out of range, skipping")
+                    log.debug("   🎨 Contour {}: area out of range, skipping", i + 1)
                     continue
                 x, y, w, h = cv2.boundingRect(c)
                 if x <= self.edge_margin or y <= self.edge_margin or (x + w) >= (w_img - self.edge_margin) or (y + h) >= (h_img - self.edge_margin):
-                    if self.debug:
-                        print(f"   🎨 Contour {i+1}: too close to edge, skipping")
+                    log.debug("   🎨 Contour {}: too close to edge, skipping", i + 1)
                     continue
                 if area > best_area:
                     best_area = area
                     best_region = (x, y, w, h)
-                    if self.debug:
-                        print(f"   🎨 Contour {i+1}: new best region at ({x}, {y}, {w}, {h})")
+                    log.debug("   🎨 Contour {}: new best region at ({}, {}, {}, {})", i + 1, x, y, w, h)
 
             if best_region is None:
-                if self.debug:
-                    print(f"   🎨 No valid regions found after filtering")
+                log.debug("   🎨 No valid regions found after filtering")
                 return None, 0.0
 
             x, y, w, h = best_region
             cx, cy = x + w // 2, y + h // 2
 
-            if self.debug:
-                print(f"   🦀 Crab region detected at ({cx}, {cy}) (area: {int(best_area)})")
+            log.debug("   🦀 Crab region detected at ({}, {}) (area: {})", cx, cy, int(best_area))
             return (cx, cy), 0.8
 
         except Exception as e:
-            print(f"   ❌ Error in color-based crab detection: {e}")
+            log.error("   ❌ Error in color-based crab detection: {}", e)
             return None, 0.0
 
-    def find_crab(self, screen):
+    def find_crab(self, screen, mask=None):
         """Find crab using color detection as primary method"""
         try:
             # Try color detection first (since it works better for the purple crab)
-            color_pos, color_conf = self._find_crab_by_color(screen)
+            color_pos, color_conf = self._find_crab_by_color(screen, mask=mask)
             if color_pos is not None and color_conf > 0.7:  # Restored to proper threshold
                 if self.debug:
                     print(f"   🦀 Found crab with color detection (confidence: {color_conf:.2f})")
@@ -420,14 +441,15 @@ class AutoAlchCrabBot:
             print(f"   ❌ Error in crab detection: {e}")
             return None, 0.0
 
-    def find_tunnel(self, screen):
+    def find_tunnel(self, screen, mask=None):
         """Find tunnel using color detection"""
         try:
-            hsv = cv2.cvtColor(screen, cv2.COLOR_BGR2HSV)
-            mask = cv2.inRange(hsv, self.tunnel_hsv_lower, self.tunnel_hsv_upper)
-            kernel = np.ones((3, 3), np.uint8)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_DILATE, kernel, iterations=1)
+            if mask is None:
+                hsv = cv2.cvtColor(screen, cv2.COLOR_BGR2HSV)
+                mask = cv2.inRange(hsv, self.tunnel_hsv_lower, self.tunnel_hsv_upper)
+                kernel = np.ones((3, 3), np.uint8)
+                mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
+                mask = cv2.morphologyEx(mask, cv2.MORPH_DILATE, kernel, iterations=1)
 
             contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             if not contours:
@@ -462,6 +484,112 @@ class AutoAlchCrabBot:
             print(f"   ❌ Error in tunnel detection: {e}")
             return None, 0.0
     
+    def _build_detectors(self):
+        """Register every detector once; start() runs the active set per frame."""
+        registry = DetectorRegistry(timer=self.metrics)
+        registry.register_mask('crab', (self.crab_hsv_lower, self.crab_hsv_upper))
+        registry.register_mask('tunnel', (self.tunnel_hsv_lower, self.tunnel_hsv_upper))
+        registry.register('tunnel', lambda v: self.find_tunnel(v.bgr, mask=v.mask('tunnel')), views=('mask:tunnel',))
+        registry.register('crab', lambda v: self.find_crab(v.bgr, mask=v.mask('crab')), views=('mask:crab',))
+        registry.register('alch_spell', lambda v: self.find_alch_spell(v.bgr, screen_gray=v.gray), views=('gray',))
+        registry.register('darts', lambda v: self.find_darts(v.bgr, screen_gray=v.gray), views=('gray',))
+        return registry
+
+    def build_state_machine(self):
+        """Tunnel → crab → (alch → darts → crab → spellbook) loop, driven by detections."""
+        sm = StateMachine(
+            "alch-crab",
+            self.capture_screen,
+            self._detect,
+            initial='find_tunnel',
+            debug=self.debug,
+            timer=self.metrics,
+            rate=self.capture_rate,
+        )
+
+        def confident(threshold):
+            return lambda r: r is not None and r[0] is not None and r[1] > threshold
+
+        # Setup: click the tunnel if it is on the first frame, otherwise the crab should be visible
+        sm.add_state('find_tunnel', wait_for=['tunnel'], timeout_s=0.0, on_timeout='find_crab')
+        sm.on('find_tunnel', 'tunnel', 'find_crab', when=confident(0.7),
+              do=lambda r: self.human_click(r[0], "🕳️ Clicked tunnel"))
+        sm.add_state('find_crab', wait_for=['crab'])
+        sm.on('find_crab', 'crab', 'find_alch', when=confident(0.7), do=self._click_initial_crab)
+
+        # Alch loop: each state moves on as soon as the next tab visibly shows up
+        sm.add_state('find_alch', wait_for=['alch_spell'], timeout_s=1.5, on_timeout=self._alch_not_found)
+        sm.on('find_alch', 'alch_spell', 'find_darts', when=confident(0.62),
+              do=lambda r: self.human_click(r[0], "🔮 Clicked alch spell"))
+        sm.add_state('find_darts', wait_for=['darts'], timeout_s=2.0, on_timeout=self._darts_not_found)
+        sm.on('find_darts', 'darts', 'attack_crab', when=confident(0.45), do=self._click_darts)
+        # Let the alch animation start, then click the crab to cancel it
+        sm.add_state('attack_crab', wait_for=['crab'], min_dwell_s=(0.3, 0.6), timeout_s=1.5,
+                     on_timeout=self._crab_not_found_after_alch)
+        sm.on('attack_crab', 'crab', 'await_spellbook', when=confident(0.7), do=self._click_crab_after_alch)
+        # The client flips back to the spellbook after the cast; open it ourselves if it doesn't
+        sm.add_state('await_spellbook', wait_for=['alch_spell'], timeout_s=0.6, on_timeout=self._open_spellbook)
+        sm.on('await_spellbook', 'alch_spell', 'find_darts', when=confident(0.62),
+              do=lambda r: self.human_click(r[0], "🔮 Clicked alch spell"))
+        return sm
+
+    def _detect(self, frame, names):
+        results = self.detectors.run(frame, active=names)['results']
+        if self.recorder.active:
+            self.recorder.detections(results, state=self.machine.state)
+        self.telemetry.detections(results)
+        return results
+
+    def _click_initial_crab(self, result):
+        if not self.human_click(result[0], "🦀 Clicked initial crab"):
+            return False
+        print("   ✅ Initial crab clicked successfully - setup complete!")
+        return True
+
+    def _click_darts(self, result):
+        if not self.human_click(result[0], "🎯 Clicked darts"):
+            return False
+        self.click_count += 1
+        self.alch_count_since_crab += 1
+        if self.debug:
+            print(f"   📊 Total clicks: {self.click_count}, alchs since crab: {self.alch_count_since_crab}")
+        return True
+
+    def _click_crab_after_alch(self, result):
+        if not self.human_click(result[0], "🦀 Clicked crab after alch"):
+            return False
+        self.crab_click_count += 1
+        self.alch_count_since_crab = 0
+        if self.debug:
+            print(f"   📊 Total crab clicks: {self.crab_click_count}")
+        return True
+
+    def _crab_not_found_after_alch(self, sm):
+        if self.debug:
+            print("   🦀 Crab not found after alch")
+        self.alch_count_since_crab = 0
+        return 'await_spellbook'
+
+    def _alch_not_found(self, sm):
+        print("   📚 Alch spell not found - pressing '3' to open spellbook...")
+        self.press_key('3', "open spellbook")
+        return 'find_alch'
+
+    def _open_spellbook(self, sm):
+        if self.debug:
+            print("   📚 Alch spell not visible - opening spellbook...")
+        self.press_key('3', "open spellbook")
+        return 'find_alch'
+
+    def _darts_not_found(self, sm):
+        if self.debug:
+            print("   🚨 Darts not found - attempting inventory recovery...")
+        if self.recover_from_inventory():
+            print("   ✅ Recovery successful - returning to alch spell...")
+            return 'find_alch'
+        print("   ❌ Recovery failed - continuing to retry...")
+        return 'find_darts'
+
     def add_click_variation(self, position, base_range: tuple | None = None):
         """Add random variation to click position"""
         x, y = position
@@ -489,9 +617,19 @@ class AutoAlchCrabBot:
         click_y = y + variation_y
         return (click_x, click_y)
     
+    def wait_for_flick(self):
+        """Hold off while another script has claimed the input (e.g. a prayer flick)"""
+        if self.ticks is not None:
+            waited = self.ticks.wait_until_idle(max_wait_s=0.5)
+            if waited > 0.001 and self.debug:
+                print(f"   ⏳ Waited {waited * 1000:.0f} ms for a flick to finish")
+
     def human_click(self, position, action_name):
         """Click with human-like behavior"""
         try:
+            with self.metrics.span("wait_flick"):
+                self.wait_for_flick()
+            t_click = time.perf_counter()
             # Increase variation specifically for alch/darts to avoid repeat pixels
             lower_name = (action_name or "").lower()
             if "alch" in lower_name or "darts" in lower_name or "crab" in lower_name:
@@ -531,6 +669,10 @@ class AutoAlchCrabBot:
             time.sleep(wait_time)
             
             pyautogui.click(x, y)
+            self.recorder.input("click", x=x, y=y, target=action_name)
+            click_ms = (time.perf_counter() - t_click) * 1000.0
+            self.metrics("input.click", click_ms)
+            self.telemetry.action("click", target=action_name, x=x, y=y, duration_ms=click_ms)
             
             if self.debug:
                 timestamp = datetime.now().strftime("%H:%M:%S")
@@ -550,65 +692,52 @@ class AutoAlchCrabBot:
                 else:
                     print(f"   ⌨️ Pressing '{key}'...")
             time.sleep(random.uniform(0.1, 0.3))
-            pyautogui.press(key)
+            self.wait_for_flick()
+            with self.metrics.span("input.key"):
+                pyautogui.press(key)
+            self.recorder.input("key", key=key, target=description)
+            self.telemetry.action("key", target=description, key=key)
             time.sleep(random.uniform(0.2, 0.5))
             return True
         except Exception as e:
             print(f"Error pressing key '{key}': {e}")
             return False
     
-    def check_break_time(self):
-        """Check if it's time for a break"""
+    def print_status(self):
+        """Print a concise status line (non-debug runs)"""
+        if self.debug:
+            return
         current_time = time.time()
-        session_time = current_time - self.session_start_time
-        time_since_last_break = current_time - self.last_break_time
-        
-        # For non-debug, periodically print a concise status line
-        if not self.debug:
-            next_break_in = max(0, int(self.break_interval - time_since_last_break))
-            next_break_min = next_break_in // 60
-            next_break_sec = next_break_in % 60
-            
-            # Calculate next skill test time
-            time_since_last_skill_test = current_time - self.last_skill_test_time
-            next_skill_test_in = max(0, int(self.skill_test_interval - time_since_last_skill_test))
-            next_skill_test_min = next_skill_test_in // 60
-            next_skill_test_sec = next_skill_test_in % 60
-            
-            # Estimate alchs per hour factoring break ratio so far
-            elapsed = max(1e-6, current_time - self.session_start_time)
-            effective_time = max(1e-6, elapsed - self.total_break_time)
-            alchs_per_hour = (self.click_count / effective_time) * 3600.0
-            crabs_per_hour = (self.crab_click_count / effective_time) * 3600.0
-            print(
-                f"Alchs: {self.click_count} | Crabs: {self.crab_click_count} | Recoveries: {self.messed_up_count} | Next break in {next_break_min}m {next_break_sec}s | Next skill test in {next_skill_test_min}m {next_skill_test_sec}s | ~{alchs_per_hour:.1f} alchs/hr | ~{crabs_per_hour:.1f} crabs/hr"
-            )
+        next_break_in = int(self.background.time_until("break") or 0)
+        next_break_min = next_break_in // 60
+        next_break_sec = next_break_in % 60
+        next_skill_test_in = int(self.background.time_until("skill_test") or 0)
+        next_skill_test_min = next_skill_test_in // 60
+        next_skill_test_sec = next_skill_test_in % 60
+
+        # Estimate alchs per hour factoring break ratio so far
+        elapsed = max(1e-6, current_time - self.session_start_time)
+        effective_time = max(1e-6, elapsed - self.total_break_time)
+        alchs_per_hour = (self.click_count / effective_time) * 3600.0
+        crabs_per_hour = (self.crab_click_count / effective_time) * 3600.0
+        print(
+            f"Alchs: {self.click_count} | Crabs: {self.crab_click_count} | Recoveries: {self.messed_up_count} | Next break in {next_break_min}m {next_break_sec}s | Next skill test in {next_skill_test_min}m {next_skill_test_sec}s | ~{alchs_per_hour:.1f} alchs/hr | ~{crabs_per_hour:.1f} crabs/hr"
+        )
+
+    def take_break(self):
+        """Take a break of break_duration seconds"""
+        if self.debug:
+            session_time = time.time() - self.session_start_time
+            print(f"   ☕ Break time! Taking a {self.break_duration} second break...")
+            print(f"   📊 Session stats: {self.click_count} clicks in {session_time/60:.1f} minutes")
+        before = time.time()
+        self.capture_rate.set_state("break")
+        time.sleep(self.break_duration)
+        self.capture_rate.set_state("active")
+        self.total_break_time += time.time() - before
+        if self.debug:
+            print("   ✅ Break finished, resuming...")
 
-        if time_since_last_break >= self.break_interval:
-            if self.debug:
-                print(f"   ☕ Break time! Taking a {self.break_duration} second break...")
-                print(f"   📊 Session stats: {self.click_count} clicks in {session_time/60:.1f} minutes")
-            before = time.time()
-            time.sleep(self.break_duration)
-            self.total_break_time += time.time() - before
-            self.last_break_time = current_time
-            self.break_interval = random.randint(600, 1200)  # New random interval
-            if self.debug:
-                print("   ✅ Break finished, resuming...")
-            return True
-        return False
-    
-    def check_skill_test_time(self):
-        """Check if it's time to test skills"""
-        current_time = time.time()
-        time_since_last_skill_test = current_time - self.last_skill_test_time
-        
-        if time_since_last_skill_test >= self.skill_test_interval:
-            if self.debug:
-                print(f"   🧪 Skill test time! Testing skills: {', '.join(self.skills_to_test)}")
-            return True
-        return False
-    
     def perform_skill_test(self):
         """Perform skill testing"""
         try:
@@ -624,9 +753,6 @@ class AutoAlchCrabBot:
                 interactive=False  # Non-interactive for automation
             )
             
-            # Update last test time
-            self.last_skill_test_time = time.time()
-            
             # Print results
             successful_skills = [skill for skill, result in results.items() if result]
             failed_skills = [skill for skill, result in results.items() if not result]
@@ -648,15 +774,18 @@ class AutoAlchCrabBot:
             return False
     
     def capture_screen(self):
-        """Capture current screen"""
-        try:
-            screenshot = pyautogui.screenshot()
-            frame = np.array(screenshot)
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-            return frame
-        except Exception as e:
-            print(f"Error capturing screen: {e}")
-            return None
+        """Capture current screen (latest frame-bus frame when AUTO_FRAME_BUS is set)"""
+        frame = read_bus_frame()
+        if frame is None:
+            try:
+                screenshot = pyautogui.screenshot()
+                frame = np.array(screenshot)
+                frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            except Exception as e:
+                print(f"Error capturing screen: {e}")
+                return None
+        self.recorder.frame(frame)
+        return frame
     
     def on_key_press(self, key):
         """Handle key press events"""
@@ -668,6 +797,12 @@ class AutoAlchCrabBot:
                 else:
                     print("\n▶️  Script RESUMED...")
                 time.sleep(0.3)  # Prevent multiple toggles
+            elif key.char == 'k':
+                # Sample the running loop; a second 'k' writes data/profiles/*.folded
+                self.profiler.toggle()
+            elif key.char == 'r':
+                # Record frames + detections + inputs to data/recordings/ for replay
+                self.recorder.toggle()
         except AttributeError:
             pass
     
@@ -676,7 +811,7 @@ class AutoAlchCrabBot:
         try:
             self.keyboard_listener = keyboard.Listener(on_press=self.on_key_press)
             self.keyboard_listener.start()
-            print("✅ Keyboard listener started - Press 'p' to pause/resume")
+            print("✅ Keyboard listener started - Press 'p' to pause/resume, 'k' to start/stop profiling, 'r' to start/stop recording")
         except Exception as e:
             print(f"⚠️  Could not start keyboard listener: {e}")
             print("   Pause functionality will not be available")
@@ -858,240 +993,25 @@ class AutoAlchCrabBot:
             print("⏸️  Script PAUSED - Click game and press 'p' to start...")
         
         self.is_running = True
+        self.metrics.start_writer(interval_s=10.0)
+        print(f"📈 Live metrics: {os.path.join(self.metrics.out_dir, self.metrics.app)}.prom / .json")
+        if recording_enabled():
+            self.recorder.start()
         
         while self.is_running:
             try:
                 # Check if script is paused
                 if self.is_paused:
-                    time.sleep(0.5)
-                    continue
-                
-                # Check for break time
-                self.check_break_time()
-                
-                # Check for skill testing time
-                if self.check_skill_test_time():
-                    self.perform_skill_test()
-                
-                # Capture screen
-                screen = self.capture_screen()
-                if screen is None:
+                    self.capture_rate.set_state("paused")
+                    self.capture_rate.wait()
                     continue
+                self.capture_rate.set_state("active")
                 
-                # Initial setup phase - check for tunnel first, if no tunnel then crab is already on screen
-                if not self.tunnel_clicked:
-                    if self.debug:
-                        print("   🕳️ Looking for tunnel...")
-                    
-                    tunnel_position, tunnel_confidence = self.find_tunnel(screen)
-                    
-                    if tunnel_position and tunnel_confidence > 0.7:
-                        if self.debug:
-                            print(f"   🕳️ Found tunnel (confidence: {tunnel_confidence:.2f})")
-                        if self.human_click(tunnel_position, "🕳️ Clicked tunnel"):
-                            self.tunnel_clicked = True
-                            print("   ✅ Tunnel clicked successfully")
-                            # Wait a bit after clicking tunnel
-                            time.sleep(random.uniform(1.0, 2.0))
-                    else:
-                        if self.debug:
-                            print(f"   🕳️ No tunnel found (best match: {tunnel_confidence:.2f}) - crab should be on screen")
-                        # If no tunnel, assume crab is already on screen, skip tunnel step
-                        self.tunnel_clicked = True
-                        print("   ⏭️  Skipping tunnel - crab should be visible")
-                        continue
-                
-                # After tunnel is clicked, look for initial crab
-                elif not self.initial_crab_clicked:
-                    if self.debug:
-                        print("   🦀 Looking for initial crab...")
-                    
-                    crab_position, crab_confidence = self.find_crab(screen)
-                    
-                    if crab_position and crab_confidence > 0.7:
-                        if self.debug:
-                            print(f"   🦀 Found initial crab (confidence: {crab_confidence:.2f})")
-                        if self.human_click(crab_position, "🦀 Clicked initial crab"):
-                            self.initial_crab_clicked = True
-                            self.setup_complete = True
-                            print("   ✅ Initial crab clicked successfully - setup complete!")
-                            # Wait a bit after clicking crab
-                            time.sleep(random.uniform(1.0, 2.0))
-                    else:
-                        if self.debug:
-                            print(f"   🦀 Initial crab not found (best match: {crab_confidence:.2f})")
-                        time.sleep(0.5)
-                        continue
-                
-                
-                
-                # Only start alching after setup is complete
-                if self.setup_complete and self.waiting_for_alch_spell:
-                    print("   🔍 Looking for alch spell...")
-                    
-                    # Try to find alch spell
-                    alch_position, alch_confidence = self.find_alch_spell(screen)
-                    
-                    if alch_position and alch_confidence > 0.62:
-                        if self.debug:
-                            print(f"   🔮 Found alch spell (confidence: {alch_confidence:.2f})")
-                        if self.human_click(alch_position, "🔮 Clicked alch spell"):
-                            self.waiting_for_alch_spell = False
-                            self.waiting_for_darts = True
-                            self.alch_armed = True
-                            self.alch_fail_count = 0  # Reset fail count on success
-                            if self.debug:
-                                print("   🔄 Now looking for darts...")
-                    else:
-                        self.alch_fail_count += 1
-                        if self.debug:
-                            print(f"   ℹ️  Current alch confidence: {alch_confidence:.2f} (need ≥ 0.62), attempt {self.alch_fail_count}/{self.max_alch_fails}")
-                        
-                        # If we've failed too many times, press '3' to open spellbook
-                        if self.alch_fail_count >= self.max_alch_fails:
-                            print("   📚 Alch spell not found - pressing '3' to open spellbook...")
-                            self.press_key('3', "open spellbook")
-                            time.sleep(0.5)
-                            self.alch_fail_count = 0  # Reset counter after pressing '3'
-                            
-                            # Check again after pressing '3'
-                            screen = self.capture_screen()
-                            if screen is not None:
-                                alch_position, alch_confidence = self.find_alch_spell(screen)
-                                if alch_position and alch_confidence > 0.62:
-                                    if self.debug:
-                                        print(f"   🔮 Found alch spell after opening spellbook (confidence: {alch_confidence:.2f})")
-                                    if self.human_click(alch_position, "🔮 Clicked alch spell"):
-                                        self.waiting_for_alch_spell = False
-                                        self.waiting_for_darts = True
-                                        self.alch_armed = True
-                                        if self.debug:
-                                            print("   🔄 Now looking for darts...")
-                                else:
-                                    if self.debug:
-                                        print(f"   ℹ️  Still no alch spell found (confidence: {alch_confidence:.2f})")
-                                    # Just wait a bit and continue looking
-                                    time.sleep(0.3)
-                            # Continue the loop to keep looking for alch spell
-                            continue
-                        else:
-                            # Just wait a bit on early failures
-                            if self.alch_fail_count >= 2:
-                                if self.debug:
-                                    print("   🔍 Waiting a bit before retrying...")
-                                time.sleep(0.3)
-                            else:
-                                time.sleep(0.5)
+                # Breaks, skill tests and the status line, at most one per pass; held back while a flicker owns the input
+                self.background.run_due(budget_s=0.0, should_yield=lambda: self.ticks is not None and self.ticks.busy())
                 
-                elif self.setup_complete and self.waiting_for_darts:
-                    if self.debug:
-                        print("   🔍 Looking for darts...")
-                    dart_position, dart_confidence = self.find_darts(screen)
-                    
-                    if dart_position and dart_confidence > 0.45:
-                        if self.debug:
-                            print(f"   🎯 Found darts (confidence: {dart_confidence:.2f})")
-                                                # Only click darts if alch was just clicked (armed)
-                        if not self.alch_armed:
-                            print("   ⚠️  Skipping darts click because alch is not armed.")
-                            time.sleep(0.2)
-                            continue
-                        if self.human_click(dart_position, "🎯 Clicked darts"):
-                            # Wait briefly for alch animation to start, then click crab to cancel it
-                            if self.debug:
-                                print("   ⏳ Waiting briefly for alch animation to start...")
-                            time.sleep(random.uniform(0.3, 0.6))
-                            self.click_count += 1
-                            self.alch_count_since_crab += 1
-                            if self.debug:
-                                print(f"   📊 Total clicks: {self.click_count}, alchs since crab: {self.alch_count_since_crab}")
-                            
-                            # Immediately look for and click crab after alch
-                            if self.debug:
-                                print("   🦀 Looking for crab after alch...")
-                            
-                            # Capture fresh screen for crab detection
-                            crab_screen = self.capture_screen()
-                            if crab_screen is not None:
-                                crab_position, crab_confidence = self.find_crab(crab_screen)
-                                
-                                if crab_position and crab_confidence > 0.7:
-                                    if self.debug:
-                                        print(f"   🦀 Found crab after alch (confidence: {crab_confidence:.2f})")
-                                    if self.human_click(crab_position, "🦀 Clicked crab after alch"):
-                                        self.crab_click_count += 1
-                                        self.alch_count_since_crab = 0  # Reset counter
-                                        if self.debug:
-                                            print(f"   📊 Total crab clicks: {self.crab_click_count}")
-                                        # Wait a bit after clicking crab
-                                        time.sleep(random.uniform(0.2, 0.4))
-                                else:
-                                    if self.debug:
-                                        print(f"   🦀 Crab not found after alch (best match: {crab_confidence:.2f})")
-                                    # Still reset counter even if crab not found
-                                    self.alch_count_since_crab = 0
-                            else:
-                                if self.debug:
-                                    print("   ❌ Could not capture screen for crab detection")
-                                # Still reset counter
-                                self.alch_count_since_crab = 0
-                            
-                            # Check if alch spell is already visible before opening spellbook
-                            if self.debug:
-                                print("   🔍 Checking if alch spell is already visible...")
-                            
-                            # Capture fresh screen to check for alch spell
-                            alch_check_screen = self.capture_screen()
-                            if alch_check_screen is not None:
-                                alch_position, alch_confidence = self.find_alch_spell(alch_check_screen)
-                                if alch_position and alch_confidence > 0.62:
-                                    if self.debug:
-                                        print(f"   🔮 Alch spell already visible (confidence: {alch_confidence:.2f}) - no need to open spellbook")
-                                    # Reset state to look for alch spell next
-                                    self.waiting_for_alch_spell = True
-                                    self.waiting_for_darts = False
-                                    self.alch_armed = False
-                                    self.dart_fail_count = 0  # Reset fail count on success
-                                    if self.debug:
-                                        print("   🔄 Now looking for alch spell...")
-                                    # Continue to next iteration to look for alch spell
-                                    continue
-                            
-                            # Only open spellbook if alch spell is not visible
-                            if self.debug:
-                                print("   📚 Alch spell not visible - opening spellbook...")
-                            self.press_key('3', "open spellbook")
-                            time.sleep(0.2)  # Brief pause for spellbook to open
-                            
-                            # Reset state to look for alch spell next
-                            self.waiting_for_alch_spell = True
-                            self.waiting_for_darts = False
-                            self.alch_armed = False
-                            self.dart_fail_count = 0  # Reset fail count on success
-                            if self.debug:
-                                print("   🔄 Now looking for alch spell...")
-                            # Continue to next iteration to look for alch spell
-                            continue
-                    else:
-                        self.dart_fail_count += 1
-                        if self.debug:
-                            print(f"   🔍 Darts not found (best match: {dart_confidence:.2f}), attempt {self.dart_fail_count}/{self.max_dart_fails}")
-                        
-                        # If we've failed too many times, try inventory recovery
-                        if self.dart_fail_count >= self.max_dart_fails:
-                            if self.debug:
-                                print("   🚨 Too many dart failures - attempting inventory recovery...")
-                            if self.recover_from_inventory():
-                                self.dart_fail_count = 0  # Reset counter
-                                self.waiting_for_alch_spell = True
-                                self.waiting_for_darts = False
-                                self.alch_armed = False
-                                print("   ✅ Recovery successful - returning to alch spell...")
-                            else:
-                                print("   ❌ Recovery failed - continuing to retry...")
-                                self.dart_fail_count = 0  # Reset counter to try again
-                        else:
-                            time.sleep(0.5)
+                # Advance the state machine by one frame
+                self.machine.step()
                 
             except KeyboardInterrupt:
                 print("\n🛑 Stopping Auto Alch + Crab Bot...")
@@ -1102,6 +1022,12 @@ class AutoAlchCrabBot:
                 print(f"   - Session time: {session_time/60:.1f} minutes")
                 print(f"   - Alchs per minute: {self.click_count/(session_time/60):.1f}")
                 print(f"   - Crabs per minute: {self.crab_click_count/(session_time/60):.1f}")
+                if self.ticks is not None and self.ticks.waits_ms:
+                    print(f"   - Waits for flicks: {len(self.ticks.waits_ms)} "
+                          f"(avg {sum(self.ticks.waits_ms) / len(self.ticks.waits_ms):.0f} ms)")
+                self.machine.print_stats()
+                self.capture_rate.print_stats()
+                self.metrics.print_stats()
                 self.is_running = False
                 break
             except Exception as e:
@@ -1111,6 +1037,11 @@ class AutoAlchCrabBot:
         # Stop keyboard listener
         if self.keyboard_listener:
             self.keyboard_listener.stop()
+        if self.ticks is not None:
+            self.ticks.stop()
+        self.metrics.stop_writer()
+        self.recorder.stop()
+        self.telemetry.close()
 
 def main():
     """Main function"""
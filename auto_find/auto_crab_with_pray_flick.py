@@ -10,6 +10,7 @@ Hotkeys:
 - s: pause
 - q: quit
 - d: toggle debug (prints detection info)
+- k: start / stop the sampling profiler (writes data/profiles/*.folded)
 """
 
 import sys
@@ -34,6 +35,18 @@ try:
 except Exception as e:
     AutoActionFunctions = None
     print(f"⚠️ Could not import AutoActionFunctions: {e}")
+from pipeline import Pipeline, must_run
+from event_channel import get_publisher
+from metrics import get_metrics
+from profiler import get_profiler
+from timer_wheel import TimerWheel
+from capture_rate import CaptureRate
+try:
+    from input_backend import get_input_backend
+    INPUT = get_input_backend()
+except Exception as e:
+    INPUT = None
+    print(f"⚠️ Fast input backend unavailable, using pyautogui: {e}")
 
 # Template-based tick digit detection (sequence-driven)
 TICKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'auto_actions', 'ticks')
@@ -90,6 +103,10 @@ FLICK_SETTLE_MAX = 90    # restored from 50
 FLICK_HOLD_MIN = 50      # restored from 30
 FLICK_HOLD_MAX = 85      # restored from 50
 FLICK_LOOP_SLEEP = 0.02
+FLICK_IDLE_HZ = 10.0        # capture rate between tick boundaries
+FLICK_TICK_S = 0.6          # game tick; digit changes are expected one tick apart
+FLICK_TICK_WINDOW_S = 0.08  # capture every FLICK_LOOP_SLEEP within this of a boundary
+FLICK_BUSY_MS = 250      # input claim announced to other scripts per toggle
 
 # Region validation for tunnel (avoid huge/edge blobs)
 MAX_AREA_TUNNEL = 150000.0
@@ -121,6 +138,8 @@ def on_key_press(key):
             FLICK_ON_AT_2_TO_1 = not FLICK_ON_AT_2_TO_1
             orient = "ON at 2→1, OFF at 1→4" if FLICK_ON_AT_2_TO_1 else "OFF at 2→1, ON at 1→4"
             print(f"🔁 Flick orientation → {orient}")
+        elif key.char == 'k':
+            get_profiler("crab_flick").toggle()
     except AttributeError:
         pass
 
@@ -184,6 +203,47 @@ def humanized_middle_drag(total_dx: int, total_dy: int,
                           min_segments: int, max_segments: int,
                           duration_min: float, duration_max: float):
     """Perform a human-like middle-mouse drag composed of multiple jittered segments."""
+    if INPUT is None:
+        return _pyautogui_middle_drag(total_dx, total_dy, min_segments, max_segments, duration_min, duration_max)
+    try:
+        INPUT.mouse_down('middle')
+        segments = random.randint(min_segments, max_segments)
+        total_duration = random.uniform(duration_min, duration_max)
+        weights = [random.uniform(0.6, 1.4) for _ in range(segments)]
+        weight_sum = sum(weights)
+        remaining_dx = total_dx
+        remaining_dy = total_dy
+        for i in range(segments):
+            frac = weights[i] / weight_sum
+            seg_dx = int(round(total_dx * frac))
+            seg_dy = int(round(total_dy * frac))
+            if i == segments - 1:
+                seg_dx = remaining_dx
+                seg_dy = remaining_dy
+            jitter_x = random.randint(-5, 5)
+            jitter_y = random.randint(-3, 3)
+            seg_duration = max(0.03, total_duration * frac * random.uniform(0.7, 1.3))
+            # Backend steps the segment itself at up to 240 Hz
+            INPUT.glide_rel(seg_dx + jitter_x, seg_dy + jitter_y, duration=seg_duration)
+            if random.random() < 0.35:
+                time.sleep(random.uniform(0.015, 0.05))
+            remaining_dx -= seg_dx
+            remaining_dy -= seg_dy
+        overshoot_x = random.randint(4, 12) * (1 if total_dx >= 0 else -1)
+        overshoot_y = random.randint(2, 8) * (1 if total_dy >= 0 else -1)
+        INPUT.glide_rel(overshoot_x, overshoot_y, duration=random.uniform(0.04, 0.09))
+        time.sleep(random.uniform(0.02, 0.05))
+        INPUT.glide_rel(-int(overshoot_x * random.uniform(0.6, 1.0)),
+                        -int(overshoot_y * random.uniform(0.6, 1.0)),
+                        duration=random.uniform(0.04, 0.1))
+    finally:
+        INPUT.mouse_up('middle')
+
+
+def _pyautogui_middle_drag(total_dx: int, total_dy: int,
+                           min_segments: int, max_segments: int,
+                           duration_min: float, duration_max: float):
+    """Original pyautogui implementation, used when no input backend is available."""
     try:
         pyautogui.mouseDown(button='middle')
         segments = random.randint(min_segments, max_segments)
@@ -273,10 +333,149 @@ def half_turn_rotate():
         print(f"⚠️ Half-turn camera rotate failed: {e}")
 
 
+def run_flick_pipeline(auto_funcs, min_area_crab: float):
+    """Prayer flick loop as a capture → detect → decide → act pipeline.
+
+    Crab visibility and the tick digit are detected in parallel on the newest
+    frame while the previous toggle is still being clicked. Frames are taken
+    at FLICK_LOOP_SLEEP only around predicted tick boundaries and at
+    FLICK_IDLE_HZ in between. Returns when the
+    crab has been missing for CRAB_MISS_FRAMES_TO_EXIT frames, or on pause/quit.
+    """
+    state = {
+        'seq_last': None,
+        'last_toggle_ms': 0.0,
+        'miss_frames': 0,
+        'last_transition': None,  # Track what transition we just did
+        'cycle_count': 0,  # Track how many cycles we've completed
+        'last_on_time': 0.0,  # Track when we last turned prayer ON
+        'crab_visible': None,
+        'tick_index': 0,
+        't_prev_capture': None,  # capture time of the previous frame (brackets a digit change)
+    }
+    events = get_publisher("crab_flick")
+    metrics = get_metrics("crab_flick").start_writer(interval_s=10.0)
+    rate = CaptureRate("crab_flick", rates={"active": FLICK_IDLE_HZ}, fast_hz=1.0 / FLICK_LOOP_SLEEP, timer=metrics)
+
+    def detect_crab(frame):
+        with metrics.span("hsv"):
+            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        return detect_color(hsv, CYAN_RANGE)
+
+    def detect_digit(frame):
+        return classify_digit_from_frame(frame, ALL_TEMPLATES, scales=(0.7, 0.85, 1.0, 1.15))
+
+    # decide() records ON/OFF as soon as it queues a toggle, so a toggle must
+    # never be dropped or skipped as stale or every later flick runs inverted
+    @must_run
+    def toggle():
+        claim = events.claim("flick", FLICK_BUSY_MS)
+        with metrics.span("input.toggle"):
+            ok = auto_funcs.quick_prayer_toggle(use_mouse=True)
+        events.ack("flick", ok=bool(ok), ref=claim)
+
+    def decide(packet):
+        results = packet['results']
+        crab2 = results.get('crab')
+        crab_vis2 = crab2 is not None and crab2[1] >= min_area_crab
+        if crab_vis2 != state['crab_visible']:
+            state['crab_visible'] = crab_vis2
+            events.detection("crab", crab_vis2, crab2[0] if crab_vis2 else None,
+                             value=crab2[1] if crab2 is not None else 0.0)
+
+        if crab_vis2:
+            state['miss_frames'] = 0
+        else:
+            state['miss_frames'] += 1
+            if state['miss_frames'] >= CRAB_MISS_FRAMES_TO_EXIT:
+                print("🦀 Crab no longer visible - exiting flick loop")
+                pipe.request_stop()
+                return None
+
+        digit, score = results.get('digit') or (None, 0.0)
+        actions = []
+        t_capture, t_prev = packet['t_capture'], state['t_prev_capture']
+        state['t_prev_capture'] = t_capture
+
+        # SIMPLE PRAYER LOGIC: Only 2→1 ON, Only 1→4 OFF
+        if digit is not None and score >= PRAY_MIN_CONF and digit != state['seq_last']:
+            print(f"🔍 DIGIT: {digit}, score={score:.2f}, prev={state['seq_last']}, last_transition={state['last_transition']}")
+            prev = state['seq_last']
+            state['seq_last'] = digit
+            state['tick_index'] += 1
+            events.tick(digit=digit, index=state['tick_index'])
+            # The next change is one tick after the boundary, which lies between the
+            # previous frame and this one: keep the predicted boundary if it falls in
+            # there, else take the midpoint (not the detection time, which lags at 10 Hz)
+            boundary = t_capture
+            if t_prev is not None and t_capture - t_prev <= FLICK_TICK_S / 2:
+                predicted = rate.expected("tick", t_capture)
+                if predicted is not None and t_prev < predicted <= t_capture:
+                    boundary = predicted
+                else:
+                    boundary = (t_prev + t_capture) / 2.0
+            rate.expect(boundary + FLICK_TICK_S, window_s=FLICK_TICK_WINDOW_S,
+                        period_s=FLICK_TICK_S, key="tick")
+            now_ms = time.time() * 1000.0
+
+            # Only toggle if enough time has passed
+            if (now_ms - state['last_toggle_ms']) >= FLICK_COOLDOWN_MS:
+                transition = f"{prev}→{digit}"
+
+                # Reset transition state when we see a new cycle starting (4→3)
+                if prev == 4 and digit == 3:
+                    state['last_transition'] = None
+                    print(f"🔄 New cycle detected (4→3) - resetting transition state")
+
+                # Only 2→1 for ON, only 1→4 for OFF, and only if we haven't done it this cycle
+                if prev == 2 and digit == 1 and state['last_transition'] != "2→1":
+                    state['cycle_count'] += 1
+                    print(f"🟡 Toggle ON (2→1) - CYCLE #{state['cycle_count']}")
+                    actions.append(toggle)
+                    state['last_toggle_ms'] = now_ms
+                    state['last_transition'] = "2→1"
+                    state['last_on_time'] = now_ms / 1000.0  # Track when we turned ON
+                elif prev == 1 and digit == 4 and state['last_transition'] == "2→1":  # Only OFF if we turned ON first
+                    print(f"⚫ Toggle OFF (1→4) - CYCLE #{state['cycle_count']} COMPLETE")
+                    actions.append(toggle)
+                    state['last_toggle_ms'] = now_ms
+                    state['last_transition'] = "1→4"
+                else:
+                    print(f"🔄 Transition {transition} - no prayer action (last={state['last_transition']})")
+
+        # Safety: Force prayer OFF if it's been ON for too long (5 seconds)
+        current_time = time.time()
+        if state['last_on_time'] > 0 and (current_time - state['last_on_time']) > 5.0:
+            print(f"⚠️ Prayer has been ON for {current_time - state['last_on_time']:.1f}s - forcing OFF")
+            actions.append(toggle)
+            state['last_on_time'] = 0.0  # Reset timer
+        return actions or None
+
+    pipe = Pipeline(
+        capture_screen,
+        detectors={'crab': detect_crab, 'digit': detect_digit},
+        decide_fn=decide,
+        name="flick",
+        timer=metrics,
+        rate=rate,
+    )
+    pipe.start()
+    try:
+        while pipe.running and not STOP and not PAUSED:
+            time.sleep(0.02)
+    finally:
+        pipe.stop()
+        metrics.stop_writer()  # final write; a resumed run starts a new writer
+        if DEBUG:
+            pipe.print_stats()
+            rate.print_stats()
+            metrics.print_stats()
+
+
 def main():
     global PAUSED, STOP, DEBUG
     print("👀 Watch and Click - Cyan crab or Magenta tunnel")
-    print("Hotkeys: p=toggle pause, s=pause, q=quit, d=debug")
+    print("Hotkeys: p=toggle pause, s=pause, q=quit, d=debug, k=profile")
     print("Click happens once per appearance; when it disappears and reappears, it will click again.")
     print("⏸️  PAUSED - Press 'p' to start")
 
@@ -318,24 +517,64 @@ def main():
     min_area_tunnel = 4000.0  # increased from 2200 to reduce false positives
 
     last_debug_time = 0.0
-
-    # Background tasks timers
-    start_time = time.time()
-    last_forced_crab_click = start_time
-    last_skills_check = start_time
-    last_camera_rotate = start_time
-    last_big_rotate = start_time
-    last_equipment_check = start_time
-    last_prayer_check = start_time
-
-    # Randomized base intervals (jitter added on each cycle)
-    forced_crab_interval = random.uniform(28, 40)  # seconds
-    skills_check_interval = random.uniform(90, 160)
-    camera_rotate_interval = random.uniform(45, 90)
-    big_rotate_interval = random.uniform(180, 360)
-    half_turn_interval = random.uniform(600, 1200)
-    equipment_check_interval = random.uniform(75, 150)
-    prayer_safety_check_interval = random.uniform(15, 25)  # Check for accidental prayer drain
+    crab = None
+    crab_visible = False
+
+    # Periodic behaviors for AFK safety. Each task reads the loop's latest
+    # detection state when it runs; intervals are re-drawn after every run.
+    def forced_crab_click():
+        # Re-click crab occasionally even if visible (to maintain aggro)
+        if crab_visible:
+            (cx, cy), area, _ = crab
+            print(f"🔁 Periodic re-click on crab at ({cx},{cy}) area={area:.0f}")
+            click_at((cx, cy))
+
+    def skills_check():
+        # Prefer the primary training skill, sometimes check a related one
+        skill_pool = [PRIMARY_SKILL] * 3 + ['hitpoints', 'defence', 'attack', 'magic']
+        skill_choice = random.choice(skill_pool)
+        print(f"📊 Periodic skills check (pref {PRIMARY_SKILL}): {skill_choice}")
+        # Non-interactive so it won't pause the loop; quick action
+        auto_funcs.checkstats(skill_choice, method=random.choice(['keybind', 'tab']), interactive=False)
+
+    def equipment_check():
+        # Periodic work equipment check (key '5')
+        if auto_funcs is not None:
+            auto_funcs.press_key('5', 'work equipment check')
+        else:
+            print("🧰 Equipment check: pressing '5'")
+            pyautogui.press('5')
+
+    def prayer_safety_check():
+        # Ensure prayer isn't accidentally left ON outside of flick loop
+        try:
+            # Only check if we're not currently in a flick session (outside crab engagement)
+            if not crab_clicked or (time.time() - crab_last_seen) > 2.0:  # Haven't seen crab for 2+ seconds
+                fresh_frame = capture_screen()
+                if fresh_frame is not None and auto_funcs.is_quick_prayer_on(fresh_frame):
+                    print("🚨 SAFETY: Prayer is ON outside of combat - turning OFF to prevent drain!")
+                    auto_funcs.quick_prayer_toggle(
+                        use_mouse=True,
+                        settle_ms_min=FLICK_SETTLE_MIN,
+                        settle_ms_max=FLICK_SETTLE_MAX,
+                        hold_ms_min=FLICK_HOLD_MIN,
+                        hold_ms_max=FLICK_HOLD_MAX,
+                    )
+        except Exception as e:
+            if DEBUG:
+                print(f"⚠️ Prayer safety check failed: {e}")
+
+    background = TimerWheel(debug=DEBUG)
+    if RECLICK_CRAB_ENABLED:
+        background.every("forced_crab_click", (28, 40), forced_crab_click)
+    background.every("camera_rotate", (45, 90), gentle_camera_rotate)
+    background.every("big_rotate", (180, 360), big_camera_rotate)
+    background.every("half_turn", (600, 1200), half_turn_rotate)  # occasional near-180° sweep to reframe world
+    background.every("equipment_check", (75, 150), equipment_check)
+    if auto_funcs is not None:
+        # Shorter interval after the first so you can notice it more
+        background.every("skills_check", (60, 120), skills_check, first=(90, 160))
+        background.every("prayer_safety_check", (15, 25), prayer_safety_check)
 
     try:
         while not STOP:
@@ -466,82 +705,8 @@ def main():
                             # Set flag to prevent main loop from clicking crab while praying
                             in_prayer_mode = True
                             
-                            # Simple variables for flick loop
-                            seq_last = None
-                            last_toggle_ms = 0.0
-                            miss_frames = 0
-                            last_transition = None  # Track what transition we just did
-                            cycle_count = 0  # Track how many cycles we've completed
-                            last_on_time = 0.0  # Track when we last turned prayer ON
-                            
-                            while True:
-                                if STOP or PAUSED:
-                                    break
-                                frame2 = capture_screen()
-                                if frame2 is None:
-                                    time.sleep(0.04)
-                                    continue
-                                    
-                                # Check if crab still visible
-                                hsv2 = cv2.cvtColor(frame2, cv2.COLOR_BGR2HSV)
-                                crab2 = detect_color(hsv2, CYAN_RANGE)
-                                crab_vis2 = crab2 is not None and crab2[1] >= min_area_crab
-                                
-                                if crab_vis2:
-                                    miss_frames = 0
-                                else:
-                                    miss_frames += 1
-                                    if miss_frames >= CRAB_MISS_FRAMES_TO_EXIT:
-                                        print("🦀 Crab no longer visible - exiting flick loop")
-                                        break
-                                
-                                # Detect orange digits
-                                try:
-                                    digit, score = classify_digit_from_frame(frame2, ALL_TEMPLATES, scales=(0.7,0.85,1.0,1.15))
-                                except Exception:
-                                    digit, score = (None, 0.0)
-                                
-                                # SIMPLE PRAYER LOGIC: Only 2→1 ON, Only 1→4 OFF
-                                if digit is not None and score >= PRAY_MIN_CONF and digit != seq_last:
-                                    print(f"🔍 DIGIT: {digit}, score={score:.2f}, prev={seq_last}, last_transition={last_transition}")
-                                    prev = seq_last
-                                    seq_last = digit
-                                    now_ms = time.time() * 1000.0
-                                    
-                                    # Only toggle if enough time has passed
-                                    if (now_ms - last_toggle_ms) >= FLICK_COOLDOWN_MS:
-                                        transition = f"{prev}→{digit}"
-                                        
-                                        # Reset transition state when we see a new cycle starting (4→3)
-                                        if prev == 4 and digit == 3:
-                                            last_transition = None
-                                            print(f"🔄 New cycle detected (4→3) - resetting transition state")
-                                        
-                                        # Only 2→1 for ON, only 1→4 for OFF, and only if we haven't done it this cycle
-                                        if prev == 2 and digit == 1 and last_transition != "2→1":
-                                            cycle_count += 1
-                                            print(f"🟡 Toggle ON (2→1) - CYCLE #{cycle_count}")
-                                            auto_funcs.quick_prayer_toggle(use_mouse=True)
-                                            last_toggle_ms = now_ms
-                                            last_transition = "2→1"
-                                            last_on_time = now_ms / 1000.0  # Track when we turned ON
-                                        elif prev == 1 and digit == 4 and last_transition == "2→1":  # Only OFF if we turned ON first
-                                            print(f"⚫ Toggle OFF (1→4) - CYCLE #{cycle_count} COMPLETE")
-                                            auto_funcs.quick_prayer_toggle(use_mouse=True)
-                                            last_toggle_ms = now_ms
-                                            last_transition = "1→4"
-                                        else:
-                                            print(f"🔄 Transition {transition} - no prayer action (last={last_transition})")
-                                
-                                # Safety: Force prayer OFF if it's been ON for too long (5 seconds)
-                                current_time = time.time()
-                                if last_on_time > 0 and (current_time - last_on_time) > 5.0:
-                                    print(f"⚠️ Prayer has been ON for {current_time - last_on_time:.1f}s - forcing OFF")
-                                    auto_funcs.quick_prayer_toggle(use_mouse=True)
-                                    last_on_time = 0.0  # Reset timer
-                                
-                                time.sleep(0.02)
-                            
+                            run_flick_pipeline(auto_funcs, min_area_crab)
+
                             # Prayer loop ended - reset flag
                             in_prayer_mode = False
                             
@@ -585,90 +750,16 @@ def main():
                     crab_last_seen = now
                     tunnel_last_seen = now
 
-            # Periodic behaviors for AFK safety
-            # 1) Re-click crab occasionally even if visible (to maintain aggro)
-            if RECLICK_CRAB_ENABLED and (now - last_forced_crab_click > forced_crab_interval):
-                if crab_visible:
-                    (cx, cy), area, _ = crab
-                    print(f"🔁 Periodic re-click on crab at ({cx},{cy}) area={area:.0f}")
-                    click_at((cx, cy))
-                last_forced_crab_click = now
-                forced_crab_interval = random.uniform(28, 40)
-
-            # 2) Occasionally rotate the camera slightly
-            if now - last_camera_rotate > camera_rotate_interval:
-                gentle_camera_rotate()
-                last_camera_rotate = now
-                camera_rotate_interval = random.uniform(45, 90)
-
-            # 2b) Less frequent big rotate
-            if now - last_big_rotate > big_rotate_interval:
-                big_camera_rotate()
-                last_big_rotate = now
-                big_rotate_interval = random.uniform(180, 360)
-
-            # 2c) Occasional near-180° sweep to reframe world
-            if now - start_time > 30 and (now - start_time) % half_turn_interval < 1.0:
-                # Ensure we don't trigger twice within the same window
-                half_turn_interval = random.uniform(600, 1200)
-                half_turn_rotate()
-
-            # 3) Occasionally check skills
-            if auto_funcs is not None and (now - last_skills_check > skills_check_interval):
-                try:
-                    # Prefer the primary training skill, sometimes check a related one
-                    skill_pool = [PRIMARY_SKILL] * 3 + ['hitpoints', 'defence', 'attack', 'magic']
-                    skill_choice = random.choice(skill_pool)
-                    print(f"📊 Periodic skills check (pref {PRIMARY_SKILL}): {skill_choice}")
-                    # Non-interactive so it won't pause the loop; quick action
-                    auto_funcs.checkstats(skill_choice, method=random.choice(['keybind', 'tab']), interactive=False)
-                except Exception as e:
-                    print(f"⚠️ Skills check failed: {e}")
-                finally:
-                    last_skills_check = now
-                    # Shorten interval a bit so you can notice it more
-                    skills_check_interval = random.uniform(60, 120)
-
-            # 4) Periodic work equipment check (key '5')
-            if now - last_equipment_check > equipment_check_interval:
-                try:
-                    if auto_funcs is not None:
-                        auto_funcs.press_key('5', 'work equipment check')
-                    else:
-                        print("🧰 Equipment check: pressing '5'")
-                        pyautogui.press('5')
-                except Exception as e:
-                    print(f"⚠️ Equipment check failed: {e}")
-                finally:
-                    last_equipment_check = now
-                    equipment_check_interval = random.uniform(75, 150)
-
-            # 5) Safety check: ensure prayer isn't accidentally left ON outside of flick loop
-            if auto_funcs is not None and (now - last_prayer_check > prayer_safety_check_interval):
-                try:
-                    # Only check if we're not currently in a flick session (outside crab engagement)
-                    if not crab_clicked or (now - crab_last_seen) > 2.0:  # Haven't seen crab for 2+ seconds
-                        fresh_frame = capture_screen()
-                        if fresh_frame is not None and auto_funcs.is_quick_prayer_on(fresh_frame):
-                            print("🚨 SAFETY: Prayer is ON outside of combat - turning OFF to prevent drain!")
-                            auto_funcs.quick_prayer_toggle(
-                                use_mouse=True,
-                                settle_ms_min=FLICK_SETTLE_MIN,
-                                settle_ms_max=FLICK_SETTLE_MAX,
-                                hold_ms_min=FLICK_HOLD_MIN,
-                                hold_ms_max=FLICK_HOLD_MAX,
-                            )
-                except Exception as e:
-                    if DEBUG:
-                        print(f"⚠️ Prayer safety check failed: {e}")
-                finally:
-                    last_prayer_check = now
-                    prayer_safety_check_interval = random.uniform(15, 25)
+            # Periodic behaviors: at most one per pass so a slow one (skills check)
+            # never delays the next frame's crab/tunnel handling by more than itself
+            background.run_due(budget_s=0.0)
 
-            time.sleep(0.05)
+            time.sleep(min(0.05, background.next_delay()))
 
     finally:
         listener.stop()
+        if DEBUG:
+            background.print_stats()
         print("👋 Stopped watcher")
 
 
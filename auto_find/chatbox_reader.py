@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Incremental Chatbox Reader
+Watches the chatbox and decodes only the lines that newly appeared
+
+Instead of running OCR over the whole screen every time we want to know
+whether "You can't reach that." or a level-up message showed up, the
+watcher keeps a hash per rendered chat row. On each frame the row hashes
+are compared with the previous ones to work out how far the chat scrolled;
+only the rows that scrolled in are OCR'd, and identical row bitmaps are
+decoded once and then served from a cache.
+
+Usage:
+    watcher = ChatboxWatcher()
+    watcher.subscribe(lambda ev: print(ev['text']), pattern="can't reach")
+    while True:
+        watcher.update(capture_screen())
+
+Each event is a dict:
+    - timestamp (float): time.time() when the line was first seen
+    - text (str): decoded line text
+    - row (int): row index inside the chatbox (0 = top)
+    - row_hash (bytes): hash of the row bitmap
+"""
+
+import sys
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import cv2
+    import numpy as np
+except ImportError as e:
+    print(f"❌ Error importing required modules: {e}")
+    print("Install missing packages with: pip install opencv-python numpy")
+    sys.exit(1)
+
+try:
+    import pytesseract
+    HAS_TESS = True
+except ImportError:
+    HAS_TESS = False
+
+
+# Default chatbox geometry for the fixed-size OSRS client, measured from the
+# bottom-left corner of the frame: (x, y_from_bottom, width, height)
+DEFAULT_CHATBOX_FROM_BOTTOM = (7, 165, 500, 112)
+DEFAULT_LINE_HEIGHT = 14
+
+
+class ChatboxWatcher:
+    def __init__(self, region=None, line_height=DEFAULT_LINE_HEIGHT, text_threshold=100,
+                 dark_text=True, cache_size=512, debug=False):
+        """
+        Args:
+            region (tuple): (x, y, w, h) of the chat lines in frame coordinates.
+                If None, derived from the frame size using the fixed-client layout.
+            line_height (int): Pixel height of one chat line.
+            text_threshold (int): Gray level separating text from background.
+            dark_text (bool): True for dark text on the parchment chatbox,
+                False for light text on a transparent chatbox.
+            cache_size (int): How many decoded row bitmaps to remember.
+            debug (bool): Print hashing / decoding details.
+        """
+        self.region = region
+        self.line_height = int(line_height)
+        self.text_threshold = int(text_threshold)
+        self.dark_text = dark_text
+        self.cache_size = int(cache_size)
+        self.debug = debug
+
+        self.row_hashes = []  # hashes of the rows rendered last frame
+        self.row_texts = []  # decoded text per row (None for blank rows)
+        self.roi_hash = None  # hash of the whole chat region
+        self.text_cache = OrderedDict()  # row_hash -> text (LRU)
+        self.subscribers = []  # (callback, compiled_pattern_or_None)
+        self.lock = threading.Lock()
+
+        self.frames_seen = 0
+        self.frames_changed = 0
+        self.lines_decoded = 0
+        self.cache_hits = 0
+
+        self._thread = None
+        self._stop = threading.Event()
+
+    # --- Subscription ---
+    def subscribe(self, callback, pattern=None, case_sensitive=False):
+        """Register a callback for new chat lines.
+
+        Args:
+            callback: Called with the event dict for every matching new line.
+            pattern (str): Optional regex; only lines matching it are delivered.
+            case_sensitive (bool): Whether the pattern match is case sensitive.
+        """
+        compiled = None
+        if pattern:
+            compiled = re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+        with self.lock:
+            self.subscribers.append((callback, compiled))
+        return callback
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            self.subscribers = [(cb, p) for cb, p in self.subscribers if cb is not callback]
+
+    # --- Region / rows ---
+    def get_region(self, frame):
+        if self.region is not None:
+            return self.region
+        h_img = frame.shape[0]
+        x, from_bottom, w, h = DEFAULT_CHATBOX_FROM_BOTTOM
+        return (x, max(0, h_img - from_bottom), w, h)
+
+    def _text_mask(self, roi):
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        if self.dark_text:
+            return (gray < self.text_threshold).astype(np.uint8)
+        return (gray > self.text_threshold).astype(np.uint8)
+
+    def _split_rows(self, mask):
+        n_rows = mask.shape[0] // self.line_height
+        if n_rows <= 0:
+            return []
+        return [mask[i * self.line_height:(i + 1) * self.line_height] for i in range(n_rows)]
+
+    @staticmethod
+    def _hash_row(row):
+        if not row.any():
+            return None  # blank row
+        return hashlib.blake2b(row.tobytes(), digest_size=8).digest()
+
+    @staticmethod
+    def _scroll_offset(old, new):
+        """Return how many rows the chat scrolled up, or None if unrelated."""
+        n = len(new)
+        if len(old) != n or n == 0:
+            return None
+        for k in range(1, n + 1):
+            if old[k:] == new[:n - k]:
+                return k
+        return None
+
+    # --- Decoding ---
+    def _decode_row(self, roi_row, row_hash):
+        cached = self.text_cache.get(row_hash)
+        if cached is not None:
+            self.text_cache.move_to_end(row_hash)
+            self.cache_hits += 1
+            return cached
+
+        text = ""
+        if HAS_TESS:
+            gray = cv2.cvtColor(roi_row, cv2.COLOR_BGR2GRAY)
+            if not self.dark_text:
+                gray = cv2.bitwise_not(gray)
+            proc = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+            try:
+                text = pytesseract.image_to_string(proc, config='--psm 7').strip()
+            except Exception as e:
+                if self.debug:
+                    print(f"   ⚠️ Chat OCR error: {e}")
+        self.lines_decoded += 1
+
+        self.text_cache[row_hash] = text
+        if len(self.text_cache) > self.cache_size:
+            self.text_cache.popitem(last=False)
+        return text
+
+    def _emit(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for callback, pattern in subscribers:
+            if pattern is not None and not pattern.search(event['text']):
+                continue
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"⚠️ Chat subscriber failed: {e}")
+
+    # --- Main entry point ---
+    def update(self, frame):
+        """Process a frame and return the list of newly appeared chat line events."""
+        if frame is None:
+            return []
+        self.frames_seen += 1
+
+        x, y, w, h = self.get_region(frame)
+        roi = frame[y:y + h, x:x + w]
+        if roi.size == 0:
+            return []
+
+        # Cheapest check first: the whole chat region is unchanged
+        roi_hash = hashlib.blake2b(roi.tobytes(), digest_size=8).digest()
+        if roi_hash == self.roi_hash:
+            return []
+        self.roi_hash = roi_hash
+
+        rows = self._split_rows(self._text_mask(roi))
+        new_hashes = [self._hash_row(r) for r in rows]
+        if new_hashes == self.row_hashes:
+            return []  # only background changed (e.g. transparency)
+        self.frames_changed += 1
+
+        old_hashes = self.row_hashes
+        offset = self._scroll_offset(old_hashes, new_hashes)
+        if offset is None:
+            # Unrelated content (first frame, tab switch, big scroll): everything is new
+            first_new = 0
+        else:
+            first_new = len(new_hashes) - offset
+
+        texts = [None] * len(new_hashes)
+        if offset is not None:
+            texts[:first_new] = self.row_texts[offset:]
+
+        events = []
+        now = time.time()
+        for i in range(first_new, len(new_hashes)):
+            row_hash = new_hashes[i]
+            if row_hash is None:
+                continue
+            roi_row = roi[i * self.line_height:(i + 1) * self.line_height]
+            text = self._decode_row(roi_row, row_hash)
+            texts[i] = text
+            if not text:
+                continue
+            events.append({
+                'timestamp': now,
+                'text': text,
+                'row': i,
+                'row_hash': row_hash,
+            })
+
+        self.row_hashes = new_hashes
+        self.row_texts = texts
+
+        if self.debug:
+            print(f"   💬 Chat changed (scroll={offset}), decoded {len(new_hashes) - first_new} row(s)")
+        for event in events:
+            self._emit(event)
+        return events
+
+    def lines(self):
+        """Return the currently visible decoded lines, top to bottom."""
+        return [t for t in self.row_texts if t]
+
+    def stats(self):
+        return {
+            'frames_seen': self.frames_seen,
+            'frames_changed': self.frames_changed,
+            'lines_decoded': self.lines_decoded,
+            'cache_hits': self.cache_hits,
+        }
+
+    # --- Optional background polling ---
+    def start(self, capture_fn, interval=0.1):
+        """Poll capture_fn in a background thread and feed frames to update()."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def _run():
+            while not self._stop.is_set():
+                try:
+                    self.update(capture_fn())
+                except Exception as e:
+                    print(f"⚠️ Chatbox watcher error: {e}")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=_run, name="chatbox-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+
+def main():
+    print("💬 Chatbox Watcher")
+    print("=" * 40)
+    print("Prints every new chat line. Press Ctrl+C to stop.")
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from color_detection import capture_screen
+
+    if not HAS_TESS:
+        print("⚠️ pytesseract not available - lines will be tracked but not decoded")
+
+    watcher = ChatboxWatcher()
+    watcher.subscribe(lambda ev: print(f"[{time.strftime('%H:%M:%S', time.localtime(ev['timestamp']))}] 💬 {ev['text']}"))
+    try:
+        while True:
+            watcher.update(capture_screen())
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        print(f"\n📊 {watcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,13 @@ import os
 import time
 import random
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'auto_actions'))
 
 import cv2
 import numpy as np
 import pyautogui
 from pynput import keyboard
+from frame_bus import read_bus_frame
 import time
 
 # ---- Helpers: pause control and screen capture ----
@@ -40,6 +42,9 @@ def wait_for_unpause():
 
 
 def capture_screen():
+    frame = read_bus_frame()  # shared capture from frame_bus.py when AUTO_FRAME_BUS is set
+    if frame is not None:
+        return frame
     try:
         image = pyautogui.screenshot()
         frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
@@ -121,6 +121,29 @@ def example_continuous_monitoring():
         print("\n🛑 Monitoring stopped by user")
 
 
+def example_menu_option():
+    """Example: Pick an option from an open right-click menu without OCR"""
+    print("📋 Menu Option Example")
+    print("-" * 30)
+    
+    option = input("Enter menu option to choose (e.g. 'Attack', 'Chop down'): ").strip()
+    if not option:
+        print("❌ No option entered")
+        return
+    
+    from text_utils import wait_for_unpause
+    from menu_parser import choose_menu_option
+    print("Right-click the target in game, then press 'p' (keep the mouse over the menu)...")
+    wait_for_unpause()
+    
+    result = choose_menu_option(option)
+    
+    if result['success']:
+        print(f"✅ Chose '{result['text_found']}'!")
+    else:
+        print(f"❌ Could not find menu option: {option}")
+
+
 def main():
     """Main menu for examples"""
     print("🔍 Text Detection Examples")
@@ -132,11 +155,12 @@ def main():
     print("3. Interface Button (find and click buttons)")
     print("4. Continuous Monitoring (keep checking for text)")
     print("5. Custom Search")
-    print("6. Exit")
+    print("6. Right-Click Menu Option (cached, no full-screen OCR)")
+    print("7. Exit")
     print()
     
     while True:
-        choice = input("Enter your choice (1-6): ").strip()
+        choice = input("Enter your choice (1-7): ").strip()
         
         if choice == '1':
             example_npc_interaction()
@@ -153,6 +177,8 @@ def main():
                 result = findtextonscreen(text, click=True)
                 print(f"Result: {result}")
         elif choice == '6':
+            example_menu_option()
+        elif choice == '7':
             print("👋 Goodbye!")
             break
         else:
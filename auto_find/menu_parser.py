@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Right-Click Menu Parser
+Finds the OSRS right-click menu by its fixed colors and reads its options
+
+The right-click menu is always drawn the same way: a flat brown body
+(RGB 93, 84, 71) with a black "Choose Option" header and fixed-height
+entry rows. That lets us skip full-screen OCR entirely:
+
+1. Locate the menu frame by its body color (optionally only near the cursor)
+2. Slice it into entry rows using the fixed header / row heights
+3. Identify each row by hashing its glyph bitmap and looking it up in a
+   cache of already-seen option strings
+
+A row bitmap is only OCR'd the first time it is seen; afterwards the same
+option ("Attack Gemstone Crab", "Chop down Tree", ...) is recognised by its
+glyph hash alone. The cache is saved to disk so later runs start warm.
+
+Only trusted reads are cached: the OCR text must contain a known option
+(passed to the parser or searched for with find_option) or Tesseract must
+report at least MIN_CACHE_CONFIDENCE. A misread is returned for that parse
+but not remembered, so the row is OCR'd again next time.
+
+Usage:
+    parser = MenuParser(known_options=["Attack", "Chop down"])
+    entries = parser.parse(frame, near=(mouse_x, mouse_y))
+    entry = parser.find_option(frame, "Chop down")
+    parser.choose_option("Attack")
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import hashlib
+
+try:
+    import cv2
+    import numpy as np
+except ImportError as e:
+    print(f"❌ Error importing required modules: {e}")
+    print("Install missing packages with: pip install opencv-python numpy")
+    sys.exit(1)
+
+try:
+    import pytesseract
+    HAS_TESS = True
+except ImportError:
+    HAS_TESS = False
+
+
+# Menu body color in BGR and layout constants (fixed by the client)
+MENU_BG_BGR = (71, 84, 93)
+MENU_BG_TOLERANCE = 4
+MENU_HEADER_HEIGHT = 19
+MENU_ROW_HEIGHT = 15
+MENU_TEXT_LEFT_PAD = 3
+MENU_MIN_WIDTH = 60
+
+# How far around the cursor the menu can open
+MENU_SEARCH_MARGIN = (320, 260)
+
+# Mean Tesseract word confidence (0-100) needed to cache an unknown option
+MIN_CACHE_CONFIDENCE = 80.0
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'auto_actions', 'data', 'menu_glyph_cache.json'
+)
+
+
+class MenuParser:
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, debug=False, known_options=None,
+                 min_confidence=MIN_CACHE_CONFIDENCE):
+        self.cache_path = cache_path
+        self.debug = debug
+        self.known_options = {o.lower() for o in (known_options or ())}
+        self.min_confidence = min_confidence
+        self.glyph_cache = {}  # row glyph hash (hex) -> option text
+        self.cache_dirty = False
+        self.cache_hits = 0
+        self.ocr_calls = 0
+        self._load_cache()
+
+    # --- Glyph cache persistence ---
+    def _load_cache(self):
+        try:
+            if self.cache_path and os.path.exists(self.cache_path):
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    self.glyph_cache = json.load(f)
+                if self.debug:
+                    print(f"🗂️ Loaded {len(self.glyph_cache)} cached menu options")
+        except Exception as e:
+            print(f"⚠️ Failed to load menu glyph cache: {e}")
+            self.glyph_cache = {}
+
+    def save_cache(self):
+        if not self.cache_dirty or not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(self.glyph_cache, f, indent=2)
+            self.cache_dirty = False
+        except Exception as e:
+            print(f"⚠️ Failed to save menu glyph cache: {e}")
+
+    def learn(self, glyph_hash, text):
+        """Store a known option string for a glyph hash."""
+        if self.glyph_cache.get(glyph_hash) != text:
+            self.glyph_cache[glyph_hash] = text
+            self.cache_dirty = True
+
+    def forget(self, glyph_hash):
+        """Drop a cached option (e.g. one later found to be misread)."""
+        if self.glyph_cache.pop(glyph_hash, None) is not None:
+            self.cache_dirty = True
+
+    def _trusted(self, text, confidence):
+        """Whether an OCR read is reliable enough to cache."""
+        lowered = text.lower()
+        if any(opt in lowered for opt in self.known_options):
+            return True
+        return confidence >= self.min_confidence
+
+    # --- Menu frame detection ---
+    def _body_mask(self, bgr):
+        lower = np.array([max(0, c - MENU_BG_TOLERANCE) for c in MENU_BG_BGR], dtype=np.uint8)
+        upper = np.array([min(255, c + MENU_BG_TOLERANCE) for c in MENU_BG_BGR], dtype=np.uint8)
+        return cv2.inRange(bgr, lower, upper)
+
+    def find_menu(self, frame, near=None):
+        """Return the menu body box (x, y, w, h) in frame coordinates, or None.
+
+        Args:
+            frame: BGR screen capture.
+            near (tuple): Optional (x, y) where the menu was opened (usually the
+                cursor); restricts the search to a small window around it.
+        """
+        if frame is None:
+            return None
+        ox, oy = 0, 0
+        search = frame
+        if near is not None:
+            mx, my = MENU_SEARCH_MARGIN
+            x1, y1 = max(0, int(near[0]) - mx), max(0, int(near[1]) - MENU_HEADER_HEIGHT - 10)
+            x2, y2 = min(frame.shape[1], int(near[0]) + mx), min(frame.shape[0], int(near[1]) + my)
+            search = frame[y1:y2, x1:x2]
+            ox, oy = x1, y1
+        if search.size == 0:
+            return None
+
+        mask = self._body_mask(search)
+        # Glyphs punch holes in the body; close them so the body is one blob
+        kernel = np.ones((5, 5), np.uint8)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+
+        best = None
+        best_area = 0
+        for c in contours:
+            x, y, w, h = cv2.boundingRect(c)
+            if w < MENU_MIN_WIDTH or h < MENU_HEADER_HEIGHT + MENU_ROW_HEIGHT:
+                continue
+            # The menu is a filled rectangle; reject irregular blobs
+            fill = cv2.contourArea(c) / float(w * h)
+            if fill < 0.85:
+                continue
+            if w * h > best_area:
+                best_area = w * h
+                best = (x + ox, y + oy, w, h)
+        if self.debug and best is not None:
+            print(f"   📋 Menu frame at {best}")
+        return best
+
+    # --- Row slicing / identification ---
+    def _row_glyphs(self, row_bgr):
+        """Binarize a row: everything that is not menu body is glyph ink."""
+        body = self._body_mask(row_bgr)
+        ink = cv2.bitwise_not(body)
+        ys, xs = np.nonzero(ink)
+        if len(xs) == 0:
+            return None
+        # Crop to the ink bounding box so a few px of horizontal jitter don't matter
+        return ink[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+
+    @staticmethod
+    def _glyph_hash(glyphs):
+        h = hashlib.blake2b(digest_size=8)
+        h.update(np.array(glyphs.shape, dtype=np.int32).tobytes())
+        h.update(np.packbits(glyphs > 0).tobytes())
+        return h.hexdigest()
+
+    def _ocr_row(self, row_bgr):
+        """OCR one row; returns (text, mean word confidence 0-100)."""
+        if not HAS_TESS:
+            return "", 0.0
+        self.ocr_calls += 1
+        gray = cv2.cvtColor(row_bgr, cv2.COLOR_BGR2GRAY)
+        proc = cv2.resize(gray, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
+        try:
+            data = pytesseract.image_to_data(proc, config='--psm 7', output_type=pytesseract.Output.DICT)
+        except Exception as e:
+            if self.debug:
+                print(f"   ⚠️ Menu OCR error: {e}")
+            return "", 0.0
+        words, confs = [], []
+        for word, conf in zip(data.get('text', []), data.get('conf', [])):
+            word = str(word).strip()
+            try:
+                conf = float(conf)
+            except (TypeError, ValueError):
+                continue
+            if word and conf >= 0:
+                words.append(word)
+                confs.append(conf)
+        if not words:
+            return "", 0.0
+        return " ".join(words), sum(confs) / len(confs)
+
+    def parse(self, frame, near=None, menu_box=None):
+        """Return the menu entries as a list of dicts, top to bottom.
+
+        Each entry has:
+            - index (int): 0-based entry index (header excluded)
+            - text (str): option text ('' if unknown and OCR unavailable)
+            - bbox (tuple): (x, y, w, h) of the row on screen
+            - center (tuple): (x, y) click point for the row
+            - glyph_hash (str): hash of the row glyph bitmap
+            - cached (bool): whether the text came from the glyph cache
+        """
+        box = menu_box or self.find_menu(frame, near=near)
+        if box is None:
+            return []
+        x, y, w, h = box
+
+        # The box includes the "Choose Option" header; entries start below it
+        n_rows = (h - MENU_HEADER_HEIGHT) // MENU_ROW_HEIGHT
+        entries = []
+        for i in range(n_rows):
+            ry = y + MENU_HEADER_HEIGHT + i * MENU_ROW_HEIGHT
+            row = frame[ry:ry + MENU_ROW_HEIGHT, x + MENU_TEXT_LEFT_PAD:x + w - 1]
+            if row.size == 0:
+                continue
+            glyphs = self._row_glyphs(row)
+            if glyphs is None:
+                continue
+            glyph_hash = self._glyph_hash(glyphs)
+            text = self.glyph_cache.get(glyph_hash)
+            cached = text is not None
+            if cached:
+                self.cache_hits += 1
+            else:
+                text, confidence = self._ocr_row(row)
+                if text and self._trusted(text, confidence):
+                    self.learn(glyph_hash, text)
+                elif text and self.debug:
+                    print(f"   📋 Not caching '{text}' (confidence {confidence:.0f})")
+            entries.append({
+                'index': len(entries),
+                'text': text,
+                'bbox': (x, ry, w, MENU_ROW_HEIGHT),
+                'center': (x + w // 2, ry + MENU_ROW_HEIGHT // 2),
+                'glyph_hash': glyph_hash,
+                'cached': cached,
+            })
+        self.save_cache()
+        return entries
+
+    def find_option(self, frame, option, near=None, case_sensitive=False):
+        """Return the first entry whose text contains `option`, or None.
+
+        `option` is also registered as a known option, so OCR reads that
+        contain it are cached even below the confidence threshold.
+        """
+        self.known_options.add(option.lower())
+        needle = option if case_sensitive else option.lower()
+        for entry in self.parse(frame, near=near):
+            text = entry['text'] if case_sensitive else entry['text'].lower()
+            if needle in text:
+                return entry
+        return None
+
+    def choose_option(self, option, near=None, capture_fn=None, case_sensitive=False):
+        """Find `option` in the open menu and click it.
+
+        Returns the result dict in the same shape as findtextonscreen().
+        """
+        import pyautogui
+
+        if capture_fn is None:
+            sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+            from color_detection import capture_screen as capture_fn
+        if near is None:
+            near = pyautogui.position()
+
+        start = time.perf_counter()
+        frame = capture_fn()
+        entry = self.find_option(frame, option, near=near, case_sensitive=case_sensitive)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        if entry is None:
+            error_msg = f"Menu option '{option}' not found"
+            print(f"❌ {error_msg}")
+            return {'success': False, 'error': error_msg, 'position': None, 'confidence': 0}
+
+        cx, cy = entry['center']
+        bx, by, bw, bh = entry['bbox']
+        final_x = cx + random.randint(-max(1, bw // 4), max(1, bw // 4))
+        final_y = cy + random.randint(-(bh // 2 - 3), bh // 2 - 3)
+        if self.debug:
+            src = "cache" if entry['cached'] else "OCR"
+            print(f"   📋 '{entry['text']}' via {src} in {elapsed_ms:.1f} ms")
+        pyautogui.moveTo(final_x, final_y, duration=random.uniform(0.08, 0.16))
+        pyautogui.click()
+        print(f"✅ Chose menu option '{entry['text']}'")
+        return {
+            'success': True,
+            'text_found': entry['text'],
+            'position': (final_x, final_y),
+            'confidence': 1.0,
+            'bounding_box': entry['bbox'],
+        }
+
+
+# Shared instance so repeated calls keep the warm cache
+_menu_parser = None
+
+
+def get_menu_parser():
+    """Get or create the shared MenuParser instance"""
+    global _menu_parser
+    if _menu_parser is None:
+        _menu_parser = MenuParser()
+    return _menu_parser
+
+
+def choose_menu_option(option, near=None):
+    """Convenience wrapper: click `option` in the currently open right-click menu."""
+    return get_menu_parser().choose_option(option, near=near)
+
+
+def main():
+    print("📋 Right-Click Menu Parser")
+    print("=" * 40)
+    print("Right-click something in game, then press Enter here to read the menu.")
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from color_detection import capture_screen
+    import pyautogui
+
+    parser = MenuParser(debug=True)
+    try:
+        while True:
+            input("Press Enter to parse (Ctrl+C to quit)...")
+            start = time.perf_counter()
+            entries = parser.parse(capture_screen(), near=pyautogui.position())
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            if not entries:
+                print("❌ No menu found")
+                continue
+            for entry in entries:
+                src = "cache" if entry['cached'] else "OCR"
+                print(f"  {entry['index']}: {entry['text']!r} ({src})")
+            print(f"⏱️ Parsed {len(entries)} options in {elapsed_ms:.1f} ms "
+                  f"(cache hits: {parser.cache_hits}, OCR calls: {parser.ocr_calls})")
+    except KeyboardInterrupt:
+        print("\n👋 Goodbye!")
+
+
+if __name__ == "__main__":
+    main()
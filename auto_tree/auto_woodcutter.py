@@ -8,7 +8,9 @@ import sys
 import os
 import time
 import random
+from collections import deque
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "auto_actions"))
 
 import cv2
 import numpy as np
@@ -16,6 +18,11 @@ import pyautogui
 from pynput import keyboard
 from tree_detector import detect_tree_indicators, capture_screen, click_tree
 from inventory_manager import InventoryManager
+from capture_rate import CaptureRate
+
+CHOP_CHECK_HZ = 1.0 / 3.0   # tree checks while chopping
+FALL_CHECK_HZ = 1.0         # tree checks around the expected fall time
+FALL_WINDOW_S = 3.0         # +/- around the median past chop duration
 
 def detect_player_position():
     """Detect the player's position by finding the orange tile (FFFF7D00)"""
@@ -103,6 +110,10 @@ class AutoWoodcutter:
         self.last_camera_rotation = 0
         self.inventory_check_interval = 20  # Check inventory every 20 seconds
         self.camera_rotation_interval = random.uniform(45, 60)  # Rotate camera every 45-60 seconds
+
+        # Tree checks slow while chopping, faster when the tree is due to fall, slow when paused
+        self.capture_rate = CaptureRate("woodcutter", rates={"chopping": CHOP_CHECK_HZ}, fast_hz=FALL_CHECK_HZ)
+        self.chop_durations = deque(maxlen=20)
         
     def start_keyboard_monitoring(self):
         """Start keyboard listener for hotkeys"""
@@ -134,7 +145,8 @@ class AutoWoodcutter:
         if not self.running:
             return False
         if self.paused:
-            time.sleep(0.1)
+            self.capture_rate.set_state("paused")
+            self.capture_rate.wait()
             return True
         return True
     
@@ -378,10 +390,13 @@ class AutoWoodcutter:
         print(f"🎯 Now tracking tree at player location: {player_tree['position']}")
         
         start_wait = time.time()
-        check_interval = 3.0  # Check every 3 seconds
-        last_check = time.time()
+        if self.chop_durations:
+            expected = float(np.median(self.chop_durations))
+            self.capture_rate.expect_in(expected, window_s=FALL_WINDOW_S, key="tree_fall")
         
         while self.running:
+            self.capture_rate.set_state("chopping")
+            self.capture_rate.wait()
             current_time = time.time()
             
             if not self.check_if_should_continue():
@@ -393,49 +408,47 @@ class AutoWoodcutter:
             # Check for periodic tasks (inventory and camera rotation)
             self.check_periodic_tasks()
             
-            if current_time - last_check >= check_interval:
-                still_there = self.is_tree_still_there(self.current_tree)
+            still_there = self.is_tree_still_there(self.current_tree)
+            self.capture_rate.frame()
+            
+            if not still_there:
+                # Triple-check: wait and scan multiple times to be absolutely sure
+                print("🔍 Tree appears gone, triple-checking...")
                 
-                if not still_there:
-                    # Triple-check: wait and scan multiple times to be absolutely sure
-                    print("🔍 Tree appears gone, triple-checking...")
-                    
-                    # First confirmation check
-                    time.sleep(2.0)  # Wait longer for first check
-                    confirmation_check_1 = self.is_tree_still_there(self.current_tree)
-                    
-                    if confirmation_check_1:
-                        print("❌ First confirmation failed - tree is still there")
-                        last_check = current_time
-                        continue
-                    
-                    # Second confirmation check  
-                    print("🔍 First check confirms gone, second check...")
-                    time.sleep(2.0)  # Wait longer for second check
-                    confirmation_check_2 = self.is_tree_still_there(self.current_tree)
-                    
-                    if confirmation_check_2:
-                        print("❌ Second confirmation failed - tree is still there")
-                        last_check = current_time
-                        continue
-                    
-                    # Tree is definitely gone
-                    elapsed = current_time - start_wait
-                    print(f"🎉 Tree confirmed chopped down! (took {elapsed:.1f}s)")
-                    self.trees_chopped += 1
-                    self.current_tree = None
-                    return True
-                    
+                # First confirmation check
+                time.sleep(2.0)  # Wait longer for first check
+                confirmation_check_1 = self.is_tree_still_there(self.current_tree)
+                
+                if confirmation_check_1:
+                    print("❌ First confirmation failed - tree is still there")
+                    continue
+                
+                # Second confirmation check  
+                print("🔍 First check confirms gone, second check...")
+                time.sleep(2.0)  # Wait longer for second check
+                confirmation_check_2 = self.is_tree_still_there(self.current_tree)
+                
+                if confirmation_check_2:
+                    print("❌ Second confirmation failed - tree is still there")
+                    continue
+                
+                # Tree is definitely gone
                 elapsed = current_time - start_wait
-                print(f"🌳 Tree still there... (waiting {elapsed:.1f}s)")
-                last_check = current_time
+                print(f"🎉 Tree confirmed chopped down! (took {elapsed:.1f}s)")
+                self.trees_chopped += 1
+                self.chop_durations.append(elapsed)
+                self.capture_rate.clear("tree_fall")
+                self.current_tree = None
+                return True
+                
+            elapsed = current_time - start_wait
+            print(f"🌳 Tree still there... (waiting {elapsed:.1f}s)")
             
             if current_time - start_wait > self.tree_timeout:
                 print(f"⏰ Timeout waiting for tree! (waited {self.tree_timeout}s)")
+                self.capture_rate.clear("tree_fall")
                 self.current_tree = None
                 return True
-                
-            time.sleep(0.5)
             
         return False
     
@@ -483,6 +496,7 @@ class AutoWoodcutter:
                     
                 if self.paused:
                     continue
+                self.capture_rate.set_state("active")
                 
                 print(f"\n--- Woodcutting Cycle #{cycle} ---")
                 
@@ -565,6 +579,7 @@ class AutoWoodcutter:
                 logs_per_hour = (self.logs_dropped * 28 / total_time) * 3600
                 print(f"   Trees per hour: {rate:.1f}")
                 print(f"   Estimated logs/hour: {logs_per_hour:.0f}")
+            self.capture_rate.print_stats()
 
 def main():
     """Main function - just run the woodcutter"""
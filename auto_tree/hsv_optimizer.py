@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+HSV Range Optimizer - Tighten colour ranges from labeled frames
+
+Offline, batch counterpart of calibrate_color.py: instead of a few clicked
+pixels it uses every pixel of a labeled dataset (see
+auto_actions/detector_eval.py). For each colour class:
+
+- positives: pixels inside that class's ground-truth boxes that fall in the
+  current (seed) range - the boxes also contain background
+- negatives: every pixel outside those boxes (other overlays included, so
+  overlapping classes such as crab/tunnel get pushed apart)
+
+Both are counted into 3-D HSV histograms (H x S/4 x V/4 bins, one
+np.bincount per frame). The range is then shrunk face by face, always
+dropping the slab that removes the most negatives per positive lost, until
+positive coverage would fall below --coverage. The result is the tightest
+axis-aligned range, a drop-in for the hand-tuned (lower, upper) tuples.
+With --lut, a per-bin lookup table (bin is on where positives outnumber
+negatives) is written as well, for colours a single box cannot separate.
+
+Each class is checked before/after on the dataset: box recall, mask pixels
+outside boxes and contours per frame, and inRange + findContours time.
+
+Usage:
+    python hsv_optimizer.py alch                        # all classes with labels
+    python hsv_optimizer.py alch --classes crab,tunnel --coverage 0.99
+    python hsv_optimizer.py alch --seed crab=140,100,100:160,255,255
+    python hsv_optimizer.py alch --out ranges.json --lut luts.npz --margin 2,10,10
+
+    luts = load_luts("luts.npz")
+    mask = apply_lut(hsv, *luts["crab"])
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "auto_actions"))
+from detector_eval import LABEL_KINDS, FrameDataset
+
+H_BINS = 180
+SV_SHIFT = 2  # S and V quantized to 4 levels per bin
+SV_BINS = 256 >> SV_SHIFT
+MIN_CONTOUR_AREA = 50  # same cut-off as calibrate_color.test_range
+
+Range = Tuple[np.ndarray, np.ndarray]
+
+# Current hand-tuned ranges; positives are only taken from pixels inside them
+SEED_RANGES: Dict[str, Range] = {
+    # AutoAlchCrabBot.crab_hsv_lower/upper
+    "crab": (np.array([140, 100, 100]), np.array([160, 255, 255])),
+    # AutoAlchCrabBot.tunnel_hsv_*, color_detection.TUNNEL_COLOR
+    "tunnel": (np.array([135, 80, 110]), np.array([175, 255, 255])),
+    # Union of tm_detect._orange_mask's two ranges
+    "digit_box": (np.array([10, 130, 160]), np.array([36, 255, 255])),
+    # Widest of attack_detector.HSV_ORANGE_DAMAGE_RANGES
+    "damage": (np.array([10, 100, 100]), np.array([45, 255, 255])),
+}
+
+
+def _bin_index(hsv: np.ndarray) -> np.ndarray:
+    """Flat histogram bin of every pixel."""
+    h = hsv[..., 0].astype(np.int32)
+    s = (hsv[..., 1] >> SV_SHIFT).astype(np.int32)
+    v = (hsv[..., 2] >> SV_SHIFT).astype(np.int32)
+    return (h * SV_BINS + s) * SV_BINS + v
+
+
+def _box_mask(shape, boxes) -> np.ndarray:
+    mask = np.zeros(shape[:2], dtype=bool)
+    for x, y, w, h in boxes:
+        x, y = max(0, int(x)), max(0, int(y))
+        mask[y:y + int(h), x:x + int(w)] = True
+    return mask
+
+
+class ClassHistograms:
+    def __init__(self, name: str, seed: Range):
+        self.name = name
+        self.seed = seed
+        size = H_BINS * SV_BINS * SV_BINS
+        self.pos = np.zeros(size, dtype=np.int64)
+        self.neg = np.zeros(size, dtype=np.int64)
+        self.frames = 0
+
+    def add(self, hsv: np.ndarray, boxes: List[List[float]]):
+        bins = _bin_index(hsv)
+        inside = _box_mask(hsv.shape, boxes)
+        in_seed = cv2.inRange(hsv, self.seed[0], self.seed[1]).astype(bool)
+        self.pos += np.bincount(bins[inside & in_seed], minlength=self.pos.size)
+        self.neg += np.bincount(bins[~inside], minlength=self.neg.size)
+        self.frames += 1
+
+    def grids(self) -> Tuple[np.ndarray, np.ndarray]:
+        shape = (H_BINS, SV_BINS, SV_BINS)
+        return self.pos.reshape(shape), self.neg.reshape(shape)
+
+
+def optimize_range(pos: np.ndarray, neg: np.ndarray, coverage: float = 0.995) -> Optional[Range]:
+    """Greedily shrink an axis-aligned bin range; returns (lower, upper) in HSV units."""
+    total = pos.sum()
+    if not total:
+        return None
+    lo, hi = [], []
+    for axis in range(3):
+        other = tuple(a for a in range(3) if a != axis)
+        nz = np.nonzero(pos.sum(axis=other))[0]
+        lo.append(int(nz[0]))
+        hi.append(int(nz[-1]))
+    budget = total * (1.0 - coverage)
+    lost = 0
+
+    def slab(grid, axis, idx):
+        sl = [slice(lo[a], hi[a] + 1) for a in range(3)]
+        sl[axis] = idx
+        return grid[tuple(sl)].sum()
+
+    while True:
+        best = None
+        for axis in range(3):
+            if lo[axis] >= hi[axis]:
+                continue
+            for side, idx in (("lo", lo[axis]), ("hi", hi[axis])):
+                p, n = slab(pos, axis, idx), slab(neg, axis, idx)
+                if p == 0:
+                    score = float("inf")  # free: only tightens
+                elif n == 0 or lost + p > budget:
+                    continue
+                else:
+                    score = n / p
+                if best is None or score > best[0]:
+                    best = (score, axis, side, p)
+        if best is None:
+            break
+        _, axis, side, p = best
+        lost += p
+        if side == "lo":
+            lo[axis] += 1
+        else:
+            hi[axis] -= 1
+    step = 1 << SV_SHIFT
+    lower = np.array([lo[0], lo[1] * step, lo[2] * step], dtype=np.uint8)
+    upper = np.array([hi[0], min(255, hi[1] * step + step - 1), min(255, hi[2] * step + step - 1)], dtype=np.uint8)
+    return lower, upper
+
+
+def build_lut(pos: np.ndarray, neg: np.ndarray, smooth: int = 1) -> np.ndarray:
+    """Bins where (neighbourhood-smoothed) positives outnumber negatives."""
+    if smooth:
+        k = 2 * smooth + 1
+        pos = np.stack([cv2.blur(pos[h].astype(np.float32), (k, k)) for h in range(H_BINS)])
+        neg = np.stack([cv2.blur(neg[h].astype(np.float32), (k, k)) for h in range(H_BINS)])
+    return ((pos > 0) & (pos >= neg)).reshape(-1)
+
+
+def lut_bounds(lut: np.ndarray) -> Range:
+    """Smallest HSV range containing every 'on' bin of a lookup table."""
+    on = np.nonzero(lut.reshape(H_BINS, SV_BINS, SV_BINS))
+    step = 1 << SV_SHIFT
+    lower = np.array([on[0].min(), on[1].min() * step, on[2].min() * step], dtype=np.uint8)
+    upper = np.array([on[0].max(), on[1].max() * step + step - 1, on[2].max() * step + step - 1], dtype=np.uint8)
+    return lower, upper
+
+
+def apply_lut(hsv: np.ndarray, lut: np.ndarray, bounds: Optional[Range] = None) -> np.ndarray:
+    """uint8 mask (0/255) from a flat lookup table built by build_lut().
+
+    With bounds (lut_bounds()), cv2.inRange picks the candidates first and only
+    those are looked up - a full-frame fancy index costs ~10x an inRange.
+    """
+    if bounds is None:
+        return np.take(lut, _bin_index(hsv)).astype(np.uint8) * 255
+    mask = cv2.inRange(hsv, bounds[0], bounds[1])
+    ys, xs = np.nonzero(mask)
+    if len(ys):
+        mask[ys, xs] = np.take(lut, _bin_index(hsv[ys, xs])).astype(np.uint8) * 255
+    return mask
+
+
+def load_luts(path: str) -> Dict[str, Tuple[np.ndarray, Range]]:
+    """name -> (lut, bounds), ready for apply_lut(hsv, *luts[name])."""
+    with np.load(path) as data:
+        return {name: (data[name], lut_bounds(data[name])) for name in data.files}
+
+
+def evaluate(dataset: FrameDataset, name: str, mask_fn) -> dict:
+    """Box recall, noise outside boxes, contours and mask+contour time per frame."""
+    boxes_hit = boxes_total = 0
+    noise = contours = 0
+    elapsed = 0.0
+    frames = 0
+    for item, frame in dataset:
+        boxes = item.get("labels", {}).get(name)
+        if boxes is None:
+            continue
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        t0 = time.perf_counter()
+        mask = mask_fn(hsv)
+        cnts, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        elapsed += time.perf_counter() - t0
+        frames += 1
+        contours += sum(1 for c in cnts if cv2.contourArea(c) >= MIN_CONTOUR_AREA)
+        inside = _box_mask(mask.shape, boxes)
+        noise += int(np.count_nonzero(mask[~inside]))
+        for x, y, w, h in boxes:
+            boxes_total += 1
+            x, y = max(0, int(x)), max(0, int(y))
+            if cv2.countNonZero(mask[y:y + int(h), x:x + int(w)]) >= MIN_CONTOUR_AREA:
+                boxes_hit += 1
+    frames = max(1, frames)
+    return {
+        "box_recall": boxes_hit / boxes_total if boxes_total else 1.0,
+        "noise_px_per_frame": noise / frames,
+        "contours_per_frame": contours / frames,
+        "ms_per_frame": elapsed * 1000.0 / frames,
+    }
+
+
+def _parse_seed(text: str) -> Tuple[str, Range]:
+    name, spec = text.split("=", 1)
+    lower, upper = (np.array([int(v) for v in part.split(",")], dtype=np.uint8) for part in spec.split(":"))
+    return name, (lower, upper)
+
+
+def _fmt(r: Range) -> str:
+    return f"np.array([{', '.join(str(int(v)) for v in r[0])}]), np.array([{', '.join(str(int(v)) for v in r[1])}])"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize HSV ranges from a labeled frame dataset")
+    parser.add_argument("dataset", help="Dataset name or path (auto_actions/data/datasets/<name>)")
+    parser.add_argument("--classes", help="Comma-separated box labels (default: all with labels and a seed)")
+    parser.add_argument("--seed", action="append", default=[], metavar="NAME=H,S,V:H,S,V",
+                        help="Seed range for a class (overrides/extends the built-in ones)")
+    parser.add_argument("--coverage", type=float, default=0.995, help="Fraction of positive pixels to keep")
+    parser.add_argument("--margin", default="0,0,0", metavar="H,S,V",
+                        help="Widen the optimized range by this much (lighting the dataset lacks)")
+    parser.add_argument("--out", help="Write ranges and before/after stats as JSON")
+    parser.add_argument("--lut", help="Also build per-class lookup tables and save them (.npz)")
+    args = parser.parse_args()
+
+    margin = np.array([int(v) for v in args.margin.split(",")])
+    seeds = dict(SEED_RANGES)
+    seeds.update(_parse_seed(s) for s in args.seed)
+    dataset = FrameDataset(args.dataset)
+    counts = dataset.label_counts()
+    if args.classes:
+        names = args.classes.split(",")
+    else:
+        names = [n for n in seeds if counts.get(n) and LABEL_KINDS.get(n, "box") == "box"]
+    names = [n for n in names if n in seeds and counts.get(n)]
+    if not names:
+        print(f"❌ No labeled box classes with a seed range in {dataset.path}")
+        return 1
+
+    print(f"🎨 HSV optimizer: {len(dataset)} frames, classes: {', '.join(names)}")
+    hists = {name: ClassHistograms(name, seeds[name]) for name in names}
+    for item, frame in dataset:
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        labels = item.get("labels", {})
+        for name, hist in hists.items():
+            if name in labels:
+                hist.add(hsv, labels[name])
+
+    report = {}
+    luts = {}
+    for name, hist in hists.items():
+        pos, neg = hist.grids()
+        tight = optimize_range(pos, neg, coverage=args.coverage)
+        if tight is None:
+            print(f"⚠️ {name}: no positive pixels inside the seed range")
+            continue
+        tight = (np.clip(tight[0].astype(int) - margin, 0, 255).astype(np.uint8),
+                 np.clip(tight[1].astype(int) + margin, 0, [179, 255, 255]).astype(np.uint8))
+        seed = seeds[name]
+        before = evaluate(dataset, name, lambda hsv, r=seed: cv2.inRange(hsv, r[0], r[1]))
+        after = evaluate(dataset, name, lambda hsv, r=tight: cv2.inRange(hsv, r[0], r[1]))
+        entry = {"seed": [seed[0].tolist(), seed[1].tolist()], "range": [tight[0].tolist(), tight[1].tolist()],
+                 "positives": int(pos.sum()), "before": before, "after": after}
+        print(f"\n🎯 {name} ({hist.frames} frames, {int(pos.sum())} positive px)")
+        print(f"   Seed:  {_fmt(seed)}")
+        print(f"   Tight: {_fmt(tight)}")
+        rows = [("range (seed)", before), ("range (tight)", after)]
+        if args.lut:
+            lut = build_lut(pos, neg)
+            luts[name] = lut
+            bounds = lut_bounds(lut)
+            entry["lut"] = evaluate(dataset, name, lambda hsv, t=lut, b=bounds: apply_lut(hsv, t, b))
+            rows.append(("lookup table", entry["lut"]))
+        for label, s in rows:
+            print(f"   {label:<14} recall={s['box_recall']:.3f} noise={s['noise_px_per_frame']:.0f} px "
+                  f"contours={s['contours_per_frame']:.1f} mask+contours={s['ms_per_frame']:.2f} ms")
+        report[name] = entry
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"dataset": dataset.path, "coverage": args.coverage, "classes": report}, f, indent=2)
+        print(f"\n💾 Wrote {args.out}")
+    if args.lut and luts:
+        np.savez_compressed(args.lut, **luts)
+        print(f"💾 Wrote lookup tables to {args.lut} (load_luts() + apply_lut())")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())